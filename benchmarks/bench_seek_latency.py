@@ -0,0 +1,131 @@
+"""
+libVLC で実際の動画をシークし、シークから新しいフレームが届くまでの遅延の分布を計測するベンチマーク。
+
+一時停止中のプレイヤーに対して、ランダムな位置への VideoPlayerModel.set_time を
+正確モード (precise=True) と高速モード (precise=False, キーフレームへ補正) で交互に実行し、
+ソフトウェア出力の FrameBuffer に次のフレームが書き込まれるまでの時間を計測します。
+キーフレームはアプリと同じく、コンテナのインデックスから読み出します。
+
+    python benchmarks/bench_seek_latency.py VIDEO [VIDEO ...] [--seeks 100] [--output result.json]
+
+libVLC と実際の動画ファイルが必要です。ネットワーク上のファイルで計測すると、
+GOPの長さとファイルの読み出しの影響がよく分かります。
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import percentile
+from src.models.video_player_model import VideoPlayerModel
+from src.utils.keyframe_index import read_keyframe_times
+
+MODES = ("precise", "fast")
+# 分布の表示に使う遅延の区切り(ms)
+HISTOGRAM_EDGES_MS = [10, 25, 50, 100, 250, 500, 1000]
+
+def wait_for_frame(frame_buffer, published_before: int, timeout_s: float) -> bool:
+    """FrameBuffer に新しいフレームが書き込まれるまで待ちます。"""
+    deadline = time.perf_counter() + timeout_s
+    while frame_buffer.frames_published <= published_before:
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.0005)
+    return True
+
+def run(video_files: list[str], seeks: int, seed: int, timeout_s: float) -> dict:
+    from src.models.vlc_player_backend import VlcPlayerBackend
+
+    backend = VlcPlayerBackend(video_output="software")
+    video_model = VideoPlayerModel(backend)
+    video_model.set_video_files(video_files)
+    if video_model.get_length() <= 0:
+        raise RuntimeError("Could not read the duration of the videos.")
+    keyframes = [read_keyframe_times(path) for path in video_files]
+    video_model.set_keyframe_times(keyframes)
+    backend.show_first_frame()
+    frame_buffer = backend.get_frame_buffer()
+    wait_for_frame(frame_buffer, 0, timeout_s)
+
+    rng = random.Random(seed)
+    length = video_model.get_length()
+    samples = {mode: {"latency_ms": [], "offset_ms": [], "timeouts": 0} for mode in MODES}
+    try:
+        for i in range(seeks * len(MODES)):
+            # 同じ位置を続けて読まないよう、モードごとに別の位置を使い、交互に計測する
+            mode = MODES[i % len(MODES)]
+            target_ms = rng.randrange(0, max(1, length - 1000))
+            published_before = frame_buffer.frames_published
+            started = time.perf_counter()
+            video_model.set_time(target_ms, precise=(mode == "precise"))
+            if not wait_for_frame(frame_buffer, published_before, timeout_s):
+                samples[mode]["timeouts"] += 1
+                continue
+            samples[mode]["latency_ms"].append((time.perf_counter() - started) * 1000.0)
+            samples[mode]["offset_ms"].append(abs(video_model.get_time() - target_ms))
+    finally:
+        video_model.release_player()
+
+    results = {
+        "videos": video_files,
+        "keyframe_counts": [None if times is None else len(times) for times in keyframes],
+        "modes": {},
+    }
+    for mode, sample in samples.items():
+        latencies = sorted(sample["latency_ms"])
+        histogram = {}
+        previous_edge = 0
+        for edge in HISTOGRAM_EDGES_MS + [None]:
+            label = f"<{edge}ms" if edge is not None else f">={previous_edge}ms"
+            histogram[label] = sum(1 for value in latencies
+                                   if value >= previous_edge and (edge is None or value < edge))
+            previous_edge = edge
+        results["modes"][mode] = {
+            "count": len(latencies),
+            "timeouts": sample["timeouts"],
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": latencies[-1] if latencies else 0.0,
+            "mean_offset_ms": statistics.fmean(sample["offset_ms"]) if sample["offset_ms"] else 0.0,
+            "histogram": histogram,
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure seek-to-frame latency in precise and fast seek modes.")
+    parser.add_argument("videos", nargs="+", help="video files to seek in (played as one playlist)")
+    parser.add_argument("--seeks", type=int, default=100, help="number of seeks per mode")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=2.0, help="seconds to wait for a frame after a seek")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    try:
+        results = run(args.videos, args.seeks, args.seed, args.timeout)
+    except (ImportError, OSError, NameError) as e:
+        print(f"libVLC is not available ({e}).")
+        sys.exit(2)
+
+    print(f"\nkeyframes per video: {results['keyframe_counts']}")
+    print(f"{'mode':<10}{'count':>7}{'timeout':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'offset':>9}")
+    for mode, stats in results["modes"].items():
+        print(f"{mode:<10}{stats['count']:>7}{stats['timeouts']:>9}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}"
+              f"{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}{stats['mean_offset_ms']:>9.0f}")
+    for mode, stats in results["modes"].items():
+        print(f"\n{mode} latency distribution:")
+        for label, count in stats["histogram"].items():
+            print(f"  {label:>9} {count:>5} {'#' * count}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4, ensure_ascii=False)
+        print(f"\nResults saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
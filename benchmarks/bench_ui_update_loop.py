@@ -0,0 +1,59 @@
+"""
+MainViewModel._ui_update_loop の1ティックあたりのコストを計測するマイクロベンチマーク。
+
+Tkのウィンドウの代わりに書き込み回数を数えるだけのスタブを、libVLC の代わりに
+仮想時計で進む FakePlayerBackend を使い、ViewModel側の処理時間だけを計測します。
+
+    python benchmarks/bench_ui_update_loop.py [--ticks 20000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.viewmodels.main_viewmodel import MainViewModel
+from common import StubView, make_playlist
+
+def run(ticks: int) -> dict:
+    video_model, clock = make_playlist(1)
+    video_model.play_pause()
+    viewmodel = MainViewModel(settings_model=None, preset_model=None, analysis_model=None, video_model=video_model)
+    view = StubView()
+    viewmodel.view = view
+    viewmodel.update_ui_regularly()
+
+    durations_ns = []
+    for _ in range(ticks):
+        clock.advance(50)
+        start = time.perf_counter_ns()
+        viewmodel._ui_update_loop()
+        durations_ns.append(time.perf_counter_ns() - start)
+
+    durations_us = sorted(d / 1000.0 for d in durations_ns)
+    return {
+        "ticks": ticks,
+        "mean_us": statistics.fmean(durations_us),
+        "p50_us": durations_us[len(durations_us) // 2],
+        "p95_us": durations_us[int(len(durations_us) * 0.95)],
+        "time_display_writes": view.time_display_var.writes,
+        "timeline_writes": view.timeline.writes,
+        "button_writes": view.play_pause_button.writes,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MainViewModel._ui_update_loop per-tick cost.")
+    parser.add_argument("--ticks", type=int, default=20000)
+    args = parser.parse_args()
+
+    result = run(args.ticks)
+    print(f"ticks: {result['ticks']}")
+    print(f"per tick: mean {result['mean_us']:.2f}us, p50 {result['p50_us']:.2f}us, p95 {result['p95_us']:.2f}us")
+    print(f"Tk writes: time label {result['time_display_writes']}, "
+          f"timeline {result['timeline_writes']}, play button {result['button_writes']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+アノテーションのホットパスに対するベンチマークケースの定義。
+
+各ケースは、パラメータ (クリップ数・スタンプ数・記録数) を受け取って
+計測対象の関数を返す build 関数と、計測回数の設定を持ちます。
+"""
+import contextlib
+import io
+import os
+import tempfile
+import warnings
+
+import numpy as np
+
+from common import (StubView, fill_analysis_model, make_mp4_index_file, make_playlist, make_records,
+                    make_stamps)
+
+class BenchmarkCase:
+    def __init__(self, name: str, params: list[int], quick_params: list[int], build,
+                 rounds: int = 20, number: int = 1):
+        """
+        Args:
+            name: ケース名。結果のキーは "name[param]" になる。
+            params: 通常実行で使うパラメータ。
+            quick_params: --quick 指定時に使うパラメータ。
+            build: build(param) -> 計測対象の引数なし関数。計測できない環境では None を返す。
+            rounds, number: measure() に渡す計測回数。
+        """
+        self.name = name
+        self.params = params
+        self.quick_params = quick_params
+        self.build = build
+        self.rounds = rounds
+        self.number = number
+
+def _quiet(func):
+    """標準出力へのログと警告 (フォント不足など) を捨てて func を実行する関数を返します。"""
+    def wrapper():
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return func()
+    return wrapper
+
+# --- MainViewModel / VideoPlayerModel ---
+
+def build_ui_update_loop(clip_count: int):
+    from src.viewmodels.main_viewmodel import MainViewModel
+
+    video_model, clock = make_playlist(clip_count)
+    video_model.play_pause()
+    viewmodel = MainViewModel(settings_model=None, preset_model=None, analysis_model=None, video_model=video_model)
+    viewmodel.view = StubView()
+    viewmodel.update_ui_regularly()
+
+    def tick():
+        clock.advance(50)
+        viewmodel._ui_update_loop()
+    return tick
+
+def build_set_time(clip_count: int):
+    video_model, _ = make_playlist(clip_count)
+    length = video_model.get_length()
+    positions = [(i * 7919 * 1000) % length for i in range(1000)]
+    state = {"i": 0}
+
+    def seek():
+        state["i"] = (state["i"] + 1) % len(positions)
+        video_model.set_time(positions[state["i"]])
+    return seek
+
+def build_set_time_fast(clip_count: int):
+    # 2秒ごとにキーフレームがある動画として、キーフレームへ補正するシークを計測する
+    video_model, _ = make_playlist(clip_count)
+    durations = video_model.get_media_durations()
+    video_model.set_keyframe_times([np.arange(0, duration, 2000, dtype=np.int64) for duration in durations])
+    length = video_model.get_length()
+    positions = [(i * 7919 * 1000) % length for i in range(1000)]
+    state = {"i": 0}
+
+    def seek():
+        state["i"] = (state["i"] + 1) % len(positions)
+        video_model.set_time(positions[state["i"]], precise=False)
+    return seek
+
+def build_get_time(clip_count: int):
+    video_model, clock = make_playlist(clip_count)
+    video_model.play_pause()
+
+    def get_time():
+        clock.advance(50)
+        video_model.get_time()
+    return get_time
+
+# --- MainWindow ---
+
+def build_stamp_list_refresh(stamp_count: int):
+    import tkinter as tk
+    from tkinter import ttk
+    from types import SimpleNamespace
+    from src.views.main_window import MainWindow
+
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None  # ディスプレイがない環境では計測しない
+    root.withdraw()
+    tree = ttk.Treeview(root, columns=("procedure",), show="headings", selectmode="browse")
+    window = SimpleNamespace(stamp_tree=tree)
+    stamps = make_stamps(stamp_count)
+
+    def refresh():
+        MainWindow.update_stamp_list_and_select(window, stamps, stamp_count // 2)
+        root.update_idletasks()
+    return refresh
+
+# --- AnalysisDataModel ---
+
+def _make_analysis_model(record_count: int):
+    from src.models.analysis_data_model import AnalysisDataModel
+
+    analysis_model = AnalysisDataModel()
+    fill_analysis_model(analysis_model, make_records(record_count))
+    return analysis_model
+
+def build_get_summary(record_count: int):
+    return _make_analysis_model(record_count).get_summary
+
+def build_export_to_dataframe(record_count: int):
+    return _make_analysis_model(record_count).export_to_dataframe
+
+def build_get_active_records(record_count: int):
+    analysis_model = _make_analysis_model(record_count)
+    end_sec = analysis_model.get_last_record()["終了時間(秒)"]
+    times = [(i * 7919.0) % end_sec for i in range(1000)]
+    state = {"i": 0}
+
+    def query():
+        state["i"] = (state["i"] + 1) % len(times)
+        analysis_model.get_active_records(times[state["i"]])
+    return query
+
+def build_get_records_in_range(record_count: int):
+    # タイムラインの表示範囲 (10分) に重なる記録を取り出す
+    analysis_model = _make_analysis_model(record_count)
+    end_sec = analysis_model.get_last_record()["終了時間(秒)"]
+    starts = [(i * 7919.0) % end_sec for i in range(1000)]
+    state = {"i": 0}
+
+    def query():
+        state["i"] = (state["i"] + 1) % len(starts)
+        analysis_model.get_records_in_range(starts[state["i"]], starts[state["i"]] + 600.0)
+    return query
+
+# --- utils ---
+
+def build_read_keyframe_times(minutes: int):
+    from src.utils.keyframe_index import read_keyframe_times
+
+    output_dir = tempfile.mkdtemp(prefix="svat_bench_")
+    path = os.path.join(output_dir, "bench.mp4")
+    make_mp4_index_file(path, minutes, keyint=15)
+    return lambda: read_keyframe_times(path)
+
+# --- helpers ---
+
+def build_video_fingerprint(megabytes: int):
+    # 指紋の計算は読む量が一定なので、ファイルの大きさによらずほぼ同じ時間になるはず
+    from src.utils.video_cache import compute_video_fingerprint
+    output_dir = tempfile.mkdtemp(prefix="svat_bench_")
+    path = os.path.join(output_dir, "video.mp4")
+    with open(path, "wb") as f:
+        f.truncate(megabytes * 1024 * 1024)
+        f.write(os.urandom(1024 * 1024))
+    return lambda: compute_video_fingerprint(path)
+
+def build_waveform_peaks(clip_count: int):
+    # 3時間のプレイリストの波形を、全体表示から1秒幅まで順にズームしながら1000列分読み出す
+    from src.models.audio_waveform_model import AudioWaveformModel, base_block_count
+    from src.utils.peak_pyramid import build_peak_pyramid
+    total_ms = 3 * 60 * 60 * 1000
+    clip_ms = total_ms // clip_count
+    audio_model = AudioWaveformModel(tempfile.mkdtemp(prefix="svat_bench_"))
+    audio_model._offsets = [i * clip_ms for i in range(clip_count + 1)]
+    rng = np.random.default_rng(0)
+    base = rng.integers(-30000, 30000, size=(base_block_count(clip_ms), 2), dtype=np.int16)
+    pyramid = build_peak_pyramid(np.sort(base, axis=1))
+    audio_model._results = {i: pyramid for i in range(clip_count)}
+    audio_model._on_results_changed()
+    views = [(center - span / 2, center + span / 2)
+             for span in (total_ms, 600_000, 10_000, 1000) for center in (total_ms * 0.25, total_ms * 0.75)]
+    state = {"i": 0}
+
+    def query():
+        state["i"] = (state["i"] + 1) % len(views)
+        audio_model.get_peaks(*views[state["i"]], 1000)
+    return query
+
+def build_predict_next_stamp(session_count: int):
+    # 40種類の手順を、飛ばしや繰り返しを含めて記録した過去のセッションから学習した遷移表で、次の手順を予測する
+    from src.models.stamp_predictor_model import StampPredictorModel
+    predictor = StampPredictorModel(os.path.join(tempfile.mkdtemp(prefix="svat_bench_"), "transitions.json"))
+    rng = np.random.default_rng(0)
+    names = [f"Step {i}" for i in range(40)]
+    for session in range(session_count):
+        steps = np.cumsum(rng.choice([0, 1, 1, 1, 2], size=30)) % len(names)
+        predictor.add_session(f"session_{session}.csv", [names[i] for i in steps])
+    candidates = set(names)
+    state = {"i": 0}
+
+    def predict():
+        state["i"] = (state["i"] + 1) % len(names)
+        predictor.predict(names[state["i"]], candidates)
+    return predict
+
+def build_session_report(record_count: int):
+    # 保存済みの結果のCSVから、HTMLのレポートを作成する (ページの枠はキャッシュ済み)
+    from src.models.report_model import write_session_report
+    df = _make_analysis_model(record_count).export_to_dataframe()
+    df['移行時間(秒)'] = df['開始時間(秒)'] - df['終了時間(秒)'].shift(1)
+    output_dir = tempfile.mkdtemp(prefix="svat_bench_")
+    csv_path = os.path.join(output_dir, "bench.csv")
+    df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+    return lambda: write_session_report(csv_path, asset_cache_dir=output_dir)
+
+def build_load_session(record_count: int):
+    # 途中のセッションのファイルを読み込む (メモリマップして、列ごとの配列から記録を作る)
+    from src.models.session_file_model import read_session, write_session
+    session_path = os.path.join(tempfile.mkdtemp(prefix="svat_bench_"), "bench.svses")
+    write_session(session_path, {"videos": [], "playhead_ms": 0, "records": make_records(record_count)})
+    return lambda: read_session(session_path)
+
+def build_create_and_save_graph(record_count: int):
+    import matplotlib
+    matplotlib.use("Agg")
+    from src.utils import helpers
+
+    df = _make_analysis_model(record_count).export_to_dataframe()
+    df['移行時間(秒)'] = df['開始時間(秒)'] - df['終了時間(秒)'].shift(1)
+    output_dir = tempfile.mkdtemp(prefix="svat_bench_")
+    output_path = os.path.join(output_dir, "bench.csv")
+    return _quiet(lambda: helpers.create_and_save_graph(df, output_path, None))
+
+CASES = [
+    BenchmarkCase("ui_update_loop", [1, 50, 500], [1, 50], build_ui_update_loop, rounds=30, number=200),
+    BenchmarkCase("set_time", [1, 50, 500], [1, 50], build_set_time, rounds=30, number=200),
+    BenchmarkCase("set_time_fast", [1, 50, 500], [1, 50], build_set_time_fast, rounds=30, number=200),
+    BenchmarkCase("get_time", [1, 50, 500], [1, 50], build_get_time, rounds=30, number=200),
+    BenchmarkCase("stamp_list_refresh", [10, 500, 5000], [10, 500], build_stamp_list_refresh, rounds=10),
+    BenchmarkCase("get_summary", [10, 10_000, 1_000_000], [10, 10_000], build_get_summary, rounds=10),
+    BenchmarkCase("get_active_records", [10, 10_000, 300_000], [10, 10_000], build_get_active_records,
+                  rounds=20, number=100),
+    BenchmarkCase("get_records_in_range", [10, 10_000, 300_000], [10, 10_000], build_get_records_in_range,
+                  rounds=20, number=100),
+    BenchmarkCase("export_to_dataframe", [10, 10_000, 1_000_000], [10, 10_000], build_export_to_dataframe, rounds=5),
+    BenchmarkCase("read_keyframe_times", [10, 240], [10], build_read_keyframe_times, rounds=10),
+    BenchmarkCase("video_fingerprint", [10, 1000, 20_000], [10], build_video_fingerprint, rounds=10, number=20),
+    BenchmarkCase("waveform_peaks", [1, 50], [1], build_waveform_peaks, rounds=10, number=50),
+    BenchmarkCase("predict_next_stamp", [10, 10_000], [10], build_predict_next_stamp, rounds=20, number=200),
+    BenchmarkCase("session_report", [10, 100, 1000], [10], build_session_report, rounds=5),
+    BenchmarkCase("load_session", [10, 10_000, 1_000_000], [10, 10_000], build_load_session, rounds=5),
+    BenchmarkCase("create_and_save_graph", [10, 100], [10], build_create_and_save_graph, rounds=3),
+]
@@ -0,0 +1,204 @@
+"""
+ベンチマークで共有する、計測用のヘルパーとスタブ、合成データの生成関数。
+"""
+import math
+import os
+import random
+import statistics
+import struct
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.fake_player_backend import FakePlayerBackend, VirtualClock
+from src.models.video_player_model import VideoPlayerModel
+
+# --- 計測 ---
+
+def measure(func, rounds: int = 20, number: int = 1, warmup: int = 2) -> dict:
+    """
+    func を rounds 回計測し、1回あたりの処理時間の統計を返します。
+
+    Args:
+        func: 計測する引数なしの関数。
+        rounds: 計測回数。
+        number: 1回の計測で func を呼び出す回数 (短い処理のタイマー誤差をならすため)。
+        warmup: 計測前に捨てる呼び出し回数。
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return {
+        "rounds": rounds,
+        "number": number,
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "stdev_s": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+# --- スタブ ---
+
+class StubVar:
+    """tk.Variable の代わり。set() の呼び出し回数だけを数える。"""
+    def __init__(self):
+        self.writes = 0
+        self.value = None
+
+    def set(self, value):
+        self.writes += 1
+        self.value = value
+
+    def get(self):
+        return self.value
+
+class StubWidget:
+    """ttk.Button などの代わり。config() の呼び出し回数だけを数える。"""
+    def __init__(self):
+        self.writes = 0
+
+    def config(self, **kwargs):
+        self.writes += 1
+
+class StubTimeline:
+    """SeekTimeline の代わり。set_position() の呼び出し回数だけを数える。"""
+    def __init__(self):
+        self.writes = 0
+        self.is_dragging = False
+
+    def set_position(self, time_ms):
+        self.writes += 1
+
+class StubView:
+    """MainWindow の代わり。UI更新ループが触る属性だけを持つ。"""
+    def __init__(self):
+        self.time_display_var = StubVar()
+        self.timeline = StubTimeline()
+        self.play_pause_button = StubWidget()
+
+    def after(self, delay_ms, callback):
+        # ループを再スケジュールせず、ベンチマーク側から1ティックずつ呼び出す
+        return None
+
+    def after_cancel(self, timer_id):
+        pass
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    """最近傍順位法でパーセンタイルを返します。"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+# --- 合成データ ---
+
+def make_playlist(clip_count: int, total_ms: int = 3 * 60 * 60 * 1000):
+    """
+    合計 total_ms の長さを clip_count 本に分けたプレイリストを FakePlayerBackend で読み込みます。
+
+    Returns:
+        (VideoPlayerModel, VirtualClock) のタプル。
+    """
+    clip_ms = total_ms // clip_count
+    paths = [f"clip_{i:04d}.mp4" for i in range(clip_count)]
+    clock = VirtualClock()
+    backend = FakePlayerBackend(clock, durations={path: clip_ms for path in paths})
+    video_model = VideoPlayerModel(backend)
+    video_model.set_video_files(paths)
+    return video_model, clock
+
+def make_stamps(count: int) -> list[str]:
+    return [f"手順 {i:05d}" for i in range(count)]
+
+def make_records(count: int, stamp_count: int = 20) -> list[dict]:
+    """連続した count 件の記録 (AnalysisDataModel の形式) を作成します。"""
+    stamps = make_stamps(stamp_count)
+    records = []
+    time_sec = 0.0
+    for i in range(count):
+        start = time_sec + 2.0
+        end = start + 30.0 + (i % 7)
+        records.append({
+            "手順名": stamps[i % stamp_count],
+            "開始時間(秒)": start,
+            "終了時間(秒)": end,
+            "所要時間(秒)": end - start,
+            "メモ": "",
+        })
+        time_sec = end
+    return records
+
+def fill_analysis_model(analysis_model, records: list[dict]):
+    """
+    記録を AnalysisDataModel にまとめて追加します。
+    (end_procedure は1件ごとにログを出力するため、大量の記録の準備には使わない)
+    """
+    analysis_model.add_records(records)
+
+def make_input_trace(action_count: int, clip_count: int = 3, seed: int = 0) -> tuple[dict, list[dict]]:
+    """
+    アノテーション作業を模した操作列を、load_trace() と同じ (ヘッダ, 操作のリスト) の形式で作成します。
+    再生して見ながら手順の開始・終了を記録し、ときどき10秒スキップや取り消しを挟みます。
+    """
+    rng = random.Random(seed)
+    header = {
+        "media_durations": [60 * 60 * 1000] * clip_count,
+        "stamps": make_stamps(10),
+        "candidates": list(range(45_000, clip_count * 60 * 60 * 1000, 90_000)),
+    }
+    events = [{"t_ms": 500.0, "action": "play_pause"}]
+    t_ms = 500.0
+    recording = False
+    while len(events) < action_count:
+        roll = rng.random()
+        if roll < 0.1:
+            action = rng.choice(["skip_backward", "skip_forward", "next_candidate"])
+            t_ms += rng.uniform(500, 3000)
+        elif roll < 0.15 and not recording:
+            action = "undo"
+            t_ms += rng.uniform(1000, 4000)
+        else:
+            action = "end" if recording else "start"
+            recording = not recording
+            t_ms += rng.uniform(20_000, 90_000) if action == "end" else rng.uniform(2000, 15_000)
+        events.append({"t_ms": round(t_ms, 1), "action": action})
+    return header, events
+
+def _mp4_box(box_type: bytes, *payloads: bytes) -> bytes:
+    body = b"".join(payloads)
+    return struct.pack(">I4s", 8 + len(body), box_type) + body
+
+def make_mp4_index_file(path: str, minutes: int, fps: int = 30, keyint: int = 60):
+    """
+    映像トラックのインデックス (mdhd・hdlr・stts・stss) だけを持つ MP4 ファイルを作成します。
+    read_keyframe_times() の計測用で、映像データ (mdat) は空です。
+
+    Returns:
+        キーフレームの時間(ms)のリスト。
+    """
+    timescale = fps * 1000
+    sample_count = minutes * 60 * fps
+    sync_samples = list(range(1, sample_count + 1, keyint))
+    full_box = lambda box_type, *payloads: _mp4_box(box_type, b"\0\0\0\0", *payloads)
+    stbl = _mp4_box(
+        b"stbl",
+        full_box(b"stts", struct.pack(">III", 1, sample_count, 1000)),
+        full_box(b"stss", struct.pack(">I", len(sync_samples)), struct.pack(f">{len(sync_samples)}I", *sync_samples)),
+    )
+    mdia = _mp4_box(
+        b"mdia",
+        full_box(b"mdhd", struct.pack(">IIIIHH", 0, 0, timescale, sample_count * 1000, 0, 0)),
+        full_box(b"hdlr", struct.pack(">I4s12s", 0, b"vide", bytes(12)), b"Video\0"),
+        _mp4_box(b"minf", stbl),
+    )
+    with open(path, "wb") as f:
+        f.write(_mp4_box(b"ftyp", b"isom", struct.pack(">I", 512), b"isommp41"))
+        f.write(_mp4_box(b"mdat"))
+        f.write(_mp4_box(b"moov", _mp4_box(b"trak", mdia)))
+    return [-(-(sample - 1) * 1000 * 1000 // timescale) for sample in sync_samples]
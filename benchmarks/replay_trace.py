@@ -0,0 +1,210 @@
+"""
+記録した操作 (InputTraceRecorder) をアプリケーションに再生し、操作ごとの遅延を集計するハーネス。
+
+実際の MainWindow と MainViewModel に対してキーイベントを event_generate で送るため、
+ショートカットのバインドからModel・UIへの反映までを含めた遅延を計測できます。
+動画は libVLC の代わりに FakePlayerBackend で再生し、記録時の動画の長さを再現します。
+ディスプレイのない環境では xvfb-run などの仮想Xサーバー上で実行してください。
+
+    python benchmarks/replay_trace.py TRACE.jsonl [--speed 10] [--output result.json]
+    python benchmarks/replay_trace.py --synthetic 500             # 合成した操作列を再生
+
+操作の記録はアプリの設定 "input_trace_enabled" か環境変数 SVAT_TRACE で有効になり、
+終了時に設定ディレクトリの Traces/ に保存されます。
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tkinter as tk
+
+from common import make_input_trace, percentile
+from src.models.analysis_data_model import AnalysisDataModel
+from src.models.fake_player_backend import FakePlayerBackend, VirtualClock
+from src.models.preset_model import PresetModel
+from src.models.scene_detection_model import SceneDetectionModel
+from src.models.settings_model import SettingsModel
+from src.models.video_player_model import VideoPlayerModel
+from src.utils.input_trace import input_trace, load_trace
+from src.viewmodels.main_viewmodel import MainViewModel
+from src.views.main_window import MainWindow
+
+# 記録時の再生位置とこれ以上ずれていたら、操作の前にシークして合わせる
+# (マウスでのシークなど、記録していない操作の影響を打ち消すため)
+SYNC_TOLERANCE_MS = 1000
+REPLAY_PRESET_NAME = "Replay"
+
+def summarize(events: list[dict]) -> dict:
+    """操作の種類ごとに、遅延の p50/p95/p99/max (ms) を集計します。"""
+    latencies = {}
+    for event in events:
+        latencies.setdefault(event["action"], []).append(event["latency_ms"])
+    summary = {}
+    for action, values in sorted(latencies.items()):
+        values.sort()
+        summary[action] = {
+            "count": len(values),
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "p99_ms": percentile(values, 99),
+            "max_ms": values[-1],
+        }
+    return summary
+
+class ReplaySession:
+    """
+    再生用に、FakePlayerBackend と記録時のプリセットでアプリケーションを組み立てます。
+    ユーザーの設定・プリセットのファイルには書き込みません。
+    """
+
+    def __init__(self, header: dict):
+        self.clock = VirtualClock()
+        durations = header.get("media_durations") or [FakePlayerBackend.DEFAULT_DURATION_MS]
+        paths = [f"replay_{i:04d}.mp4" for i in range(len(durations))]
+        backend = FakePlayerBackend(self.clock, durations=dict(zip(paths, durations)))
+        self.video_model = VideoPlayerModel(backend)
+
+        settings_model = SettingsModel()
+        # メモ入力のダイアログは人の入力待ちになるため、再生中は表示しない
+        settings_model.set("memo_enabled", False)
+        preset_model = PresetModel(settings_model)
+        self.stamps = header.get("stamps") or preset_model.get_stamps(preset_model.presets_data.get("last_used"))
+        preset_model.presets_data = {"presets": {REPLAY_PRESET_NAME: self.stamps}, "last_used": REPLAY_PRESET_NAME}
+
+        # 記録時の境界候補をそのまま使う (再生中に解析は行わない)
+        scene_model = SceneDetectionModel(tempfile.mkdtemp(prefix="svat_replay_"))
+        scene_model._sorted_candidates = sorted(header.get("candidates") or [])
+
+        self.viewmodel = MainViewModel(
+            settings_model=settings_model,
+            preset_model=preset_model,
+            analysis_model=AnalysisDataModel(),
+            video_model=self.video_model,
+            scene_model=scene_model,
+        )
+        self.view = MainWindow(self.viewmodel)
+        self.viewmodel.set_view(self.view)
+        self.view.set_video_model(self.video_model)
+
+        self.video_model.set_video_files(paths)
+        self.video_model.set_display_handle(self.view.get_video_frame_handle())
+        self.viewmodel._show_playlist_on_timelines()
+        self.viewmodel.initialize_app()
+        self.viewmodel.update_ui_regularly()
+
+    def pump(self, virtual_ms: float, speed: float):
+        """
+        仮想時計を virtual_ms 進めながら、実時間で virtual_ms / speed の間Tkのイベントを処理します。
+        speed が0以下のときは待たずに1回だけ処理します。
+        """
+        if speed <= 0:
+            self.clock.advance(virtual_ms)
+            self.view.update()
+            return
+        remaining_ms = virtual_ms
+        deadline = time.perf_counter() + virtual_ms / 1000.0 / speed
+        last = time.perf_counter()
+        while True:
+            now = time.perf_counter()
+            step_ms = min((now - last) * 1000.0 * speed, remaining_ms)
+            self.clock.advance(step_ms)
+            remaining_ms -= step_ms
+            last = now
+            self.view.update()
+            if now >= deadline:
+                break
+            time.sleep(min(0.005, deadline - now))
+        self.clock.advance(remaining_ms)
+
+    def sync(self, event: dict):
+        """記録時の状態 (再生速度・再生中かどうか・再生位置・選択中のスタンプ) に合わせます。"""
+        rate = event.get("rate")
+        if rate and rate != self.video_model.get_rate() and rate in self.view.speed_buttons:
+            self.viewmodel.on_set_speed_clicked(rate)
+        if "playing" in event and event["playing"] != self.video_model.is_playing():
+            self.video_model.play_pause()
+        position_ms = event.get("position_ms")
+        if position_ms is not None and abs(self.video_model.get_time() - position_ms) > SYNC_TOLERANCE_MS:
+            self.video_model.set_time(int(position_ms))
+        stamp = event.get("stamp")
+        if (event["action"] == "start" and stamp and stamp != self.viewmodel.selected_stamp
+                and not self.viewmodel.is_recording and stamp in self.stamps):
+            self.view.update_stamp_list_and_select(self.stamps, self.stamps.index(stamp))
+            self.viewmodel.on_stamp_select()
+        self.view.update_idletasks()
+
+    def replay(self, events: list[dict], speed: float) -> list[dict]:
+        """操作列を再生し、再生中に記録された操作 (遅延つき) を返します。"""
+        self.view.focus_force()
+        self.view.update()
+        input_trace.reset()
+        input_trace.start()
+        previous_t_ms = 0.0
+        for event in events:
+            keysym = MainWindow.SHORTCUT_KEYS.get(event["action"])
+            if keysym is None:
+                continue
+            self.pump(max(0.0, event["t_ms"] - previous_t_ms), speed)
+            previous_t_ms = event["t_ms"]
+            self.sync(event)
+            self.view.event_generate(f"<KeyPress-{keysym}>")
+        input_trace.enabled = False
+        return input_trace.get_events()
+
+    def close(self):
+        if self.viewmodel._update_timer:
+            self.view.after_cancel(self.viewmodel._update_timer)
+        self.view.destroy()
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded input trace and report per-action latency.")
+    parser.add_argument("trace", nargs="?", help="input trace (.jsonl) saved by the application")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="replay N synthetic annotation actions instead")
+    parser.add_argument("--speed", type=float, default=10.0,
+                        help="replay speed relative to the recording (0 = as fast as possible)")
+    parser.add_argument("--output", help="write the latency summary to this JSON file")
+    args = parser.parse_args()
+
+    if args.trace:
+        header, events = load_trace(args.trace)
+    elif args.synthetic:
+        header, events = make_input_trace(args.synthetic)
+    else:
+        parser.error("specify a trace file or --synthetic N")
+
+    try:
+        session = ReplaySession(header)
+    except tk.TclError as e:
+        print(f"Cannot open a Tk window ({e}). Run under a virtual X server, e.g. xvfb-run.")
+        sys.exit(2)
+
+    started = time.perf_counter()
+    try:
+        replayed = session.replay(events, args.speed)
+    finally:
+        session.close()
+    elapsed = time.perf_counter() - started
+
+    summary = summarize(replayed)
+    recorded = summarize([event for event in events if "latency_ms" in event])
+    print(f"\nReplayed {len(replayed)} actions in {elapsed:.1f}s (speed {args.speed:g}x)")
+    print(f"{'action':<20}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'rec p95':>9}")
+    for action, stats in summary.items():
+        recorded_p95 = recorded.get(action, {}).get("p95_ms")
+        recorded_text = f"{recorded_p95:>9.2f}" if recorded_p95 is not None else f"{'-':>9}"
+        print(f"{action:<20}{stats['count']:>7}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}"
+              f"{stats['p99_ms']:>9.2f}{stats['max_ms']:>9.2f}{recorded_text}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"trace": args.trace, "speed": args.speed, "replayed": summary, "recorded": recorded},
+                      f, indent=4, ensure_ascii=False)
+        print(f"\nResults saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+アノテーションのホットパスのベンチマークを実行し、結果をJSONで出力するランナー。
+
+    python benchmarks/run_benchmarks.py                       # 全ケースを実行して表示
+    python benchmarks/run_benchmarks.py --output results.json # 結果をJSONに保存
+    python benchmarks/run_benchmarks.py --save-baseline       # 結果を基準値として保存
+    python benchmarks/run_benchmarks.py --compare             # 基準値と比較 (劣化があれば終了コード1)
+
+--filter でケース名の部分一致による絞り込み、--quick で大きなパラメータの省略ができます。
+基準値は benchmarks/baseline.json (--quick で作成) をリポジトリに含めているため、
+clone 直後でも `--quick --compare` で比較できます。計測するマシンが変わったら --save-baseline で作り直してください。
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cases import CASES
+from common import measure
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+def run_cases(name_filter: str | None, quick: bool) -> dict:
+    results = {}
+    for case in CASES:
+        if name_filter and name_filter not in case.name:
+            continue
+        for param in (case.quick_params if quick else case.params):
+            key = f"{case.name}[{param}]"
+            # 準備中のログ (プレイリストの読み込みなど) は結果表示の邪魔になるので捨てる
+            with contextlib.redirect_stdout(io.StringIO()):
+                func = case.build(param)
+            if func is None:
+                print(f"{key:<36} skipped")
+                continue
+            stats = measure(func, rounds=case.rounds, number=case.number)
+            results[key] = stats
+            print(f"{key:<36} median {stats['median_s'] * 1e6:>12.2f}us  min {stats['min_s'] * 1e6:>12.2f}us")
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    基準値と比較し、中央値が threshold (割合) を超えて遅くなったケースの一覧を返します。
+    """
+    regressions = []
+    print(f"\n{'case':<36}{'baseline':>14}{'current':>14}{'change':>10}")
+    for key, stats in results.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f"{key:<36}{'-':>14}{stats['median_s'] * 1e6:>12.2f}us{'new':>10}")
+            continue
+        ratio = stats["median_s"] / base["median_s"] if base["median_s"] > 0 else 1.0
+        marker = "  REGRESSION" if ratio > 1.0 + threshold else ""
+        print(f"{key:<36}{base['median_s'] * 1e6:>12.2f}us{stats['median_s'] * 1e6:>12.2f}us"
+              f"{(ratio - 1.0) * 100:>+9.1f}%{marker}")
+        if marker:
+            regressions.append(key)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the annotation hot-path benchmark suite.")
+    parser.add_argument("--filter", help="run only cases whose name contains this text")
+    parser.add_argument("--quick", action="store_true", help="skip the largest parameter sizes")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="compare the results against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown of the median before a case counts as a regression (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = run_cases(args.filter, args.quick)
+    document = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=4, ensure_ascii=False)
+        print(f"\nResults saved to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=4, ensure_ascii=False)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if args.compare:
+        try:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline_document = json.load(f)
+            baseline = baseline_document["results"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
+            print(f"\nCannot read baseline {args.baseline}: {e}")
+            sys.exit(2)
+        baseline_meta = baseline_document.get("meta", {})
+        if baseline_meta.get("quick", args.quick) != args.quick:
+            print(f"\nNote: the baseline was made {'with' if baseline_meta['quick'] else 'without'} --quick; "
+                  "cases missing from it are shown as new.")
+        if baseline_meta.get("platform") and baseline_meta["platform"] != platform.platform():
+            print(f"\nNote: the baseline was measured on {baseline_meta['platform']}.")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import argparse
 import sys
 import os
 import tkinter as tk
@@ -6,6 +7,12 @@ from tkinter import filedialog
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from src.app import Application
+from src.models.agreement_model import run_agreement
+from src.models.report_model import run_reports
+from src.models.session_file_model import open_session
+from src.models.settings_model import SettingsModel
+from src.models.video_analysis_model import get_analysis_executor, shutdown_analysis_executor
+from src.models.worklist_model import WorklistModel
 
 def select_video_files() -> list[str]:
     """
@@ -40,23 +47,119 @@ def select_video_files() -> list[str]:
     
     return list(file_paths)
 
+def create_worklist(source_path: str) -> WorklistModel | None:
+    """
+    フォルダまたはマニフェストからワークリストを作成し、最初の症例の準備を始める。
+    読み込めない場合は None を返す。
+    """
+    settings_model = SettingsModel()
+    try:
+        worklist = WorklistModel(
+            source_path,
+            state_dir=settings_model.get_cache_dir('worklists'),
+            keyframe_cache_dir=settings_model.get_cache_dir('keyframes'),
+            prefetch_count=settings_model.get("worklist_prefetch_count"),
+            sample_points=settings_model.get("worklist_sample_points"),
+        )
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Failed to load worklist {source_path}: {e}")
+        return None
+    return worklist
+
+def load_session(session_path: str) -> dict | None:
+    """
+    保存したセッション (または結果のCSV) を読み込む。
+    読み込めない場合や、動画が見つからない場合は None を返す。
+    """
+    try:
+        session = open_session(session_path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Failed to open session {session_path}: {e}")
+        return None
+    if not session["videos"]:
+        print(f"No videos are recorded in {session_path}.")
+        return None
+    missing = [video["path"] for video in session["videos"] if not os.path.exists(video["path"])]
+    if missing:
+        print(f"Cannot open session {session_path}; videos not found: {', '.join(missing)}")
+        return None
+    return session
+
 def main():
     """
     アプリケーションのメインループ。
+    ワークリストが指定された場合は、ファイルを選ばずに症例を順に開く。
     """
+    parser = argparse.ArgumentParser(description="Surgical Video Analysis Tool 2")
+    parser.add_argument("--worklist", help="folder or manifest of cases to annotate one after another")
+    parser.add_argument("--compare", nargs="+", metavar="PATH",
+                        help="compare the saved results of several raters (folders or CSVs) and exit")
+    parser.add_argument("--output", default="agreement_report", help="output folder for --compare")
+    parser.add_argument("--report", nargs="+", metavar="PATH",
+                        help="write an HTML report next to each saved result (folders or CSVs) and exit")
+    parser.add_argument("--force", action="store_true", help="with --report, rebuild reports that are up to date")
+    parser.add_argument("--session", metavar="PATH",
+                        help="resume a saved session (or a saved result CSV) at its saved position")
+    args = parser.parse_args()
+
+    if args.compare:
+        # GUIは起動せず、評価者間の一致度のレポートだけを作成する
+        try:
+            run_agreement(args.compare, args.output, executor=get_analysis_executor())
+        finally:
+            shutdown_analysis_executor()
+        return
+    if args.report:
+        # GUIは起動せず、保存済みの結果のHTMLのレポートだけを作成する
+        try:
+            run_reports(args.report, asset_cache_dir=SettingsModel().get_cache_dir('reports'), force=args.force,
+                        executor=get_analysis_executor())
+        finally:
+            shutdown_analysis_executor()
+        return
+    worklist = create_worklist(args.worklist) if args.worklist else None
+    session = load_session(args.session) if args.session else None
+
     while True:
-        video_paths = select_video_files()
-        
-        # ファイルが選択されなかったら、ループを終了してアプリを閉じる
-        if not video_paths:
-            break
+        # セッションを開き直す場合は、動画とその長さは Application がセッションから取る
+        video_paths, media_durations = [], None
+        if worklist and not session:
+            case = worklist.next_case()
+            if case is None:
+                print("All cases in the worklist are done.")
+                break
+            video_paths, media_durations = case["files"], case["durations"]
+        elif not session:
+            video_paths = select_video_files()
 
-        app = Application(video_paths) # 選択されたパスを渡して起動
+            # ファイルが選択されなかったら、ループを終了してアプリを閉じる
+            if not video_paths:
+                break
+
+        # 選択されたパスを渡して起動 (開き直したセッションの結果は、ワークリストの症例としては扱わない)
+        app = Application(video_paths, worklist_model=None if session else worklist, media_durations=media_durations,
+                          session=session)
+        session = None
         continue_session = app.run()
-        
+
+        if app.requested_session_path:
+            # 「Open Session...」で選ばれたセッションを開く (開けなければ通常どおり動画を選ぶ)
+            session = load_session(app.requested_session_path)
+            continue
+
+        if app.requested_worklist_path:
+            # 「Open Worklist...」で選ばれたワークリストに切り替える
+            if worklist:
+                worklist.cancel()
+            worklist = create_worklist(app.requested_worklist_path)
+            continue
+
         if not continue_session:
             break
-            
+
+    if worklist:
+        worklist.cancel()
+    shutdown_analysis_executor()
     print("Application has been completely closed.")
 
 if __name__ == "__main__":
@@ -1,8 +1,17 @@
+import os
+
 # --- Model層のインポート ---
 from .models.settings_model import SettingsModel
 from .models.preset_model import PresetModel
 from .models.analysis_data_model import AnalysisDataModel
 from .models.video_player_model import VideoPlayerModel
+from .models.scene_detection_model import SceneDetectionModel
+from .models.motion_analysis_model import MotionAnalysisModel
+from .models.proxy_model import ProxyModel
+from .models.keyframe_index_model import KeyframeIndexModel
+from .models.worklist_model import WorklistModel
+from .models.audio_waveform_model import AudioWaveformModel
+from .models.stamp_predictor_model import StampPredictorModel
 
 # --- ViewModel層のインポート ---
 from .viewmodels.main_viewmodel import MainViewModel
@@ -15,11 +24,26 @@ class Application:
     アプリケーション全体を管理するクラスです。
     MVVMの各コンポーネントを初期化し、結合します。
     """
-    def __init__(self, video_paths: list[str]):
+    def __init__(self, video_paths: list[str], player_backend=None, worklist_model: WorklistModel | None = None,
+                 media_durations: list[int] | None = None, session: dict | None = None):
         """
         アプリケーションの初期化を行います。
+
+        Args:
+            video_paths: 起動時に読み込む動画ファイルのパスのリスト。
+            player_backend: 動画プレイヤーの実装。None の場合は設定の映像出力方法で libVLC を使用する。
+            worklist_model: ワークリストモードの場合の、セッションをまたいで使うワークリスト。
+            media_durations: ワークリストの準備で調べた各動画の長さ(ms)。
+            session: 開き直すセッション (session_file_model.open_session() の戻り値)。
+                指定した場合は video_paths と media_durations の代わりに、保存しておいた動画とその長さを使う。
         """
+        if session is not None:
+            # 保存しておいた長さを使うので、動画を調べ直さずに開ける
+            video_paths = [video["path"] for video in session["videos"]]
+            durations = [video.get("duration_ms") for video in session["videos"]]
+            media_durations = durations if all(duration is not None for duration in durations) else None
         self.initial_video_paths = video_paths # 受け取ったパスを保持
+        self.initial_media_durations = media_durations
         """
         MVVMの各コンポーネントをインスタンス化し、接続します。
         """
@@ -29,7 +53,38 @@ class Application:
         #    PresetModelはSettingsModelに依存している
         preset_model = PresetModel(settings_model)
         analysis_model = AnalysisDataModel()
-        video_model = VideoPlayerModel()
+        if player_backend is None and settings_model.get("player_process"):
+            # libVLCの呼び出しでUIが固まらないよう、プレイヤーを別プロセスで動かす
+            from .models.process_player_backend import ProcessPlayerBackend
+            player_backend = ProcessPlayerBackend(video_output=settings_model.get("video_output"))
+        elif player_backend is None:
+            # libVLCがない環境でも他のバックエンドを使えるように、ここで読み込む
+            from .models.vlc_player_backend import VlcPlayerBackend
+            player_backend = VlcPlayerBackend(video_output=settings_model.get("video_output"))
+        video_model = VideoPlayerModel(player_backend)
+        scene_model = None
+        if settings_model.get("scene_detection_enabled"):
+            # 手順の境界の候補 (シーンの切り替わり) を、全フレームのデコードでバックグラウンドで探す
+            scene_model = SceneDetectionModel(settings_model.get_cache_dir('scenes'))
+        motion_model = None
+        if settings_model.get("motion_analysis_enabled"):
+            # 移行時間をアクティブ/アイドルに分けるための動きの量を、バックグラウンドで求める
+            motion_model = MotionAnalysisModel(settings_model.get_cache_dir('motion'))
+        keyframe_model = KeyframeIndexModel(settings_model.get_cache_dir('keyframes'))
+        audio_model = None
+        if settings_model.get("waveform_enabled"):
+            # タイムラインの下に表示する音声波形を、バックグラウンドで作成する
+            audio_model = AudioWaveformModel(settings_model.get_cache_dir('waveforms'))
+        stamp_predictor = None
+        if settings_model.get("stamp_prediction_enabled"):
+            # 過去のセッションの結果から、End の後に次の手順を予測する
+            stamp_predictor = StampPredictorModel(os.path.join(settings_model.get_cache_dir('stamp_predictor'),
+                                                               'transitions.json'))
+        proxy_model = None
+        if settings_model.get("proxy_enabled"):
+            # スクラブ用の低解像度プロキシをバックグラウンドで作成する
+            proxy_model = ProxyModel(settings_model.get_cache_dir('proxies'),
+                                     settings_model.get("proxy_cache_mb") * 1024 * 1024)
 
         # 2. ViewModel層のインスタンス化
         #    ViewModelはすべてのModelにアクセスできる必要がある
@@ -37,7 +92,14 @@ class Application:
             settings_model=settings_model,
             preset_model=preset_model,
             analysis_model=analysis_model,
-            video_model=video_model
+            video_model=video_model,
+            scene_model=scene_model,
+            motion_model=motion_model,
+            proxy_model=proxy_model,
+            keyframe_model=keyframe_model,
+            worklist_model=worklist_model,
+            audio_model=audio_model,
+            stamp_predictor=stamp_predictor
         )
 
         # 3. View層のインスタンス化
@@ -51,7 +113,11 @@ class Application:
         self.view.set_video_model(video_model)
         
         # 起動と同時に動画を読み込む
-        self.viewmodel.load_videos(self.initial_video_paths)
+        # (セッションを開き直す場合は、読み込みが終わってから記録を戻し、保存したときの再生位置へ移動する)
+        on_loaded = None
+        if session is not None:
+            on_loaded = lambda: self.viewmodel.restore_session(session)
+        self.viewmodel.load_videos(self.initial_video_paths, self.initial_media_durations, on_loaded)
         
         print("Application components assembled.")
 
@@ -64,6 +130,10 @@ class Application:
         
         # Viewにメインループの開始を指示
         self.view.start_main_loop()
+        # 「Open Worklist...」で選ばれたワークリストは、呼び出し側で次のセッションから使う
+        self.requested_worklist_path = self.view.requested_worklist_path
+        # 「Open Session...」で選ばれたセッションも、呼び出し側で次のセッションとして開く
+        self.requested_session_path = self.view.requested_session_path
         # ウィンドウが閉じた後、次のセッションが要求されているかチェック
         if self.view.is_next_session_requested:
             return True # 次のセッションへ
@@ -0,0 +1,318 @@
+import itertools
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from ..utils.result_format import REPORT_PREFIX, TOTAL_ROW_NAME
+
+# 結果のCSVの名前の末尾につく保存日時 (例: "_20250101_093000")
+SESSION_TIME_PATTERN = re.compile(r"_\d{8}_\d{6}$")
+# 一致度の計算に使う時間の刻み(秒)
+DEFAULT_BIN_SEC = 1.0
+# プロセスプールの1ジョブで比較する症例の数
+CASES_PER_JOB = 25
+
+# --- 区間の計算 (すべて NumPy の配列でまとめて計算する) ---
+
+def interval_iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    区間の配列 a (n, 2) と b (m, 2) のすべての組み合わせの IoU を (n, m) の配列で返します。
+    """
+    intersection = np.clip(np.minimum(a[:, None, 1], b[None, :, 1]) - np.maximum(a[:, None, 0], b[None, :, 0]),
+                           0.0, None)
+    union = (a[:, None, 1] - a[:, None, 0]) + (b[None, :, 1] - b[None, :, 0]) - intersection
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(union > 0, intersection / union, 0.0)
+
+def coverage(intervals: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """各時刻が、区間 (n, 2) のいずれかに含まれるかどうかの bool 配列を返します。"""
+    started = np.searchsorted(np.sort(intervals[:, 0]), points, side="right")
+    ended = np.searchsorted(np.sort(intervals[:, 1]), points, side="left")
+    return started > ended
+
+def union_iou(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    区間の集合 a と b をそれぞれ和集合としたときの IoU を返します。どちらも空の場合は NaN を返します。
+    すべての境界で時間を区切り、各区切りの中点がどちらに含まれるかで共通部分と和集合の長さを求めます。
+    """
+    bounds = np.unique(np.concatenate([a.ravel(), b.ravel()]))
+    if len(bounds) < 2:
+        return float("nan")
+    midpoints = (bounds[:-1] + bounds[1:]) / 2.0
+    lengths = np.diff(bounds)
+    in_a = coverage(a, midpoints) if len(a) else np.zeros(len(midpoints), dtype=bool)
+    in_b = coverage(b, midpoints) if len(b) else np.zeros(len(midpoints), dtype=bool)
+    union = lengths[in_a | in_b].sum()
+    return float(lengths[in_a & in_b].sum() / union) if union > 0 else float("nan")
+
+def match_occurrences(a: np.ndarray, b: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    同じ手順の2人分の区間を、IoU の大きい組み合わせから順に1対1で対応づけます。重ならない区間は対応づけません。
+
+    Returns:
+        (a のインデックス, b のインデックス, IoU) の配列のタプル。
+    """
+    if not len(a) or not len(b):
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, np.empty(0)
+    iou = interval_iou_matrix(a, b)
+    order = np.argsort(-iou, axis=None, kind="stable")
+    rows, cols = np.unravel_index(order, iou.shape)
+    used_a = np.zeros(len(a), dtype=bool)
+    used_b = np.zeros(len(b), dtype=bool)
+    matched_a, matched_b = [], []
+    for row, col in zip(rows, cols):
+        if iou[row, col] <= 0 or len(matched_a) == min(len(a), len(b)):
+            break
+        if used_a[row] or used_b[col]:
+            continue
+        used_a[row] = used_b[col] = True
+        matched_a.append(row)
+        matched_b.append(col)
+    matched_a = np.asarray(matched_a, dtype=np.intp)
+    matched_b = np.asarray(matched_b, dtype=np.intp)
+    return matched_a, matched_b, iou[matched_a, matched_b]
+
+def fleiss_kappa(presence: np.ndarray) -> float:
+    """
+    評価者ごとの「その時間に手順が行われていたか」の bool 配列 (評価者数, 時間の刻み数) から、
+    2値の Fleiss の κ を返します。一致の偶然の期待値が1 (全員が全時間で同じ判定) の場合は NaN を返します。
+    """
+    rater_count, item_count = presence.shape
+    if rater_count < 2 or item_count == 0:
+        return float("nan")
+    positive = presence.sum(axis=0).astype(np.float64)
+    negative = rater_count - positive
+    observed = ((positive * (positive - 1) + negative * (negative - 1)) / (rater_count * (rater_count - 1))).mean()
+    p_positive = positive.sum() / (item_count * rater_count)
+    expected = p_positive ** 2 + (1.0 - p_positive) ** 2
+    if expected >= 1.0:
+        return float("nan")
+    return float((observed - expected) / (1.0 - expected))
+
+# --- 結果のCSVの読み込み ---
+
+def read_annotation_csv(csv_path: str) -> dict[str, np.ndarray]:
+    """
+    保存された結果のCSVを読み込み、手順名 -> 区間 (n, 2) [開始, 終了](秒) の配列 (開始時間順) を返します。
+    合計行は除きます。
+    """
+    df = pd.read_csv(csv_path, encoding="utf-8-sig", usecols=["手順名", "開始時間(秒)", "終了時間(秒)"])
+    # 1ファイルの行数は少ないので、groupby よりも NumPy で直接分けたほうが速い
+    names = df["手順名"].to_numpy(dtype=object)
+    bounds = df[["開始時間(秒)", "終了時間(秒)"]].to_numpy(dtype=np.float64)
+    keep = (names != TOTAL_ROW_NAME) & ~np.isnan(bounds).any(axis=1)
+    names, bounds = names[keep], np.sort(bounds[keep], axis=1)
+    order = np.argsort(bounds[:, 0], kind="stable")
+    names, bounds = names[order], bounds[order]
+    return {str(name): bounds[names == name] for name in dict.fromkeys(names)}
+
+def find_annotation_sets(paths: list[str]) -> tuple[dict[str, dict[str, str]], dict[str, str]]:
+    """
+    フォルダ (サブフォルダも含む) または結果のCSVのパスから、症例ごとの評価者別の結果を集めます。
+
+    症例は、CSVと同じ名前のJSONにある動画の内容の指紋で識別します (名前を変えた動画も同じ症例になる)。
+    JSONがない場合は、CSVの名前から保存日時を除いたものを使います。
+    評価者はCSVのあるフォルダの名前で、同じ評価者の同じ症例の結果が複数ある場合は最も新しいものを使います。
+
+    Returns:
+        (症例のキー -> {評価者: CSVのパス}, 症例のキー -> 表示名) のタプル。
+    """
+    csv_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                csv_paths.extend(os.path.join(directory, name) for name in names
+                                 if name.lower().endswith(".csv") and not name.startswith(REPORT_PREFIX))
+        elif path.lower().endswith(".csv"):
+            csv_paths.append(path)
+
+    sets, labels = {}, {}
+    for csv_path in sorted(csv_paths, key=os.path.getmtime):
+        stem = os.path.splitext(os.path.basename(csv_path))[0]
+        case_key = case_label = SESSION_TIME_PATTERN.sub("", stem)
+        try:
+            with open(os.path.splitext(csv_path)[0] + ".json", "r", encoding="utf-8") as f:
+                videos = json.load(f).get("videos", [])
+            fingerprints = [video.get("fingerprint") for video in videos]
+            if videos and all(fingerprints):
+                case_key = "+".join(fingerprints)
+                case_label = os.path.splitext(os.path.basename(videos[0]["path"]))[0]
+        except (OSError, ValueError, AttributeError, KeyError):
+            pass
+        rater = os.path.basename(os.path.dirname(os.path.abspath(csv_path)))
+        # 更新日時の順に見ているので、後から見つかった結果で上書きする
+        sets.setdefault(case_key, {})[rater] = csv_path
+        labels.setdefault(case_key, case_label)
+
+    # JSONのない結果は、同じ名前の動画の症例が指紋で1つに決まる場合はそこに加える
+    keys_by_label = {}
+    for key, label in labels.items():
+        if key != label:
+            keys_by_label.setdefault(label, []).append(key)
+    for label, keys in keys_by_label.items():
+        if label in sets and len(keys) == 1:
+            for rater, csv_path in sets.pop(label).items():
+                sets[keys[0]].setdefault(rater, csv_path)
+            del labels[label]
+    return sets, labels
+
+# --- 症例ごとの比較 ---
+
+def compare_case(case_label: str, rater_paths: dict[str, str], bin_sec: float = DEFAULT_BIN_SEC) -> dict[str, list]:
+    """
+    1症例の評価者全員の結果を比較します。
+    (ProcessPoolExecutorのワーカープロセスで実行されます)
+
+    Returns:
+        "pairs" (手順×評価者の組ごと)・"boundaries" (対応づけた区間ごと)・"steps" (手順ごと) の行のリストの辞書。
+    """
+    annotations = {rater: read_annotation_csv(path) for rater, path in sorted(rater_paths.items())}
+    raters = list(annotations)
+    steps = sorted({name for intervals in annotations.values() for name in intervals})
+    empty = np.empty((0, 2))
+    case_end = max((bounds[:, 1].max() for intervals in annotations.values() for bounds in intervals.values()),
+                   default=0.0)
+    bin_centers = (np.arange(int(np.ceil(case_end / bin_sec))) + 0.5) * bin_sec
+
+    pair_rows, boundary_rows, step_rows = [], [], []
+    for step in steps:
+        step_ious, start_offsets, end_offsets = [], [], []
+        for rater_a, rater_b in itertools.combinations(raters, 2):
+            a = annotations[rater_a].get(step, empty)
+            b = annotations[rater_b].get(step, empty)
+            index_a, index_b, ious = match_occurrences(a, b)
+            start_offset = b[index_b, 0] - a[index_a, 0]
+            end_offset = b[index_b, 1] - a[index_a, 1]
+            iou = union_iou(a, b)
+            step_ious.append(iou)
+            start_offsets.append(start_offset)
+            end_offsets.append(end_offset)
+            pair_rows.append({
+                "case": case_label, "step": step, "rater_a": rater_a, "rater_b": rater_b,
+                "count_a": len(a), "count_b": len(b), "matched": len(index_a), "iou": iou,
+                "mean_abs_start_offset_s": np.abs(start_offset).mean() if len(index_a) else np.nan,
+                "mean_abs_end_offset_s": np.abs(end_offset).mean() if len(index_a) else np.nan,
+            })
+            boundary_rows.extend(
+                {"case": case_label, "step": step, "rater_a": rater_a, "rater_b": rater_b,
+                 "start_a": a[i, 0], "end_a": a[i, 1], "start_b": b[j, 0], "end_b": b[j, 1],
+                 "start_offset_s": b[j, 0] - a[i, 0], "end_offset_s": b[j, 1] - a[i, 1], "iou": value}
+                for i, j, value in zip(index_a, index_b, ious)
+            )
+
+        presence = np.array([coverage(annotations[rater].get(step, empty), bin_centers)
+                             if step in annotations[rater] else np.zeros(len(bin_centers), dtype=bool)
+                             for rater in raters])
+        start_offsets = np.abs(np.concatenate(start_offsets)) if start_offsets else np.empty(0)
+        end_offsets = np.abs(np.concatenate(end_offsets)) if end_offsets else np.empty(0)
+        step_rows.append({
+            "case": case_label, "step": step, "raters": len(raters),
+            "raters_marked": sum(step in annotations[rater] for rater in raters),
+            "mean_iou": np.nanmean(step_ious) if not np.all(np.isnan(step_ious)) else np.nan,
+            "fleiss_kappa": fleiss_kappa(presence),
+            "mean_abs_start_offset_s": start_offsets.mean() if len(start_offsets) else np.nan,
+            "mean_abs_end_offset_s": end_offsets.mean() if len(end_offsets) else np.nan,
+        })
+    return {"pairs": pair_rows, "boundaries": boundary_rows, "steps": step_rows}
+
+def compare_cases(cases: list[tuple[str, dict[str, str]]], bin_sec: float = DEFAULT_BIN_SEC) -> list[dict[str, list]]:
+    """複数の症例をまとめて比較します。1症例ずつ送るとプロセス間の通信が比較より重くなるため、まとめて渡します。"""
+    return [compare_case(case_label, rater_paths, bin_sec) for case_label, rater_paths in cases]
+
+def summarize_steps(steps: pd.DataFrame, boundaries: pd.DataFrame) -> pd.DataFrame:
+    """手順ごとに、全症例を通した一致度と境界のずれの統計をまとめます。最後の行は全手順の合計です。"""
+    rows = []
+    step_groups = [(step, steps[steps["step"] == step], boundaries[boundaries["step"] == step])
+                   for step in sorted(steps["step"].unique())]
+    for step, step_df, boundary_df in step_groups + [("(all)", steps, boundaries)]:
+        start = boundary_df["start_offset_s"].abs()
+        end = boundary_df["end_offset_s"].abs()
+        rows.append({
+            "step": step,
+            "cases": step_df["case"].nunique(),
+            "mean_iou": step_df["mean_iou"].mean(),
+            "mean_fleiss_kappa": step_df["fleiss_kappa"].mean(),
+            "matched_pairs": len(boundary_df),
+            "median_abs_start_offset_s": start.median(),
+            "p90_abs_start_offset_s": start.quantile(0.9) if len(start) else np.nan,
+            "median_abs_end_offset_s": end.median(),
+            "p90_abs_end_offset_s": end.quantile(0.9) if len(end) else np.nan,
+        })
+    return pd.DataFrame(rows)
+
+def run_agreement(paths: list[str], output_dir: str, bin_sec: float = DEFAULT_BIN_SEC, executor=None,
+                  progress=None, workers: int = 1, cancelled=None) -> dict:
+    """
+    複数の評価者の結果を症例ごとに比較し、まとめたレポートをCSVで書き出します。
+
+    Args:
+        paths: 結果のCSVを含むフォルダ、またはCSVのパスのリスト。
+        output_dir: レポートの出力先のフォルダ。
+        bin_sec: Fleiss の κ を計算する時間の刻み(秒)。
+        executor: 症例ごとの比較を並列に実行する Executor。
+        progress: 進み具合 (0.0〜1.0, メッセージ) を受け取る関数。
+        workers: executor が None の場合に、比較のために作る専用のプロセスプールのプロセス数。
+                 1 以下の場合や、症例が1ジョブ分しかない場合は、このスレッドで順に比較する。
+        cancelled: 中止が要求されていれば True を返す関数。比較の合間に確認し、中止されたらレポートは書き出さない。
+
+    Returns:
+        {"cases": 比較した症例数, "skipped": 評価者が1人だけの症例数, "files": {種類: 出力したパス},
+         "cancelled": 中止したかどうか}
+    """
+    sets, labels = find_annotation_sets(paths)
+    comparable = {key: raters for key, raters in sets.items() if len(raters) >= 2}
+    cases = [(labels[key], raters) for key, raters in comparable.items()]
+    batches = [cases[i:i + CASES_PER_JOB] for i in range(0, len(cases), CASES_PER_JOB)]
+    own_executor = None
+    if executor is None and workers > 1 and len(batches) > 1:
+        own_executor = executor = ProcessPoolExecutor(max_workers=min(workers, len(batches)),
+                                                      mp_context=multiprocessing.get_context("spawn"))
+    results = []
+    try:
+        if executor is None:
+            for case, raters in cases:
+                if cancelled and cancelled():
+                    break
+                results.append(compare_case(case, raters, bin_sec))
+                if progress:
+                    progress(len(results) / len(cases), f"Compared {len(results)}/{len(cases)} cases")
+        else:
+            futures = [executor.submit(compare_cases, batch, bin_sec) for batch in batches]
+            for future in as_completed(futures):
+                if cancelled and cancelled():
+                    # まだ始まっていないジョブは取り消す (共有のプールでも他の処理を待たせない)
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                results.extend(future.result())
+                if progress:
+                    progress(len(results) / len(cases), f"Compared {len(results)}/{len(cases)} cases")
+    finally:
+        if own_executor is not None:
+            own_executor.shutdown(wait=True, cancel_futures=True)
+    if cancelled and cancelled():
+        print("Agreement report cancelled.")
+        return {"cases": 0, "skipped": 0, "files": {}, "cancelled": True}
+
+    tables = {name: pd.DataFrame([row for result in results for row in result[name]])
+              for name in ("pairs", "boundaries", "steps")}
+    for name, table in tables.items():
+        if not table.empty:
+            tables[name] = table.sort_values(["case", "step"], kind="stable", ignore_index=True)
+    if not tables["steps"].empty:
+        if tables["boundaries"].empty:
+            tables["boundaries"] = pd.DataFrame(columns=["step", "start_offset_s", "end_offset_s"])
+        tables["summary"] = summarize_steps(tables["steps"], tables["boundaries"])
+
+    os.makedirs(output_dir, exist_ok=True)
+    files = {}
+    for name, table in tables.items():
+        files[name] = os.path.join(output_dir, f"{REPORT_PREFIX}{name}.csv")
+        table.to_csv(files[name], index=False, encoding="utf-8-sig", float_format="%.3f")
+    print(f"Agreement report: {len(comparable)} case(s) compared, "
+          f"{len(sets) - len(comparable)} skipped (single rater). Saved to {output_dir}")
+    return {"cases": len(comparable), "skipped": len(sets) - len(comparable), "files": files, "cancelled": False}
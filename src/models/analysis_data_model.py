@@ -1,52 +1,121 @@
+import heapq
 import pandas as pd
+from ..utils.interval_index import IntervalIndex
 
 class AnalysisDataModel:
     """
     手術分析データを管理するクラス。
     タイムスタンプの記録、削除（Undo）、データのエクスポートを担当します。
+
+    複数の手順を同時に記録できます (例: I/A 中の灌流)。記録済みの手順は区間インデックスにも登録し、
+    「ある時刻に行われていた手順」や「ある範囲に重なる手順」を記録数によらず素早く検索できます。
+    重なり合う記録は、タイムラインで重ならずに表示できるようにトラック (段) に振り分けます。
     """
-    
+
     def __init__(self):
         """
         AnalysisDataModelの初期化。
         分析データを保存するリストを準備します。
         """
         # 記録されたデータを [手順名, 開始時間, 終了時間, ... ] の形式で格納するリスト
+        # (記録のインデックスを区間インデックスのIDとして使う)
         self._procedure_data = []
-        
-        # 現在記録中の手順の情報を一時的に保持する変数
-        self.current_procedure_name = None
-        self.current_start_time = None
+        self._interval_index = IntervalIndex()
+        # 各記録のトラック番号 (_procedure_data と同じ順)
+        self._tracks = []
+        self._total_duration = 0.0
+
+        # 記録中の手順: 手順名 -> 開始時間(秒) (開始した順)
+        self._open_procedures = {}
+        # 記録中の手順の、開始時のスナップショットの参照: 手順名 -> 画像のパス
+        self._open_snapshots = {}
 
-    def start_procedure(self, procedure_name: str, start_time: float):
+    # --- 記録 ---
+
+    def start_procedure(self, procedure_name: str, start_time: float, snapshot: str | None = None) -> bool:
         """
-        新しい手順の記録を開始します。
+        新しい手順の記録を開始します。同じ手順がすでに記録中の場合は何もせず False を返します。
+        snapshot は開始時のフレームの画像のパスで、終了したときに記録に加えます。
         """
-        self.current_procedure_name = procedure_name
-        self.current_start_time = start_time
+        if procedure_name in self._open_procedures:
+            return False
+        self._open_procedures[procedure_name] = start_time
+        if snapshot:
+            self._open_snapshots[procedure_name] = snapshot
         print(f"Started: {procedure_name} at {start_time:.2f}s") # 動作確認用
+        return True
 
-    def end_procedure(self, end_time: float, memo: str = ""):
+    def end_procedure(self, end_time: float, memo: str = "", procedure_name: str | None = None,
+                      snapshot: str | None = None) -> dict | None:
         """
-        現在記録中の手順を終了し、データをリストに保存します。
+        記録中の手順を終了し、データをリストに保存します。
+
+        Args:
+            end_time: 終了時間(秒)。
+            memo: 記録に付けるメモ。
+            procedure_name: 終了する手順名。None の場合は最後に開始した手順を終了する。
+            snapshot: 終了時のフレームの画像のパス。
+
+        Returns:
+            追加された記録。終了できる手順がない場合は None。
         """
-        if self.current_procedure_name is None:
-            return
+        if procedure_name is None:
+            if not self._open_procedures:
+                return None
+            procedure_name = next(reversed(self._open_procedures))
+        start_time = self._open_procedures.pop(procedure_name, None)
+        if start_time is None:
+            return None
 
-        duration = end_time - self.current_start_time
         record = {
-            "手順名": self.current_procedure_name,
-            "開始時間(秒)": self.current_start_time,
+            "手順名": procedure_name,
+            "開始時間(秒)": start_time,
             "終了時間(秒)": end_time,
-            "所要時間(秒)": duration,
+            "所要時間(秒)": end_time - start_time,
             "メモ": memo,
         }
-        self._procedure_data.append(record)
-        print(f"Ended: {self.current_procedure_name}. Record added.") # 動作確認用
-        
-        # 一時変数をリセット
-        self.current_procedure_name = None
-        self.current_start_time = None
+        start_snapshot = self._open_snapshots.pop(procedure_name, None)
+        if start_snapshot or snapshot:
+            record["開始画像"] = start_snapshot or ""
+            record["終了画像"] = snapshot or ""
+        self._append_record(record)
+        print(f"Ended: {procedure_name}. Record added.") # 動作確認用
+        return record
+
+    def get_open_procedures(self) -> dict[str, float]:
+        """記録中の手順の 手順名 -> 開始時間(秒) を、開始した順に返します。"""
+        return dict(self._open_procedures)
+
+    def get_open_snapshots(self) -> dict[str, str]:
+        """記録中の手順の 手順名 -> 開始時のスナップショットのパス を返します。"""
+        return dict(self._open_snapshots)
+
+    def restore_open_procedures(self, open_procedures: list[tuple[str, float, str | None]]):
+        """保存したセッションの、記録中だった手順 (手順名, 開始時間(秒), 開始時のスナップショット) を開始した順に戻します。"""
+        for procedure_name, start_time, snapshot in open_procedures:
+            self._open_procedures[procedure_name] = start_time
+            if snapshot:
+                self._open_snapshots[procedure_name] = snapshot
+
+    def is_procedure_open(self, procedure_name: str) -> bool:
+        return procedure_name in self._open_procedures
+
+    def is_recording(self) -> bool:
+        """記録中の手順があるかどうかを返します。"""
+        return bool(self._open_procedures)
+
+    def add_records(self, records: list[dict]):
+        """
+        記録済みの手順をまとめて追加します (セッションの読み込みなど)。
+        区間インデックスとトラックは、追加後の全記録からまとめて作り直します。
+        """
+        self._procedure_data.extend(records)
+        self._total_duration = sum(item["所要時間(秒)"] for item in self._procedure_data)
+        starts = [item["開始時間(秒)"] for item in self._procedure_data]
+        ends = [item["終了時間(秒)"] for item in self._procedure_data]
+        self._interval_index = IntervalIndex()
+        self._interval_index.add_many(range(len(self._procedure_data)), starts, ends)
+        self._tracks = _assign_tracks(starts, ends)
 
     def undo_last_record(self) -> dict | None:
         """
@@ -54,32 +123,107 @@ class AnalysisDataModel:
         """
         if not self._procedure_data:
             return None
-        
-        return self._procedure_data.pop()
+
+        record = self._procedure_data.pop()
+        self._interval_index.remove(len(self._procedure_data))
+        self._tracks.pop()
+        self._total_duration -= record["所要時間(秒)"]
+        return record
+
+    # --- 参照 ---
+
+    def get_last_record(self) -> dict | None:
+        """
+        最後に追加された記録を返します。記録がない場合は None を返します。
+        """
+        if not self._procedure_data:
+            return None
+        return self._procedure_data[-1]
+
+    def get_records(self) -> list[dict]:
+        """すべての記録を、追加した順 (Undo で取り消される順の逆) に返します。"""
+        return list(self._procedure_data)
+
+    def get_record(self, index: int) -> dict:
+        """記録のインデックス (追加した順の番号) の記録を返します。"""
+        return self._procedure_data[index]
+
+    def get_record_track(self, index: int) -> int:
+        """記録のトラック番号 (重なり合う記録どうしは別の番号になる) を返します。"""
+        return self._tracks[index]
+
+    def get_track_count(self) -> int:
+        return max(self._tracks) + 1 if self._tracks else 0
+
+    def get_active_records(self, time_sec: float) -> list[dict]:
+        """指定した時刻(秒)に行われていた手順の記録を、開始時間の順に返します。"""
+        return [self._procedure_data[i] for i in self._interval_index.at(time_sec)]
+
+    def get_records_in_range(self, start_sec: float, end_sec: float) -> list[tuple[int, dict]]:
+        """範囲 [start_sec, end_sec] に重なる記録を、(記録のインデックス, 記録) の開始時間順のリストで返します。"""
+        return [(int(i), self._procedure_data[i]) for i in self._interval_index.overlapping(start_sec, end_sec)]
+
+    def get_record_count(self) -> int:
+        """
+        記録済みの手順数を返します。
+        """
+        return len(self._procedure_data)
 
     def get_summary(self) -> tuple[int, float]:
         """
         記録済みの手順数と合計所要時間を返します。
         """
-        count = len(self._procedure_data)
-        total_duration = sum(item["所要時間(秒)"] for item in self._procedure_data)
-        return count, total_duration
+        return len(self._procedure_data), self._total_duration
 
     def has_data(self) -> bool:
         """
         記録されたデータが存在するかどうかを返します。
         """
         return bool(self._procedure_data)
-        
-    import pandas as pd
 
     def export_to_dataframe(self) -> pd.DataFrame:
         """
-        記録されたデータをPandas DataFrameとしてエクスポートします。
+        記録されたデータを、開始時間の順に並べたPandas DataFrameとしてエクスポートします。
         """
         if not self._procedure_data:
             return pd.DataFrame()
 
-        # データ整形処理はViewModelに移動したため、ここでは単純にDataFrameを返す
+        # データ整形処理はViewModelに移動したため、ここでは開始時間で並べ替えるだけ
         df = pd.DataFrame(self._procedure_data)
-        return df
\ No newline at end of file
+        return df.sort_values("開始時間(秒)", kind="stable", ignore_index=True)
+
+    # --- 内部処理 ---
+
+    def _append_record(self, record: dict):
+        index = len(self._procedure_data)
+        start, end = record["開始時間(秒)"], record["終了時間(秒)"]
+        # 重なっている記録が使っていない、最小のトラックに置く
+        used_tracks = {self._tracks[i] for i in self._interval_index.overlapping(min(start, end), max(start, end))}
+        track = 0
+        while track in used_tracks:
+            track += 1
+        self._procedure_data.append(record)
+        self._tracks.append(track)
+        self._interval_index.add(index, start, end)
+        self._total_duration += record["所要時間(秒)"]
+
+def _assign_tracks(starts: list[float], ends: list[float]) -> list[int]:
+    """区間を開始時間の順に走査し、重なり合う区間が別のトラックになるように振り分けます。"""
+    tracks = [0] * len(starts)
+    # 使用中のトラックの (終了時間, トラック番号) と、空いているトラック番号のヒープ
+    active = []
+    free = []
+    track_count = 0
+    for index in sorted(range(len(starts)), key=lambda i: min(starts[i], ends[i])):
+        start, end = min(starts[index], ends[index]), max(starts[index], ends[index])
+        # 閉区間なので、ちょうど開始時間に終わる区間とも重なるとみなす
+        while active and active[0][0] < start:
+            heapq.heappush(free, heapq.heappop(active)[1])
+        if free:
+            track = heapq.heappop(free)
+        else:
+            track = track_count
+            track_count += 1
+        tracks[index] = track
+        heapq.heappush(active, (end, track))
+    return tracks
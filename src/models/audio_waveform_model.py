@@ -0,0 +1,174 @@
+import os
+import struct
+import tempfile
+import threading
+import numpy as np
+from ..utils.peak_pyramid import BASE_BLOCK_SAMPLES, PeakAccumulator, PeakPyramid, build_peak_pyramid
+from ..utils.video_cache import get_video_cache_path
+from .video_analysis_model import VideoAnalysisModel, wait_for_job
+
+# 波形用にデコードする音声のサンプリング周波数 (モノラル)
+SAMPLE_RATE = 8000
+# 一時ファイルから一度に読み込むサンプル数
+READ_CHUNK_SAMPLES = 1 << 18
+# 1区間のデコードを打ち切るまでの時間(秒)
+DECODE_TIMEOUT_S = 30 * 60
+
+def base_block_count(duration_ms: int) -> int:
+    """動画の長さから、ピラミッドの最も細かいレベルのブロック数を返します。"""
+    return -(-duration_ms * SAMPLE_RATE // (1000 * BASE_BLOCK_SAMPLES))
+
+def extract_audio_peaks(path: str, start_ms: int, stop_ms: int) -> np.ndarray:
+    """
+    動画の1区間の音声をデコードし、ピラミッドの最も細かいレベルの (min, max) を返します。
+    (ProcessPoolExecutorのワーカープロセスで実行されます)
+
+    libVLCのストリーム出力で、モノラル・SAMPLE_RATE の16bit PCMに変換して一時ファイル (WAV) に書き出し、
+    それを一定量ずつ読みながらブロックごとの最小値と最大値に畳み込みます。PCM全体をメモリに載せることはありません。
+    音声のない動画は無音 (0) になります。
+    """
+    import vlc
+
+    block_count = base_block_count(stop_ms - start_ms)
+    fd, wav_path = tempfile.mkstemp(prefix="svat_audio_", suffix=".wav")
+    os.close(fd)
+    chain = (f"#transcode{{acodec=s16l,channels=1,samplerate={SAMPLE_RATE}}}"
+             f":std{{access=file,mux=wav,dst=\"{wav_path}\"}}")
+    instance = vlc.Instance("--quiet", "--no-sout-video", "--no-sout-spu")
+    player = instance.media_player_new()
+    media = instance.media_new(path)
+    media.add_option(f":sout={chain}")
+    media.add_option(f":start-time={start_ms / 1000.0:.3f}")
+    media.add_option(f":stop-time={stop_ms / 1000.0:.3f}")
+    player.set_media(media)
+
+    finished = threading.Event()
+    events = player.event_manager()
+    events.event_attach(vlc.EventType.MediaPlayerEndReached, lambda e: finished.set())
+    events.event_attach(vlc.EventType.MediaPlayerEncounteredError, lambda e: finished.set())
+    try:
+        player.play()
+        if not wait_for_job(finished, DECODE_TIMEOUT_S):
+            raise TimeoutError(f"Audio decoding did not finish in {DECODE_TIMEOUT_S}s")
+        player.stop()
+
+        accumulator = PeakAccumulator()
+        for samples in _iter_wav_samples(wav_path):
+            accumulator.add(samples)
+        return accumulator.finish(block_count)
+    finally:
+        player.release()
+        media.release()
+        instance.release()
+        try:
+            os.remove(wav_path)
+        except OSError:
+            pass
+
+def _iter_wav_samples(wav_path: str):
+    """16bit PCMのWAVファイルを、READ_CHUNK_SAMPLES ずつモノラルの int16 配列として読み出します。"""
+    with open(wav_path, "rb") as f:
+        if f.read(12)[:4] != b"RIFF":
+            return
+        channels = 1
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                channels = struct.unpack("<HH", f.read(4))[1] or 1
+                f.seek(chunk_size - 4 + (chunk_size & 1), os.SEEK_CUR)
+            elif chunk_id == b"data":
+                break
+            else:
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+        # 書き出しが途中で終わると data のサイズが正しくないことがあるため、ファイルの終わりまで読む
+        while True:
+            samples = np.fromfile(f, dtype="<i2", count=READ_CHUNK_SAMPLES * channels)
+            if not len(samples):
+                return
+            if channels > 1:
+                samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+                samples = samples.mean(axis=1).astype(np.int16)
+            yield samples
+
+
+class AudioWaveformModel(VideoAnalysisModel):
+    """
+    プレイリストの各動画の音声波形を、複数の解像度の (min, max) のピラミッドとして管理するクラス。
+    手技の区切りになる音 (超音波の装置音や声の指示) を、タイムラインの下に表示するために使います。
+
+    ピラミッドは動画ごとに int16 の .npy としてキャッシュし、読み込むときはメモリマップするため、
+    表示に必要なレベルの表示範囲の部分だけがディスクから読まれます。
+    """
+    SEGMENT_FUNCTION = staticmethod(extract_audio_peaks)
+    ANALYSIS_NAME = "Audio waveform"
+
+    def __init__(self, cache_dir: str):
+        super().__init__(cache_dir)
+        # 動画のインデックス -> PeakPyramid (_on_results_changed で作り直す)
+        self._pyramids = {}
+
+    def get_peaks(self, start_ms: float, end_ms: float, columns: int) -> tuple[np.ndarray, np.ndarray] | None:
+        """
+        プレイリスト全体での範囲 [start_ms, end_ms] を columns 列に分けた、各列の (min, max) を返します。
+
+        Returns:
+            ((columns, 2) int16 の配列, 列に波形があるかどうかの bool 配列) のタプル。波形がまだない場合は None。
+        """
+        if not self._pyramids or columns <= 0 or end_ms <= start_ms:
+            return None
+        edges = np.linspace(start_ms, end_ms, columns + 1)
+        peaks = np.zeros((columns, 2), dtype=np.int16)
+        valid = np.zeros(columns, dtype=bool)
+        for index, pyramid in self._pyramids.items():
+            offset, end = self._offsets[index], self._offsets[index + 1]
+            if end <= start_ms or offset >= end_ms:
+                continue
+            clip_peaks, clip_valid = pyramid.read(edges - offset)
+            # 動画の境界をまたぐ列は、両方の動画の値をまとめる
+            both = valid & clip_valid
+            peaks[both, 0] = np.minimum(peaks[both, 0], clip_peaks[both, 0])
+            peaks[both, 1] = np.maximum(peaks[both, 1], clip_peaks[both, 1])
+            only_clip = clip_valid & ~valid
+            peaks[only_clip] = clip_peaks[only_clip]
+            valid |= clip_valid
+        return peaks, valid
+
+    # --- 内部処理 ---
+
+    def _combine_segments(self, parts: list, duration_ms: int):
+        base = np.concatenate(parts)
+        block_count = base_block_count(duration_ms)
+        if len(base) < block_count:
+            base = np.concatenate([base, np.zeros((block_count - len(base), 2), dtype=np.int16)])
+        return build_peak_pyramid(base[:block_count])
+
+    def _load_cache(self, video_path: str, duration_ms: int):
+        try:
+            cache_path = get_video_cache_path(self.cache_dir, video_path, ".npy")
+            if not os.path.exists(cache_path):
+                return None
+            pyramid = np.load(cache_path, mmap_mode="r")
+            if pyramid.dtype != np.int16 or pyramid.shape != (PeakPyramid.expected_size(base_block_count(duration_ms)), 2):
+                # 長さが変わった (別の長さで解析した) キャッシュは使わない
+                return None
+            return pyramid
+        except (OSError, ValueError) as e:
+            print(f"Failed to load waveform cache for {video_path}: {e}")
+            return None
+
+    def _save_cache(self, video_path: str, result, duration_ms: int):
+        # 解析したときの長さは、ピラミッドの大きさからわかる
+        try:
+            cache_path = get_video_cache_path(self.cache_dir, video_path, ".npy")
+            np.save(cache_path, result)
+        except OSError as e:
+            print(f"Failed to save waveform cache for {video_path}: {e}")
+
+    def _on_results_changed(self):
+        self._pyramids = {
+            index: PeakPyramid(result, base_block_count(self._offsets[index + 1] - self._offsets[index]), SAMPLE_RATE)
+            for index, result in self._results.items()
+        }
@@ -0,0 +1,229 @@
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+CLIP_SUFFIX = ".mp4"
+# 出力先のフォルダに置く、書き出しの進み具合の記録 (途中で止めた書き出しを再開するために使う)
+MANIFEST_NAME = "clip_export.json"
+MANIFEST_VERSION = 1
+# 動画の境界をまたぐ記録で、これより短い部分は書き出さない(ms)
+MIN_PART_MS = 200
+# 1クリップの書き出しを打ち切るまでの時間(秒)
+CUT_TIMEOUT_S = 60 * 60
+# ファイル名に使えない文字
+_UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\s]+')
+
+# ワーカープロセスで、書き出しの中止を受け取るイベント (_init_worker で設定する)
+_stop_event = None
+
+def plan_clip_jobs(records: list[tuple[str, float, float]], video_files: list[str],
+                   media_durations: list[int]) -> list[dict]:
+    """
+    記録 (手順名, 開始時間(秒), 終了時間(秒)) を、動画ファイルごとの切り出しのジョブに分けます。
+    時間はプレイリスト全体での時間で、動画の境界をまたぐ記録は動画ごとの部分 (_part1, _part2, ...) に分けます。
+
+    Returns:
+        {"output": 出力ファイル名, "record": 記録の番号, "name": 手順名, "source": 動画のパス,
+         "start_ms": 動画内の開始位置, "stop_ms": 動画内の終了位置} のリスト。
+    """
+    offsets = [0]
+    for duration in media_durations:
+        offsets.append(offsets[-1] + max(duration, 0))
+
+    jobs = []
+    for number, (name, start_sec, end_sec) in enumerate(records, start=1):
+        start_ms, end_ms = sorted((int(round(start_sec * 1000)), int(round(end_sec * 1000))))
+        pieces = []
+        for index, path in enumerate(video_files):
+            piece_start, piece_end = max(start_ms, offsets[index]), min(end_ms, offsets[index + 1])
+            if piece_end > piece_start:
+                pieces.append((path, piece_start - offsets[index], piece_end - offsets[index]))
+        if len(pieces) > 1:
+            pieces = [piece for piece in pieces if piece[2] - piece[1] >= MIN_PART_MS] or pieces[:1]
+        stem = f"{number:03d}_{_UNSAFE_CHARS.sub('_', name).strip('_') or 'clip'}"
+        for part, (path, piece_start, piece_end) in enumerate(pieces, start=1):
+            suffix = f"_part{part}" if len(pieces) > 1 else ""
+            jobs.append({"output": stem + suffix + CLIP_SUFFIX, "record": number, "name": name, "source": path,
+                         "start_ms": piece_start, "stop_ms": piece_end})
+    return jobs
+
+def cut_clip(source_path: str, start_ms: int, stop_ms: int, output_path: str) -> dict:
+    """
+    動画の区間 [start_ms, stop_ms] を、libVLCのストリーム出力でMP4に書き出します。
+    (ProcessPoolExecutorのワーカープロセスで実行されます)
+
+    まず再エンコードせずに入れ物だけを変え (remux)、MP4に入れられないコーデックなどで失敗した場合は
+    H.264/AACに変換します。remux では開始位置の直前のキーフレームから書き出されるため、少し前から始まることがあります。
+    書き込み中は ".part" のファイルに出力し、完了してから output_path へ移動します。
+
+    Returns:
+        {"bytes": 出力ファイルのサイズ, "remuxed": 再エンコードせずに書き出したかどうか}
+    """
+    part_path = output_path + ".part"
+    chains = [
+        (True, f"#std{{access=file,mux=mp4,dst=\"{part_path}\"}}"),
+        (False, "#transcode{vcodec=h264,venc=x264{preset=veryfast},acodec=mp4a,ab=128,scodec=none}"
+                f":std{{access=file,mux=mp4,dst=\"{part_path}\"}}"),
+    ]
+    error = None
+    for remuxed, chain in chains:
+        try:
+            _run_stream_output(source_path, start_ms, stop_ms, chain)
+            if os.path.exists(part_path) and os.path.getsize(part_path) > 0:
+                os.replace(part_path, output_path)
+                return {"bytes": os.path.getsize(output_path), "remuxed": remuxed}
+            error = RuntimeError("libVLC did not write the clip")
+        except Exception as e:
+            error = e
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        if _stop_event is not None and _stop_event.is_set():
+            break
+    raise error
+
+def _run_stream_output(source_path: str, start_ms: int, stop_ms: int, chain: str):
+    """libVLCで動画の区間を sout のチェーンに流し、終わるまで待ちます。中止の要求があれば途中で止めます。"""
+    import vlc
+
+    instance = vlc.Instance("--quiet", "--no-sout-spu")
+    player = instance.media_player_new()
+    media = instance.media_new(source_path)
+    media.add_option(f":sout={chain}")
+    media.add_option(f":start-time={start_ms / 1000.0:.3f}")
+    media.add_option(f":stop-time={stop_ms / 1000.0:.3f}")
+    player.set_media(media)
+
+    finished = threading.Event()
+    failed = []
+    events = player.event_manager()
+    events.event_attach(vlc.EventType.MediaPlayerEndReached, lambda e: finished.set())
+    events.event_attach(vlc.EventType.MediaPlayerEncounteredError,
+                        lambda e: (failed.append(True), finished.set()))
+    deadline = time.monotonic() + CUT_TIMEOUT_S
+    try:
+        player.play()
+        while not finished.wait(0.5):
+            if _stop_event is not None and _stop_event.is_set():
+                raise RuntimeError("Clip export was cancelled")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Cutting did not finish in {CUT_TIMEOUT_S}s")
+        if failed:
+            raise RuntimeError("libVLC could not write the clip")
+    finally:
+        player.stop()
+        player.release()
+        media.release()
+        instance.release()
+
+def _init_worker(stop_event):
+    global _stop_event
+    _stop_event = stop_event
+
+def run_clip_export(jobs: list[dict], output_dir: str, workers: int, cancelled=None, progress=None) -> dict:
+    """
+    切り出しのジョブを専用のプロセスプールで並列に実行し、出力先のフォルダに書き出します。
+
+    完了したジョブは出力先のフォルダの MANIFEST_NAME に記録するため、同じ出力先で再び実行すると、
+    書き出し済みのクリップ (元の動画・区間・サイズが同じもの) は飛ばして、残りだけを書き出します。
+    同時に実行するジョブは workers 個までで、中止されたら実行中のジョブもすぐに止めます。
+
+    Args:
+        jobs: plan_clip_jobs() で作ったジョブのリスト。
+        output_dir: 出力先のフォルダ。
+        workers: ワーカープロセスの数。
+        cancelled: 中止が要求されていれば True を返す関数。
+        progress: 進み具合 (0.0〜1.0, メッセージ) を受け取る関数。
+
+    Returns:
+        {"written": 書き出した数, "skipped": 書き出し済みで飛ばした数, "remuxed": そのうち再エンコードしなかった数,
+         "failed": [(出力ファイル名, エラー)], "cancelled": 中止したかどうか}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = _load_manifest(output_dir)
+    pending = [job for job in jobs if not _is_job_done(manifest, job, output_dir)]
+    total_ms = sum(job["stop_ms"] - job["start_ms"] for job in jobs) or 1
+    done_ms = total_ms - sum(job["stop_ms"] - job["start_ms"] for job in pending)
+    summary = {"written": 0, "skipped": len(jobs) - len(pending), "remuxed": 0, "failed": [], "cancelled": False}
+    if not pending:
+        return summary
+
+    if progress:
+        progress(done_ms / total_ms, f"{summary['skipped']}/{len(jobs)} clips")
+    context = multiprocessing.get_context("spawn")
+    stop_event = context.Event()
+    queue = list(reversed(pending))
+    running = {}
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(pending))), mp_context=context,
+                             initializer=_init_worker, initargs=(stop_event,)) as executor:
+        while queue or running:
+            if cancelled and cancelled() and not summary["cancelled"]:
+                summary["cancelled"] = True
+                stop_event.set()
+                queue.clear()
+            # 中止したときに待つ量を抑えるため、同時に投入するジョブは workers 個までにする
+            while queue and len(running) < workers:
+                job = queue.pop()
+                future = executor.submit(cut_clip, job["source"], job["start_ms"], job["stop_ms"],
+                                         os.path.join(output_dir, job["output"]))
+                running[future] = job
+            finished, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job = running.pop(future)
+                entry = {key: job[key] for key in ("source", "start_ms", "stop_ms")}
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if not summary["cancelled"]:
+                        summary["failed"].append((job["output"], str(e)))
+                        manifest["jobs"][job["output"]] = dict(entry, status="failed", error=str(e))
+                        _save_manifest(output_dir, manifest)
+                    continue
+                manifest["jobs"][job["output"]] = dict(entry, status="done", **result)
+                _save_manifest(output_dir, manifest)
+                summary["written"] += 1
+                summary["remuxed"] += int(result["remuxed"])
+                done_ms += job["stop_ms"] - job["start_ms"]
+                if progress:
+                    progress(done_ms / total_ms, f"{summary['skipped'] + summary['written']}/{len(jobs)} clips")
+    print(f"Clip export: {summary['written']} written, {summary['skipped']} already done, "
+          f"{len(summary['failed'])} failed{' (cancelled)' if summary['cancelled'] else ''}. Saved to {output_dir}")
+    return summary
+
+def _is_job_done(manifest: dict, job: dict, output_dir: str) -> bool:
+    """ジョブが同じ内容で書き出し済みで、出力ファイルが残っているかどうかを返します。"""
+    entry = manifest["jobs"].get(job["output"])
+    if not entry or entry.get("status") != "done":
+        return False
+    if any(entry.get(key) != job[key] for key in ("source", "start_ms", "stop_ms")):
+        return False
+    try:
+        return os.path.getsize(os.path.join(output_dir, job["output"])) == entry.get("bytes")
+    except OSError:
+        return False
+
+def _load_manifest(output_dir: str) -> dict:
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION and isinstance(manifest.get("jobs"), dict):
+            return manifest
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Failed to load the clip export manifest: {e}")
+    return {"version": MANIFEST_VERSION, "jobs": {}}
+
+def _save_manifest(output_dir: str, manifest: dict):
+    """記録を一時ファイルに書いてから置き換えるため、途中で止まっても壊れた記録は残りません。"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"Failed to save the clip export manifest: {e}")
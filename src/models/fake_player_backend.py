@@ -0,0 +1,158 @@
+from .player_backend import PlayerBackend
+
+class VirtualClock:
+    """
+    FakePlayerBackend の再生位置を進めるための仮想時計。
+    実時間とは無関係に advance() した分だけ進むため、結果が常に再現できます。
+    """
+
+    def __init__(self, start_ms: float = 0.0):
+        self.now_ms = start_ms
+
+    def advance(self, delta_ms: float):
+        """時計を delta_ms だけ進めます。"""
+        self.now_ms += delta_ms
+
+    def time_ms(self) -> float:
+        return self.now_ms
+
+
+class FakePlayerBackend(PlayerBackend):
+    """
+    libVLC もディスプレイも使わない、プロセス内で完結するプレイヤーの実装。
+    再生位置は VirtualClock に従って進むため、ベンチマークやテストで
+    何時間分もの再生を一瞬でシミュレートできます。
+    """
+    DEFAULT_DURATION_MS = 30 * 60 * 1000
+
+    def __init__(self, clock: VirtualClock | None = None, durations: dict[str, int] | None = None,
+                 seek_cost_ms: float = 0.0):
+        """
+        Args:
+            clock: 再生位置の基準になる仮想時計。None の場合は新しく作成する。
+            durations: ファイルパス -> 長さ(ms)。含まれないファイルは DEFAULT_DURATION_MS になる。
+            seek_cost_ms: シーク1回ごとに仮想時計を進める時間 (シークの遅延のシミュレーション)。
+        """
+        super().__init__()
+        self.clock = clock or VirtualClock()
+        self.durations = durations or {}
+        self.seek_cost_ms = seek_cost_ms
+
+        self._item_durations = []
+        self._index = -1
+        self._playing = False
+        self._rate = 1.0
+        # 再生位置は「最後に基準を取った時点の位置 + 経過時間 × 再生速度」で計算する
+        self._anchor_position_ms = 0.0
+        self._anchor_clock_ms = self.clock.time_ms()
+
+        self.display_handle = None
+        self.seek_count = 0
+        self.file_paths = []
+        self.replace_count = 0
+
+    def load_playlist(self, file_paths: list[str], known_durations: list[int] | None = None) -> list[int]:
+        self.file_paths = list(file_paths)
+        if known_durations is not None and len(known_durations) == len(file_paths):
+            self._item_durations = [int(duration) for duration in known_durations]
+        else:
+            self._item_durations = [int(self.durations.get(path, self.DEFAULT_DURATION_MS)) for path in file_paths]
+        self._index = 0 if file_paths else -1
+        self._playing = False
+        self._set_anchor(0.0)
+        return list(self._item_durations)
+
+    def replace_sources(self, file_paths: list[str], index: int, time_in_item_ms: int):
+        # 長さは変わらない前提なので、パスを入れ替えてシークするだけ
+        self.file_paths = list(file_paths)
+        self.replace_count += 1
+        self.seek(index, time_in_item_ms)
+
+    def set_display_handle(self, handle: int):
+        self.display_handle = handle
+
+    def show_first_frame(self):
+        # 描画するものがないので、一時停止のまま先頭に留まる
+        self._playing = False
+        self._set_anchor(0.0)
+
+    def toggle_pause(self):
+        if self._index < 0:
+            return
+        self._sync()
+        self._playing = not self._playing
+        self._set_anchor(self._anchor_position_ms)
+        self._notify_state(self.STATE_PLAYING if self._playing else self.STATE_PAUSED)
+
+    def seek(self, index: int, time_in_item_ms: int):
+        if not 0 <= index < len(self._item_durations):
+            return
+        self.seek_count += 1
+        if self.seek_cost_ms:
+            self._sync()
+            self.clock.advance(self.seek_cost_ms)
+        changed = index != self._index
+        self._index = index
+        self._set_anchor(float(min(max(time_in_item_ms, 0), self._item_durations[index])))
+        if changed:
+            self._notify_state(self.STATE_ITEM_CHANGED)
+
+    def step_frame(self):
+        if self._index < 0:
+            return
+        self._sync()
+        was_playing = self._playing
+        self._playing = False
+        position = min(self._anchor_position_ms + self.get_frame_duration_ms(), self._item_durations[self._index])
+        self._set_anchor(position)
+        if was_playing:
+            self._notify_state(self.STATE_PAUSED)
+
+    def get_current_index(self) -> int:
+        self._sync()
+        return self._index
+
+    def get_item_time(self) -> int:
+        self._sync()
+        return int(self._anchor_position_ms)
+
+    def is_playing(self) -> bool:
+        self._sync()
+        return self._playing
+
+    def set_rate(self, rate: float):
+        self._sync()
+        self._rate = rate
+        self._set_anchor(self._anchor_position_ms)
+
+    def get_rate(self) -> float:
+        return self._rate
+
+    def release(self):
+        self._playing = False
+        self._item_durations = []
+        self._index = -1
+
+    # --- 内部処理 ---
+
+    def _set_anchor(self, position_ms: float):
+        self._anchor_position_ms = position_ms
+        self._anchor_clock_ms = self.clock.time_ms()
+
+    def _sync(self):
+        """仮想時計の経過分だけ再生位置を進め、動画の終わりを越えたら次の動画へ移ります。"""
+        if not self._playing:
+            self._anchor_clock_ms = self.clock.time_ms()
+            return
+        position = self._anchor_position_ms + (self.clock.time_ms() - self._anchor_clock_ms) * self._rate
+        while position >= self._item_durations[self._index]:
+            position -= self._item_durations[self._index]
+            if self._index + 1 >= len(self._item_durations):
+                # プレイリストの最後に到達したら、最後の動画の終端で停止する
+                self._playing = False
+                self._set_anchor(float(self._item_durations[self._index]))
+                self._notify_state(self.STATE_ENDED)
+                return
+            self._index += 1
+            self._notify_state(self.STATE_ITEM_CHANGED)
+        self._set_anchor(position)
@@ -0,0 +1,83 @@
+import os
+import numpy as np
+from ..utils.keyframe_index import read_keyframe_times
+from ..utils.video_cache import get_video_cache_path
+from .video_analysis_model import VideoAnalysisModel
+
+def index_keyframes(path: str, start_ms: int, stop_ms: int) -> np.ndarray:
+    """
+    動画のキーフレームの時間(ms)を、コンテナのインデックスから読み出します。
+    (ProcessPoolExecutorのワーカープロセスで実行されます)
+
+    Returns:
+        区間 [start_ms, stop_ms] 内のキーフレームの時間の int64 配列。
+        インデックスを読めない形式の場合は空の配列。
+    """
+    times_ms = read_keyframe_times(path)
+    if times_ms is None:
+        return np.empty(0, dtype=np.int64)
+    return times_ms[(times_ms >= start_ms) & (times_ms <= stop_ms)]
+
+def load_keyframe_cache(cache_dir: str, video_path: str, duration_ms: int) -> np.ndarray | None:
+    """
+    キャッシュしたキーフレームの時間(ms)の配列を返します。
+    キャッシュがない場合や、別の長さで読み出した (長さを読めなかったときの) キャッシュの場合は None を返します。
+    """
+    cache_path = get_video_cache_path(cache_dir, video_path, ".npz")
+    if not os.path.exists(cache_path):
+        return None
+    with np.load(cache_path) as data:
+        if int(data["duration_ms"]) != duration_ms:
+            return None
+        return data["times"]
+
+def save_keyframe_cache(cache_dir: str, video_path: str, times_ms: np.ndarray, duration_ms: int):
+    """
+    キーフレームの時間(ms)の配列を、読み出したときの長さと一緒にキャッシュに保存します。
+    ワークリストの準備のプロセスと同時に書くことがあるため、一時ファイルに書いてから置き換えます。
+    """
+    cache_path = get_video_cache_path(cache_dir, video_path, ".npz")
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            np.savez(f, times=np.asarray(times_ms, dtype=np.int64), duration_ms=np.int64(duration_ms))
+        os.replace(temp_path, cache_path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class KeyframeIndexModel(VideoAnalysisModel):
+    """
+    プレイリストの各動画のキーフレームの時間を管理するクラス。
+    デコードはせずコンテナのインデックスだけを読むため、長い動画でもすぐに終わります。
+    結果は動画ファイルごとに int64 の配列としてキャッシュします。
+    キーフレームを取得できない形式の動画は空の配列になり、シーク位置の補正には使われません。
+    """
+    SEGMENT_FUNCTION = staticmethod(index_keyframes)
+    # デコードを伴わないので分割せず、1ファイルを1ジョブで処理する
+    SEGMENT_MS = 2 ** 62
+    ANALYSIS_NAME = "Keyframe indexing"
+
+    def get_clip_keyframes(self) -> list[np.ndarray | None]:
+        """各動画内のキーフレームの時間(ms)の配列を返します。まだ読み出していない動画は None になります。"""
+        return [self._results.get(index) for index in range(len(self._video_files))]
+
+    # --- 内部処理 ---
+
+    def _combine_segments(self, parts: list, duration_ms: int):
+        return np.concatenate(parts).astype(np.int64)
+
+    def _load_cache(self, video_path: str, duration_ms: int):
+        try:
+            return load_keyframe_cache(self.cache_dir, video_path, duration_ms)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Failed to load keyframe cache for {video_path}: {e}")
+            return None
+
+    def _save_cache(self, video_path: str, result, duration_ms: int):
+        try:
+            save_keyframe_cache(self.cache_dir, video_path, result, duration_ms)
+        except OSError as e:
+            print(f"Failed to save keyframe cache for {video_path}: {e}")
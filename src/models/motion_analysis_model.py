@@ -0,0 +1,164 @@
+import math
+import os
+import numpy as np
+from ..utils.video_cache import get_video_cache_path
+from .video_analysis_model import AnalysisStopped, VideoAnalysisModel, is_analysis_stopping
+
+# 動き解析用の縮小フレームサイズとサンプリング間隔 (シーン検出よりさらに粗くてよい)
+MOTION_WIDTH = 64
+MOTION_HEIGHT = 36
+MOTION_INTERVAL_MS = 250
+BATCH_SIZE = 64
+
+# 平均輝度がこれ未満のフレームは、顕微鏡がオフ (またはレンズキャップ) とみなす
+DARK_LEVEL = 16
+
+def aggregate_motion_per_second(times_ms: np.ndarray, frames: np.ndarray, prev_frame: np.ndarray | None,
+                                first_second: int, seconds: int):
+    """
+    フレームのバッチから、1秒ごとの動きスコアの合計とフレーム数を計算します。
+
+    Args:
+        times_ms: 各フレームの時間(ms)。
+        frames: (N, H, W) uint8 のフレーム配列。
+        prev_frame: 直前のバッチの最後のフレーム。最初のバッチでは None。
+        first_second: 結果配列の先頭に対応する秒。
+        seconds: 結果配列の長さ(秒)。
+
+    Returns:
+        (秒ごとのスコア合計, 秒ごとのフレーム数, 最後のフレーム) のタプル。
+    """
+    count = len(frames)
+    flat = frames.reshape(count, -1).astype(np.int16)
+    previous = np.empty_like(flat)
+    previous[0] = flat[0] if prev_frame is None else prev_frame.reshape(-1)
+    previous[1:] = flat[:-1]
+
+    motion = np.abs(flat - previous).mean(axis=1) / 255.0
+    # 暗いフレームは動きがあっても静止 (アイドル) として扱う
+    motion[flat.mean(axis=1) < DARK_LEVEL] = 0.0
+
+    second_index = np.clip(times_ms // 1000 - first_second, 0, seconds - 1)
+    sums = np.bincount(second_index, weights=motion, minlength=seconds)
+    counts = np.bincount(second_index, minlength=seconds)
+    return sums, counts, frames[-1].copy()
+
+def analyze_motion_segment(path: str, start_ms: int, stop_ms: int):
+    """
+    動画の1区間をストリーミングでデコードし、1秒ごとの動きスコアを計算します。
+    (ProcessPoolExecutorのワーカープロセスで実行されます)
+
+    Returns:
+        区間内の各秒の動きスコア (float32配列)。
+    """
+    from ..utils.vlc_frames import iter_gray_frames
+
+    first_second = start_ms // 1000
+    seconds = max(1, math.ceil(stop_ms / 1000) - first_second)
+    sums = np.zeros(seconds, dtype=np.float64)
+    counts = np.zeros(seconds, dtype=np.int64)
+
+    batch = np.empty((BATCH_SIZE, MOTION_HEIGHT, MOTION_WIDTH), dtype=np.uint8)
+    batch_times = np.empty(BATCH_SIZE, dtype=np.int64)
+    filled = 0
+    prev_frame = None
+
+    for time_ms, gray in iter_gray_frames(path, MOTION_WIDTH, MOTION_HEIGHT, MOTION_INTERVAL_MS,
+                                          start_ms=start_ms, stop_ms=stop_ms, cancelled=is_analysis_stopping):
+        batch[filled] = gray
+        batch_times[filled] = time_ms
+        filled += 1
+        if filled == BATCH_SIZE:
+            batch_sums, batch_counts, prev_frame = aggregate_motion_per_second(
+                batch_times, batch, prev_frame, first_second, seconds)
+            sums += batch_sums
+            counts += batch_counts
+            filled = 0
+    if is_analysis_stopping():
+        raise AnalysisStopped()
+    if filled:
+        batch_sums, batch_counts, prev_frame = aggregate_motion_per_second(
+            batch_times[:filled], batch[:filled], prev_frame, first_second, seconds)
+        sums += batch_sums
+        counts += batch_counts
+
+    # フレームが1枚もない秒 (デコードできなかった秒) は静止とみなす
+    return np.divide(sums, counts, out=np.zeros(seconds), where=counts > 0).astype(np.float32)
+
+
+class MotionAnalysisModel(VideoAnalysisModel):
+    """
+    動画の1秒ごとの動きスコアを計算し、術野が静止していた時間 (アイドル) を判定するクラス。
+    スコアは動画ファイルごとに float16 の配列としてメモリマップで保存・参照します。
+    """
+    SEGMENT_FUNCTION = staticmethod(analyze_motion_segment)
+    ANALYSIS_NAME = "Motion analysis"
+    # この値以上の動きスコアを持つ秒をアクティブとみなす (平均輝度差 約2.5階調)
+    ACTIVE_THRESHOLD = 0.01
+
+    def get_activity_seconds(self, start_sec: float, end_sec: float) -> tuple[float, float] | None:
+        """
+        プレイリスト全体での区間 [start_sec, end_sec) を、アクティブ時間とアイドル時間に分けます。
+
+        Returns:
+            (アクティブ秒数, アイドル秒数) のタプル。解析が完了していない場合は None を返します。
+        """
+        if not self.is_complete():
+            return None
+        if end_sec <= start_sec:
+            return 0.0, 0.0
+
+        active = 0.0
+        idle = 0.0
+        for index, scores in self._results.items():
+            file_start = self._offsets[index] / 1000.0
+            file_end = self._offsets[index + 1] / 1000.0
+            local_start = max(start_sec, file_start) - file_start
+            local_end = min(end_sec, file_end) - file_start
+            if local_end <= local_start or len(scores) == 0:
+                continue
+
+            # 区間にかかる各秒と、その秒が区間に含まれる長さ (端の秒は一部だけ)
+            seconds = np.arange(math.floor(local_start), math.ceil(local_end))
+            weights = np.minimum(local_end, seconds + 1) - np.maximum(local_start, seconds)
+            is_active = scores[np.clip(seconds, 0, len(scores) - 1)] >= self.ACTIVE_THRESHOLD
+            active += float(weights[is_active].sum())
+            idle += float(weights[~is_active].sum())
+        return active, idle
+
+    # --- 内部処理 ---
+
+    def _combine_segments(self, parts: list, duration_ms: int):
+        seconds = math.ceil(duration_ms / 1000)
+        return np.concatenate(parts)[:seconds].astype(np.float16)
+
+    def _load_cache(self, video_path: str, duration_ms: int):
+        try:
+            cache_path = get_video_cache_path(self.cache_dir, video_path, ".npy")
+            if not os.path.exists(cache_path):
+                return None
+            scores = np.load(cache_path, mmap_mode="r")
+            if scores.shape != (math.ceil(duration_ms / 1000),):
+                # 長さが変わった (別の長さで解析した) キャッシュは使わない
+                return None
+            return scores
+        except (OSError, ValueError) as e:
+            print(f"Failed to load motion cache for {video_path}: {e}")
+            return None
+
+    def _save_cache(self, video_path: str, result, duration_ms: int):
+        """
+        スコアは1秒ごとなので、解析したときの長さは配列の長さからわかります。
+        一時ファイルに書いてから置き換えます。_load_cache でメモリマップしているファイルへ直接書き込むと、
+        Windowsでは失敗するためです。
+        """
+        cache_path = get_video_cache_path(self.cache_dir, video_path, ".npy")
+        temp_path = cache_path + ".tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                np.save(f, np.asarray(result, dtype=np.float16))
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            print(f"Failed to save motion cache for {video_path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
@@ -0,0 +1,128 @@
+class PlayerBackend:
+    """
+    動画プレイヤーの実装を差し替えるためのインターフェース。
+    VideoPlayerModel はこのインターフェースだけを通してプレイヤーを操作します。
+
+    時間はすべて、プレイリスト内の各動画の先頭からのミリ秒で扱います。
+    プレイリスト全体での時間への変換は VideoPlayerModel が担当します。
+    """
+    # add_state_listener に通知される状態
+    STATE_PLAYING = "playing"
+    STATE_PAUSED = "paused"
+    STATE_STOPPED = "stopped"
+    STATE_ENDED = "ended"
+    STATE_ITEM_CHANGED = "item_changed"
+
+    def __init__(self):
+        self._state_listeners = []
+
+    def load_playlist(self, file_paths: list[str], known_durations: list[int] | None = None) -> list[int] | None:
+        """
+        プレイリストを読み込み、各動画の長さ(ms)のリストを返します。
+        長さを取得できなかった動画は 0 になります。
+        known_durations (事前に調べた各動画の長さ) が与えられた場合は、長さの取得を省略してその値を返します。
+        長さの取得を待たずに戻る実装は None を返し、取得できた長さを poll_playlist_durations() で返します。
+        """
+        raise NotImplementedError
+
+    def poll_playlist_durations(self) -> list[int] | None:
+        """
+        load_playlist() が None を返した場合に、取得できた各動画の長さ(ms)を一度だけ返します。
+        まだ取得中の場合は None を返します。待たずに戻ります。
+        """
+        return None
+
+    def replace_sources(self, file_paths: list[str], index: int, time_in_item_ms: int):
+        """
+        プレイリストの各動画を、同じ長さの別のファイル (プロキシなど) に差し替えます。
+        差し替え後は index 番目の動画の time_in_item_ms へ移動し、再生状態を維持します。
+        動画の長さは読み込み時の値をそのまま使うため、取得し直しません。
+        """
+        raise NotImplementedError
+
+    def set_display_handle(self, handle: int):
+        """動画を表示するウィンドウのハンドルを設定します。"""
+        raise NotImplementedError
+
+    def set_frame_listener(self, listener):
+        """
+        ソフトウェア出力の場合、表示される各フレームについて listener(index, time_in_item_ms, frame) を
+        デコーダのスレッドから呼ぶように設定します (None で解除)。time_in_item_ms はフレームごとの表示時間です。
+        フレームを受け取れない実装では何もしません。
+        """
+        pass
+
+    def get_frame_buffer(self):
+        """
+        デコードしたフレームを受け取る FrameBuffer を返します。
+        プレイヤーがウィンドウへ直接描画する場合は None を返します。
+        """
+        return None
+
+    def show_first_frame(self):
+        """最初のフレームを描画し、一時停止状態にします。"""
+        raise NotImplementedError
+
+    def toggle_pause(self):
+        """再生と一時停止を切り替えます。"""
+        raise NotImplementedError
+
+    def seek(self, index: int, time_in_item_ms: int):
+        """
+        プレイリストの index 番目の動画の指定時間へ移動します。
+        再生中なら再生を続け、一時停止中なら一時停止を維持します。
+        """
+        raise NotImplementedError
+
+    def step_frame(self):
+        """1フレーム進めて一時停止します。"""
+        raise NotImplementedError
+
+    def get_frame_duration_ms(self) -> float:
+        """現在の動画の1フレームの長さ(ms)を返します。"""
+        return 1000.0 / 30
+
+    def take_snapshot(self, path: str, width: int) -> bool:
+        """
+        表示中のフレームを幅 width(px) のJPEGとして path に保存します。保存できなかった場合は False を返します。
+        実装によってはフレームが書き出されるまでブロックするため、Tkのスレッドから呼ばないこと。
+        """
+        return False
+
+    def get_current_index(self) -> int:
+        """現在の動画のプレイリスト内のインデックスを返します。不明な場合は -1 を返します。"""
+        raise NotImplementedError
+
+    def get_item_time(self) -> int:
+        """現在の動画内での再生位置(ms)を返します。"""
+        raise NotImplementedError
+
+    def is_playing(self) -> bool:
+        raise NotImplementedError
+
+    def set_rate(self, rate: float):
+        raise NotImplementedError
+
+    def get_rate(self) -> float:
+        raise NotImplementedError
+
+    def release(self):
+        """プレイヤーのリソースを解放します。"""
+        raise NotImplementedError
+
+    # --- 状態変化の通知 ---
+
+    def add_state_listener(self, listener):
+        """
+        状態が変化したときに listener(state) を呼び出すように登録します。
+        実装によってはTkのスレッド以外から呼ばれるため、listener内でTkを操作してはいけません。
+        """
+        self._state_listeners.append(listener)
+
+    def remove_state_listener(self, listener):
+        if listener in self._state_listeners:
+            self._state_listeners.remove(listener)
+
+    def _notify_state(self, state: str):
+        for listener in list(self._state_listeners):
+            listener(state)
@@ -1,6 +1,7 @@
 import json
 import os
 from .settings_model import SettingsModel
+from ..utils.profiler import profiler
 
 class PresetModel:
     """
@@ -78,6 +79,7 @@ class PresetModel:
         except IOError as e:
             print(f"Error creating default preset file: {e}")
 
+    @profiler.timed("preset.save")
     def save(self):
         """
         現在のプリセットデータをファイルに保存します。
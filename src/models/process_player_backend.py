@@ -0,0 +1,466 @@
+import multiprocessing
+import struct
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+from .player_backend import PlayerBackend
+
+# 共有メモリ上の再生状態のレイアウト
+#   seq: 書き込み中は奇数になるシーケンス番号 (seqlock)
+#   ack: ワーカーが処理を終えた最後のコマンドID
+#   heartbeat_ms: ワーカーが最後に状態を書き込んだ時刻 (time.monotonic, ms)
+#   index, item_time_ms, rate, frame_ms, playing: 再生状態 (frame_ms は現在の動画の1フレームの長さ)
+_STATE_FORMAT = "<QQQqqddB"
+_STATE_SIZE = struct.calcsize(_STATE_FORMAT)
+_SEQ_FORMAT = "<Q"
+_BODY_FORMAT = "<" + _STATE_FORMAT[2:]
+_BODY_OFFSET = struct.calcsize(_SEQ_FORMAT)
+
+# ワーカーが状態を書き込む間隔(秒)
+_PUBLISH_INTERVAL_S = 0.02
+
+# 戻り値を待つコマンド
+_REPLY_COMMANDS = ("load_playlist", "take_snapshot")
+# 送信前に次の同じコマンドが来たら、古いほうを捨ててよいコマンド (最後の値だけが意味を持つ)
+_COALESCED_COMMANDS = ("seek",)
+# 読み出した状態の初期値
+_EMPTY_STATE = (0, 0, 0, -1, 0, 1.0, 0.0, 0)
+
+
+def _write_state(buf, ack: int, index: int, item_time_ms: int, rate: float, frame_ms: float, playing: bool):
+    """seqlock で状態を書き込みます (書き込みはワーカーだけが行う)。"""
+    seq = struct.unpack_from(_SEQ_FORMAT, buf, 0)[0]
+    struct.pack_into(_SEQ_FORMAT, buf, 0, seq + 1)
+    struct.pack_into(_BODY_FORMAT, buf, _BODY_OFFSET, ack, int(time.monotonic() * 1000),
+                     index, item_time_ms, rate, frame_ms, 1 if playing else 0)
+    struct.pack_into(_SEQ_FORMAT, buf, 0, seq + 2)
+
+
+class _CommandOutbox:
+    """
+    ワーカーへ送るコマンドのキュー。パイプへの書き込みは送信用のスレッドだけが行います。
+    ワーカーが止まってパイプが詰まっても、書き込みで待つのは送信用のスレッドだけで、UIのスレッドは待ちません。
+    まだ送っていない最後のコマンドが同じ種類の _COALESCED_COMMANDS であれば置き換えるため、
+    ドラッグ中のシークが溜まり続けることもありません。
+    """
+
+    def __init__(self):
+        self._commands = deque()
+        self._ready = threading.Condition()
+        self._closed = False
+
+    def put(self, command: tuple):
+        with self._ready:
+            if self._commands and command[1] in _COALESCED_COMMANDS and self._commands[-1][1] == command[1]:
+                self._commands[-1] = command
+            else:
+                self._commands.append(command)
+            self._ready.notify()
+
+    def close(self):
+        with self._ready:
+            self._closed = True
+            self._ready.notify()
+
+    def send_loop(self, conn):
+        """送信用のスレッド。閉じられるか、パイプが使えなくなるまでコマンドを送り続けます。"""
+        while True:
+            with self._ready:
+                self._ready.wait_for(lambda: self._commands or self._closed)
+                if not self._commands:
+                    return
+                command = self._commands.popleft()
+            try:
+                conn.send(command)
+            except (OSError, EOFError, ValueError):
+                return  # ワーカーが終了した (再起動では新しいキューを作る)
+
+
+def _player_worker(conn, shm_name: str, backend_class, backend_kwargs: dict):
+    """
+    プレイヤーのワーカープロセスの本体。
+    コマンドをパイプから受け取って実行し、再生状態を共有メモリへ定期的に書き込みます。
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            try:
+                conn.send(message)
+            except (OSError, EOFError):
+                pass
+
+    backend = backend_class(**backend_kwargs)
+    # VLCのイベントスレッドから呼ばれるため、送信はロックで保護する
+    backend.add_state_listener(lambda state: send(("state", state)))
+
+    ack = 0
+    released = False
+    try:
+        while True:
+            if conn.poll(_PUBLISH_INTERVAL_S):
+                try:
+                    command_id, name, args = conn.recv()
+                except (EOFError, OSError):
+                    break  # UI側のプロセスが終了した
+                if name == "exit":
+                    break
+                try:
+                    result = getattr(backend, name)(*args)
+                except Exception as e:
+                    print(f"Player worker: '{name}' failed: {e}")
+                    result = None
+                if name in _REPLY_COMMANDS:
+                    send(("reply", command_id, result))
+                ack = command_id
+                released = released or name == "release"
+            if released:
+                _write_state(shm.buf, ack, -1, 0, 1.0, 0.0, False)
+            else:
+                _write_state(shm.buf, ack, backend.get_current_index(), backend.get_item_time(),
+                             backend.get_rate(), backend.get_frame_duration_ms(), backend.is_playing())
+    finally:
+        if not released:
+            backend.release()
+        shm.close()
+
+
+class ProcessPlayerBackend(PlayerBackend):
+    """
+    プレイヤーを別プロセスで動かす実装。
+    libVLCの呼び出しはすべてワーカープロセスで行い、UIのスレッドはコマンドをキューに積むだけです
+    (パイプへの書き込みは送信用のスレッドが行います)。
+    再生位置や再生状態はワーカーが共有メモリへ書き込み、UI側はロックを取らずに読み出します。
+    そのため、ネットワーク上のファイルやデコーダが止まってもUIは固まりません。
+
+    ワーカーが終了・応答しなくなった場合は再起動し、プレイリスト・再生位置・再生速度・
+    再生状態を復元します (記録中の手順などUI側の状態はそのまま残ります)。
+    """
+    # ワーカーの状態がこの時間更新されなければ、応答なしとみなして再起動する
+    STALL_TIMEOUT_S = 5.0
+    # ワーカーの生存確認の間隔
+    WATCHDOG_INTERVAL_S = 0.5
+    # 動画の長さの取得を待つ最大時間。UIのスレッドは待たずに poll_playlist_durations() で結果を受け取る
+    LOAD_TIMEOUT_S = 60.0
+    # take_snapshot の応答を待つ最大時間 (スナップショットのスレッドで待つ)
+    SNAPSHOT_TIMEOUT_S = 5.0
+
+    def __init__(self, backend_class=None, **backend_kwargs):
+        """
+        Args:
+            backend_class: ワーカープロセスで使うプレイヤーの実装。None の場合は VlcPlayerBackend。
+            backend_kwargs: backend_class に渡す引数。
+        """
+        super().__init__()
+        if backend_class is None:
+            from .vlc_player_backend import VlcPlayerBackend
+            backend_class = VlcPlayerBackend
+            # フレームは別プロセスのメモリに書き込まれるため、ソフトウェア出力は使えない
+            if backend_kwargs.get("video_output") == "software":
+                print("Software video output is not available with the player process. Using native output.")
+            backend_kwargs["video_output"] = "native"
+        self._backend_class = backend_class
+        self._backend_kwargs = backend_kwargs
+        self._context = multiprocessing.get_context("spawn")
+
+        self._shm = shared_memory.SharedMemory(create=True, size=_STATE_SIZE)
+        self._shm.buf[:_STATE_SIZE] = bytes(_STATE_SIZE)
+        self._last_state = _EMPTY_STATE
+
+        self._command_id = 0
+        # スナップショットの依頼はTk以外のスレッドからも送るため、コマンドIDの採番と積む順番はロックで保護する
+        self._send_lock = threading.Lock()
+        self._outbox = None
+        # ワーカーからの戻り値: コマンドID -> 値
+        self._replies = {}
+        self._reply_ready = threading.Condition()
+        # 待つのをやめたコマンドのID (後から届いた戻り値は捨てる)
+        self._abandoned_replies = set()
+        self._process = None
+        self._conn = None
+        self._last_watchdog_check = 0.0
+
+        # 再起動時に復元するセッションの状態
+        self._file_paths = []
+        # 読み込み時に取得した動画の長さ (再起動時にパースし直さないため)
+        self._durations = None
+        self._display_handle = None
+        self._rate = 1.0
+        # ワーカーが処理するまでの間、UIに返す値 (コマンドID, 値)
+        self._pending_seek = None
+        self._pending_playing = None
+        # 長さを取得中の load_playlist の (コマンドID, 送った時刻) と、取得に失敗した場合の結果
+        self._pending_load = None
+        self._failed_load = None
+
+        self._start_worker()
+
+    # --- ワーカーの管理 ---
+
+    def _start_worker(self):
+        parent_conn, child_conn = self._context.Pipe()
+        self._conn = parent_conn
+        self._process = self._context.Process(
+            target=_player_worker,
+            args=(child_conn, self._shm.name, self._backend_class, self._backend_kwargs),
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+        self._started_at = time.monotonic()
+        self._outbox = _CommandOutbox()
+        threading.Thread(target=self._outbox.send_loop, args=(parent_conn,), daemon=True).start()
+        threading.Thread(target=self._receive_loop, args=(parent_conn,), daemon=True).start()
+
+    def _receive_loop(self, conn):
+        """ワーカーからの状態通知と戻り値を受け取るスレッド。"""
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            if message[0] == "state":
+                self._notify_state(message[1])
+            elif message[0] == "reply":
+                with self._reply_ready:
+                    if message[1] in self._abandoned_replies:
+                        self._abandoned_replies.discard(message[1])
+                        continue
+                    self._replies[message[1]] = message[2]
+                    self._reply_ready.notify_all()
+
+    def _stop_worker(self):
+        if self._process is None:
+            return
+        self._send("exit")
+        self._outbox.close()
+        self._process.join(timeout=2.0)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join(timeout=2.0)
+        self._conn.close()
+        self._process = None
+
+    def restart(self):
+        """ワーカーを再起動し、再生中だったセッションの状態を復元します。"""
+        _, _, _, index, item_time_ms, _, _, playing = self._read_state()
+        if self._pending_seek:
+            _, index, item_time_ms = self._pending_seek
+        print("Restarting the player process...")
+        self._outbox.close()
+        self._process.terminate()
+        self._process.join(timeout=2.0)
+        # 送信用のスレッドがパイプへの書き込みで止まっていても、閉じれば終わる
+        self._conn.close()
+        self._process = None
+        self._shm.buf[:_STATE_SIZE] = bytes(_STATE_SIZE)
+        self._last_state = _EMPTY_STATE
+        self._pending_seek = None
+        self._pending_playing = None
+        self._start_worker()
+
+        if self._pending_load is not None:
+            # 長さの取得の途中だった場合は、取得からやり直す
+            self._pending_load = (self._send("load_playlist", self._file_paths, None), time.monotonic())
+            if self._display_handle:
+                self._send("set_display_handle", self._display_handle)
+        elif self._file_paths:
+            # 動画の長さは取得済みなので応答は待たない (コマンドは送った順に処理される)
+            self._send("load_playlist", self._file_paths, self._durations)
+            if self._display_handle:
+                self._send("set_display_handle", self._display_handle)
+            self._send("show_first_frame")
+            self._send("set_rate", self._rate)
+            if index >= 0:
+                self.seek(index, item_time_ms)
+            if playing:
+                self.toggle_pause()
+        print("Player process restarted.")
+
+    def _check_worker(self):
+        """ワーカーが終了・応答なしになっていないか確認し、必要なら再起動します。"""
+        now = time.monotonic()
+        if now - self._last_watchdog_check < self.WATCHDOG_INTERVAL_S:
+            return
+        self._last_watchdog_check = now
+        if self._process is None:
+            return
+        if not self._process.is_alive():
+            print("The player process has exited unexpectedly.")
+            self.restart()
+            return
+        if self._pending_load is not None:
+            # 長さの取得中はワーカーが状態を書き込まないため、取得の制限時間だけを確認する
+            if now - self._pending_load[1] > self.LOAD_TIMEOUT_S:
+                print(f"The player process could not read the videos in {self.LOAD_TIMEOUT_S:.0f}s.")
+                # 再起動したワーカーが同じ読み込みで止まらないよう、プレイリストは復元しない
+                self._failed_load = [0] * len(self._file_paths)
+                self._file_paths = []
+                self._pending_load = None
+                self.restart()
+            return
+        heartbeat_ms = self._last_state[2]
+        last_update_s = heartbeat_ms / 1000.0 if heartbeat_ms else self._started_at
+        if now - last_update_s > self.STALL_TIMEOUT_S:
+            print("The player process is not responding.")
+            self.restart()
+
+    # --- コマンドと状態 ---
+
+    def _send(self, name: str, *args) -> int:
+        """コマンドを送信のキューに積み、そのIDを返します。待ちません。"""
+        with self._send_lock:
+            self._command_id += 1
+            command_id = self._command_id
+            self._outbox.put((command_id, name, args))
+        return command_id
+
+    def _call(self, name: str, *args, timeout: float):
+        """コマンドを送り、ワーカーからの戻り値を待ちます。タイムアウトした場合は None を返します。"""
+        command_id = self._send(name, *args)
+        with self._reply_ready:
+            if self._reply_ready.wait_for(lambda: command_id in self._replies, timeout):
+                return self._replies.pop(command_id)
+            self._abandoned_replies.add(command_id)
+        print(f"The player process did not answer '{name}' in {timeout:.1f}s.")
+        return None
+
+    def _take_reply(self, command_id: int):
+        """届いていれば戻り値を (True, 値) で、まだなら (False, None) で返します。待ちません。"""
+        with self._reply_ready:
+            if command_id in self._replies:
+                return True, self._replies.pop(command_id)
+        return False, None
+
+    def _read_state(self) -> tuple:
+        """
+        共有メモリから再生状態を読み出します (seqlock)。
+        書き込み中で一貫した値が読めなかった場合は、前回読み出した値を返します。
+        """
+        buf = self._shm.buf
+        for _ in range(4):
+            seq = struct.unpack_from(_SEQ_FORMAT, buf, 0)[0]
+            if seq & 1:
+                continue
+            body = struct.unpack_from(_BODY_FORMAT, buf, _BODY_OFFSET)
+            if struct.unpack_from(_SEQ_FORMAT, buf, 0)[0] == seq:
+                self._last_state = (seq, *body)
+                break
+        return self._last_state
+
+    def _acked(self, command_id: int) -> bool:
+        return self._read_state()[1] >= command_id
+
+    # --- PlayerBackend ---
+
+    def load_playlist(self, file_paths: list[str], known_durations: list[int] | None = None) -> list[int] | None:
+        """
+        長さが分かっている場合は、読み込みを送ってすぐにその長さを返します。
+        分からない場合は None を返し、ワーカーが取得した長さは poll_playlist_durations() で受け取ります
+        (ネットワーク上のファイルなどで取得に時間がかかっても、UIのスレッドは待ちません)。
+        """
+        self._file_paths = list(file_paths)
+        self._pending_seek = None
+        self._pending_playing = None
+        self._failed_load = None
+        if known_durations is not None and len(known_durations) == len(file_paths):
+            self._durations = list(known_durations)
+            self._pending_load = None
+            self._send("load_playlist", self._file_paths, self._durations)
+            return list(self._durations)
+        self._durations = None
+        self._pending_load = (self._send("load_playlist", self._file_paths, None), time.monotonic())
+        return None
+
+    def poll_playlist_durations(self) -> list[int] | None:
+        if self._failed_load is not None:
+            durations, self._failed_load = self._failed_load, None
+            return durations
+        if self._pending_load is None:
+            return None
+        self._check_worker()
+        if self._pending_load is None:
+            # 制限時間を過ぎて、取得をあきらめた
+            return self.poll_playlist_durations()
+        received, durations = self._take_reply(self._pending_load[0])
+        if not received:
+            return None
+        self._pending_load = None
+        if durations is None:
+            durations = [0] * len(self._file_paths)
+        self._durations = durations
+        return list(durations)
+
+    def replace_sources(self, file_paths: list[str], index: int, time_in_item_ms: int):
+        # 再起動時にも差し替え後のファイルで復元する
+        self._file_paths = list(file_paths)
+        self._pending_seek = (self._send("replace_sources", self._file_paths, index, time_in_item_ms),
+                              index, time_in_item_ms)
+
+    def set_display_handle(self, handle: int):
+        self._display_handle = handle
+        self._send("set_display_handle", handle)
+
+    def show_first_frame(self):
+        self._pending_playing = (self._send("show_first_frame"), False)
+
+    def toggle_pause(self):
+        self._pending_playing = (self._send("toggle_pause"), not self.is_playing())
+
+    def seek(self, index: int, time_in_item_ms: int):
+        self._pending_seek = (self._send("seek", index, time_in_item_ms), index, time_in_item_ms)
+
+    def step_frame(self):
+        self._pending_playing = (self._send("step_frame"), False)
+
+    def get_frame_duration_ms(self) -> float:
+        # ワーカーが状態と一緒に書き込んだ値を使う (ワーカーが止まっていても待たない)
+        duration = self._read_state()[6]
+        return duration if duration > 0 else super().get_frame_duration_ms()
+
+    def take_snapshot(self, path: str, width: int) -> bool:
+        # スナップショットのスレッドから呼ばれるので、ワーカーが保存し終えるのを待つ
+        if self._process is None or not self._process.is_alive():
+            return False
+        return bool(self._call("take_snapshot", path, width, timeout=self.SNAPSHOT_TIMEOUT_S))
+
+    def get_current_index(self) -> int:
+        if self._pending_seek:
+            if not self._acked(self._pending_seek[0]):
+                return self._pending_seek[1]
+            self._pending_seek = None
+        return self._read_state()[3]
+
+    def get_item_time(self) -> int:
+        self._check_worker()
+        if self._pending_seek:
+            if not self._acked(self._pending_seek[0]):
+                return self._pending_seek[2]
+            self._pending_seek = None
+        return max(self._read_state()[4], 0)
+
+    def is_playing(self) -> bool:
+        if self._pending_playing:
+            if not self._acked(self._pending_playing[0]):
+                return self._pending_playing[1]
+            self._pending_playing = None
+        return bool(self._read_state()[7])
+
+    def set_rate(self, rate: float):
+        self._rate = rate
+        self._send("set_rate", rate)
+
+    def get_rate(self) -> float:
+        return self._rate
+
+    def release(self):
+        if self._process is not None:
+            self._send("release")
+            self._stop_worker()
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+            print("Player process released.")
@@ -0,0 +1,263 @@
+import os
+import threading
+from ..utils.video_cache import get_video_cache_path
+from .video_analysis_model import get_analysis_executor, shutdown_analysis_executor, wait_for_job
+
+PROXY_SUFFIX = ".proxy.mp4"
+# プロキシの高さ(px)。幅は元の動画のアスペクト比から決まる
+PROXY_HEIGHT = 360
+# キーフレームの間隔 (フレーム数)。短いGOPにして、どの位置へのシークも数フレームのデコードで済ませる
+PROXY_KEYINT = 6
+# 元の動画とプロキシの長さの差がこれを超えたら、時間がずれているとみなして使わない
+DURATION_TOLERANCE_MS = 100
+# 1ファイルの変換を打ち切るまでの時間(秒)
+TRANSCODE_TIMEOUT_S = 6 * 60 * 60
+
+def transcode_proxy(source_path: str, output_path: str) -> int:
+    """
+    libVLCのストリーム出力で、動画を低解像度・短いGOPのプロキシに変換します。
+    (ProcessPoolExecutorのワーカープロセスで実行されます)
+
+    フレームレートは変換せず、元の動画のタイムスタンプをそのまま使うため、
+    プロキシ内の時間は元の動画の時間と一致します。音声は含めません。
+    書き込み中は ".part" のファイルに出力し、完了してから output_path へ移動します。
+
+    Returns:
+        プロキシの長さ(ms)。
+    """
+    import vlc
+
+    part_path = output_path + ".part"
+    chain = (
+        "#transcode{vcodec=h264,"
+        f"venc=x264{{preset=ultrafast,tune=fastdecode,keyint={PROXY_KEYINT},min-keyint=1,bframes=0}},"
+        f"height={PROXY_HEIGHT},acodec=none,scodec=none}}"
+        f":std{{access=file,mux=mp4,dst=\"{part_path}\"}}"
+    )
+    instance = vlc.Instance("--quiet", "--no-sout-audio", "--no-sout-spu")
+    player = instance.media_player_new()
+    media = instance.media_new(source_path)
+    media.add_option(f":sout={chain}")
+    player.set_media(media)
+
+    finished = threading.Event()
+    failed = []
+    events = player.event_manager()
+    events.event_attach(vlc.EventType.MediaPlayerEndReached, lambda e: finished.set())
+    events.event_attach(vlc.EventType.MediaPlayerEncounteredError,
+                        lambda e: (failed.append(True), finished.set()))
+    try:
+        player.play()
+        if not wait_for_job(finished, TRANSCODE_TIMEOUT_S):
+            raise TimeoutError(f"Transcoding did not finish in {TRANSCODE_TIMEOUT_S}s")
+        player.stop()
+        if failed or not os.path.exists(part_path) or os.path.getsize(part_path) == 0:
+            raise RuntimeError("libVLC could not transcode the file")
+
+        duration_ms = _parse_duration(instance, part_path)
+    except Exception:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    finally:
+        player.release()
+        media.release()
+        instance.release()
+
+    os.replace(part_path, output_path)
+    return duration_ms
+
+def probe_proxy_duration(proxy_path: str) -> int:
+    """
+    キャッシュにあるプロキシの長さ(ms)を調べます。
+    (ProcessPoolExecutorのワーカープロセスで実行されます)
+    """
+    import vlc
+
+    instance = vlc.Instance("--quiet")
+    try:
+        return _parse_duration(instance, proxy_path)
+    finally:
+        instance.release()
+
+def _parse_duration(instance, path: str) -> int:
+    """libVLCで動画をパースし、長さ(ms)を返します。"""
+    media = instance.media_new(path)
+    try:
+        media.parse()
+        return max(media.get_duration(), 0)
+    finally:
+        media.release()
+
+
+class ProxyModel:
+    """
+    スクラブ用の低解像度プロキシを、バックグラウンドで作成・管理するクラス。
+
+    プロキシは解析と同じ共有プロセスプールで作成し、キャッシュディレクトリに
+    元の動画ごとのファイルとして保存します。キャッシュの合計サイズが上限を超えたら、
+    最後に使われた時刻 (更新日時) が古いものから削除します (LRU)。
+
+    解析モデルと同じ start_analysis / poll / is_running / cancel / shutdown を持つため、
+    ViewModelは解析モデルと同じ流れで開始・取り込み・終了を行えます。
+    """
+    ANALYSIS_NAME = "Proxy generation"
+
+    def __init__(self, cache_dir: str, max_cache_bytes: int):
+        """
+        Args:
+            cache_dir: プロキシを保存するディレクトリ。
+            max_cache_bytes: キャッシュの合計サイズの上限(バイト)。
+        """
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_bytes
+
+        self._video_files = []
+        # ファイルのインデックス -> (Future, プロキシのパス, 元の動画の長さ(ms), キャッシュの検証かどうか)
+        self._pending = {}
+        # ファイルのインデックス -> 使用できるプロキシのパス
+        self._proxy_paths = {}
+
+    def start_analysis(self, video_files: list[str], media_durations: list[int]):
+        """
+        プレイリストのプロキシの作成を開始します。キャッシュにあるものは、長さを確かめてから使います。
+        長さが分からない動画は、プロキシと時間が対応しているか確かめられないため、プロキシを作りません。
+
+        Args:
+            video_files: 動画ファイルのパスのリスト。
+            media_durations: 各動画の長さ(ms)のリスト。プロキシの長さの検証に使う。
+        """
+        self.cancel()
+        self._video_files = list(video_files)
+
+        cached = 0
+        for index, (path, duration) in enumerate(zip(video_files, media_durations)):
+            if duration <= 0:
+                print(f"{self.ANALYSIS_NAME} skipped for {path}: unknown duration.")
+                continue
+            try:
+                proxy_path = get_video_cache_path(self.cache_dir, path, PROXY_SUFFIX)
+            except OSError as e:
+                print(f"{self.ANALYSIS_NAME} skipped for {path}: {e}")
+                continue
+            if os.path.exists(proxy_path):
+                # 以前のバージョンで作ったものや、同じパスの別の動画のプロキシかもしれないので長さを確かめる
+                self._touch(proxy_path)
+                future = get_analysis_executor().submit(probe_proxy_duration, proxy_path)
+                self._pending[index] = (future, proxy_path, duration, True)
+                cached += 1
+                continue
+            self._submit_transcode(index, path, proxy_path, duration)
+
+        self._enforce_cache_limit()
+        print(f"{self.ANALYSIS_NAME} started: {len(self._pending) - cached} file(s) to transcode, "
+              f"{cached} found in cache.")
+
+    def _submit_transcode(self, index: int, path: str, proxy_path: str, duration: int):
+        future = get_analysis_executor().submit(transcode_proxy, path, proxy_path)
+        self._pending[index] = (future, proxy_path, duration, False)
+
+    def poll(self) -> bool:
+        """
+        完了した変換の結果を取り込みます。使用できるプロキシが増えた場合は True を返します。
+        """
+        updated = False
+        for index in list(self._pending):
+            future, proxy_path, duration, from_cache = self._pending[index]
+            if not future.done():
+                continue
+            del self._pending[index]
+            path = self._video_files[index]
+            try:
+                proxy_duration = future.result()
+            except Exception as e:
+                print(f"{self.ANALYSIS_NAME} failed for {path}: {e}")
+                continue
+            # 長さが一致しないプロキシは、元の動画と時間が対応しないので使わない
+            if abs(proxy_duration - duration) > DURATION_TOLERANCE_MS:
+                print(f"{self.ANALYSIS_NAME}: discarded the {'cached ' if from_cache else ''}proxy of {path} "
+                      f"(duration {proxy_duration}ms differs from {duration}ms).")
+                self._remove(proxy_path)
+                if from_cache:
+                    # キャッシュが古かっただけなので、作り直す
+                    self._submit_transcode(index, path, proxy_path, duration)
+                continue
+            self._proxy_paths[index] = proxy_path
+            updated = True
+
+        if updated:
+            self._enforce_cache_limit()
+            if not self._pending:
+                print(f"{self.ANALYSIS_NAME} finished.")
+        return updated
+
+    def get_proxy_paths(self) -> list[str | None]:
+        """プレイリストの各動画のプロキシのパスを返します。まだ使えない動画は None になります。"""
+        return [self._proxy_paths.get(index) for index in range(len(self._video_files))]
+
+    def is_running(self) -> bool:
+        """変換中のファイルが残っているかどうかを返します。"""
+        return bool(self._pending)
+
+    def is_complete(self) -> bool:
+        """プレイリストのすべてのファイルのプロキシが揃っているかどうかを返します。"""
+        return bool(self._video_files) and len(self._proxy_paths) == len(self._video_files)
+
+    def cancel(self):
+        """
+        開始前の変換を取り消し、結果をリセットします。
+        すでに変換中のファイルは最後まで変換され、次回以降のキャッシュとして使われます。
+        """
+        for future, _, _, _ in self._pending.values():
+            future.cancel()
+        self._pending = {}
+        self._proxy_paths = {}
+
+    def shutdown(self):
+        """変換を取り消し、共有プロセスプールを終了します。"""
+        self.cancel()
+        shutdown_analysis_executor()
+
+    # --- キャッシュの管理 ---
+
+    def _touch(self, proxy_path: str):
+        """使用したプロキシの更新日時を現在時刻にします (LRUの順序に使う)。"""
+        try:
+            os.utime(proxy_path)
+        except OSError:
+            pass
+
+    def _remove(self, proxy_path: str):
+        try:
+            os.remove(proxy_path)
+        except OSError as e:
+            print(f"Could not remove proxy {proxy_path}: {e}")
+
+    def _enforce_cache_limit(self):
+        """
+        キャッシュの合計サイズが上限を超えていれば、更新日時の古いプロキシから削除します。
+        現在のプレイリストのプロキシと、変換中・検証中のファイルは削除しません。
+        """
+        in_use = set(self._proxy_paths.values())
+        for _, proxy_path, _, _ in self._pending.values():
+            in_use.update((proxy_path, proxy_path + ".part"))
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file() or not entry.name.endswith((PROXY_SUFFIX, PROXY_SUFFIX + ".part")):
+                continue
+            stat = entry.stat()
+            total += stat.st_size
+            if entry.path not in in_use:
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        entries.sort()
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_cache_bytes:
+                break
+            self._remove(path)
+            total -= size
+            removed += 1
+        if removed:
+            print(f"{self.ANALYSIS_NAME}: removed {removed} old proxy file(s) from the cache.")
@@ -0,0 +1,371 @@
+import base64
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import re
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from string import Template
+import pandas as pd
+from ..utils.helpers import format_time
+from ..utils.result_format import REPORT_PREFIX, TOTAL_ROW_NAME
+
+REPORT_SUFFIX = ".html"
+# プロセスプールの1ジョブで作成するレポートの数
+REPORTS_PER_JOB = 20
+# 手順ごとの色 (手順名から決まるので、どのレポートでも同じ手順は同じ色になる)
+STEP_COLORS = ("#0A84FF", "#30D158", "#FF9F0A", "#BF5AF2", "#FF375F", "#64D2FF", "#FFD60A", "#AC8E68",
+               "#5E5CE6", "#66D4CF")
+
+# --- テンプレート ---
+# ページの枠 (スタイルとスクリプトを埋め込んだもの) は一度だけ組み立て、キャッシュしておく
+
+_STYLE = """
+body { font-family: "Yu Gothic UI", "Hiragino Sans", "Noto Sans CJK JP", sans-serif; margin: 24px; color: #1D1D1F; }
+h1 { font-size: 20px; margin: 0 0 4px; }
+h2 { font-size: 16px; margin: 28px 0 8px; }
+.meta { color: #6E6E73; font-size: 12px; }
+table { border-collapse: collapse; font-size: 13px; }
+th, td { border-bottom: 1px solid #E5E5EA; padding: 4px 10px; text-align: left; vertical-align: top; }
+th { background: #F5F5F7; cursor: pointer; user-select: none; }
+td.num { text-align: right; font-variant-numeric: tabular-nums; }
+.summary td:first-child { color: #6E6E73; }
+.chart text { font-size: 11px; fill: #3A3A3C; }
+.chart .grid { stroke: #E5E5EA; }
+img.snapshot { width: 160px; border-radius: 4px; display: block; }
+"""
+
+_SCRIPT = """
+document.querySelectorAll("table.sortable th").forEach(function (th, column) {
+  th.addEventListener("click", function () {
+    var body = th.closest("table").tBodies[0];
+    var rows = Array.prototype.slice.call(body.rows);
+    var ascending = th.dataset.order !== "asc";
+    th.dataset.order = ascending ? "asc" : "desc";
+    rows.sort(function (a, b) {
+      var x = a.cells[column].dataset.value || a.cells[column].textContent;
+      var y = b.cells[column].dataset.value || b.cells[column].textContent;
+      var nx = parseFloat(x), ny = parseFloat(y);
+      var result = (isNaN(nx) || isNaN(ny)) ? x.localeCompare(y) : nx - ny;
+      return ascending ? result : -result;
+    });
+    rows.forEach(function (row) { body.appendChild(row); });
+  });
+});
+"""
+
+_PAGE = """<!DOCTYPE html>
+<html lang="ja"><head><meta charset="utf-8"><title>$${title}</title><style>${style}</style></head>
+<body>$${body}<script>${script}</script></body></html>
+"""
+
+# アセットのキャッシュ: キャッシュディレクトリ -> 組み立て済みのページの枠
+_page_templates = {}
+_page_templates_lock = threading.Lock()
+
+def get_page_template(cache_dir: str | None = None) -> Template:
+    """
+    スタイルとスクリプトを埋め込んだページの枠を返します。
+    空白を詰めた枠をテンプレートの内容のハッシュを名前にしてキャッシュディレクトリに保存し、
+    次の実行からはそれを読み込みます (テンプレートを変えるとハッシュが変わり、作り直されます)。
+    """
+    with _page_templates_lock:
+        page = _page_templates.get(cache_dir)
+    if page is not None:
+        return page
+
+    digest = hashlib.blake2b((_PAGE + _STYLE + _SCRIPT).encode("utf-8"), digest_size=8).hexdigest()
+    cache_path = os.path.join(cache_dir, f"report_page_{digest}.html") if cache_dir else None
+    text = None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except OSError as e:
+            print(f"Failed to load cached report assets: {e}")
+    if text is None:
+        text = Template(_PAGE).substitute(style=_minify(_STYLE), script=_minify(_SCRIPT))
+        if cache_path:
+            try:
+                with open(cache_path + ".tmp", "w", encoding="utf-8") as f:
+                    f.write(text)
+                os.replace(cache_path + ".tmp", cache_path)
+            except OSError as e:
+                print(f"Failed to cache report assets: {e}")
+    page = Template(text)
+    with _page_templates_lock:
+        _page_templates[cache_dir] = page
+    return page
+
+def _minify(text: str) -> str:
+    """スタイルとスクリプトの空白を詰めます (どちらも // のコメントを使わないこと)。"""
+    return re.sub(r"\s*([{};,:()=<>!|&?+\-*/])\s*", r"\1", re.sub(r"\s+", " ", text)).strip()
+
+# --- 読み込み ---
+
+def load_session(csv_path: str) -> tuple[pd.DataFrame, dict]:
+    """
+    保存された結果のCSVと、同じ名前のJSON (セッションの情報) を読み込みます。
+
+    Returns:
+        (合計行を除いた記録の DataFrame, セッションの情報) のタプル。JSONがない場合は空の辞書。
+    """
+    df = pd.read_csv(csv_path, encoding="utf-8-sig")
+    if "手順名" not in df.columns or "開始時間(秒)" not in df.columns:
+        raise ValueError("not a session result CSV")
+    df = df[(df["手順名"] != TOTAL_ROW_NAME) & df["開始時間(秒)"].notna()].reset_index(drop=True)
+    session_info = {}
+    json_path = os.path.splitext(csv_path)[0] + ".json"
+    if os.path.exists(json_path):
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                session_info = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Failed to read session info {json_path}: {e}")
+    return df, session_info
+
+# --- 描画 ---
+
+def render_session_report(csv_path: str, include_snapshots: bool = True, asset_cache_dir: str | None = None) -> str:
+    """
+    1セッションの結果から、外部のファイルを参照しない1つのHTMLを作ります。
+    概要の表、手順のタイムライン、手順ごとの所要時間、記録の一覧 (スナップショットは画像を埋め込む) を含みます。
+    """
+    df, session_info = load_session(csv_path)
+    title = os.path.splitext(os.path.basename(csv_path))[0]
+    meta = [f"Saved: {session_info['saved_at']}" if session_info.get("saved_at") else "",
+            f"Preset: {session_info['preset']}" if session_info.get("preset") else ""]
+    videos = [os.path.basename(video.get("path", "")) for video in session_info.get("videos", [])]
+    if videos:
+        meta.append("Videos: " + ", ".join(videos))
+    body = [f"<h1>{html.escape(title)}</h1>",
+            f"<div class=\"meta\">{html.escape(' / '.join(item for item in meta if item))}</div>",
+            "<h2>Summary</h2>", _render_summary(df)]
+    if not df.empty:
+        body += ["<h2>Timeline</h2>", _render_timeline(df),
+                 "<h2>Duration by Procedure</h2>", _render_step_durations(df)]
+    body += ["<h2>Records</h2>", _render_records(df, os.path.dirname(csv_path), include_snapshots)]
+    return get_page_template(asset_cache_dir).substitute(title=html.escape(title), body="\n".join(body))
+
+def _color(name: str) -> str:
+    return STEP_COLORS[zlib.crc32(name.encode("utf-8")) % len(STEP_COLORS)]
+
+def _seconds(value) -> str:
+    return "" if pd.isna(value) else f"{value:.2f}"
+
+def _render_summary(df: pd.DataFrame) -> str:
+    rows = [("Logged procedures", str(len(df)))]
+    if not df.empty:
+        rows += [("Total duration", f"{df['所要時間(秒)'].sum():.2f}s"),
+                 ("Session span", f"{format_time(df['開始時間(秒)'].min())} - {format_time(df['終了時間(秒)'].max())}")]
+        if "移行時間(秒)" in df.columns:
+            rows.append(("Total transition time", f"{df['移行時間(秒)'].sum():.2f}s"))
+        if "移行中アクティブ(秒)" in df.columns:
+            rows.append(("Active / idle during transitions",
+                         f"{df['移行中アクティブ(秒)'].sum():.2f}s / {df['移行中アイドル(秒)'].sum():.2f}s"))
+    cells = "".join(f"<tr><td>{html.escape(label)}</td><td>{html.escape(value)}</td></tr>" for label, value in rows)
+    return f"<table class=\"summary\">{cells}</table>"
+
+def _tick_step(span_sec: float) -> int:
+    """時間軸の目盛りの間隔(秒)を、目盛りが10本以下になるように選びます。"""
+    for step in (10, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200):
+        if span_sec / step <= 10:
+            return step
+    return 14400
+
+def _render_timeline(df: pd.DataFrame) -> str:
+    """手順ごとに1段を使い、各記録を開始から終了までの帯で描くSVG。"""
+    lanes = list(dict.fromkeys(df["手順名"].astype(str)))
+    label_width, chart_width, row_height, axis_height = 170, 780, 20, 22
+    span = max(float(df["終了時間(秒)"].max()), 1.0)
+    height = axis_height + row_height * len(lanes)
+    parts = [f"<svg class=\"chart\" width=\"{label_width + chart_width + 10}\" height=\"{height}\" "
+             f"xmlns=\"http://www.w3.org/2000/svg\">"]
+    step = _tick_step(span)
+    for tick in range(0, int(span) + 1, step):
+        x = label_width + tick / span * chart_width
+        parts.append(f"<line class=\"grid\" x1=\"{x:.1f}\" y1=\"0\" x2=\"{x:.1f}\" y2=\"{height - axis_height}\"/>"
+                     f"<text x=\"{x:.1f}\" y=\"{height - 6}\" text-anchor=\"middle\">{format_time(tick)}</text>")
+    for lane, name in enumerate(lanes):
+        y = lane * row_height
+        parts.append(f"<text x=\"{label_width - 8}\" y=\"{y + row_height - 6}\" text-anchor=\"end\">"
+                     f"{html.escape(name)}</text>")
+    lane_index = {name: lane for lane, name in enumerate(lanes)}
+    for name, start, end in zip(df["手順名"].astype(str), df["開始時間(秒)"], df["終了時間(秒)"]):
+        x = label_width + start / span * chart_width
+        width = max((end - start) / span * chart_width, 1.0)
+        y = lane_index[name] * row_height + 3
+        tooltip = html.escape(f"{name}: {format_time(start)} - {format_time(end)} ({end - start:.2f}s)")
+        parts.append(f"<rect x=\"{x:.1f}\" y=\"{y}\" width=\"{width:.1f}\" height=\"{row_height - 6}\" rx=\"2\" "
+                     f"fill=\"{_color(name)}\"><title>{tooltip}</title></rect>")
+    parts.append("</svg>")
+    return "".join(parts)
+
+def _render_step_durations(df: pd.DataFrame) -> str:
+    """手順ごとの合計の所要時間を横棒で描くSVG。回数と平均も添えます。"""
+    grouped = df.groupby("手順名", sort=False)["所要時間(秒)"].agg(["sum", "count", "mean"])
+    label_width, chart_width, row_height = 170, 560, 22
+    longest = max(float(grouped["sum"].max()), 1e-9)
+    parts = [f"<svg class=\"chart\" width=\"{label_width + chart_width + 220}\" height=\"{row_height * len(grouped)}\" "
+             f"xmlns=\"http://www.w3.org/2000/svg\">"]
+    for row, (name, values) in enumerate(grouped.iterrows()):
+        y = row * row_height
+        width = max(values["sum"] / longest * chart_width, 1.0)
+        parts.append(f"<text x=\"{label_width - 8}\" y=\"{y + row_height - 7}\" text-anchor=\"end\">"
+                     f"{html.escape(str(name))}</text>"
+                     f"<rect x=\"{label_width}\" y=\"{y + 3}\" width=\"{width:.1f}\" height=\"{row_height - 6}\" rx=\"2\" "
+                     f"fill=\"{_color(str(name))}\"/>"
+                     f"<text x=\"{label_width + width + 6:.1f}\" y=\"{y + row_height - 7}\">"
+                     f"{values['sum']:.1f}s ({int(values['count'])}x, mean {values['mean']:.1f}s)</text>")
+    parts.append("</svg>")
+    return "".join(parts)
+
+def _render_records(df: pd.DataFrame, base_dir: str, include_snapshots: bool) -> str:
+    snapshot_columns = [column for column in ("開始画像", "終了画像") if column in df.columns] if include_snapshots else []
+    headers = ["#", "手順名", "開始", "終了", "所要時間(秒)", "移行時間(秒)", "メモ"] + snapshot_columns
+    rows = []
+    for number, record in enumerate(df.to_dict("records"), start=1):
+        cells = [
+            f"<td class=\"num\">{number}</td>",
+            f"<td>{html.escape(str(record['手順名']))}</td>",
+            f"<td class=\"num\" data-value=\"{record['開始時間(秒)']}\">{format_time(record['開始時間(秒)'])}</td>",
+            f"<td class=\"num\" data-value=\"{record['終了時間(秒)']}\">{format_time(record['終了時間(秒)'])}</td>",
+            f"<td class=\"num\">{_seconds(record.get('所要時間(秒)'))}</td>",
+            f"<td class=\"num\">{_seconds(record.get('移行時間(秒)'))}</td>",
+            f"<td>{html.escape('' if pd.isna(record.get('メモ')) else str(record.get('メモ')))}</td>",
+        ]
+        cells += [f"<td>{_render_snapshot(base_dir, record.get(column))}</td>" for column in snapshot_columns]
+        rows.append("<tr>" + "".join(cells) + "</tr>")
+    head = "".join(f"<th>{html.escape(header)}</th>" for header in headers)
+    return f"<table class=\"sortable\"><thead><tr>{head}</tr></thead><tbody>{''.join(rows)}</tbody></table>"
+
+def _render_snapshot(base_dir: str, relative_path) -> str:
+    """スナップショットの画像を data URI として埋め込みます。画像がない場合は空にします。"""
+    if not isinstance(relative_path, str) or not relative_path:
+        return ""
+    try:
+        with open(os.path.join(base_dir, relative_path), "rb") as f:
+            data = base64.b64encode(f.read()).decode("ascii")
+    except OSError:
+        return ""
+    return f"<img class=\"snapshot\" src=\"data:image/jpeg;base64,{data}\" alt=\"{html.escape(relative_path)}\">"
+
+# --- 書き出し ---
+
+def get_report_path(csv_path: str) -> str:
+    """結果のCSVに対応するHTMLのレポートのパスを返します。"""
+    return os.path.splitext(csv_path)[0] + REPORT_SUFFIX
+
+def write_session_report(csv_path: str, include_snapshots: bool = True, asset_cache_dir: str | None = None) -> str:
+    """
+    1セッションのレポートを、CSVと同じ名前のHTMLとして書き出し、そのパスを返します。
+    一時ファイルに書いてから置き換えるため、途中で止まっても壊れたレポートは残りません。
+    """
+    text = render_session_report(csv_path, include_snapshots, asset_cache_dir)
+    report_path = get_report_path(csv_path)
+    with open(report_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(report_path + ".tmp", report_path)
+    return report_path
+
+def write_session_reports(csv_paths: list[str], include_snapshots: bool = True,
+                          asset_cache_dir: str | None = None) -> list[tuple[str, str | None]]:
+    """
+    複数のセッションのレポートを書き出します。(ProcessPoolExecutorのワーカープロセスで実行されます)
+
+    Returns:
+        (CSVのパス, エラーのメッセージ (成功した場合は None)) のリスト。
+    """
+    results = []
+    for csv_path in csv_paths:
+        try:
+            write_session_report(csv_path, include_snapshots, asset_cache_dir)
+            results.append((csv_path, None))
+        except (OSError, ValueError, KeyError) as e:
+            results.append((csv_path, str(e)))
+    return results
+
+def find_result_csvs(paths: list[str]) -> list[str]:
+    """フォルダ (サブフォルダも含む) またはCSVのパスから、セッションの結果のCSVを集めます。"""
+    csv_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                csv_paths.extend(os.path.join(directory, name) for name in sorted(names)
+                                 if name.lower().endswith(".csv") and not name.startswith(REPORT_PREFIX))
+        elif path.lower().endswith(".csv"):
+            csv_paths.append(path)
+    return csv_paths
+
+def run_reports(paths: list[str], include_snapshots: bool = True, asset_cache_dir: str | None = None,
+                force: bool = False, executor=None, progress=None, workers: int = 1, cancelled=None) -> dict:
+    """
+    フォルダ内の結果のCSVのレポートをまとめて書き出します。
+    CSVより新しいレポートがあるセッションは、force が False なら飛ばします。
+
+    Args:
+        paths: 結果のCSVを含むフォルダ、またはCSVのパスのリスト。
+        include_snapshots: スナップショットの画像を埋め込むかどうか。
+        asset_cache_dir: ページの枠をキャッシュするディレクトリ。
+        force: 最新のレポートがあっても作り直すかどうか。
+        executor: レポートの作成を並列に実行する Executor。
+        progress: 進み具合 (0.0〜1.0, メッセージ) を受け取る関数。
+        workers: executor が None の場合に、作成のために作る専用のプロセスプールのプロセス数。
+                 1 以下の場合は、このスレッドで順に作成する。
+        cancelled: 中止が要求されていれば True を返す関数。ジョブの合間に確認し、まだ始まっていないジョブは取り消す。
+
+    Returns:
+        {"written": 書き出した数, "skipped": 最新で飛ばした数, "failed": [(CSVのパス, エラー)],
+         "cancelled": 中止したかどうか}
+    """
+    csv_paths = find_result_csvs(paths)
+    pending = [path for path in csv_paths if force or not _is_report_current(path)]
+    summary = {"written": 0, "skipped": len(csv_paths) - len(pending), "failed": [], "cancelled": False}
+    # 枠を先に作ってキャッシュしておき、ワーカーではそれを読み込むだけにする
+    get_page_template(asset_cache_dir)
+    batches = [pending[i:i + REPORTS_PER_JOB] for i in range(0, len(pending), REPORTS_PER_JOB)]
+    own_executor = None
+    if executor is None and workers > 1 and len(batches) > 1:
+        own_executor = executor = ProcessPoolExecutor(max_workers=min(workers, len(batches)),
+                                                      mp_context=multiprocessing.get_context("spawn"))
+    futures = []
+    # 1ジョブに収まる量なら、ワーカーの起動を待たずにこのスレッドで作る
+    if executor is None or len(batches) <= 1:
+        results = (write_session_reports(batch, include_snapshots, asset_cache_dir) for batch in batches)
+    else:
+        futures = [executor.submit(write_session_reports, batch, include_snapshots, asset_cache_dir)
+                   for batch in batches]
+        results = (future.result() for future in as_completed(futures) if not future.cancelled())
+    done = 0
+    try:
+        for batch_results in results:
+            for csv_path, error in batch_results:
+                if error is None:
+                    summary["written"] += 1
+                else:
+                    summary["failed"].append((csv_path, error))
+            done += len(batch_results)
+            if progress:
+                progress(done / len(pending), f"Wrote {done}/{len(pending)} reports")
+            if cancelled and not summary["cancelled"] and done < len(pending) and cancelled():
+                # 実行中のジョブは書き終えるまで待って数え、まだ始まっていないジョブは取り消す
+                summary["cancelled"] = True
+                for future in futures:
+                    future.cancel()
+                if not futures:
+                    break
+    finally:
+        if own_executor is not None:
+            own_executor.shutdown(wait=True, cancel_futures=True)
+    print(f"HTML reports: {summary['written']} written, {summary['skipped']} up to date, "
+          f"{len(summary['failed'])} failed{' (cancelled)' if summary['cancelled'] else ''}.")
+    return summary
+
+def _is_report_current(csv_path: str) -> bool:
+    try:
+        return os.path.getmtime(get_report_path(csv_path)) >= os.path.getmtime(csv_path)
+    except OSError:
+        return False
@@ -0,0 +1,203 @@
+import bisect
+import os
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from ..utils.video_cache import get_video_cache_path
+from .video_analysis_model import AnalysisStopped, VideoAnalysisModel, is_analysis_stopping
+
+# 解析用の縮小フレームサイズとサンプリング間隔
+ANALYSIS_WIDTH = 160
+ANALYSIS_HEIGHT = 90
+SAMPLE_INTERVAL_MS = 200
+HISTOGRAM_BINS = 32
+BATCH_SIZE = 64
+
+def compute_frame_features(frames: np.ndarray, prev_frame: np.ndarray | None,
+                           prev_hist: np.ndarray | None):
+    """
+    グレースケールフレームのバッチから、フレームごとの特徴量をまとめて計算します。
+
+    Args:
+        frames: (N, H, W) uint8 のフレーム配列。
+        prev_frame: 直前のバッチの最後のフレーム。最初のバッチでは None。
+        prev_hist: 直前のバッチの最後のヒストグラム。最初のバッチでは None。
+
+    Returns:
+        (ヒストグラム差分 (N,), 動きエネルギー (N,), 最後のフレーム, 最後のヒストグラム) のタプル。
+        どちらの特徴量も 0〜1 の範囲に正規化されています。
+    """
+    count = len(frames)
+    flat = frames.reshape(count, -1)
+    pixels = flat.shape[1]
+
+    # フレームごとのヒストグラムを、ビン番号をずらして1回のbincountでまとめて数える
+    shift = 8 - int(np.log2(HISTOGRAM_BINS))
+    bins = (flat >> shift).astype(np.intp) + (np.arange(count, dtype=np.intp) * HISTOGRAM_BINS)[:, None]
+    hists = np.bincount(bins.ravel(), minlength=count * HISTOGRAM_BINS)
+    hists = hists.reshape(count, HISTOGRAM_BINS).astype(np.float32) / pixels
+
+    previous_hists = np.empty_like(hists)
+    previous_hists[0] = hists[0] if prev_hist is None else prev_hist
+    previous_hists[1:] = hists[:-1]
+    hist_diff = 0.5 * np.abs(hists - previous_hists).sum(axis=1)
+
+    previous_flat = np.empty_like(flat)
+    previous_flat[0] = flat[0] if prev_frame is None else prev_frame.reshape(-1)
+    previous_flat[1:] = flat[:-1]
+    motion = np.abs(flat.astype(np.int16) - previous_flat.astype(np.int16)).mean(axis=1) / 255.0
+
+    return hist_diff, motion.astype(np.float32), frames[-1].copy(), hists[-1].copy()
+
+def analyze_segment(path: str, start_ms: int, stop_ms: int | None):
+    """
+    動画の1区間をストリーミングでデコードし、特徴量を計算します。
+    (ProcessPoolExecutorのワーカープロセスで実行されます)
+
+    Returns:
+        (時間(ms) int64配列, ヒストグラム差分 float32配列, 動きエネルギー float32配列) のタプル。
+    """
+    from ..utils.vlc_frames import iter_gray_frames
+
+    batch = np.empty((BATCH_SIZE, ANALYSIS_HEIGHT, ANALYSIS_WIDTH), dtype=np.uint8)
+    batch_times = []
+    times, hist_diffs, motions = [], [], []
+    prev_frame, prev_hist = None, None
+
+    def flush():
+        nonlocal prev_frame, prev_hist
+        count = len(batch_times)
+        hist_diff, motion, prev_frame, prev_hist = compute_frame_features(batch[:count], prev_frame, prev_hist)
+        times.append(np.asarray(batch_times, dtype=np.int64))
+        hist_diffs.append(hist_diff)
+        motions.append(motion)
+        batch_times.clear()
+
+    for time_ms, gray in iter_gray_frames(path, ANALYSIS_WIDTH, ANALYSIS_HEIGHT, SAMPLE_INTERVAL_MS,
+                                          start_ms=start_ms, stop_ms=stop_ms, cancelled=is_analysis_stopping):
+        batch[len(batch_times)] = gray
+        batch_times.append(time_ms)
+        if len(batch_times) == BATCH_SIZE:
+            flush()
+    if is_analysis_stopping():
+        raise AnalysisStopped()
+    if batch_times:
+        flush()
+
+    if not times:
+        empty = np.empty(0, dtype=np.float32)
+        return np.empty(0, dtype=np.int64), empty, empty
+    return np.concatenate(times), np.concatenate(hist_diffs), np.concatenate(motions)
+
+def _zscore(values: np.ndarray) -> np.ndarray:
+    std = values.std()
+    if std == 0:
+        return np.zeros_like(values)
+    return (values - values.mean()) / std
+
+def rank_boundary_candidates(times_ms: np.ndarray, hist_diff: np.ndarray, motion: np.ndarray,
+                             min_separation_ms: int = 3000, min_score: float = 2.0):
+    """
+    特徴量からシーン切り替わりの候補を抽出し、スコアの高い順に返します。
+
+    ヒストグラム差分と動きエネルギーの変化量を標準化して合算し、
+    min_separation_ms の範囲で極大となる点だけを候補とします。
+
+    Returns:
+        (候補の時間(ms) int64配列, スコア float32配列) のタプル。スコアの降順に並びます。
+    """
+    if len(times_ms) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    motion_change = np.abs(np.diff(motion, prepend=motion[:1]))
+    score = (_zscore(hist_diff) + 0.5 * _zscore(motion_change)).astype(np.float32)
+
+    half_window = max(1, min_separation_ms // SAMPLE_INTERVAL_MS)
+    padded = np.pad(score, half_window, mode="constant", constant_values=-np.inf)
+    local_max = sliding_window_view(padded, 2 * half_window + 1).max(axis=1)
+    peaks = np.flatnonzero((score >= local_max) & (score >= min_score))
+
+    order = peaks[np.argsort(score[peaks])[::-1]]
+    return times_ms[order], score[order]
+
+
+class SceneDetectionModel(VideoAnalysisModel):
+    """
+    プレイリストをオフラインで解析し、手順の境界になりそうなシーン切り替わりの候補を管理するクラス。
+    デコードと特徴量計算はプロセスプールで並列に行い、結果は動画ファイルごとにキャッシュします。
+    """
+    SEGMENT_FUNCTION = staticmethod(analyze_segment)
+    ANALYSIS_NAME = "Scene detection"
+    MAX_CANDIDATES = 300
+
+    def __init__(self, cache_dir: str):
+        # プレイリスト全体での候補 (スコア順) と、ナビゲーション用の時間順リスト
+        self._ranked_candidates = []
+        self._sorted_candidates = []
+        super().__init__(cache_dir)
+
+    def get_candidates(self) -> list[int]:
+        """境界候補の時間(ms)を時間順に返します。"""
+        return self._sorted_candidates
+
+    def get_ranked_candidates(self) -> list[tuple[int, float]]:
+        """境界候補を (時間(ms), スコア) のタプルでスコアの高い順に返します。"""
+        return self._ranked_candidates
+
+    def get_next_candidate(self, time_ms: int, min_gap_ms: int = 500) -> int | None:
+        """指定時間より後にある最初の候補の時間(ms)を返します。"""
+        index = bisect.bisect_right(self._sorted_candidates, time_ms + min_gap_ms)
+        if index < len(self._sorted_candidates):
+            return self._sorted_candidates[index]
+        return None
+
+    def get_previous_candidate(self, time_ms: int, min_gap_ms: int = 500) -> int | None:
+        """指定時間より前にある最後の候補の時間(ms)を返します。"""
+        index = bisect.bisect_left(self._sorted_candidates, time_ms - min_gap_ms)
+        if index > 0:
+            return self._sorted_candidates[index - 1]
+        return None
+
+    # --- 内部処理 ---
+
+    def _combine_segments(self, parts: list, duration_ms: int):
+        return tuple(np.concatenate([part[i] for part in parts]) for i in range(3))
+
+    def _on_results_changed(self):
+        all_times, all_scores = [], []
+        for index, (times, hist_diff, motion) in self._results.items():
+            candidate_times, scores = rank_boundary_candidates(times, hist_diff, motion)
+            all_times.append(candidate_times + self._offsets[index])
+            all_scores.append(scores)
+        if not all_times:
+            self._ranked_candidates = []
+            self._sorted_candidates = []
+            return
+
+        times = np.concatenate(all_times)
+        scores = np.concatenate(all_scores)
+        order = np.argsort(scores)[::-1][:self.MAX_CANDIDATES]
+        self._ranked_candidates = [(int(times[i]), float(scores[i])) for i in order]
+        self._sorted_candidates = sorted(time_ms for time_ms, _ in self._ranked_candidates)
+
+    def _load_cache(self, video_path: str, duration_ms: int):
+        try:
+            cache_path = get_video_cache_path(self.cache_dir, video_path, ".npz")
+            if not os.path.exists(cache_path):
+                return None
+            with np.load(cache_path) as data:
+                # 解析したときの長さを持たない (古い) キャッシュや、長さが変わったキャッシュは使わない
+                if "duration_ms" not in data or int(data["duration_ms"]) != duration_ms:
+                    return None
+                return data["times"], data["hist_diff"], data["motion"]
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Failed to load scene cache for {video_path}: {e}")
+            return None
+
+    def _save_cache(self, video_path: str, result, duration_ms: int):
+        times, hist_diff, motion = result
+        try:
+            cache_path = get_video_cache_path(self.cache_dir, video_path, ".npz")
+            np.savez_compressed(cache_path, times=times, hist_diff=hist_diff, motion=motion,
+                                duration_ms=np.int64(duration_ms))
+        except OSError as e:
+            print(f"Failed to save scene cache for {video_path}: {e}")
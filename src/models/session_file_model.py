@@ -0,0 +1,220 @@
+import json
+import mmap
+import os
+import struct
+import numpy as np
+import pandas as pd
+from ..utils.result_format import TOTAL_ROW_NAME
+
+SESSION_SUFFIX = ".svses"
+SESSION_MAGIC = b"SVATSES\0"
+# ファイルの形式を変えたときに上げる (新しい形式のファイルは古いバージョンでは開かない)
+SESSION_VERSION = 1
+# 先頭の固定長の部分: マジック, バージョン, ヘッダ(JSON)のバイト数
+_PREAMBLE = struct.Struct("<8sII")
+# 列のデータは、この境界に揃えて置く (np.frombuffer でそのまま読めるようにする)
+_ALIGN = 8
+# 結果のCSVのうち、記録として読み込む列 (移行時間などは保存のときに計算し直す)
+# (AnalysisDataModel の記録と同じ順)
+RECORD_COLUMNS = ("手順名", "開始時間(秒)", "終了時間(秒)", "所要時間(秒)", "メモ", "開始画像", "終了画像")
+RECORD_NUMBER_COLUMNS = ("開始時間(秒)", "終了時間(秒)", "所要時間(秒)")
+
+def write_session(path: str, session: dict):
+    """
+    途中のセッションを、列ごとのバイナリ形式で保存します。
+
+    ファイルは、固定長の部分・ヘッダ(JSON)・列のデータの順に並びます。ヘッダには動画 (パス, 指紋, 長さ)、
+    再生位置、プリセット、記録中の手順と、各列のデータの位置を持ちます。記録は列ごとに、数値は float64、
+    文字列は重複を除いた文字列表の番号 (int32) の配列として保存するため、同じ手順名を何度記録しても
+    大きくならず、読み込みでは配列をコピーせずに取り出せます。
+    一時ファイルに書いてから置き換えるため、途中で止まっても壊れたファイルは残りません。
+
+    Args:
+        path: 保存先のパス。
+        session: {"videos": [{"path", "fingerprint", "duration_ms"}], "playhead_ms": 再生位置,
+                  "preset": プリセット名, "stamps": プリセットの手順名のリスト,
+                  "open_procedures": [[手順名, 開始時間(秒), 開始時のスナップショット]], "records": 記録のリスト,
+                  "saved_at": 保存日時} の辞書。記録は AnalysisDataModel の記録 (列名 -> 値) で、追加した順に保存します。
+    """
+    records = session.get("records", [])
+    column_names = list(dict.fromkeys(name for record in records for name in record))
+    strings, string_ids = [], {}
+    chunks, offset = [], 0
+
+    def add_chunk(data: bytes) -> int:
+        nonlocal offset
+        start = offset
+        padding = -len(data) % _ALIGN
+        chunks.append(data + b"\0" * padding)
+        offset += len(data) + padding
+        return start
+
+    def intern(value) -> int:
+        if value is None:
+            return -1
+        index = string_ids.get(value)
+        if index is None:
+            index = string_ids[value] = len(strings)
+            strings.append(value)
+        return index
+
+    columns = []
+    for name in column_names:
+        values = [record.get(name) for record in records]
+        missing = sum(value is None for value in values)
+        if all(value is None or isinstance(value, str) for value in values):
+            data = np.fromiter((intern(value) for value in values), dtype="<i4", count=len(values))
+            column_type = "text"
+        else:
+            data = np.array([np.nan if value is None else value for value in values], dtype="<f8")
+            column_type = "number"
+        columns.append({"name": name, "type": column_type, "offset": add_chunk(data.tobytes()),
+                        "missing": missing})
+
+    encoded = [text.encode("utf-8") for text in strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+    np.cumsum([len(data) for data in encoded], out=string_offsets[1:])
+    header = {
+        "saved_at": session.get("saved_at"),
+        "videos": session.get("videos", []),
+        "playhead_ms": int(session.get("playhead_ms", 0)),
+        "preset": session.get("preset"),
+        "stamps": session.get("stamps", []),
+        "open_procedures": session.get("open_procedures", []),
+        "record_count": len(records),
+        "columns": columns,
+        "strings": {"count": len(encoded), "offsets": add_chunk(string_offsets.tobytes()),
+                    "data": add_chunk(b"".join(encoded))},
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (-(_PREAMBLE.size + len(header_bytes)) % _ALIGN)
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(SESSION_MAGIC, SESSION_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.writelines(chunks)
+    os.replace(temp_path, path)
+
+def read_session(path: str) -> dict:
+    """
+    write_session() で保存したセッションを、ファイルをメモリマップして読み込みます。
+
+    列のデータは配列としてそのまま取り出し、文字列は文字列表の分だけデコードするため、
+    記録の数によらず読み込みの大部分は配列の変換だけで終わります。
+
+    Returns:
+        write_session() に渡したものと同じ形式の辞書。
+    Raises:
+        ValueError: セッションのファイルではない、または壊れている場合。
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < _PREAMBLE.size:
+            raise ValueError(f"{path} is not a session file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            # 配列が buffer を参照したままだと閉じられないため、変換は関数の中で済ませる
+            return _parse_session(buffer, path)
+
+def _parse_session(buffer: mmap.mmap, path: str) -> dict:
+    magic, version, header_size = _PREAMBLE.unpack_from(buffer, 0)
+    if magic != SESSION_MAGIC:
+        raise ValueError(f"{path} is not a session file")
+    if version > SESSION_VERSION:
+        raise ValueError(f"{path} was saved by a newer version (format {version})")
+    try:
+        header = json.loads(buffer[_PREAMBLE.size:_PREAMBLE.size + header_size].decode("utf-8"))
+        base = _PREAMBLE.size + header_size
+        count = header["record_count"]
+        strings = header["strings"]
+        string_offsets = np.frombuffer(buffer, dtype="<i8", count=strings["count"] + 1,
+                                       offset=base + strings["offsets"]).tolist()
+        data_start = base + strings["data"]
+        # 番号 -1 (値がない) が最後の None を指すように、文字列表の末尾に None を置く
+        texts = np.array([buffer[data_start + start:data_start + end].decode("utf-8")
+                          for start, end in zip(string_offsets[:-1], string_offsets[1:])] + [None], dtype=object)
+        names, values, sparse = [], [], []
+        for column in header["columns"]:
+            if column["type"] == "text":
+                ids = np.frombuffer(buffer, dtype="<i4", count=count, offset=base + column["offset"])
+                values.append(texts[ids].tolist())
+            else:
+                values.append(np.frombuffer(buffer, dtype="<f8", count=count,
+                                            offset=base + column["offset"]).tolist())
+            names.append(column["name"])
+            if column["missing"]:
+                sparse.append(column["name"])
+    except (KeyError, TypeError, IndexError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"{path} is damaged: {e}") from e
+
+    records = [dict(zip(names, row)) for row in zip(*values)]
+    for name in sparse:
+        # 値がない列は、記録の辞書にも含めない (数値の列の値がないところは NaN で保存している)
+        for record in records:
+            value = record[name]
+            if value is None or value != value:
+                del record[name]
+    return {
+        "saved_at": header.get("saved_at"),
+        "videos": header.get("videos", []),
+        "playhead_ms": header.get("playhead_ms", 0),
+        "preset": header.get("preset"),
+        "stamps": header.get("stamps", []),
+        "open_procedures": header.get("open_procedures", []),
+        "records": records,
+    }
+
+def read_result_csv(csv_path: str) -> dict:
+    """
+    保存された結果のCSVと同じ名前のJSON (セッションの情報) から、read_session() と同じ形式のセッションを作ります。
+    結果と一緒に保存したセッションのファイルがない場合 (古い結果や、手で直したCSV) に使います。
+
+    記録の値はCSVに書かれた値 (小数点以下2桁) のまま読み込みます。数値は書かれた値に正確に戻るように読み、
+    文字列の列は空欄や "nan" もそのまま読みます。移行時間と合計は保存のときに計算し直します。
+    再生位置は最後の記録の終了時間にします。
+    """
+    df = pd.read_csv(csv_path, encoding="utf-8-sig", float_precision="round_trip", keep_default_na=False,
+                     na_values={column: [""] for column in RECORD_NUMBER_COLUMNS},
+                     dtype={column: str for column in RECORD_COLUMNS if column not in RECORD_NUMBER_COLUMNS})
+    df = df[(df["手順名"] != TOTAL_ROW_NAME) | df["開始時間(秒)"].notna()]
+    columns = [column for column in RECORD_COLUMNS if column in df.columns]
+    records = df[columns].to_dict("records")
+    for record in records:
+        record.setdefault("メモ", "")
+        # スナップショットは、開始・終了のどちらかがある記録だけが列を持つ (AnalysisDataModel と同じ)
+        if not record.get("開始画像") and not record.get("終了画像"):
+            record.pop("開始画像", None)
+            record.pop("終了画像", None)
+
+    session_info = {}
+    json_path = os.path.splitext(csv_path)[0] + ".json"
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            session_info = json.load(f)
+    playhead_ms = int(max((record["終了時間(秒)"] for record in records), default=0.0) * 1000)
+    return {
+        "saved_at": session_info.get("saved_at"),
+        "videos": session_info.get("videos", []),
+        "playhead_ms": playhead_ms,
+        "preset": session_info.get("preset"),
+        "stamps": [],
+        "open_procedures": [],
+        "records": records,
+    }
+
+def open_session(path: str) -> dict:
+    """
+    セッションのファイル、または保存された結果のCSVを読み込みます。
+    CSVと一緒に保存したセッションのファイルがあり、CSVがその後に書き換えられていなければ、
+    丸めていない記録を持つそちらを読み込みます。
+    """
+    if not path.lower().endswith(".csv"):
+        return read_session(path)
+    session_path = os.path.splitext(path)[0] + SESSION_SUFFIX
+    try:
+        if os.path.getmtime(session_path) >= os.path.getmtime(path):
+            return read_session(session_path)
+    except FileNotFoundError:
+        pass
+    except ValueError as e:
+        print(f"Ignored {session_path}: {e}")
+    return read_result_csv(path)
@@ -11,6 +11,27 @@ class SettingsModel:
         "window_geometry": "1300x850+50+50",
         "memo_enabled": False,
         "graph_enabled": False,
+        "profiling_enabled": False,
+        "input_trace_enabled": False,
+        "video_output": "auto",
+        "player_process": False,
+        "scene_detection_enabled": True,
+        "motion_analysis_enabled": True,
+        "proxy_enabled": False,
+        "proxy_cache_mb": 20000,
+        "fast_seek_enabled": True,
+        "frame_history_mb": 256,
+        "frame_history_downscale": 2,
+        "waveform_enabled": True,
+        "stamp_prediction_enabled": True,
+        "clip_export_workers": 0,
+        "snapshot_enabled": False,
+        "snapshot_width": 320,
+        "snapshot_pending_mb": 64,
+        "html_report_enabled": True,
+        "session_autosave_enabled": True,
+        "worklist_prefetch_count": 2,
+        "worklist_sample_points": 3,
     }
 
     def __init__(self):
@@ -40,6 +61,14 @@ class SettingsModel:
         
         return os.path.join(app_data_dir, 'app_settings.json')
 
+    def get_cache_dir(self, name: str) -> str:
+        """
+        設定ファイルと同じディレクトリ配下に、指定された名前のキャッシュディレクトリを作成して返します。
+        """
+        cache_dir = os.path.join(os.path.dirname(self.settings_file_path), 'Cache', name)
+        os.makedirs(cache_dir, exist_ok=True)
+        return cache_dir
+
     def load(self) -> dict:
         """
         設定ファイルから設定を読み込みます。
@@ -0,0 +1,151 @@
+import json
+import os
+import pandas as pd
+from ..utils.result_format import REPORT_PREFIX, TOTAL_ROW_NAME
+
+# 遷移表のファイルの形式を変えたときに上げる (古い形式のファイルは作り直す)
+TABLE_VERSION = 1
+# セッションの最初の手順を数えるときの、直前の手順の代わりのキー
+SESSION_START = ""
+
+def read_procedure_sequence(csv_path: str) -> list[str]:
+    """保存された結果のCSVから、手順名を開始時間の順に並べたリストを返します。合計行は除きます。"""
+    df = pd.read_csv(csv_path, encoding="utf-8-sig", usecols=["手順名", "開始時間(秒)"])
+    df = df[(df["手順名"] != TOTAL_ROW_NAME) & df["開始時間(秒)"].notna()]
+    return [str(name) for name in df.sort_values("開始時間(秒)", kind="stable")["手順名"]]
+
+def scan_result_sequences(results_dir: str, known_sources: set[str]) -> list[tuple[str, list[str]]]:
+    """
+    結果のフォルダから、まだ学習していないCSVを読み込みます。(ワーカースレッドで実行されます)
+
+    Returns:
+        (CSVのファイル名, 手順名のリスト) のリスト (古い順)。
+    """
+    if not os.path.isdir(results_dir):
+        return []
+    entries = [entry for entry in os.scandir(results_dir)
+               if entry.is_file() and entry.name.lower().endswith(".csv")
+               and not entry.name.startswith(REPORT_PREFIX) and entry.name not in known_sources]
+    sequences = []
+    for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+        try:
+            sequences.append((entry.name, read_procedure_sequence(entry.path)))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Skipped {entry.path} while learning stamp transitions: {e}")
+    return sequences
+
+
+class StampPredictorModel:
+    """
+    過去のセッションの結果から、ある手順の次に記録される手順の回数 (遷移表) を学習し、
+    次の手順の候補を可能性の高い順に返すクラス。
+
+    遷移表は直前の手順ごとに、次の手順の回数と、回数の多い順に並べた手順名を持ちます。
+    予測は辞書を1回引くだけなので、End のたびに呼んでもUIを待たせません。
+    並べ替えは学習したときに、回数が変わった行だけで行います。
+    """
+
+    def __init__(self, table_path: str):
+        """
+        Args:
+            table_path: 遷移表を保存するJSONファイルのパス。
+        """
+        self.table_path = table_path
+        # 直前の手順 -> {次の手順: 回数}
+        self._counts = {}
+        # 直前の手順 -> 次の手順の名前 (回数の多い順)
+        self._ranked = {}
+        # 学習済みの結果のCSVのファイル名 (同じセッションを二重に数えない)
+        self._sources = set()
+        self._dirty = False
+        self.load()
+
+    # --- 予測 ---
+
+    def predict(self, previous: str | None, candidates=None, limit: int = 9) -> list[str]:
+        """
+        直前の手順 (None の場合はセッションの最初) の次に記録されそうな手順を、可能性の高い順に返します。
+
+        Args:
+            previous: 直前に終了した手順名。
+            candidates: 候補に含める手順名の集合 (現在のプリセットの手順)。None の場合は制限しない。
+            limit: 返す候補の最大数。
+        """
+        ranked = self._ranked.get(SESSION_START if previous is None else previous, ())
+        result = []
+        for name in ranked:
+            if candidates is None or name in candidates:
+                result.append(name)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def get_sources(self) -> set[str]:
+        """学習済みの結果のCSVのファイル名の集合を返します。"""
+        return set(self._sources)
+
+    # --- 学習 ---
+
+    def add_session(self, source: str, sequence: list[str]) -> bool:
+        """
+        1セッションの手順名の並び (開始時間の順) を学習します。
+        学習済みのセッションの場合は何もせず False を返します。
+        """
+        if source in self._sources:
+            return False
+        self._sources.add(source)
+        changed = set()
+        for previous, name in zip([SESSION_START] + sequence, sequence):
+            row = self._counts.setdefault(previous, {})
+            row[name] = row.get(name, 0) + 1
+            changed.add(previous)
+        for previous in changed:
+            self._rank(previous)
+        self._dirty = True
+        return True
+
+    def add_sessions(self, sessions: list[tuple[str, list[str]]]) -> int:
+        """複数のセッションを学習し、新たに学習したセッションの数を返します。"""
+        return sum(self.add_session(source, sequence) for source, sequence in sessions)
+
+    # --- 保存と読み込み ---
+
+    def load(self):
+        """遷移表をファイルから読み込みます。ファイルがない、または形式が違う場合は空の表から始めます。"""
+        self._counts, self._ranked, self._sources = {}, {}, set()
+        try:
+            if not os.path.exists(self.table_path):
+                return
+            with open(self.table_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != TABLE_VERSION:
+                return
+            self._counts = {previous: {name: int(count) for name, count in row.items()}
+                            for previous, row in data.get("transitions", {}).items()}
+            self._sources = set(data.get("sources", []))
+            for previous in self._counts:
+                self._rank(previous)
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Failed to load stamp transitions: {e}")
+            self._counts, self._ranked, self._sources = {}, {}, set()
+
+    def save(self):
+        """学習した内容があれば、遷移表をファイルに保存します。"""
+        if not self._dirty:
+            return
+        data = {"version": TABLE_VERSION, "transitions": self._counts, "sources": sorted(self._sources)}
+        temp_path = self.table_path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temp_path, self.table_path)
+            self._dirty = False
+        except OSError as e:
+            print(f"Failed to save stamp transitions: {e}")
+
+    # --- 内部処理 ---
+
+    def _rank(self, previous: str):
+        """1行の次の手順を、回数の多い順 (同じ回数なら名前順) に並べ直します。"""
+        row = self._counts[previous]
+        self._ranked[previous] = tuple(sorted(row, key=lambda name: (-row[name], name)))
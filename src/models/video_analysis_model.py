@@ -0,0 +1,197 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# すべての解析モデルで共有するプロセスプール (CPUコア数以上のプロセスを起動しないため)
+_executor = None
+# プールの終了を実行中のジョブに伝えるイベント (親プロセスではプールと一緒に作り、ワーカーには初期化で渡す)
+_stop_event = None
+
+class AnalysisStopped(Exception):
+    """共有プロセスプールの終了が要求されたため、ワーカーでのジョブを途中でやめたことを示す例外。"""
+
+
+def get_analysis_executor() -> ProcessPoolExecutor:
+    """解析用の共有プロセスプールを返します。初回呼び出し時に作成します。"""
+    global _executor, _stop_event
+    if _executor is None:
+        # 親プロセスのlibVLCの状態を引き継がないよう、spawnで起動する
+        context = multiprocessing.get_context("spawn")
+        _stop_event = context.Event()
+        _executor = ProcessPoolExecutor(
+            max_workers=max(1, (os.cpu_count() or 2) - 1), mp_context=context,
+            initializer=_init_analysis_worker, initargs=(_stop_event,)
+        )
+    return _executor
+
+def shutdown_analysis_executor():
+    """
+    解析用の共有プロセスプールを終了します。
+    実行中のジョブにも終了を伝えるため、デコードや変換の途中でもワーカーはすぐに終わります
+    (Pythonの終了時にはプールの終了を待つため、伝えないとアプリのプロセスが残り続けます)。
+    """
+    global _executor, _stop_event
+    if _executor is not None:
+        _stop_event.set()
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _stop_event = None
+
+def _init_analysis_worker(stop_event):
+    global _stop_event
+    _stop_event = stop_event
+
+def is_analysis_stopping() -> bool:
+    """ワーカープロセスで、共有プロセスプールの終了が要求されていれば True を返します。"""
+    return _stop_event is not None and _stop_event.is_set()
+
+def wait_for_job(finished: threading.Event, timeout_s: float) -> bool:
+    """
+    ワーカープロセスで finished を最大 timeout_s 秒待ちます。タイムアウトした場合は False を返します。
+    待っている間に共有プロセスプールの終了が要求されたら、AnalysisStopped を送出します。
+    """
+    deadline = time.monotonic() + timeout_s
+    while not finished.wait(min(1.0, max(0.0, deadline - time.monotonic()))):
+        if is_analysis_stopping():
+            raise AnalysisStopped()
+        if time.monotonic() >= deadline:
+            return False
+    return True
+
+class VideoAnalysisModel:
+    """
+    プレイリストの動画をオフラインで解析するモデルの基底クラス。
+    各動画を一定長の区間に分割してプロセスプールで並列に解析し、
+    ファイル単位でまとめた結果をキャッシュします。
+
+    サブクラスは SEGMENT_FUNCTION と、結果の結合・キャッシュ入出力のメソッドを実装します。
+    """
+    # 区間を解析するモジュールレベルの関数 (path, start_ms, stop_ms) -> 区間の結果
+    SEGMENT_FUNCTION = None
+    # 1ジョブあたりの区間長 (長い動画も複数のプロセスで分担できるように分割する)
+    SEGMENT_MS = 10 * 60 * 1000
+    # ログ出力用の名前
+    ANALYSIS_NAME = "Video analysis"
+
+    def __init__(self, cache_dir: str):
+        """
+        Args:
+            cache_dir: 解析結果のキャッシュを保存するディレクトリ。
+        """
+        self.cache_dir = cache_dir
+
+        self._video_files = []
+        self._offsets = []
+        # ファイルのインデックス -> {区間の開始時間(ms): Future}
+        self._pending = {}
+        # ファイルのインデックス -> ファイル単位の解析結果
+        self._results = {}
+        # 長さを読めなかったため解析しないファイルのインデックス
+        self._skipped = set()
+
+    def start_analysis(self, video_files: list[str], media_durations: list[int]):
+        """
+        プレイリストの解析を開始します。キャッシュがあるファイルはデコードしません。
+
+        Args:
+            video_files: 動画ファイルのパスのリスト。
+            media_durations: 各動画の長さ(ms)のリスト。
+        """
+        self.cancel()
+        self._video_files = list(video_files)
+        self._offsets = [0]
+        for duration in media_durations:
+            self._offsets.append(self._offsets[-1] + duration)
+
+        for index, (path, duration) in enumerate(zip(video_files, media_durations)):
+            if duration <= 0:
+                # 長さ 0 で解析した空の結果をキャッシュすると、後で読めるようになっても使われ続けるため解析しない
+                print(f"{self.ANALYSIS_NAME} skipped for {path}: the duration could not be read.")
+                self._skipped.add(index)
+                continue
+            cached = self._load_cache(path, duration)
+            if cached is not None:
+                self._results[index] = cached
+                continue
+            executor = get_analysis_executor()
+            futures = {}
+            for start_ms in range(0, max(duration, 1), self.SEGMENT_MS):
+                stop_ms = min(start_ms + self.SEGMENT_MS, duration)
+                futures[start_ms] = executor.submit(self.SEGMENT_FUNCTION, path, start_ms, stop_ms)
+            self._pending[index] = (duration, futures)
+
+        self._on_results_changed()
+        print(f"{self.ANALYSIS_NAME} started: {len(self._pending)} file(s) to analyze, "
+              f"{len(self._results)} loaded from cache.")
+
+    def poll(self) -> bool:
+        """
+        完了したジョブの結果を取り込みます。結果が更新された場合は True を返します。
+        """
+        updated = False
+        for index in list(self._pending):
+            duration, futures = self._pending[index]
+            if not all(future.done() for future in futures.values()):
+                continue
+            del self._pending[index]
+            path = self._video_files[index]
+            try:
+                parts = [futures[start].result() for start in sorted(futures)]
+            except Exception as e:
+                print(f"{self.ANALYSIS_NAME} failed for {path}: {e}")
+                continue
+            result = self._combine_segments(parts, duration)
+            self._results[index] = result
+            self._save_cache(path, result, duration)
+            updated = True
+
+        if updated:
+            self._on_results_changed()
+            if not self._pending:
+                print(f"{self.ANALYSIS_NAME} finished.")
+        return updated
+
+    def is_running(self) -> bool:
+        """解析中のファイルが残っているかどうかを返します。"""
+        return bool(self._pending)
+
+    def is_complete(self) -> bool:
+        """プレイリストのすべてのファイル (長さを読めず解析しないものを除く) の結果が揃っているかどうかを返します。"""
+        return bool(self._video_files) and len(self._results) + len(self._skipped) == len(self._video_files)
+
+    def cancel(self):
+        """実行中の解析を取り消し、結果をリセットします。"""
+        for _, futures in self._pending.values():
+            for future in futures.values():
+                future.cancel()
+        self._pending = {}
+        self._results = {}
+        self._skipped = set()
+        self._on_results_changed()
+
+    def shutdown(self):
+        """解析を取り消し、共有プロセスプールを終了します。"""
+        self.cancel()
+        shutdown_analysis_executor()
+
+    # --- サブクラスで実装するメソッド ---
+
+    def _combine_segments(self, parts: list, duration_ms: int):
+        """区間ごとの結果 (開始時間順) を、ファイル単位の結果にまとめます。"""
+        raise NotImplementedError
+
+    def _load_cache(self, video_path: str, duration_ms: int):
+        """
+        キャッシュされた結果を返します。キャッシュがない場合や、別の長さで解析した結果の場合は None を返します。
+        """
+        raise NotImplementedError
+
+    def _save_cache(self, video_path: str, result, duration_ms: int):
+        """ファイル単位の結果を、解析したときの長さ(ms)がわかるようにキャッシュに保存します。"""
+        raise NotImplementedError
+
+    def _on_results_changed(self):
+        """結果が追加・リセットされたときに呼ばれます。"""
+        pass
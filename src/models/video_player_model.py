@@ -1,83 +1,123 @@
-import vlc
-import time
-import os
+import bisect
+import numpy as np
+from ..utils.frame_history import FrameHistory
+from ..utils.profiler import profiler
+from .player_backend import PlayerBackend
 
 class VideoPlayerModel:
     """
-    VLCプレイヤーを管理し、動画再生のロジックを担当するクラス。
-    複数動画の連続再生に対応。
+    動画再生のロジックを担当するクラス。
+    複数動画の連続再生に対応し、プレイリスト全体での時間と各動画内の時間を相互に変換します。
+    実際の再生は PlayerBackend (既定では libVLC) に委譲します。
     """
-    
-    def __init__(self):
+
+    def __init__(self, backend: PlayerBackend | None = None):
         """
         VideoPlayerModelの初期化。
-        VLCインスタンスとMediaListPlayerを作成します。
-        """
-        self.vlc_instance = vlc.Instance()
-        
-        # MediaListPlayerを作成
-        self.list_player = self.vlc_instance.media_list_player_new()
-        
-        # MediaListPlayerから内部のMediaPlayerインスタンスを取得
-        self.player = self.list_player.get_media_player()
-        
+
+        Args:
+            backend: 再生に使うプレイヤーの実装。None の場合は libVLC を使用する。
+        """
+        if backend is None:
+            # libVLCがない環境でも他のバックエンドを使えるように、ここで読み込む
+            from .vlc_player_backend import VlcPlayerBackend
+            backend = VlcPlayerBackend()
+        self.backend = backend
+
         self.media_loaded = False
         self.video_files = []
+        # プレイヤーが動画の長さを取得している間は True (poll_durations() で読み込みを終える)
+        self._loading_durations = False
 
         # 各動画の長さ(ms)と、その動画までの合計時間(ms)をキャッシュする
         self._media_durations = []
         self._cumulative_durations = []
         self._total_duration = 0
 
-    def set_video_files(self, file_paths: list[str]):
+        # スクラブ用のプロキシ (インデックス -> パス、未作成は None) と、現在プロキシを再生しているか
+        self._proxy_paths = []
+        self._using_proxies = False
+        self._scrubbing = False
+        # 各動画内のキーフレームの時間(ms)の配列 (不明な動画は None)
+        self._keyframes = []
+        # コマ戻し用の直近のフレームと、その中の過去のフレームを表示している間の位置(ms)
+        self.frame_history = None
+        self._history_position = None
+
+    def set_video_files(self, file_paths: list[str], media_durations: list[int] | None = None):
         """
         再生する動画ファイルのリストを設定します。
-        
+
+        プレイヤーが長さの取得を待たずに戻った場合は、is_loading() が True になり、
+        poll_durations() が長さを受け取るまで media_loaded は False のままになります。
+
         Args:
             file_paths: 動画ファイルのパスのリスト。
+            media_durations: 事前に調べた各動画の長さ(ms)。None の場合はプレイヤーで取得する。
         """
+        self.media_loaded = False
+        self._loading_durations = False
         if not file_paths:
-            self.media_loaded = False
             return
-        
+
         self.video_files = file_paths
-        
+        self._proxy_paths = []
+        self._using_proxies = False
+        self._keyframes = []
+        self._history_position = None
+        if self.frame_history is not None:
+            self.frame_history.clear()
+
         # キャッシュをリセット
         self._media_durations = []
         self._cumulative_durations = [0]
         self._total_duration = 0
 
-        media_list = self.vlc_instance.media_list_new()
-        
-        for path in file_paths:
-            media = self.vlc_instance.media_new(path)
-            media_list.add_media(media)
-            
-            # 各動画の長さを取得してキャッシュする
-            # この処理は時間がかかる可能性があるため、本来は非同期処理が望ましい
-            media.parse()
-            time.sleep(0.05) # パースを待つ
-            duration = media.get_duration()
-            if duration > 0:
-                self._media_durations.append(duration)
-                self._total_duration += duration
-                self._cumulative_durations.append(self._total_duration)
-
-        self.list_player.set_media_list(media_list)
+        durations = self.backend.load_playlist(file_paths, media_durations)
+        if durations is None:
+            self._loading_durations = True
+            print("Reading the video durations...")
+            return
+        self._apply_durations(durations)
+
+    def is_loading(self) -> bool:
+        """プレイヤーが動画の長さを取得している間は True を返します。"""
+        return self._loading_durations
+
+    def poll_durations(self) -> bool:
+        """
+        長さの取得中であれば、プレイヤーが取得を終えたかを確認し、終えていれば読み込みを完了します。
+        待たずに戻ります。読み込みが完了した (または取得中ではない) 場合は True を返します。
+        """
+        if not self._loading_durations:
+            return True
+        durations = self.backend.poll_playlist_durations()
+        if durations is None:
+            return False
+        self._loading_durations = False
+        self._apply_durations(durations)
+        return True
+
+    def _apply_durations(self, durations: list[int]):
+        for duration in durations:
+            self._media_durations.append(duration)
+            self._total_duration += duration
+            self._cumulative_durations.append(self._total_duration)
+
         self.media_loaded = True
-        
+
         print(f"Media list loaded. Total duration: {self._total_duration / 1000.0:.2f}s")
 
     def get_current_video_path(self) -> str | None:
         """現在再生中の動画ファイルのパスを返します。"""
         if not self.media_loaded:
             return None
-        
-        media = self.player.get_media()
-        if not media:
+
+        index = self.backend.get_current_index()
+        if not 0 <= index < len(self.video_files):
             return None
-        
-        return media.get_mrl()
+
+        return self.video_files[index]
 
     def set_display_handle(self, handle: int):
         """
@@ -87,118 +127,278 @@ class VideoPlayerModel:
         if not handle or not self.media_loaded:
             return
 
-        self.player.set_hwnd(handle)
+        self.backend.set_display_handle(handle)
+        self.backend.show_first_frame()
 
-        # ★★★【今回の修正の核心】★★★
-        # 最初のフレームを描画させ、かつ確実に一時停止状態にする
-        self.list_player.play()
-        
-        # play()の反映を少し待つ
-        time.sleep(0.1) 
-        
-        # 再生中であれば、pause()を呼び出す
-        if self.list_player.is_playing():
-            self.list_player.pause()
+    def get_frame_buffer(self):
+        """
+        プレイヤーがソフトウェア出力の場合、デコードしたフレームを受け取る FrameBuffer を返します。
+        ウィンドウへ直接描画する場合は None を返します。
+        """
+        return self.backend.get_frame_buffer()
+
+    def get_displayed_frame(self):
+        """
+        ソフトウェア出力の場合、いま表示しているフレーム (コマ戻し中はリングバッファのフレーム) を返します。
+        ウィンドウへ直接描画する場合は None を返します。
+        """
+        if self._history_position is not None:
+            entry = self.frame_history.find_before(self._history_position + 1)
+            if entry is not None:
+                return entry[1]
+        frame_buffer = self.get_frame_buffer()
+        return frame_buffer.get_current_frame() if frame_buffer is not None else None
+
+    def take_snapshot(self, path: str, width: int) -> bool:
+        """
+        プレイヤーに表示中のフレームを、幅 width(px) のJPEGとして保存させます。
+        ブロックすることがあるため、Tkのスレッドから呼ばないこと。
+        """
+        if not self.media_loaded: return False
+        return self.backend.take_snapshot(path, width)
 
     def play_pause(self):
         """動画の再生と一時停止を切り替えます。"""
         if not self.media_loaded: return
-        
-        # MediaListPlayerのplay/pauseメソッドを呼び出す
-        self.list_player.pause()
 
-    def set_time(self, time_ms: int):
+        if not self.backend.is_playing():
+            # コマ戻しで表示していた位置から、元の動画で再生する
+            self._leave_frame_history(seek=True)
+            self._use_proxies(False)
+        self.backend.toggle_pause()
+
+    # --- コマ送り・コマ戻し ---
+
+    def enable_frame_history(self, max_bytes: int, downscale: int = 2):
+        """
+        コマ戻し用に、直近に表示したフレームを保持するリングバッファを作成します。
+        フレームを受け取れるのはソフトウェア出力の場合だけなので、それ以外では何もしません。
+
+        Args:
+            max_bytes: リングバッファのメモリの上限(バイト)。
+            downscale: フレームを保持するときの縦横の間引き率。
+        """
+        frame_buffer = self.get_frame_buffer()
+        if frame_buffer is None or max_bytes <= 0:
+            self.frame_history = None
+            self.backend.set_frame_listener(None)
+            return
+        self.frame_history = FrameHistory(frame_buffer.width, frame_buffer.height, max_bytes, downscale)
+        # UIの描画の間隔に関係なく、表示されたすべてのフレームを記録する
+        self.backend.set_frame_listener(self._record_frame)
+        print(f"Frame history: {self.frame_history.capacity} frames "
+              f"({self.frame_history.nbytes / (1024 * 1024):.0f} MB).")
+
+    def _record_frame(self, index: int, time_in_item_ms: int, frame):
+        """
+        表示されたフレームを、そのフレームの表示時間と一緒にコマ戻し用のリングバッファへ記録します。
+        プレイヤーのデコーダのスレッドから呼ばれます。プロキシのフレームは画質が低いため記録しません。
+        """
+        history = self.frame_history
+        cumulative_durations = self._cumulative_durations
+        if (history is None or self._using_proxies or self._history_position is not None
+                or not 0 <= index < len(cumulative_durations) - 1):
+            return
+        history.push(cumulative_durations[index] + time_in_item_ms, frame)
+
+    def is_showing_history_frame(self) -> bool:
+        """コマ戻しで、リングバッファ内の過去のフレームを表示しているかどうかを返します。"""
+        return self._history_position is not None
+
+    def step_frame(self, direction: int):
+        """
+        1フレーム進める (direction=1) または戻します (direction=-1)。再生中の場合は一時停止します。
+
+        リングバッファにあるフレームへの移動はデコードせずに行い、そのフレームを返します (呼び出し側が表示する)。
+        リングバッファの範囲外へ戻る場合は1フレーム前へシークし、None を返します (プレイヤーが描画する)。
+        """
+        if not self.media_loaded: return None
+
+        if self.backend.is_playing():
+            self.backend.toggle_pause()
+        history = self.frame_history
+        current_ms = self.get_time()
+        if self._history_position is None and history is not None:
+            # プレイヤーの時間は粗いため、表示中のフレーム (最後に記録したフレーム) の時間を現在位置とする
+            latest = history.latest()
+            if latest is not None and abs(latest[0] - current_ms) <= FrameHistory.MAX_GAP_MS:
+                current_ms = latest[0]
+
+        if direction < 0:
+            entry = history.find_before(current_ms) if history is not None else None
+            if entry is not None:
+                self._history_position = entry[0]
+                return entry[1]
+            self.set_time(max(0, current_ms - round(self.backend.get_frame_duration_ms())))
+            return None
+
+        if self._history_position is not None:
+            entry = history.find_after(current_ms)
+            if entry is not None:
+                # 最新のフレームまで進んだら、プレイヤーの現在のフレームに戻ったことになる
+                self._history_position = entry[0] if entry[0] < history.latest()[0] else None
+                return entry[1]
+            self._history_position = None
+        self.backend.step_frame()
+        return None
+
+    def _leave_frame_history(self, seek: bool = False):
+        """
+        リングバッファ内のフレームの表示をやめます。
+        seek が True の場合は、表示していたフレームの位置へプレイヤーをシークします。
+        """
+        position = self._history_position
+        self._history_position = None
+        if seek and position is not None:
+            self.set_time(position)
+
+    # --- スクラブ用プロキシ ---
+
+    def set_proxy_paths(self, proxy_paths: list[str | None]):
+        """
+        各動画のプロキシのパスを設定します (まだ作成されていない動画は None)。
+        プロキシは元の動画と同じ長さであることを前提に、時間の変換には元の動画の長さを使います。
+        新しく追加されたプロキシは、次にプロキシへ切り替えたときから使われます。
+        """
+        self._proxy_paths = list(proxy_paths)
+
+    def set_scrubbing(self, scrubbing: bool):
+        """
+        タイムラインのドラッグの開始・終了を通知します。
+        ドラッグ中はプロキシでシークし、終了時に再生中であれば元の動画へ戻します。
+        """
+        self._scrubbing = scrubbing
+        if not self.media_loaded: return
+        if scrubbing:
+            self._use_proxies(True)
+        elif self.backend.is_playing():
+            self._use_proxies(False)
+
+    def is_using_proxies(self) -> bool:
+        return self._using_proxies
+
+    def _use_proxies(self, enabled: bool, index: int | None = None, item_time: int | None = None) -> bool:
+        """
+        プレイヤーのソースをプロキシと元の動画の間で切り替え、切り替えた場合は True を返します。
+        切り替え後は index 番目の動画の item_time へ移動します (省略時は現在の位置)。再生状態は維持されます。
+        プロキシがまだない動画は、プロキシ側のリストでも元の動画を使います。
+        """
+        if enabled == self._using_proxies:
+            return False
+        if enabled and not any(self._proxy_paths):
+            return False
+        if index is None:
+            index = self.backend.get_current_index()
+            item_time = self.backend.get_item_time()
+        if not 0 <= index < len(self.video_files):
+            return False
+        if enabled:
+            sources = [proxy or original for proxy, original in zip(self._proxy_paths, self.video_files)]
+        else:
+            sources = self.video_files
+        self.backend.replace_sources(sources, index, item_time)
+        self._using_proxies = enabled
+        return True
+
+    def set_keyframe_times(self, keyframes: list):
+        """各動画内のキーフレームの時間(ms)の配列を設定します (不明な動画は None または空の配列)。"""
+        self._keyframes = list(keyframes)
+
+    def _snap_to_keyframe(self, index: int, time_in_media: int) -> int:
+        """動画内の時間を、その動画の最も近いキーフレームの時間に補正します。"""
+        if index >= len(self._keyframes):
+            return time_in_media
+        keyframes = self._keyframes[index]
+        if keyframes is None or len(keyframes) == 0:
+            return time_in_media
+        position = int(np.searchsorted(keyframes, time_in_media))
+        candidates = keyframes[max(position - 1, 0):position + 1]
+        return int(min(candidates, key=lambda keyframe: abs(keyframe - time_in_media)))
+
+    @profiler.timed("video.seek")
+    def set_time(self, time_ms: int, precise: bool = True):
         """
         プレイリスト全体の指定された総経過時間（ミリ秒）に再生位置を設定します。
+
+        Args:
+            time_ms: 移動先の総経過時間(ms)。
+            precise: False の場合は、移動先をその動画の最も近いキーフレームに補正します。
+                キーフレームからのデコードが不要になるため、GOPの長さによらず速くシークできます。
+                ドラッグ中のシークに使い、最終的な位置決めは True で行います。
         """
         if not self.media_loaded or time_ms < 0 or time_ms > self._total_duration:
             return
-            
-        # ★★★【修正の核心】★★★
-        # シーク操作の前に、現在の再生状態を記憶しておく
-        was_playing = self.list_player.is_playing()
+        self._leave_frame_history()
 
         # 1. どの動画を再生すべきか (target_index) を特定
-        target_index = -1
-        for i, cumulative_time in enumerate(self._cumulative_durations):
-            if time_ms < cumulative_time:
-                target_index = i - 1
-                break
-        
-        if target_index == -1: return
+        #    (time_ms が含まれる、開始位置が time_ms 以下の最後の動画)
+        target_index = bisect.bisect_right(self._cumulative_durations, time_ms) - 1
+        if target_index >= len(self._media_durations):
+            # ちょうど最後の動画の終端が指定された場合
+            target_index = len(self._media_durations) - 1
+        if target_index < 0: return
 
         # 2. その動画内での再生時間 (time_in_media) を計算
         time_offset = self._cumulative_durations[target_index]
         time_in_media = time_ms - time_offset
+        if not precise:
+            time_in_media = self._snap_to_keyframe(target_index, time_in_media)
 
-        # 3. MediaListPlayerで目的の動画に切り替え、シークを実行
-        self.list_player.play_item_at_index(target_index)
-        
-        time.sleep(0.1) 
-        
-        self.player.set_time(time_in_media)
-
-        # 4. 記憶しておいた再生状態に戻す
-        if was_playing:
-            # 再生中だった場合は、再生を再開
-            self.list_player.play()
-        else:
-            # 一時停止中だった場合は、一時停止を維持
-            self.list_player.pause()
+        # 3. 目的の動画に切り替えてシークを実行 (再生状態はバックエンドが維持する)
+        #    ドラッグ中と一時停止中のシークは、デコードの軽いプロキシで行う
+        #    (切り替えが発生した場合は、差し替えと同時に目的の位置へ移動している)
+        if (self._scrubbing or not self.backend.is_playing()) and self._use_proxies(True, target_index, time_in_media):
+            return
+        self.backend.seek(target_index, time_in_media)
 
     def set_rate(self, rate: float):
         """再生速度を設定します。"""
-        self.player.set_rate(rate)
+        self.backend.set_rate(rate)
 
+    def get_rate(self) -> float:
+        """現在の再生速度を返します。"""
+        return self.backend.get_rate()
+
+    @profiler.timed("video.get_time")
     def get_time(self) -> int:
         """
         プレイリスト全体の現在の総再生時間をミリ秒単位で取得します。
         """
         if not self.media_loaded:
             return 0
+        if self._history_position is not None:
+            return self._history_position
 
         # 現在再生中のメディアがリストの何番目かを取得
-        current_media = self.player.get_media()
-        if not current_media:
-            return 0
-        
-        try:
-            # Mediaオブジェクトから直接インデックスを取得するのは難しいため、
-            # MRL (パス) を比較してインデックスを特定する
-            current_path = current_media.get_mrl()
-            current_index = -1
-            for i, path in enumerate(self.video_files):
-                # vlc.Media.new()で生成されるMRLは 'file:///C:/...' のようになるため、それを考慮
-                if os.path.basename(path) in current_path: # ファイル名で比較
-                    current_index = i
-                    break
-            
-            if current_index == -1: return 0
-
-            # 前の動画までの合計時間 + 現在の動画での経過時間
-            time_offset = self._cumulative_durations[current_index]
-            current_media_time = self.player.get_time()
-            return time_offset + current_media_time
-        except Exception:
-            # まだメディア情報が取得できていない場合など
+        current_index = self.backend.get_current_index()
+        if not 0 <= current_index < len(self._media_durations):
             return 0
 
+        # 前の動画までの合計時間 + 現在の動画での経過時間
+        return self._cumulative_durations[current_index] + self.backend.get_item_time()
+
     def get_length(self) -> int:
         """
         プレイリスト全体の総再生時間をミリ秒単位で取得します。
         """
         return self._total_duration
-        
+
+    def get_media_durations(self) -> list[int]:
+        """
+        プレイリスト内の各動画の長さ(ms)のリストを返します。
+        """
+        return list(self._media_durations)
+
+    def get_cumulative_durations(self) -> list[int]:
+        """
+        各動画の開始位置となる、それまでの動画の合計時間(ms)のリストを返します。
+        """
+        return list(self._cumulative_durations)
+
     def is_playing(self) -> bool:
         """現在再生中かどうかを返します。"""
-        return self.list_player.is_playing()
+        return self.backend.is_playing()
 
     def release_player(self):
         """プレイヤーリソースを解放します。"""
-        if self.list_player:
-            if self.list_player.is_playing():
-                self.list_player.stop()
-            self.list_player.release()
-            self.list_player = None
-            self.player = None # 内部のplayer参照もクリア
-            print("VLC List Player released.")
\ No newline at end of file
+        self.backend.release()
@@ -0,0 +1,259 @@
+import sys
+import threading
+import time
+import vlc
+from .player_backend import PlayerBackend
+from ..utils.frame_buffer import FrameBuffer
+from ..utils.vlc_frames import VlcFrameBufferCallbacks
+
+class VlcPlayerBackend(PlayerBackend):
+    """
+    libVLC の MediaListPlayer を使ったプレイヤーの実装。
+
+    映像の出力方法は2通りあります。
+      - "native": VLCがウィンドウのハンドル (HWND / X11ウィンドウ / NSView) へ直接描画する。
+      - "software": VLCがデコードしたフレームを FrameBuffer に書き込み、UI側で描画する。
+        ハンドルを渡せない環境でも表示でき、他の機能から現在のフレームを参照できる。
+    """
+    VIDEO_OUTPUTS = ("auto", "native", "software")
+    # software 出力でVLCに縮小させるフレームサイズ(px)
+    SOFTWARE_OUTPUT_SIZE = (1280, 720)
+    # フレームの数から数えた時間がプレイヤーの時間からこれ以上ずれたら、フレームが飛んだとみなして数え直す(ms)
+    FRAME_TIME_TOLERANCE_MS = 500
+    # 動画を切り替えてから、再生が始まる (シークできるようになる) のを待つ最大の時間(秒)
+    PLAY_START_TIMEOUT_S = 1.0
+
+    def __init__(self, video_output: str = "auto"):
+        """
+        VLCインスタンスとMediaListPlayerを作成します。
+
+        Args:
+            video_output: "native"、"software"、または "auto"。
+                "auto" の場合は、ウィンドウのハンドルを渡せない macOS だけ "software" にする。
+        """
+        super().__init__()
+        # スナップショット (記録の開始・終了時のフレーム) はJPEGで保存する
+        self.vlc_instance = vlc.Instance("--snapshot-format=jpg")
+
+        # MediaListPlayerを作成
+        self.list_player = self.vlc_instance.media_list_player_new()
+
+        # MediaListPlayerから内部のMediaPlayerインスタンスを取得
+        self.player = self.list_player.get_media_player()
+
+        # MRL -> プレイリスト内のインデックス (再生中の動画を特定するため)
+        self._index_by_mrl = {}
+
+        if video_output not in self.VIDEO_OUTPUTS:
+            print(f"Unknown video output '{video_output}'. Falling back to 'auto'.")
+            video_output = "auto"
+        if video_output == "auto":
+            video_output = "software" if sys.platform == "darwin" else "native"
+        self.video_output = video_output
+        self.frame_buffer = None
+        self._frame_callbacks = None
+        # 表示したフレームを受け取る関数と、フレームごとの時間を数えるための基準
+        # (基準のフレームの (インデックス, 動画内の時間, 1フレームの長さ)、基準から表示したフレームの数、シーク先の時間)
+        self._frame_listener = None
+        self._frame_anchor = None
+        self._frames_since_anchor = 0
+        self._anchor_target_ms = None
+        if video_output == "software":
+            self.frame_buffer = FrameBuffer(*self.SOFTWARE_OUTPUT_SIZE)
+            self._frame_callbacks = VlcFrameBufferCallbacks(self.player, self.frame_buffer,
+                                                            on_display=self._on_frame_displayed)
+        print(f"VLC video output: {self.video_output}")
+
+        # 再生が始まったときにセットされる (切り替え直後のシークを、固定の時間ではなくこれで待つ)
+        self._playing = threading.Event()
+        events = self.player.event_manager()
+        events.event_attach(vlc.EventType.MediaPlayerPlaying, self._on_playing)
+        events.event_attach(vlc.EventType.MediaPlayerPaused, lambda e: self._notify_state(self.STATE_PAUSED))
+        events.event_attach(vlc.EventType.MediaPlayerStopped, lambda e: self._notify_state(self.STATE_STOPPED))
+        events.event_attach(vlc.EventType.MediaPlayerEndReached, lambda e: self._notify_state(self.STATE_ENDED))
+        events.event_attach(vlc.EventType.MediaPlayerMediaChanged, lambda e: self._notify_state(self.STATE_ITEM_CHANGED))
+
+    def load_playlist(self, file_paths: list[str], known_durations: list[int] | None = None) -> list[int]:
+        medias = self._set_media_list(file_paths)
+        if known_durations is not None and len(known_durations) == len(file_paths):
+            # ワークリストの準備などで調べ済みなので、パースを待たない
+            return list(known_durations)
+        durations = []
+        for media in medias:
+            # 各動画の長さを取得する
+            # この処理は時間がかかる可能性があるため、本来は非同期処理が望ましい
+            media.parse()
+            time.sleep(0.05) # パースを待つ
+            durations.append(max(media.get_duration(), 0))
+        return durations
+
+    def replace_sources(self, file_paths: list[str], index: int, time_in_item_ms: int):
+        was_playing = self.list_player.is_playing()
+        self._set_media_list(file_paths)
+        self._reset_frame_anchor(time_in_item_ms)
+
+        # seek() と同じ手順で、差し替えたリストの目的の位置へ移動する
+        self._play_item_and_wait(index)
+        self.player.set_time(time_in_item_ms)
+        if not was_playing:
+            self.list_player.pause()
+
+    def _on_playing(self, event):
+        self._playing.set()
+        self._notify_state(self.STATE_PLAYING)
+
+    def _play_item_and_wait(self, index: int | None = None):
+        """
+        index 番目の動画 (None の場合は現在の動画) の再生を始め、Playing イベントが届くまで待ちます。
+        再生が始まる前の set_time() や pause() は無視されることがあるため、切り替えの直後はこれで待ちます。
+        """
+        self._playing.clear()
+        if index is None:
+            self.list_player.play()
+        else:
+            self.list_player.play_item_at_index(index)
+        if not self._playing.wait(self.PLAY_START_TIMEOUT_S):
+            print(f"VLC did not start playing within {self.PLAY_START_TIMEOUT_S}s.")
+
+    def _set_media_list(self, file_paths: list[str]) -> list:
+        """ファイルのリストから MediaList を作ってプレイヤーに設定し、Media のリストを返します。"""
+        medias = []
+        self._index_by_mrl = {}
+        self._reset_frame_anchor()
+        media_list = self.vlc_instance.media_list_new()
+        for index, path in enumerate(file_paths):
+            media = self.vlc_instance.media_new(path)
+            media_list.add_media(media)
+            self._index_by_mrl[media.get_mrl()] = index
+            medias.append(media)
+        self.list_player.set_media_list(media_list)
+        return medias
+
+    def set_display_handle(self, handle: int):
+        if self.video_output == "software":
+            return  # フレームは FrameBuffer 経由でUIが描画する
+        if sys.platform == "win32":
+            self.player.set_hwnd(handle)
+        elif sys.platform == "darwin":
+            self.player.set_nsobject(handle)
+        else:
+            self.player.set_xwindow(handle)
+
+    def get_frame_buffer(self) -> FrameBuffer | None:
+        return self.frame_buffer
+
+    def set_frame_listener(self, listener):
+        self._frame_listener = listener
+
+    def _reset_frame_anchor(self, target_ms: int | None = None):
+        """次に表示されるフレームから時間を数え直します。target_ms はシーク先の時間です。"""
+        self._anchor_target_ms = target_ms
+        self._frame_anchor = None
+
+    def _on_frame_displayed(self, frame):
+        """
+        表示されるフレームごとにVLCのスレッドから呼ばれ、フレームに表示時間を付けて listener に渡します。
+
+        get_time() は更新が粗く、連続したフレームに同じ時間を返すため、時間はシーク先 (またはプレイヤーの時間)
+        から数えたフレームの数 × 1フレームの長さで決めます。動画が切り替わった場合や、
+        フレームが飛んで数えた時間がプレイヤーの時間からずれた場合は、プレイヤーの時間から数え直します。
+        """
+        listener = self._frame_listener
+        player = self.player
+        if listener is None or player is None:
+            return
+        index = self.get_current_index()
+        if index < 0:
+            return
+        player_ms = max(player.get_time(), 0)
+
+        anchor = self._frame_anchor
+        if anchor is not None and anchor[0] == index:
+            time_ms = anchor[1] + round(self._frames_since_anchor * anchor[2])
+            if abs(time_ms - player_ms) <= self.FRAME_TIME_TOLERANCE_MS:
+                self._frames_since_anchor += 1
+                listener(index, time_ms, frame)
+                return
+
+        # シーク・動画の切り替えの直後は、まだ反映されていないことがあるプレイヤーの時間よりシーク先を優先する
+        target_ms, self._anchor_target_ms = self._anchor_target_ms, None
+        time_ms = target_ms if target_ms is not None and anchor is None else player_ms
+        self._frame_anchor = (index, time_ms, self.get_frame_duration_ms())
+        self._frames_since_anchor = 1
+        listener(index, time_ms, frame)
+
+    def show_first_frame(self):
+        # 最初のフレームを描画させ、かつ確実に一時停止状態にする
+        self._reset_frame_anchor(0)
+        self._play_item_and_wait()
+
+        # 再生中であれば、pause()を呼び出す
+        if self.list_player.is_playing():
+            self.list_player.pause()
+
+    def toggle_pause(self):
+        # MediaListPlayerのplay/pauseメソッドを呼び出す
+        self.list_player.pause()
+
+    def seek(self, index: int, time_in_item_ms: int):
+        self._reset_frame_anchor(time_in_item_ms)
+        if (index == self.get_current_index()
+                and self.player.get_state() in (vlc.State.Playing, vlc.State.Paused)):
+            # 同じ動画内のシークは、再生状態を変えずに位置だけを移動する (動画の切り替えの待ち時間がない)
+            self.player.set_time(time_in_item_ms)
+            return
+
+        # シーク操作の前に、現在の再生状態を記憶しておく
+        was_playing = self.list_player.is_playing()
+
+        # MediaListPlayerで目的の動画に切り替え、再生が始まってからシークを実行
+        self._play_item_and_wait(index)
+
+        self.player.set_time(time_in_item_ms)
+
+        # 記憶しておいた再生状態に戻す
+        if was_playing:
+            # 再生中だった場合は、再生を再開
+            self.list_player.play()
+        else:
+            # 一時停止中だった場合は、一時停止を維持
+            self.list_player.pause()
+
+    def step_frame(self):
+        # 再生中の場合は、一時停止してから1フレーム進める
+        self.player.next_frame()
+
+    def get_frame_duration_ms(self) -> float:
+        fps = self.player.get_fps()
+        return 1000.0 / fps if fps and fps > 0 else super().get_frame_duration_ms()
+
+    def take_snapshot(self, path: str, width: int) -> bool:
+        # 高さに 0 を指定すると、縦横比を保って縮小される
+        return self.player.video_take_snapshot(0, path, width, 0) == 0
+
+    def get_current_index(self) -> int:
+        media = self.player.get_media()
+        if not media:
+            return -1
+        return self._index_by_mrl.get(media.get_mrl(), -1)
+
+    def get_item_time(self) -> int:
+        return max(self.player.get_time(), 0)
+
+    def is_playing(self) -> bool:
+        return bool(self.list_player.is_playing())
+
+    def set_rate(self, rate: float):
+        self.player.set_rate(rate)
+
+    def get_rate(self) -> float:
+        return self.player.get_rate()
+
+    def release(self):
+        if self.list_player:
+            if self.list_player.is_playing():
+                self.list_player.stop()
+            self.list_player.release()
+            self.list_player = None
+            self.player = None # 内部のplayer参照もクリア
+            print("VLC List Player released.")
@@ -0,0 +1,313 @@
+import hashlib
+import json
+import os
+from .keyframe_index_model import index_keyframes, load_keyframe_cache, save_keyframe_cache
+from .video_analysis_model import get_analysis_executor
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi")
+
+# 症例の状態
+CASE_PENDING = "pending"
+CASE_PREPARING = "preparing"
+CASE_READY = "ready"
+CASE_FAILED = "failed"
+CASE_ACTIVE = "active"
+CASE_DONE = "done"
+
+# 整合性チェックで、各サンプル位置からフレームが出るまで読み進める長さ(ms)
+SAMPLE_WINDOW_MS = 2000
+# ファイルの先頭と末尾から読み込んで、OSのキャッシュに載せておく量 (MP4のインデックスは末尾にあることが多い)
+WARM_UP_BYTES = 8 * 1024 * 1024
+
+def load_worklist(source_path: str) -> list[dict]:
+    """
+    フォルダまたはマニフェストから、症例のリストを読み込みます。
+
+    フォルダの場合は、動画を含むサブフォルダを1症例 (中の動画を名前順に連続再生) とし、
+    フォルダ直下の動画はそれぞれを1症例とします。
+    マニフェストは、JSON ({"name": ..., "files": [...]} またはパスのリストの配列) か、
+    1行に1症例の動画のパスを "|" 区切りで書いたテキストです。相対パスはマニフェストのフォルダからの位置です。
+
+    Returns:
+        {"name": 症例名, "files": 動画ファイルのパスのリスト} のリスト。
+    """
+    if os.path.isdir(source_path):
+        return _load_folder(source_path)
+    return _load_manifest(source_path)
+
+def probe_durations(video_files: list[str]) -> list[int]:
+    """libVLCで各動画の長さ(ms)を取得します。取得できなかった動画は 0 になります。"""
+    import vlc
+
+    instance = vlc.Instance("--no-audio", "--quiet", "--no-video-title-show", "--no-xlib")
+    durations = []
+    try:
+        for path in video_files:
+            media = instance.media_new(path)
+            media.parse()
+            durations.append(max(media.get_duration(), 0))
+            media.release()
+    finally:
+        instance.release()
+    return durations
+
+def check_decodable(path: str, sample_times_ms: list[int]) -> list[int]:
+    """
+    動画の各サンプル位置から少しだけデコードし、フレームが得られなかった位置(ms)のリストを返します。
+    """
+    from ..utils.vlc_frames import iter_gray_frames
+
+    failed = []
+    for time_ms in sample_times_ms:
+        frames = iter_gray_frames(path, 64, 36, SAMPLE_WINDOW_MS, start_ms=time_ms,
+                                  stop_ms=time_ms + SAMPLE_WINDOW_MS, max_queued=1)
+        try:
+            decoded = next(frames, None) is not None
+        finally:
+            frames.close()
+        if not decoded:
+            failed.append(time_ms)
+    return failed
+
+def warm_up_file(path: str):
+    """ファイルの先頭と末尾を読み込み、OSのファイルキャッシュに載せておきます。"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        f.read(WARM_UP_BYTES)
+        if size > WARM_UP_BYTES:
+            f.seek(max(WARM_UP_BYTES, size - WARM_UP_BYTES))
+            f.read(WARM_UP_BYTES)
+
+def prepare_case(video_files: list[str], keyframe_cache_dir: str | None, sample_points: int) -> dict:
+    """
+    症例を開く前の準備をまとめて行います。
+    (ProcessPoolExecutorのワーカープロセスで実行されます)
+
+    各動画の長さを調べ、いくつかの位置をデコードして壊れていないか確かめ、
+    キーフレームのインデックスを KeyframeIndexModel と同じキャッシュに書き込み、ファイルをキャッシュに載せます。
+
+    Returns:
+        {"durations": 各動画の長さ(ms)のリスト, "errors": 問題の説明のリスト}
+    """
+    errors = []
+    for path in video_files:
+        if not os.path.isfile(path):
+            errors.append(f"{os.path.basename(path)}: file not found")
+    if errors:
+        return {"durations": [0] * len(video_files), "errors": errors}
+
+    durations = probe_durations(video_files)
+    for path, duration in zip(video_files, durations):
+        name = os.path.basename(path)
+        warm_up_file(path)
+        if duration <= 0:
+            errors.append(f"{name}: could not read the duration")
+            continue
+        # 先頭と末尾を避けて、等間隔の位置をデコードしてみる
+        sample_times = [duration * (i + 1) // (sample_points + 1) for i in range(sample_points)]
+        failed = check_decodable(path, sample_times)
+        if failed:
+            errors.append(f"{name}: no frame decoded at " + ", ".join(f"{t / 1000.0:.0f}s" for t in failed))
+        if keyframe_cache_dir:
+            try:
+                if load_keyframe_cache(keyframe_cache_dir, path, duration) is None:
+                    save_keyframe_cache(keyframe_cache_dir, path, index_keyframes(path, 0, duration), duration)
+            except (OSError, KeyError, ValueError) as e:
+                errors.append(f"{name}: could not cache the keyframe index ({e})")
+    return {"durations": durations, "errors": errors}
+
+
+class WorklistModel:
+    """
+    1日分の症例のリスト (ワークリスト) を管理するクラス。
+    症例を順に開き、注釈中に次の症例の準備 (長さの取得・整合性チェック・キャッシュの準備) を
+    解析用のプロセスプールで先に進めておくことで、「Save & Next」で次の症例をすぐに開けるようにします。
+
+    終わった症例は状態ファイルに記録するため、アプリを再起動しても続きから再開できます。
+    """
+
+    def __init__(self, source_path: str, state_dir: str | None = None, keyframe_cache_dir: str | None = None,
+                 prefetch_count: int = 2, sample_points: int = 3):
+        """
+        Args:
+            source_path: 症例のフォルダまたはマニフェストのパス。
+            state_dir: 進み具合を保存するディレクトリ。None の場合は保存しない。
+            keyframe_cache_dir: 準備で作るキーフレームのインデックスの保存先 (KeyframeIndexModel と同じ)。
+            prefetch_count: 先に準備しておく症例の数。
+            sample_points: 整合性チェックでデコードする、1動画あたりの位置の数。
+        """
+        self.source_path = os.path.abspath(source_path)
+        self.keyframe_cache_dir = keyframe_cache_dir
+        self.prefetch_count = max(1, prefetch_count)
+        self.sample_points = sample_points
+        self.cases = load_worklist(self.source_path)
+        for case in self.cases:
+            case.update(status=CASE_PENDING, durations=None, errors=[], output=None)
+        self.current_index = -1
+        # 症例のインデックス -> Future
+        self._pending = {}
+
+        self._state_path = None
+        if state_dir:
+            key = hashlib.sha1(self.source_path.encode("utf-8")).hexdigest()
+            self._state_path = os.path.join(state_dir, key + ".json")
+            self._load_state()
+        print(f"Worklist loaded: {len(self.cases)} case(s) from {self.source_path}")
+
+    # --- 症例の切り替え ---
+
+    def next_case(self) -> dict | None:
+        """
+        まだ終わっていない次の症例を開く症例にして返します。残っていない場合は None を返します。
+        準備が終わっていない症例は準備を取り消し、開くときにプレイヤー側で長さを取得させます。
+        """
+        self.poll()
+        for index in range(self.current_index + 1, len(self.cases)):
+            case = self.cases[index]
+            if case["status"] == CASE_DONE:
+                continue
+            future = self._pending.pop(index, None)
+            if future is not None:
+                future.cancel()
+            if case["status"] == CASE_PREPARING:
+                case["status"] = CASE_PENDING
+            self.current_index = index
+            case["status"] = CASE_ACTIVE
+            self.start_preparation()
+            return case
+        self.current_index = len(self.cases)
+        return None
+
+    def get_current_case(self) -> dict | None:
+        if 0 <= self.current_index < len(self.cases):
+            return self.cases[self.current_index]
+        return None
+
+    def finish_current(self, output_path: str | None = None):
+        """開いている症例を終了済みにし、進み具合を保存します。"""
+        case = self.get_current_case()
+        if case is None:
+            return
+        case["status"] = CASE_DONE
+        case["output"] = output_path
+        self._save_state()
+
+    # --- 準備 ---
+
+    def start_preparation(self):
+        """開いている症例の後ろの、準備していない症例を prefetch_count 件まで準備し始めます。"""
+        upcoming = [index for index in range(self.current_index + 1, len(self.cases))
+                    if self.cases[index]["status"] != CASE_DONE][:self.prefetch_count]
+        for index in upcoming:
+            case = self.cases[index]
+            if case["status"] != CASE_PENDING:
+                continue
+            case["status"] = CASE_PREPARING
+            self._pending[index] = get_analysis_executor().submit(
+                prepare_case, case["files"], self.keyframe_cache_dir, self.sample_points)
+
+    def poll(self) -> bool:
+        """完了した準備の結果を取り込みます。状態が変わった場合は True を返します。"""
+        updated = False
+        for index in list(self._pending):
+            future = self._pending[index]
+            if not future.done():
+                continue
+            del self._pending[index]
+            case = self.cases[index]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"durations": None, "errors": [f"preparation failed: {e}"]}
+            durations = result["durations"]
+            case["durations"] = durations if durations and all(d > 0 for d in durations) else None
+            case["errors"] = result["errors"]
+            case["status"] = CASE_FAILED if case["errors"] else CASE_READY
+            print(f"Worklist case '{case['name']}' {case['status']}" +
+                  (f": {'; '.join(case['errors'])}" if case["errors"] else "."))
+            updated = True
+        return updated
+
+    def is_running(self) -> bool:
+        return bool(self._pending)
+
+    def cancel(self):
+        """実行中の準備を取り消します。"""
+        for index, future in self._pending.items():
+            future.cancel()
+            self.cases[index]["status"] = CASE_PENDING
+        self._pending = {}
+
+    def get_progress_text(self) -> str:
+        """「症例 3/40: 名前 | 次: ready | 完了 2, 準備済み 2, 問題あり 1」のような進み具合の文字列を返します。"""
+        counts = {}
+        for case in self.cases:
+            counts[case["status"]] = counts.get(case["status"], 0) + 1
+        case = self.get_current_case()
+        text = f"Case {self.current_index + 1}/{len(self.cases)}: {case['name']}" if case else "Worklist finished"
+        upcoming = [c for c in self.cases[self.current_index + 1:] if c["status"] != CASE_DONE]
+        if upcoming:
+            text += f"  |  Next: {upcoming[0]['status']}"
+        text += (f"  |  Done {counts.get(CASE_DONE, 0)}, ready {counts.get(CASE_READY, 0)}, "
+                 f"failed {counts.get(CASE_FAILED, 0)}")
+        return text
+
+    # --- 内部処理 ---
+
+    def _load_state(self):
+        try:
+            with open(self._state_path, "r", encoding="utf-8") as f:
+                outputs = json.load(f).get("done", {})
+        except FileNotFoundError:
+            return
+        except (OSError, json.JSONDecodeError, AttributeError) as e:
+            print(f"Failed to load worklist state: {e}")
+            return
+        for case in self.cases:
+            if case["name"] in outputs:
+                case["status"] = CASE_DONE
+                case["output"] = outputs[case["name"]]
+
+    def _save_state(self):
+        if not self._state_path:
+            return
+        state = {
+            "source": self.source_path,
+            "done": {case["name"]: case["output"] for case in self.cases if case["status"] == CASE_DONE},
+        }
+        try:
+            with open(self._state_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=4, ensure_ascii=False)
+        except OSError as e:
+            print(f"Failed to save worklist state: {e}")
+
+def _load_folder(folder: str) -> list[dict]:
+    cases = []
+    for entry in sorted(os.scandir(folder), key=lambda e: e.name.lower()):
+        if entry.is_dir():
+            files = sorted((os.path.join(entry.path, name) for name in os.listdir(entry.path)
+                            if name.lower().endswith(VIDEO_EXTENSIONS)), key=str.lower)
+            if files:
+                cases.append({"name": entry.name, "files": files})
+        elif entry.name.lower().endswith(VIDEO_EXTENSIONS):
+            cases.append({"name": os.path.splitext(entry.name)[0], "files": [entry.path]})
+    return cases
+
+def _load_manifest(manifest_path: str) -> list[dict]:
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        if manifest_path.lower().endswith(".json"):
+            entries = json.load(f)
+        else:
+            entries = [[part.strip() for part in line.split("|") if part.strip()]
+                       for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+    cases = []
+    for entry in entries:
+        name, files = (entry.get("name"), entry["files"]) if isinstance(entry, dict) else (None, entry)
+        if isinstance(files, str):
+            files = [files]
+        files = [os.path.normpath(os.path.join(base_dir, path)) for path in files]
+        if files:
+            cases.append({"name": name or os.path.splitext(os.path.basename(files[0]))[0], "files": files})
+    return cases
@@ -0,0 +1,64 @@
+import threading
+import numpy as np
+
+class FrameBuffer:
+    """
+    デコーダのスレッドとUIのスレッドで、映像フレームを受け渡すためのトリプルバッファ。
+
+    3枚のバッファを事前に確保し、デコーダは「書き込み中」、UIは「表示中」のバッファだけに触れます。
+    書き込みが終わったフレームは「最新」と入れ替えるだけなので、フレームのコピーは発生しません。
+    UIの処理が追いつかないときは、まだ読まれていない「最新」のフレームが上書きされ (ドロップ)、
+    UIは常に一番新しいフレームだけを受け取ります。
+    """
+
+    def __init__(self, width: int, height: int, channels: int = 4):
+        self.width = width
+        self.height = height
+        self._buffers = [np.zeros((height, width, channels), dtype=np.uint8) for _ in range(3)]
+        self._pointers = [buffer.ctypes.data for buffer in self._buffers]
+        # 書き込み中・最新・表示中のバッファのインデックス
+        self._write_index = 0
+        self._latest_index = 1
+        self._front_index = 2
+        self._has_new_frame = False
+        self._lock = threading.Lock()
+
+        self.frames_published = 0
+        self.frames_dropped = 0
+
+    # --- デコーダ側 ---
+
+    def get_write_pointer(self) -> int:
+        """次のフレームを書き込むバッファの先頭アドレスを返します。"""
+        return self._pointers[self._write_index]
+
+    def get_write_buffer(self) -> np.ndarray:
+        """次のフレームを書き込むバッファを返します。"""
+        return self._buffers[self._write_index]
+
+    def publish(self):
+        """書き込みが終わったフレームを最新のフレームにします。"""
+        with self._lock:
+            if self._has_new_frame:
+                self.frames_dropped += 1
+            self._write_index, self._latest_index = self._latest_index, self._write_index
+            self._has_new_frame = True
+            self.frames_published += 1
+
+    # --- UI側 ---
+
+    def take_latest(self) -> np.ndarray | None:
+        """
+        前回の呼び出し以降に新しいフレームがあれば、それを返します。なければ None を返します。
+        返したバッファは、次に take_latest() を呼ぶまで書き換えられません。
+        """
+        with self._lock:
+            if not self._has_new_frame:
+                return None
+            self._front_index, self._latest_index = self._latest_index, self._front_index
+            self._has_new_frame = False
+        return self._buffers[self._front_index]
+
+    def get_current_frame(self) -> np.ndarray:
+        """最後に take_latest() で受け取ったフレームを返します (BGRA, 読み取り専用として扱うこと)。"""
+        return self._buffers[self._front_index]
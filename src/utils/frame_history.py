@@ -0,0 +1,112 @@
+import threading
+import numpy as np
+
+class FrameHistory:
+    """
+    直近にデコードされたフレームを、再生位置(ms)と一緒に保持するリングバッファ。
+    1フレーム戻す操作を、シークとデコードなしで即座に行うために使います。
+
+    バッファはメモリの上限から決まる枚数分を最初に確保し、フレームは縮小してコピーします。
+    保持するのは連続して再生・コマ送りされたフレームだけで、シークなどで位置が飛んだ場合は
+    それまでのフレームを捨てます。そのため、フレームは常に時間の昇順に並んでいます。
+    フレームはデコーダのスレッドから追加され、UIのスレッドから参照されるため、操作はロックで保護します。
+    """
+    # 直前のフレームからこの時間以上離れたフレームは、シークによる不連続とみなす
+    MAX_GAP_MS = 1000
+
+    def __init__(self, width: int, height: int, max_bytes: int, downscale: int = 2, channels: int = 4):
+        """
+        Args:
+            width, height: 入力されるフレームの大きさ(px)。
+            max_bytes: バッファ全体のメモリの上限(バイト)。
+            downscale: 縦横の間引き率 (2 なら 1/2 の大きさで保持する)。
+            channels: 1ピクセルあたりのバイト数 (BGRA なら 4)。
+        """
+        self.downscale = max(1, downscale)
+        frame_shape = (-(-height // self.downscale), -(-width // self.downscale), channels)
+        frame_bytes = int(np.prod(frame_shape))
+        self.capacity = max(2, max_bytes // frame_bytes)
+        self._frames = np.empty((self.capacity, *frame_shape), dtype=np.uint8)
+        self._times = np.zeros(self.capacity, dtype=np.int64)
+        # 最も古いフレームのスロットと、保持しているフレームの数
+        self._start = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return self._frames.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._start = 0
+            self._count = 0
+
+    def push(self, time_ms: int, frame: np.ndarray):
+        """
+        表示されたフレームを追加します。バッファが一杯の場合は最も古いフレームを上書きします。
+        時間が戻った・飛んだ場合はそれまでのフレームを捨てます。直前と同じ時間のフレームも捨てずに追加します
+        (フレームごとの時間を付け直した直後などに起こり、捨てるとコマ戻しでフレームが飛ぶため)。
+        """
+        with self._lock:
+            if self._count:
+                last_ms = int(self._times[self._slot(self._count - 1)])
+                if time_ms < last_ms or time_ms - last_ms > self.MAX_GAP_MS:
+                    self._start = 0
+                    self._count = 0
+
+            if self._count < self.capacity:
+                slot = self._slot(self._count)
+                self._count += 1
+            else:
+                slot = self._start
+                self._start = (self._start + 1) % self.capacity
+            self._frames[slot] = frame[::self.downscale, ::self.downscale]
+            self._times[slot] = time_ms
+
+    def find_before(self, time_ms: int) -> tuple[int, np.ndarray] | None:
+        """time_ms より前で最も新しいフレームの (時間, フレーム) を返します。ない場合は None を返します。"""
+        with self._lock:
+            position = self._bisect_left(time_ms) - 1
+            if position < 0:
+                return None
+            return self._entry(position)
+
+    def find_after(self, time_ms: int) -> tuple[int, np.ndarray] | None:
+        """time_ms より後で最も古いフレームの (時間, フレーム) を返します。ない場合は None を返します。"""
+        with self._lock:
+            position = self._bisect_left(time_ms + 1)
+            if position >= self._count:
+                return None
+            return self._entry(position)
+
+    def latest(self) -> tuple[int, np.ndarray] | None:
+        """最も新しいフレームの (時間, フレーム) を返します。"""
+        with self._lock:
+            if not self._count:
+                return None
+            return self._entry(self._count - 1)
+
+    # --- 内部処理 ---
+
+    def _slot(self, position: int) -> int:
+        """古い順の位置を、バッファ内のスロットに変換します。"""
+        return (self._start + position) % self.capacity
+
+    def _entry(self, position: int) -> tuple[int, np.ndarray]:
+        slot = self._slot(position)
+        return int(self._times[slot]), self._frames[slot]
+
+    def _bisect_left(self, time_ms: int) -> int:
+        """古い順の並びで、時間が time_ms 以上になる最初の位置を返します。"""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._times[self._slot(mid)] < time_ms:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
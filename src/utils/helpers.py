@@ -1,7 +1,9 @@
 import os
 import sys
-import matplotlib.pyplot as plt
+from functools import lru_cache
+import matplotlib.style
 import numpy as np
+from matplotlib.figure import Figure
 from matplotlib.font_manager import FontProperties
 
 def format_time(seconds: float) -> str:
@@ -17,8 +19,13 @@ def format_time(seconds: float) -> str:
     if seconds is None or seconds < 0:
         return "00:00:00"
     
+    # 表示は秒単位なので、整数秒ごとの結果をキャッシュして再利用します。
+    return _format_whole_seconds(int(seconds))
+
+@lru_cache(maxsize=4096)
+def _format_whole_seconds(total_seconds: int) -> str:
     # divmodを使って、商と余りを同時に計算します。
-    mins, secs = divmod(int(seconds), 60)
+    mins, secs = divmod(total_seconds, 60)
     hours, mins = divmod(mins, 60)
     
     # f-stringを使って文字列をフォーマットします。
@@ -51,27 +58,29 @@ def create_and_save_graph(df, output_path: str, font_prop: FontProperties | None
     成功した場合はグラフ画像のパスを、失敗した場合は None を返します。
     """
     try:
-        plt.style.use('seaborn-v0_8-whitegrid')
-        fig, ax = plt.subplots(figsize=(12, 7))
+        # pyplot はGUIのバックエンド (Tk) を使うため、バックグラウンドのスレッドからでも
+        # 安全に呼べるように Figure を直接作成する
+        with matplotlib.style.context('seaborn-v0_8-whitegrid'):
+            fig = Figure(figsize=(12, 7))
+            ax = fig.subplots()
         
-        bar_width = 0.4
-        index = np.arange(len(df['手順名']))
+            bar_width = 0.4
+            index = np.arange(len(df['手順名']))
         
-        bar1 = ax.bar(index - bar_width/2, df['所要時間(秒)'], bar_width, label='所要時間', color='royalblue')
-        bar2 = ax.bar(index + bar_width/2, df['移行時間(秒)'].fillna(0), bar_width, label='移行時間', color='skyblue')
+            bar1 = ax.bar(index - bar_width/2, df['所要時間(秒)'], bar_width, label='所要時間', color='royalblue')
+            bar2 = ax.bar(index + bar_width/2, df['移行時間(秒)'].fillna(0), bar_width, label='移行時間', color='skyblue')
         
-        ax.set_ylabel('時間 (秒)', fontsize=12, fontproperties=font_prop)
-        ax.set_title('各手技の所要時間と移行時間', fontsize=16, pad=20, fontproperties=font_prop)
-        ax.set_xticks(index)
-        ax.set_xticklabels(df['手順名'], rotation=30, ha='right', fontsize=11, fontproperties=font_prop)
-        ax.legend(prop=font_prop)
-        ax.grid(True, which='major', axis='y', linestyle='--', linewidth=0.5)
+            ax.set_ylabel('時間 (秒)', fontsize=12, fontproperties=font_prop)
+            ax.set_title('各手技の所要時間と移行時間', fontsize=16, pad=20, fontproperties=font_prop)
+            ax.set_xticks(index)
+            ax.set_xticklabels(df['手順名'], rotation=30, ha='right', fontsize=11, fontproperties=font_prop)
+            ax.legend(prop=font_prop)
+            ax.grid(True, which='major', axis='y', linestyle='--', linewidth=0.5)
 
-        plt.tight_layout(pad=1.5)
+            fig.tight_layout(pad=1.5)
         
-        graph_path = output_path.replace('.csv', '.png')
-        plt.savefig(graph_path, dpi=150)
-        plt.close(fig)
+            graph_path = output_path.replace('.csv', '.png')
+            fig.savefig(graph_path, dpi=150)
         
         print(f"Graph saved to {graph_path}")
         return graph_path
@@ -0,0 +1,98 @@
+import json
+import time
+
+class InputTraceRecorder:
+    """
+    キーボードショートカットの操作を、時刻と処理時間つきで記録するクラス。
+    実際のアノテーション作業の操作列を保存しておき、benchmarks/replay_trace.py で
+    再生して操作ごとの遅延を比較するために使います。
+
+    記録する処理時間は、ハンドラの呼び出しから flush (Tkの再描画) が終わるまでの時間です。
+    記録が無効なときは、呼び出し元で enabled を見てハンドラを直接呼び出してください。
+    """
+    FORMAT_VERSION = 1
+
+    def __init__(self):
+        self.enabled = False
+        self._start = None
+        self._events = []
+
+    def start(self):
+        """記録を開始します。操作の時刻は、ここからの経過時間(ms)になります。"""
+        self.enabled = True
+        self._start = time.perf_counter()
+
+    def record(self, action: str, handler, flush=None, **context):
+        """
+        handler を実行し、操作を1件記録します。
+
+        Args:
+            action: 操作の種類 ("start", "end" など)。
+            handler: 実行する引数なしの関数。
+            flush: ハンドラの後に呼び出す、UIへの反映を完了させる関数 (update_idletasks など)。
+            context: 操作直前の状態 (再生位置など)。再生時の同期に使う。
+        """
+        started = time.perf_counter()
+        if self._start is None:
+            self._start = started
+        try:
+            return handler()
+        finally:
+            if flush:
+                flush()
+            finished = time.perf_counter()
+            self._events.append({
+                "t_ms": round((started - self._start) * 1000.0, 1),
+                "action": action,
+                "latency_ms": round((finished - started) * 1000.0, 3),
+                **context,
+            })
+
+    def has_data(self) -> bool:
+        return bool(self._events)
+
+    def get_events(self) -> list[dict]:
+        return list(self._events)
+
+    def save(self, path: str, header: dict):
+        """
+        記録をJSON Lines形式で保存します。
+        1行目はヘッダ (動画の長さ・スタンプなど、再生に必要な情報)、2行目以降が操作です。
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"type": "header", "version": self.FORMAT_VERSION, **header}, ensure_ascii=False) + "\n")
+            for event in self._events:
+                f.write(json.dumps({"type": "input", **event}, ensure_ascii=False) + "\n")
+        print(f"Input trace saved: {path} ({len(self._events)} events)")
+
+    def reset(self):
+        self._events = []
+        self._start = None
+
+def load_trace(path: str) -> tuple[dict, list[dict]]:
+    """
+    InputTraceRecorder.save() で保存した記録を読み込みます。
+
+    Returns:
+        (ヘッダ, 時刻順の操作のリスト) のタプル。
+    """
+    header = {}
+    events = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            entry_type = entry.pop("type", None)
+            if entry_type == "header":
+                header = entry
+            elif entry_type == "input":
+                events.append(entry)
+    if header.get("version", InputTraceRecorder.FORMAT_VERSION) > InputTraceRecorder.FORMAT_VERSION:
+        raise ValueError(f"Unsupported input trace version: {header.get('version')}")
+    events.sort(key=lambda event: event["t_ms"])
+    return header, events
+
+# アプリケーション全体で共有する記録器
+input_trace = InputTraceRecorder()
@@ -0,0 +1,201 @@
+import os
+import struct
+import numpy as np
+
+# ISO BMFF (MP4 / MOV) で中身を読むコンテナボックス
+_MP4_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts"}
+# AVIの idx1 のキーフレームのフラグ
+_AVIIF_KEYFRAME = 0x10
+_IDX1_DTYPE = np.dtype([("ckid", "S4"), ("flags", "<u4"), ("offset", "<u4"), ("size", "<u4")])
+
+def read_keyframe_times(path: str) -> np.ndarray | None:
+    """
+    動画ファイルのコンテナのインデックスだけを読み、映像のキーフレームの時間(ms)を返します。
+    フレームのデコードは行いません。
+
+    対応しているのは MP4 / MOV (stss・stts・ctts・mdhd・elst) と AVI (idx1) です。
+    対応していない形式 (フラグメント化MP4、OpenDMLだけのAVI、MKVなど) の場合は None を返します。
+
+    Returns:
+        キーフレームの表示時間(ms)の昇順の int64 配列。時間は切り上げているため、
+        この時間へシークするとキーフレーム以降の位置になります。
+    """
+    with open(path, "rb") as f:
+        head = f.read(12)
+        f.seek(0)
+        if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+            return _read_avi_keyframes(f)
+        if head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+            return _read_mp4_keyframes(f)
+    return None
+
+# --- MP4 / MOV ---
+
+def _iter_boxes(data: bytes | memoryview, start: int = 0, end: int | None = None):
+    """data[start:end] に含まれるボックスの (種類, 本体の開始位置, 終了位置) を順に返します。"""
+    end = len(data) if end is None else end
+    position = start
+    while position + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, position)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, position + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - position
+        if size < header or position + size > end:
+            break
+        yield box_type, position + header, position + size
+        position += size
+
+def _find_top_level_box(f, name: bytes) -> bytes | None:
+    """ファイルの最上位のボックスを、本体を読み飛ばしながら探します (mdat は読まない)。"""
+    file_size = os.fstat(f.fileno()).st_size
+    position = 0
+    while position + 8 <= file_size:
+        f.seek(position)
+        header = f.read(16)
+        if len(header) < 8:
+            break
+        size, box_type = struct.unpack_from(">I4s", header, 0)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - position
+        if size < header_size:
+            break
+        if box_type == name:
+            f.seek(position + header_size)
+            return f.read(size - header_size)
+        position += size
+    return None
+
+def _read_mp4_keyframes(f) -> np.ndarray | None:
+    moov = _find_top_level_box(f, b"moov")
+    if moov is None:
+        return None
+    for box_type, start, end in _iter_boxes(moov):
+        if box_type != b"trak":
+            continue
+        tables = {}
+        _collect_track_tables(moov, start, end, tables)
+        if tables.get(b"hdlr") == b"vide":
+            return _mp4_track_keyframes(moov, tables)
+    return None
+
+def _collect_track_tables(data: bytes, start: int, end: int, tables: dict, parent: bytes = b"trak"):
+    """trak 内のボックスを再帰的にたどり、必要なボックスの位置を tables に集めます。"""
+    for box_type, body_start, body_end in _iter_boxes(data, start, end):
+        if box_type in _MP4_CONTAINERS:
+            _collect_track_tables(data, body_start, body_end, tables, box_type)
+        elif box_type == b"hdlr" and parent == b"mdia":
+            # トラックの種類は mdia 直下の hdlr だけが持つ
+            # (MOVでは minf 内にもデータの参照方法の hdlr があり、種類が "alis" などになる)
+            tables[b"hdlr"] = data[body_start + 8:body_start + 12]
+        elif box_type in (b"mdhd", b"stts", b"ctts", b"stss", b"elst"):
+            tables[box_type] = (body_start, body_end)
+
+def _read_table(data: bytes, position: tuple[int, int], columns: int, dtype: str) -> np.ndarray:
+    """バージョン・フラグとエントリ数に続く、ビッグエンディアンの表を (エントリ数, columns) の配列で読みます。"""
+    start, end = position
+    count = struct.unpack_from(">I", data, start + 4)[0]
+    count = min(count, (end - start - 8) // (4 * columns))
+    table = np.frombuffer(data, dtype=dtype, count=count * columns, offset=start + 8)
+    return table.reshape(count, columns).astype(np.int64)
+
+def _mp4_track_keyframes(data: bytes, tables: dict) -> np.ndarray | None:
+    if b"mdhd" not in tables or b"stts" not in tables:
+        return None
+    mdhd_start, _ = tables[b"mdhd"]
+    version = data[mdhd_start]
+    timescale = struct.unpack_from(">I", data, mdhd_start + (20 if version == 1 else 12))[0]
+    if timescale == 0:
+        return None
+
+    # 各サンプルのデコード時間 = それまでのサンプルの長さの合計
+    stts = _read_table(data, tables[b"stts"], 2, ">u4")
+    deltas = np.repeat(stts[:, 1], stts[:, 0])
+    decode_times = np.zeros(len(deltas), dtype=np.int64)
+    np.cumsum(deltas[:-1], out=decode_times[1:])
+
+    # stss がない場合は、すべてのサンプルがキーフレーム
+    if b"stss" in tables:
+        sync_samples = _read_table(data, tables[b"stss"], 1, ">u4")[:, 0] - 1
+        sync_samples = sync_samples[(sync_samples >= 0) & (sync_samples < len(decode_times))]
+    else:
+        sync_samples = np.arange(len(decode_times))
+    times = decode_times[sync_samples]
+
+    # 表示時間 = デコード時間 + コンポジション時間のずれ (Bフレームがある場合)
+    if b"ctts" in tables:
+        ctts = _read_table(data, tables[b"ctts"], 2, ">i4")
+        offsets = np.repeat(ctts[:, 1], ctts[:, 0])
+        valid = sync_samples < len(offsets)
+        times[valid] += offsets[sync_samples[valid]]
+
+    # 編集リストで先頭が切り詰められている場合は、その分だけ前にずらす
+    if b"elst" in tables:
+        elst_start, _ = tables[b"elst"]
+        elst_version = data[elst_start]
+        entry_count = struct.unpack_from(">I", data, elst_start + 4)[0]
+        entry_format, entry_size = (">Qq", 20) if elst_version == 1 else (">Ii", 12)
+        for entry in range(entry_count):
+            _, media_time = struct.unpack_from(entry_format, data, elst_start + 8 + entry * entry_size)
+            if media_time >= 0:
+                times -= media_time
+                break
+
+    times_ms = -(-times * 1000 // timescale)  # 切り上げ
+    return np.unique(times_ms[times_ms >= 0])
+
+# --- AVI ---
+
+def _read_avi_keyframes(f) -> np.ndarray | None:
+    data = f.read(12)
+    riff_size = struct.unpack_from("<I", data, 4)[0]
+    end = min(8 + riff_size, os.fstat(f.fileno()).st_size)
+    position = 12
+    video_stream = None
+    scale = rate = start_frame = 0
+    while position + 8 <= end:
+        f.seek(position)
+        chunk_id, size = struct.unpack("<4sI", f.read(8))
+        if chunk_id == b"LIST":
+            list_type = f.read(4)
+            if list_type == b"hdrl":
+                video_stream, scale, rate, start_frame = _read_avi_video_header(f.read(size - 4))
+        elif chunk_id == b"idx1" and video_stream is not None:
+            if rate == 0:
+                return None
+            entries = np.frombuffer(f.read(size), dtype=_IDX1_DTYPE, count=size // _IDX1_DTYPE.itemsize)
+            stream_ids = (f"{video_stream:02d}db".encode(), f"{video_stream:02d}dc".encode())
+            # 長さ0のチャンクも1フレーム (前のフレームの繰り返し) として数える
+            frames = entries[np.isin(entries["ckid"], stream_ids)]
+            keyframes = np.flatnonzero(frames["flags"] & _AVIIF_KEYFRAME)
+            times_ms = -(-(keyframes + start_frame) * scale * 1000 // rate)  # 切り上げ
+            return times_ms.astype(np.int64)
+        position += 8 + size + (size & 1)
+    return None
+
+def _read_avi_video_header(hdrl: bytes) -> tuple[int | None, int, int, int]:
+    """hdrl から、映像ストリームの (ストリーム番号, dwScale, dwRate, dwStart) を返します。"""
+    stream = 0
+    for chunk_id, start, end in _iter_riff_chunks(hdrl):
+        if chunk_id != b"LIST" or hdrl[start:start + 4] != b"strl":
+            continue
+        for sub_id, sub_start, _ in _iter_riff_chunks(hdrl, start + 4, end):
+            if sub_id == b"strh" and hdrl[sub_start:sub_start + 4] == b"vids":
+                scale, rate, start_frame = struct.unpack_from("<III", hdrl, sub_start + 20)
+                return stream, scale, rate, start_frame
+        stream += 1
+    return None, 0, 0, 0
+
+def _iter_riff_chunks(data: bytes, start: int = 0, end: int | None = None):
+    end = len(data) if end is None else end
+    position = start
+    while position + 8 <= end:
+        chunk_id, size = struct.unpack_from("<4sI", data, position)
+        yield chunk_id, position + 8, min(position + 8 + size, end)
+        position += 8 + size + (size & 1)
@@ -0,0 +1,126 @@
+import math
+import numpy as np
+
+# 最も細かいレベルの1ブロックのサンプル数と、1つ上のレベルで何ブロックをまとめるか
+BASE_BLOCK_SAMPLES = 64
+LEVEL_FACTOR = 4
+# これ以下のブロック数になったら、それより上のレベルは作らない
+MIN_TOP_LEVEL_BLOCKS = 256
+
+def level_lengths(base_count: int) -> list[int]:
+    """最も細かいレベルのブロック数から、各レベルのブロック数のリストを返します。"""
+    lengths = [base_count]
+    while lengths[-1] > MIN_TOP_LEVEL_BLOCKS:
+        lengths.append(-(-lengths[-1] // LEVEL_FACTOR))
+    return lengths
+
+def build_peak_pyramid(base: np.ndarray) -> np.ndarray:
+    """
+    最も細かいレベルの (min, max) の配列 (n, 2) int16 から、すべてのレベルを連結したピラミッドを作ります。
+    レベル k の1ブロックは、レベル k-1 の LEVEL_FACTOR ブロックの最小値と最大値です。
+    """
+    levels = [np.ascontiguousarray(base, dtype=np.int16)]
+    for length in level_lengths(len(base))[1:]:
+        previous = levels[-1]
+        starts = np.arange(0, len(previous), LEVEL_FACTOR)
+        level = np.empty((length, 2), dtype=np.int16)
+        level[:, 0] = np.minimum.reduceat(previous[:, 0], starts)
+        level[:, 1] = np.maximum.reduceat(previous[:, 1], starts)
+        levels.append(level)
+    return np.concatenate(levels)
+
+
+class PeakAccumulator:
+    """
+    PCMのサンプルを少しずつ受け取り、最も細かいレベルの (min, max) を作るクラス。
+    保持するのは1ブロックに満たない端数のサンプルと、ブロックごとの (min, max) だけです。
+    """
+
+    def __init__(self):
+        self._remainder = np.empty(0, dtype=np.int16)
+        self._blocks = []
+        self.sample_count = 0
+
+    def add(self, samples: np.ndarray):
+        """モノラルの int16 のサンプルを追加します。"""
+        self.sample_count += len(samples)
+        if len(self._remainder):
+            samples = np.concatenate([self._remainder, samples])
+        full = len(samples) - len(samples) % BASE_BLOCK_SAMPLES
+        if full:
+            blocks = samples[:full].reshape(-1, BASE_BLOCK_SAMPLES)
+            self._blocks.append(np.stack([blocks.min(axis=1), blocks.max(axis=1)], axis=1))
+        self._remainder = samples[full:].copy()
+
+    def finish(self, block_count: int | None = None) -> np.ndarray:
+        """
+        最も細かいレベルの (min, max) の配列 (n, 2) int16 を返します。
+        block_count を指定した場合は、足りないブロックを無音で埋め、余分なブロックを切り捨てます。
+        """
+        blocks = list(self._blocks)
+        if len(self._remainder):
+            blocks.append(np.array([[self._remainder.min(), self._remainder.max()]], dtype=np.int16))
+        base = np.concatenate(blocks) if blocks else np.zeros((0, 2), dtype=np.int16)
+        if block_count is not None:
+            if len(base) < block_count:
+                base = np.concatenate([base, np.zeros((block_count - len(base), 2), dtype=np.int16)])
+            base = base[:block_count]
+        return base
+
+
+class PeakPyramid:
+    """
+    build_peak_pyramid() で作ったピラミッド (メモリマップした配列でもよい) から、表示用のピークを読み出すクラス。
+    表示の1列の幅に合ったレベルの、表示範囲の部分だけを読むため、ズームの倍率によらず読む量は列数の数倍で済みます。
+    """
+
+    def __init__(self, data: np.ndarray, base_count: int, sample_rate: int):
+        """
+        Args:
+            data: すべてのレベルを連結した (min, max) の配列。
+            base_count: 最も細かいレベルのブロック数。
+            sample_rate: PCMのサンプリング周波数(Hz)。
+        """
+        self.data = data
+        self.base_block_ms = BASE_BLOCK_SAMPLES * 1000.0 / sample_rate
+        self._lengths = level_lengths(base_count)
+        self._offsets = np.concatenate([[0], np.cumsum(self._lengths)]).astype(np.int64)
+
+    @staticmethod
+    def expected_size(base_count: int) -> int:
+        """ピラミッド全体のブロック数を返します (キャッシュの検証用)。"""
+        return sum(level_lengths(base_count))
+
+    def read(self, edges_ms: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        区切り edges_ms (列数+1, ms) の各列の (min, max) を読み出します。
+
+        Returns:
+            ((列数, 2) int16 の配列, 列にデータがあるかどうかの bool 配列) のタプル。
+        """
+        columns = len(edges_ms) - 1
+        peaks = np.zeros((columns, 2), dtype=np.int16)
+        if columns <= 0 or not self._lengths[0]:
+            return peaks, np.zeros(columns, dtype=bool)
+
+        # 1列に1ブロック以上が入る、最も粗いレベルを使う
+        column_ms = (edges_ms[-1] - edges_ms[0]) / columns
+        level = int(np.clip(math.floor(math.log(max(column_ms / self.base_block_ms, 1.0), LEVEL_FACTOR)),
+                            0, len(self._lengths) - 1))
+        block_ms = self.base_block_ms * LEVEL_FACTOR ** level
+        length = self._lengths[level]
+        first_blocks = np.floor(edges_ms[:-1] / block_ms).astype(np.int64)
+        last_blocks = np.ceil(edges_ms[1:] / block_ms).astype(np.int64)
+        valid = (last_blocks > 0) & (first_blocks < length)
+        if not valid.any():
+            return peaks, valid
+
+        starts = np.clip(first_blocks[valid], 0, length - 1)
+        lo = int(starts[0])
+        hi = max(int(min(last_blocks[valid][-1], length)), int(starts[-1]) + 1)
+        # 必要な範囲だけを読む (メモリマップの場合はこの部分だけがディスクから読まれる)
+        chunk = np.asarray(self.data[self._offsets[level] + lo:self._offsets[level] + hi])
+        starts -= lo
+        peaks[valid, 0] = np.minimum.reduceat(chunk[:, 0], starts)
+        peaks[valid, 1] = np.maximum.reduceat(chunk[:, 1], starts)
+        return peaks, valid
@@ -0,0 +1,165 @@
+import functools
+import json
+import time
+
+class LatencyHistogram:
+    """
+    処理時間の分布を、2のべき乗ナノ秒ごとのバケットで集計するヒストグラム。
+    記録は整数演算だけで済むため、ホットパスでも負荷がほとんどかかりません。
+    """
+    BUCKET_COUNT = 40  # 2^39 ns (約9分) までを区別する
+
+    def __init__(self):
+        self.buckets = [0] * self.BUCKET_COUNT
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+
+    def record(self, duration_ns: int):
+        index = min(duration_ns.bit_length(), self.BUCKET_COUNT - 1)
+        self.buckets[index] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        if self.min_ns is None or duration_ns < self.min_ns:
+            self.min_ns = duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def percentile_ns(self, percentile: float) -> int:
+        """
+        指定パーセンタイルの推定値(ns)を返します。
+        該当するバケットの上限値を返すため、実際の値より最大2倍大きく見積もられます。
+        """
+        if self.count == 0:
+            return 0
+        threshold = self.count * percentile / 100.0
+        cumulative = 0
+        for index, bucket_count in enumerate(self.buckets):
+            cumulative += bucket_count
+            if cumulative >= threshold:
+                return min((1 << index) - 1, self.max_ns) if index else 0
+        return self.max_ns
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": (self.total_ns / self.count / 1e6) if self.count else 0.0,
+            "min_ms": (self.min_ns or 0) / 1e6,
+            "p50_ms": self.percentile_ns(50) / 1e6,
+            "p95_ms": self.percentile_ns(95) / 1e6,
+            "p99_ms": self.percentile_ns(99) / 1e6,
+            "max_ms": self.max_ns / 1e6,
+            "buckets": {str(1 << index): count for index, count in enumerate(self.buckets) if count},
+        }
+
+
+class _Measurement:
+    """Profiler.measure() が返すコンテキストマネージャ。"""
+    __slots__ = ("_profiler", "_name", "_start")
+
+    def __init__(self, profiler, name: str):
+        self._profiler = profiler
+        self._name = name
+        self._start = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._profiler.record(self._name, time.perf_counter_ns() - self._start)
+        return False
+
+
+class _NullMeasurement:
+    """計測が無効なときに返す、何もしないコンテキストマネージャ。"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NULL_MEASUREMENT = _NullMeasurement()
+
+
+class Profiler:
+    """
+    ホットパスの処理時間を名前ごとのヒストグラムに集計するクラス。
+    無効なときは、計測箇所のコストが属性の参照1回だけになるようにしています。
+
+    使い方:
+        with profiler.measure("ui.tick"):
+            ...
+
+        @profiler.timed("video.seek")
+        def set_time(self, time_ms): ...
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._histograms = {}
+
+    def measure(self, name: str):
+        """with文で囲んだ区間の処理時間を記録するコンテキストマネージャを返します。"""
+        if not self.enabled:
+            return _NULL_MEASUREMENT
+        return _Measurement(self, name)
+
+    def timed(self, name: str):
+        """関数の処理時間を記録するデコレータを返します。"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter_ns() - start)
+            return wrapper
+        return decorator
+
+    def record(self, name: str, duration_ns: int):
+        """処理時間(ns)を1件記録します。"""
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = LatencyHistogram()
+        histogram.record(duration_ns)
+
+    def has_data(self) -> bool:
+        return bool(self._histograms)
+
+    def get_stats(self) -> dict:
+        """名前ごとの集計結果を辞書で返します。"""
+        return {name: histogram.to_dict() for name, histogram in sorted(self._histograms.items())}
+
+    def format_summary(self) -> str:
+        """オーバーレイ表示用に、集計結果を1行1項目のテキストにまとめます。"""
+        lines = [f"{'name':<20}{'count':>8}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}"]
+        for name, stats in self.get_stats().items():
+            lines.append(f"{name:<20}{stats['count']:>8}{stats['p50_ms']:>9.2f}"
+                         f"{stats['p95_ms']:>9.2f}{stats['max_ms']:>9.2f}")
+        return "\n".join(lines)
+
+    def dump_json(self, path: str):
+        """集計結果をJSONファイルに保存します (後で比較するため)。"""
+        data = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "stats": self.get_stats(),
+        }
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+            print(f"Profile saved to {path}")
+        except IOError as e:
+            print(f"Error saving profile: {e}")
+
+    def reset(self):
+        self._histograms = {}
+
+# アプリケーション全体で共有するプロファイラ
+profiler = Profiler()
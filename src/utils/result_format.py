@@ -0,0 +1,6 @@
+# 保存した結果のCSVの形式に関する定数 (書き出す側と、読み込む各モデルで共有する)
+
+# 結果のCSVの合計行の手順名
+TOTAL_ROW_NAME = "合計"
+# 評価者間の一致度のレポートのファイル名の接頭辞 (入力の結果として読み込まないように、この接頭辞のCSVは除外する)
+REPORT_PREFIX = "agreement_"
@@ -0,0 +1,117 @@
+import queue
+import threading
+import numpy as np
+from PIL import Image
+
+# JPEGの画質
+JPEG_QUALITY = 80
+
+class SnapshotWriter:
+    """
+    記録の開始・終了時のフレームを、バックグラウンドのスレッドで縮小・JPEG圧縮して保存するクラス。
+
+    Tkのスレッドで行うのは、フレームの間引きコピー (縮小後の幅の2倍程度まで) とキューへの追加だけです。
+    保存待ちのフレームが使うメモリは max_pending_bytes までで、超える場合はそのスナップショットを
+    保存せずに False を返すため、S/E のショートカットを待たせることはありません。
+    """
+
+    def __init__(self, width: int, max_pending_bytes: int):
+        """
+        Args:
+            width: 保存する画像の幅(px)。高さはフレームの縦横比から決まる。
+            max_pending_bytes: 保存待ちのフレームのメモリの上限(バイト)。
+        """
+        self.width = width
+        self.max_pending_bytes = max_pending_bytes
+        self._pending_bytes = 0
+        # キューに入っていて、まだ保存し終えていないスナップショットの数
+        self._pending_jobs = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        self._thread.start()
+        self.saved_count = 0
+        self.dropped_count = 0
+
+    @property
+    def pending_bytes(self) -> int:
+        return self._pending_bytes
+
+    def submit_frame(self, frame: np.ndarray, path: str) -> bool:
+        """
+        BGRA のフレーム (H, W, 4) を縮小して path にJPEGで保存するよう依頼します。
+        フレームはこの呼び出しの中で間引いてコピーするため、呼び出し後に書き換えられても構いません。
+        メモリの上限を超える場合は何もせず False を返します。
+        """
+        step = max(1, frame.shape[1] // (self.width * 2))
+        nbytes = -(-frame.shape[0] // step) * -(-frame.shape[1] // step) * frame.shape[2]
+        if not self._reserve(nbytes):
+            return False
+        with self._lock:
+            self._pending_jobs += 1
+        # 1ピクセル (4バイト) を1要素として間引くと、バイト単位で間引くより1桁速い
+        pixels = np.ascontiguousarray(frame).view(np.uint32)[..., 0]
+        small = np.ascontiguousarray(pixels[::step, ::step]).view(np.uint8).reshape(-1, -(-frame.shape[1] // step), 4)
+        self._queue.put((self._encode, (small, path), nbytes))
+        return True
+
+    def submit_call(self, func, *args) -> bool:
+        """
+        func(*args) をバックグラウンドのスレッドで実行するよう依頼します。
+        ブロックすることのある libVLC のスナップショットなどに使います。
+        """
+        with self._lock:
+            self._pending_jobs += 1
+        self._queue.put((func, args, 0))
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        保存待ちのスナップショットがすべて書き終わるまで待ちます。Tkのスレッドから呼ばないこと。
+        時間内に書き終わった場合は True を返します。
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending_jobs == 0, timeout)
+
+    def close(self, timeout: float = 5.0):
+        """保存待ちのスナップショットを書き終えてから、スレッドを終了します。"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    # --- 内部処理 ---
+
+    def _reserve(self, nbytes: int) -> bool:
+        with self._lock:
+            if self._pending_bytes + nbytes > self.max_pending_bytes:
+                self.dropped_count += 1
+                print(f"Snapshot skipped: {self._pending_bytes / (1024 * 1024):.1f} MB of snapshots are still pending.")
+                return False
+            self._pending_bytes += nbytes
+        return True
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            func, args, nbytes = job
+            try:
+                if func(*args) is False:
+                    print(f"Failed to save snapshot: {args[0] if args else func}")
+                else:
+                    self.saved_count += 1
+            except Exception as e:
+                print(f"Failed to save snapshot: {e}")
+            finally:
+                with self._idle:
+                    self._pending_bytes -= nbytes
+                    self._pending_jobs -= 1
+                    self._idle.notify_all()
+
+    def _encode(self, frame: np.ndarray, path: str):
+        height, width = frame.shape[:2]
+        image = Image.frombuffer("RGB", (width, height), frame, "raw", "BGRX", 0, 1)
+        if width > self.width:
+            image = image.resize((self.width, max(1, round(height * self.width / width))), Image.BILINEAR)
+        image.save(path, "JPEG", quality=JPEG_QUALITY)
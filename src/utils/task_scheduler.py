@@ -0,0 +1,318 @@
+import heapq
+import itertools
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# 優先度 (小さいほど先に実行される)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+class TaskCancelled(Exception):
+    """タスクがキャンセルされたことを示す例外。タスクの関数内から送出して中断できます。"""
+
+
+class CancellationToken:
+    """タスクのキャンセル要求を、実行中の関数へ伝えるためのトークン。"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TaskCancelled()
+
+
+class TaskContext:
+    """
+    ワーカースレッドで実行される関数に、第1引数として渡されるオブジェクト。
+    キャンセルの確認と進捗の報告だけを提供し、Tkのオブジェクトには触れさせません。
+    """
+
+    def __init__(self, scheduler, task):
+        self._scheduler = scheduler
+        self._task = task
+
+    @property
+    def token(self) -> CancellationToken:
+        return self._task.token
+
+    def report_progress(self, fraction: float, message: str = ""):
+        """進捗 (0.0〜1.0) を報告します。on_progress はTkのスレッドで呼ばれます。"""
+        self._scheduler._post_progress(self._task, fraction, message)
+
+
+class Task:
+    """TaskScheduler.submit() が返す、タスクの状態とキャンセル操作を持つオブジェクト。"""
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, scheduler, name: str, priority: int, func, args, kwargs,
+                 on_done, on_error, on_progress):
+        self.name = name
+        self.priority = priority
+        self.state = self.PENDING
+        self.progress = 0.0
+        self.token = CancellationToken()
+        self._scheduler = scheduler
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self._on_done = on_done
+        self._on_error = on_error
+        self._on_progress = on_progress
+        # 進捗の通知がキューに溜まりすぎないよう、最新の値だけを届ける
+        self._latest_progress = None
+        self._progress_lock = threading.Lock()
+
+    def cancel(self):
+        """
+        タスクをキャンセルします。実行前のタスクは実行されず、実行中のタスクには token で通知します。
+        キャンセルされたタスクの on_done / on_error は呼ばれません。
+        """
+        self.token.cancel()
+
+    def is_finished(self) -> bool:
+        return self.state in (self.DONE, self.FAILED, self.CANCELLED)
+
+
+class TaskScheduler:
+    """
+    時間のかかる処理をスレッドプールで実行し、結果をTkのスレッドへ戻すスケジューラ。
+
+    ワーカースレッドからの結果・エラー・進捗はキューに積まれ、Tkの after() で定期的に動く
+    1つのポンプだけがそれを取り出してコールバックを呼び出します。
+    そのため、コールバック (on_done / on_error / on_progress / call_soon) は必ずTkのスレッドで実行され、
+    ワーカースレッドからTkを操作することはありません。
+
+    PRIORITY_HIGH のタスク (記録の保存など) のために、ワーカーを1つ余分に用意して空けておきます。
+    それ以外のタスクは同時に max_workers 個までしか実行しないため、クリップの書き出しやレポートの作成が
+    長くかかっていても、保存はすぐに始まります。
+
+    使い方:
+        scheduler.submit(write_csv, df, path, priority=PRIORITY_HIGH,
+                         on_done=lambda result: ..., on_error=lambda error: ...)
+
+        def write_csv(context, df, path):
+            context.token.raise_if_cancelled()
+            context.report_progress(0.5, "Writing CSV")
+            ...
+    """
+    # タスクの実行中と待機中のポンプの間隔(ms)
+    ACTIVE_POLL_MS = 30
+    IDLE_POLL_MS = 200
+
+    def __init__(self, root, max_workers: int = 2):
+        """
+        Args:
+            root: after() でポンプを動かすTkのウィジェット。Tkのスレッドで作成すること。
+            max_workers: PRIORITY_HIGH 以外のタスクを同時に実行する最大数。
+                         PRIORITY_HIGH のタスクは、これに加えて1つ多く実行できる。
+        """
+        self._root = root
+        self._tk_thread = threading.current_thread()
+        self._max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers + 1, thread_name_prefix="svat-task")
+
+        # (優先度, 投入順, Task) のヒープ
+        self._pending = []
+        self._sequence = itertools.count()
+        self._running = set()
+        # Tkのスレッドで実行する (callback, args) のキュー
+        self._inbox = queue.SimpleQueue()
+        self._pump_timer = None
+        # begin_shutdown() の後は新しいタスクを受け付けない
+        self._accepting = True
+        self._closed = False
+        self._schedule_pump()
+
+    # --- Tkのスレッドから呼ぶAPI ---
+
+    def submit(self, func, *args, name: str = "", priority: int = PRIORITY_NORMAL,
+               on_done=None, on_error=None, on_progress=None, **kwargs) -> Task:
+        """
+        func(context, *args, **kwargs) をワーカースレッドで実行するタスクを登録します。
+
+        Args:
+            func: 実行する関数。第1引数に TaskContext を受け取る。Tkを操作してはいけない。
+            name: ログ出力用の名前。
+            priority: 優先度。PRIORITY_HIGH / PRIORITY_NORMAL / PRIORITY_LOW。
+            on_done: 成功時に戻り値を引数に呼ばれる。
+            on_error: 例外が発生したときに例外を引数に呼ばれる。
+            on_progress: 進捗の報告ごとに (fraction, message) を引数に呼ばれる。
+        """
+        self._check_tk_thread("submit")
+        if self._closed or not self._accepting:
+            raise RuntimeError("TaskScheduler has been shut down")
+        task = Task(self, name or getattr(func, "__name__", "task"), priority, func, args, kwargs,
+                    on_done, on_error, on_progress)
+        heapq.heappush(self._pending, (priority, next(self._sequence), task))
+        self._dispatch()
+        self._schedule_pump(soon=True)
+        return task
+
+    def has_active_tasks(self) -> bool:
+        return bool(self._pending or self._running)
+
+    def begin_shutdown(self):
+        """
+        新しいタスクの受け付けをやめ、PRIORITY_HIGH 以外のタスクをキャンセルします。
+        PRIORITY_HIGH のタスク (記録の保存など) はそのまま実行され、コールバックも呼ばれます。
+        Tkのスレッドをブロックしないよう、has_active_tasks() が False になるまで after() で待ってから
+        shutdown() を呼んでください。
+        """
+        self._check_tk_thread("begin_shutdown")
+        self._accepting = False
+        kept = []
+        for entry in self._pending:
+            task = entry[2]
+            if task.priority > PRIORITY_HIGH:
+                task.token.cancel()
+                task.state = Task.CANCELLED
+            else:
+                kept.append(entry)
+        heapq.heapify(kept)
+        self._pending = kept
+        for task in self._running:
+            if task.priority > PRIORITY_HIGH:
+                task.token.cancel()
+        self._dispatch()
+        self._schedule_pump(soon=True)
+
+    def shutdown(self, wait: bool = True):
+        """
+        待機中のタスクを破棄し、実行中のタスクにキャンセルを通知してスケジューラを停止します。
+        wait が True の場合は、実行中のタスクが終わるまで待ちます (ファイルの書き込み途中で終了しないため)。
+        終了後に届いた結果のコールバックは呼ばれません。
+        """
+        self._check_tk_thread("shutdown")
+        if self._closed:
+            return
+        self._closed = True
+        for _, _, task in self._pending:
+            task.token.cancel()
+            task.state = Task.CANCELLED
+        self._pending = []
+        for task in self._running:
+            task.token.cancel()
+        if self._pump_timer:
+            self._root.after_cancel(self._pump_timer)
+            self._pump_timer = None
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    # --- どのスレッドからでも呼べるAPI ---
+
+    def call_soon(self, callback, *args):
+        """callback(*args) を、次のポンプでTkのスレッドから呼び出します。"""
+        self._inbox.put((callback, args))
+
+    # --- 内部処理 ---
+
+    def _check_tk_thread(self, operation: str):
+        if threading.current_thread() is not self._tk_thread:
+            raise RuntimeError(f"TaskScheduler.{operation} must be called from the Tk thread "
+                               f"(called from '{threading.current_thread().name}')")
+
+    def _dispatch(self):
+        """
+        空いているワーカーに、優先度の高い順にタスクを割り当てます (Tkのスレッドで実行)。
+        最後の1つのワーカーは PRIORITY_HIGH のタスクにだけ割り当てます。
+        """
+        while self._pending and len(self._running) <= self._max_workers:
+            priority, _, task = self._pending[0]
+            if task.token.is_cancelled:
+                heapq.heappop(self._pending)
+                task.state = Task.CANCELLED
+                continue
+            if priority > PRIORITY_HIGH and \
+                    sum(running.priority > PRIORITY_HIGH for running in self._running) >= self._max_workers:
+                # ヒープの先頭が PRIORITY_HIGH でなければ、待機中の PRIORITY_HIGH のタスクはない
+                break
+            heapq.heappop(self._pending)
+            task.state = Task.RUNNING
+            self._running.add(task)
+            self._executor.submit(self._run, task)
+
+    def _run(self, task: Task):
+        """ワーカースレッドでタスクを実行し、結果をTkのスレッドへ送ります。"""
+        try:
+            task.token.raise_if_cancelled()
+            result = task._func(TaskContext(self, task), *task._args, **task._kwargs)
+        except TaskCancelled:
+            self.call_soon(self._finish, task, Task.CANCELLED, None)
+        except Exception as e:
+            print(f"Task '{task.name}' failed: {e}")
+            traceback.print_exc()
+            self.call_soon(self._finish, task, Task.FAILED, e)
+        else:
+            self.call_soon(self._finish, task, Task.DONE, result)
+
+    def _post_progress(self, task: Task, fraction: float, message: str):
+        with task._progress_lock:
+            already_posted = task._latest_progress is not None
+            task._latest_progress = (fraction, message)
+        if not already_posted:
+            self.call_soon(self._deliver_progress, task)
+
+    def _deliver_progress(self, task: Task):
+        with task._progress_lock:
+            fraction, message = task._latest_progress
+            task._latest_progress = None
+        task.progress = fraction
+        if task._on_progress and not task.token.is_cancelled:
+            task._on_progress(fraction, message)
+
+    def _finish(self, task: Task, state: str, value):
+        self._running.discard(task)
+        if task.token.is_cancelled:
+            state = Task.CANCELLED
+        task.state = state
+        if state == Task.DONE:
+            task.progress = 1.0
+            if task._on_done:
+                task._on_done(value)
+        elif state == Task.FAILED and task._on_error:
+            task._on_error(value)
+        self._dispatch()
+
+    def _pump(self):
+        """キューに溜まったコールバックをTkのスレッドで実行します。"""
+        self._pump_timer = None
+        if self._closed:
+            return
+        self._check_tk_thread("_pump")
+        # ポンプ中に追加されたものは次回に回し、1回の処理時間を抑える
+        for _ in range(self._inbox.qsize()):
+            try:
+                callback, args = self._inbox.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Task callback failed: {e}")
+                traceback.print_exc()
+        self._schedule_pump()
+
+    def _schedule_pump(self, soon: bool = False):
+        if self._closed:
+            return
+        if soon and self._pump_timer:
+            self._root.after_cancel(self._pump_timer)
+            self._pump_timer = None
+        if self._pump_timer:
+            return
+        active = self.has_active_tasks() or not self._inbox.empty()
+        self._pump_timer = self._root.after(self.ACTIVE_POLL_MS if active else self.IDLE_POLL_MS, self._pump)
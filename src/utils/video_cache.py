@@ -0,0 +1,98 @@
+import hashlib
+import mmap
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 指紋の計算方法を変えたときに上げる (古いキャッシュと混ざらないようにする)
+FINGERPRINT_VERSION = 1
+# 指紋に使う区間の数と、1区間の大きさ
+FINGERPRINT_CHUNKS = 16
+FINGERPRINT_CHUNK_BYTES = 64 * 1024
+# 同時に読むファイルの数 (ネットワーク上のファイルは待ち時間が長いため、並列に読む)
+FINGERPRINT_WORKERS = 8
+
+# (絶対パス, サイズ, 更新日時) -> 指紋。同じファイルを何度も読まないためのキャッシュ
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+_executor = None
+
+def compute_video_fingerprint(video_path: str) -> str:
+    """
+    動画ファイルの内容から指紋を計算します。
+    ファイル全体ではなく、サイズと、先頭から末尾まで等間隔に取った一定数の区間だけを
+    メモリマップで読んでハッシュするため、ファイルの大きさによらず数ミリ秒で終わります。
+    """
+    size = os.path.getsize(video_path)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"v{FINGERPRINT_VERSION}|{size}".encode("ascii"))
+    if size == 0:
+        return digest.hexdigest()
+
+    with open(video_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if hasattr(mapped, "madvise"):
+            # 区間の前後を先読みさせない
+            mapped.madvise(mmap.MADV_RANDOM)
+        chunk_count = FINGERPRINT_CHUNKS
+        if size <= chunk_count * FINGERPRINT_CHUNK_BYTES:
+            digest.update(mapped[:])
+        else:
+            last_offset = size - FINGERPRINT_CHUNK_BYTES
+            for i in range(chunk_count):
+                offset = last_offset * i // (chunk_count - 1)
+                digest.update(mapped[offset:offset + FINGERPRINT_CHUNK_BYTES])
+    return digest.hexdigest()
+
+def get_video_fingerprint(video_path: str) -> str:
+    """
+    動画ファイルの指紋を返します。パス・サイズ・更新日時が同じ間は、計算済みの値を使います。
+    """
+    stat = os.stat(video_path)
+    key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+    with _fingerprints_lock:
+        fingerprint = _fingerprints.get(key)
+    if fingerprint is None:
+        fingerprint = compute_video_fingerprint(video_path)
+        with _fingerprints_lock:
+            _fingerprints[key] = fingerprint
+    return fingerprint
+
+def get_video_fingerprints(video_paths: list[str]) -> list[str | None]:
+    """
+    複数の動画ファイルの指紋を、スレッドプールで並列に計算して返します。
+    読めなかったファイルは None になります。
+    """
+    global _executor
+
+    def fingerprint_or_none(path):
+        try:
+            return get_video_fingerprint(path)
+        except (OSError, ValueError) as e:
+            print(f"Failed to fingerprint {path}: {e}")
+            return None
+
+    if len(video_paths) <= 1:
+        return [fingerprint_or_none(path) for path in video_paths]
+    with _fingerprints_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=FINGERPRINT_WORKERS, thread_name_prefix="fingerprint")
+    return list(_executor.map(fingerprint_or_none, video_paths))
+
+def get_video_cache_key(video_path: str) -> str:
+    """
+    動画ファイルごとのキャッシュキーを返します。
+    内容の指紋から作るため、名前の変更や移動をしても同じキーになり、同じ内容のコピーはキャッシュを共有します。
+    ファイルが上書きされて内容が変わると、キーも変わります。
+    """
+    return get_video_fingerprint(video_path)
+
+def get_video_cache_path(cache_dir: str, video_path: str, suffix: str) -> str:
+    """
+    キャッシュディレクトリ内の、動画ファイルに対応するキャッシュファイルのパスを返します。
+
+    Args:
+        cache_dir: キャッシュの種類ごとのディレクトリ。
+        video_path: 動画ファイルのパス。
+        suffix: キャッシュファイルの拡張子 (例: ".npz")。
+    """
+    return os.path.join(cache_dir, get_video_cache_key(video_path) + suffix)
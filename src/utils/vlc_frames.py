@@ -0,0 +1,188 @@
+import ctypes
+import queue
+import threading
+import numpy as np
+import vlc
+from .frame_buffer import FrameBuffer
+
+class VlcFrameCallbacks:
+    """
+    libVLCのビデオコールバック (lock/unlock/display) を、事前に確保した
+    NumPyバッファに接続するクラス。
+    VLCはデコードしたフレームをこのバッファへ直接書き込むため、Python側でのコピーは発生しません。
+    """
+
+    def __init__(self, player: vlc.MediaPlayer, width: int, height: int, on_frame):
+        """
+        Args:
+            player: コールバックを設定する MediaPlayer。
+            width: 出力フレームの幅(px)。VLCがこのサイズへ縮小します。
+            height: 出力フレームの高さ(px)。
+            on_frame: フレームが書き込まれるたびに、VLCのスレッドから buffer を引数に呼ばれる関数。
+        """
+        self.width = width
+        self.height = height
+        # RV32 は BGRA の順で1ピクセル4バイト
+        self.buffer = np.zeros((height, width, 4), dtype=np.uint8)
+        self._buffer_ptr = self.buffer.ctypes.data_as(ctypes.c_void_p).value
+        self._on_frame = on_frame
+
+        # ctypesのコールバックはGCされないように参照を保持しておく必要がある
+        self._lock_cb = vlc.CallbackDecorators.VideoLockCb(self._lock)
+        self._unlock_cb = vlc.CallbackDecorators.VideoUnlockCb(self._unlock)
+        self._display_cb = vlc.CallbackDecorators.VideoDisplayCb(self._display)
+
+        player.video_set_callbacks(self._lock_cb, self._unlock_cb, self._display_cb, None)
+        player.video_set_format("RV32", width, height, width * 4)
+
+    def _lock(self, opaque, planes):
+        planes[0] = self._buffer_ptr
+        return None
+
+    def _unlock(self, opaque, picture, planes):
+        pass
+
+    def _display(self, opaque, picture):
+        self._on_frame(self.buffer)
+
+
+class VlcFrameBufferCallbacks:
+    """
+    libVLCのビデオコールバックを FrameBuffer に接続するクラス。
+    VLCは FrameBuffer の書き込み用バッファへ直接デコードし、表示のタイミングでバッファを入れ替えます。
+    """
+
+    def __init__(self, player: vlc.MediaPlayer, frame_buffer: FrameBuffer, on_display=None):
+        """
+        Args:
+            player: コールバックを設定する MediaPlayer。
+            frame_buffer: フレームを受け渡す FrameBuffer。
+            on_display: 表示されるフレームごとに、バッファを入れ替える前にVLCのスレッドから
+                        書き込まれたフレームを引数に呼ばれる関数。UIが取りこぼすフレームも受け取れる。
+        """
+        self.frame_buffer = frame_buffer
+        self._on_display = on_display
+
+        # ctypesのコールバックはGCされないように参照を保持しておく必要がある
+        self._lock_cb = vlc.CallbackDecorators.VideoLockCb(self._lock)
+        self._unlock_cb = vlc.CallbackDecorators.VideoUnlockCb(self._unlock)
+        self._display_cb = vlc.CallbackDecorators.VideoDisplayCb(self._display)
+
+        player.video_set_callbacks(self._lock_cb, self._unlock_cb, self._display_cb, None)
+        player.video_set_format("RV32", frame_buffer.width, frame_buffer.height, frame_buffer.width * 4)
+
+    def _lock(self, opaque, planes):
+        planes[0] = self.frame_buffer.get_write_pointer()
+        return None
+
+    def _unlock(self, opaque, picture, planes):
+        pass
+
+    def _display(self, opaque, picture):
+        if self._on_display is not None:
+            self._on_display(self.frame_buffer.get_write_buffer())
+        self.frame_buffer.publish()
+
+
+def bgra_to_gray(frames: np.ndarray) -> np.ndarray:
+    """
+    BGRAフレーム (..., H, W, 4) を輝度 (..., H, W) の uint8 に変換します。
+    整数演算のみで計算するため、浮動小数点への変換コストがかかりません。
+    """
+    b = frames[..., 0].astype(np.uint16)
+    g = frames[..., 1].astype(np.uint16)
+    r = frames[..., 2].astype(np.uint16)
+    return ((29 * b + 150 * g + 77 * r) >> 8).astype(np.uint8)
+
+
+def iter_gray_frames(path: str, width: int, height: int, interval_ms: int,
+                     start_ms: int = 0, stop_ms: int | None = None, max_queued: int = 32, cancelled=None):
+    """
+    動画ファイルを低解像度のグレースケールフレームとして順に読み出すジェネレータ。
+    動画全体をメモリに載せることはなく、キューに溜まるのは最大 max_queued フレームだけです。
+
+    Args:
+        path: 動画ファイルのパス。
+        width, height: 解析用に縮小したフレームサイズ(px)。
+        interval_ms: フレームを取り出す間隔(ms)。これより細かいフレームは読み飛ばします。
+        start_ms, stop_ms: 読み出す区間(ms)。stop_ms が None の場合は最後まで。
+        max_queued: デコード側が先行できる最大フレーム数。
+        cancelled: 中止が要求されていれば True を返す関数。フレームを待つ合間にも確認し、要求されたら読み出しをやめる。
+
+    Yields:
+        (ファイル内の時間(ms), グレースケールフレーム (height, width) uint8) のタプル。
+    """
+    frames = queue.Queue(maxsize=max_queued)
+    finished = threading.Event()
+    end_of_stream = object()
+
+    instance = vlc.Instance("--no-audio", "--quiet", "--no-video-title-show", "--no-xlib")
+    player = instance.media_player_new()
+    media = instance.media_new(path)
+    media.add_option(f":start-time={start_ms / 1000.0:.3f}")
+    if stop_ms is not None:
+        media.add_option(f":stop-time={stop_ms / 1000.0:.3f}")
+    player.set_media(media)
+
+    next_sample_ms = [start_ms]
+
+    def on_frame(buffer):
+        if finished.is_set():
+            return
+        time_ms = player.get_time()
+        if time_ms < next_sample_ms[0]:
+            return
+        next_sample_ms[0] = time_ms + interval_ms
+        # キューが一杯のときはここで待つため、デコードが解析より先行しすぎることはない
+        gray = bgra_to_gray(buffer)
+        while not finished.is_set():
+            try:
+                frames.put((time_ms, gray), timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def on_end(event):
+        finished.set()
+        try:
+            frames.put_nowait(end_of_stream)
+        except queue.Full:
+            pass
+
+    callbacks = VlcFrameCallbacks(player, width, height, on_frame)
+    events = player.event_manager()
+    events.event_attach(vlc.EventType.MediaPlayerEndReached, on_end)
+    events.event_attach(vlc.EventType.MediaPlayerEncounteredError, on_end)
+    events.event_attach(vlc.EventType.MediaPlayerStopped, on_end)
+
+    # 表示用ではないので、時計に合わせず可能な限り速くデコードさせる
+    player.play()
+    player.set_rate(32.0)
+
+    try:
+        while True:
+            if cancelled and cancelled():
+                return
+            try:
+                item = frames.get(timeout=1.0)
+            except queue.Empty:
+                if finished.is_set():
+                    break
+                continue
+            if item is end_of_stream:
+                break
+            yield item
+        # 終了イベントより前にキューに入ったフレームを取りこぼさない
+        while True:
+            try:
+                item = frames.get_nowait()
+            except queue.Empty:
+                break
+            if item is not end_of_stream:
+                yield item
+    finally:
+        finished.set()
+        player.stop()
+        player.release()
+        instance.release()
+        del callbacks
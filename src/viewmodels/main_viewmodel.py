@@ -1,10 +1,22 @@
 import tkinter as tk
 from tkinter import simpledialog, messagebox
+import json
 import os
 from datetime import datetime
 from ..utils import helpers
 import pandas as pd
 from ..utils.helpers import format_time
+from ..utils.profiler import profiler
+from ..utils.result_format import TOTAL_ROW_NAME
+from ..utils.input_trace import input_trace
+from ..utils.task_scheduler import PRIORITY_HIGH, PRIORITY_LOW, TaskScheduler
+from ..utils.video_cache import get_video_fingerprints
+from ..utils.snapshot_writer import SnapshotWriter
+from ..models.agreement_model import run_agreement
+from ..models.clip_export_model import plan_clip_jobs, run_clip_export
+from ..models.report_model import run_reports, write_session_report
+from ..models.session_file_model import SESSION_SUFFIX, write_session
+from ..models.stamp_predictor_model import scan_result_sequences
 from tkinter import filedialog
 from ..views.add_stamp_dialog import AddStampDialog
 
@@ -13,34 +25,130 @@ class MainViewModel:
     メインウィンドウのViewModel。
     Viewからのユーザー操作を処理し、Modelと連携してアプリケーションの状態を管理します。
     """
-    def __init__(self, settings_model, preset_model, analysis_model, video_model):
+    def __init__(self, settings_model, preset_model, analysis_model, video_model, scene_model=None, motion_model=None,
+                 proxy_model=None, keyframe_model=None, worklist_model=None, audio_model=None, stamp_predictor=None):
         self.settings_model = settings_model
         self.preset_model = preset_model
         self.analysis_model = analysis_model
         self.video_model = video_model
+        self.scene_model = scene_model
+        self.motion_model = motion_model
+        self.proxy_model = proxy_model
+        self.keyframe_model = keyframe_model
+        self.worklist_model = worklist_model
+        self.audio_model = audio_model
+        self.stamp_predictor = stamp_predictor
         self.view = None
+        self.scheduler = None
         
         print("MainViewModel initialized.")
 
         self._update_timer = None
+        self._analysis_poll_timer = None
+        self._worklist_poll_timer = None
+        # プレイヤーが動画の長さを取得し終えるのを待つタイマー
+        self._video_load_timer = None
+        # 実行中のクリップの書き出しのタスク
+        self._clip_export_task = None
+        # 記録の開始・終了時のフレームを保存するライター (最初に使うときに作成する)
+        self.snapshot_writer = None
+        # このセッションのスナップショットのフォルダ (結果のフォルダからの相対パス) と、保存した枚数
+        self._snapshot_dir = None
+        self._snapshot_count = 0
+        # UI更新ループで、値が変わったときだけTkの変数へ書き込むための前回値
+        self._total_time_text = format_time(0)
+        self._last_displayed_second = None
+        self._last_is_playing = None
+        self._last_timeline_position = None
+        self._perf_overlay_timer = None
+        self._video_frame_timer = None
+        # 終了処理の途中 (保存のタスクの完了待ち) かどうか
+        self._closing = False
+        # ドラッグ中にキーフレームへ補正してシークした、マウスの位置(ms)
+        self._drag_seek_target = None
+        # 読み込んだ各動画の内容の指紋 (結果と一緒に保存し、名前の変更や移動をしても動画を特定できるようにする)
+        self._video_fingerprints = []
+        # 数字キー (1〜9) で選べる、予測した次の手順 (可能性の高い順)
+        self.predicted_stamps = []
+        # 開き直したセッションの (プリセット名, 保存したときの手順名のリスト) と、内容が変わっていた動画のパス
+        self._resumed_preset = None
+        self._changed_session_videos = []
+        # 記録を結果のCSVに保存し終えたかどうか (保存していない記録は、閉じるときにセッションとして自動保存する)
+        self._results_saved = False
         self.current_preset_name = None
         self.selected_stamp = None
-        self.is_recording = False
         self.is_preset_modified = False
 
+    @property
+    def is_recording(self) -> bool:
+        """記録中の手順が1つ以上あるかどうか。"""
+        return bool(self.analysis_model and self.analysis_model.is_recording())
+
     def set_view(self, view):
         self.view = view
+        # 時間のかかる処理の結果は、このスケジューラ経由でTkのスレッドに戻す
+        self.scheduler = TaskScheduler(view)
+        if self.audio_model:
+            self.view.waveform.set_peak_provider(self.audio_model.get_peaks)
 
     def on_window_closing(self):
+        if self._closing:
+            return
         if self.is_preset_modified:
             if not messagebox.askyesno("Unsaved Changes", "Preset has unsaved changes. Exit without saving?"):
+                if self.view:
+                    # 閉じるのをやめたので、次のセッションの要求 (Open Session など) も取り消す
+                    self.view.is_next_session_requested = False
+                    self.view.requested_worklist_path = None
+                    self.view.requested_session_path = None
                 return
         
         print("Window is closing. Starting cleanup...")
+        self._closing = True
         if self.view:
             self.settings_model.set("window_geometry", self.view.geometry())
+        if self.settings_model.get("session_autosave_enabled") and self._has_unsaved_records():
+            self._autosave_session()
         
         self.settings_model.save()
+        self._dump_profile()
+        self._dump_input_trace()
+        if self._analysis_poll_timer and self.view:
+            self.view.after_cancel(self._analysis_poll_timer)
+        if self._worklist_poll_timer and self.view:
+            self.view.after_cancel(self._worklist_poll_timer)
+        if self._video_load_timer and self.view:
+            self.view.after_cancel(self._video_load_timer)
+        if self._perf_overlay_timer and self.view:
+            self.view.after_cancel(self._perf_overlay_timer)
+        if self._video_frame_timer and self.view:
+            self.view.after_cancel(self._video_frame_timer)
+        if self.snapshot_writer:
+            # 保存待ちのスナップショットを書き終えてから閉じる (CSVから参照されているため)
+            self.snapshot_writer.close()
+        if self._clip_export_task:
+            # クリップの書き出しは途中で止め、次に同じ出力先へ書き出すときに続きから再開する
+            self._clip_export_task.cancel()
+        if self.scheduler:
+            # 記録の保存 (PRIORITY_HIGH) は最後まで書かせ、それ以外のタスクはキャンセルする。
+            # Tkのスレッドをブロックしないよう、タスクが終わるのは after() で待つ
+            self.scheduler.begin_shutdown()
+        self._finish_closing()
+
+    def _finish_closing(self):
+        """スケジューラのタスクが終わったら、残りの終了処理を行ってウィンドウを閉じます。"""
+        if self.view and self.scheduler and self.scheduler.has_active_tasks():
+            self.view.after(50, self._finish_closing)
+            return
+        if self.scheduler:
+            self.scheduler.shutdown(wait=True)
+        next_session = self.view is not None and self.view.is_next_session_requested
+        for model in self._get_analysis_models():
+            # 次のセッションでもワークリストの準備を続けられるよう、プロセスプールは残しておく
+            if next_session:
+                model.cancel()
+            else:
+                model.shutdown()
         self.video_model.release_player()
         
         print("Cleanup finished. Exiting.")
@@ -48,7 +156,24 @@ class MainViewModel:
             self.view.destroy()
 
     def initialize_app(self):
+        # 設定または環境変数で計測が有効になっていれば、起動時から記録する
+        if self.settings_model.get("profiling_enabled") or os.environ.get("SVAT_PROFILE"):
+            profiler.enabled = True
+        # 同様に、操作の記録 (benchmarks/replay_trace.py で再生する) を開始する
+        if self.settings_model.get("input_trace_enabled") or os.environ.get("SVAT_TRACE"):
+            input_trace.start()
         self.current_preset_name = self.preset_model.presets_data.get("last_used")
+        restored_preset = False
+        if self._resumed_preset:
+            # 開き直したセッションでは、保存したときのプリセットを使う
+            preset_name, saved_stamps = self._resumed_preset
+            if preset_name in self.preset_model.get_preset_names():
+                self.current_preset_name = preset_name
+            elif preset_name and saved_stamps:
+                # プリセットが削除・改名されていれば、保存しておいた手順から作り直す (ファイルには保存しない)
+                self.preset_model.save_preset(preset_name, list(saved_stamps))
+                self.current_preset_name = preset_name
+                restored_preset = True
         stamps = self.preset_model.get_stamps(self.current_preset_name)
         
         if self.view:
@@ -59,11 +184,23 @@ class MainViewModel:
 
             preset_names = self.preset_model.get_preset_names()
             self.view.update_preset_combo(preset_names, self.current_preset_name)
+            if restored_preset:
+                self._mark_preset_as_modified()
             self.view.speed_buttons[1.0].config(state=tk.DISABLED)
             memo_enabled = self.settings_model.get("memo_enabled", False)
             self.view.memo_enabled_var.set(memo_enabled)
             graph_enabled = self.settings_model.get("graph_enabled", True)
             self.view.graph_enabled_var.set(graph_enabled)
+            if self.worklist_model:
+                self._poll_worklist()
+                self._warn_worklist_case_errors()
+            if self._changed_session_videos:
+                messagebox.showwarning("Open Session", "These videos have changed since the session was saved:\n\n"
+                                       + "\n".join(self._changed_session_videos), parent=self.view)
+            if self.stamp_predictor:
+                last_record = self.analysis_model.get_last_record()
+                self._show_stamp_predictions(last_record["手順名"] if last_record else None, stamps)
+                self._learn_stamp_history()
             
         print(f"Loaded preset '{self.current_preset_name}' with {len(stamps)} stamps.")
 
@@ -145,6 +282,9 @@ class MainViewModel:
         stamps = self.preset_model.get_stamps(self.current_preset_name)
         self.view.update_preset_combo(self.preset_model.get_preset_names(), self.current_preset_name)
         self.view.update_stamp_list_and_select(stamps)
+        if self.stamp_predictor:
+            last_record = self.analysis_model.get_last_record()
+            self._show_stamp_predictions(last_record["手順名"] if last_record else None, stamps)
         print(f"Switched to preset: {new_preset_name}")
 
     def on_save_preset_clicked(self):
@@ -235,12 +375,8 @@ class MainViewModel:
             filetypes=(("Movie Files", "*.mp4 *.mov *.avi"), ("All files", "*.*"))
         )
         if not file_paths: return
-        self.video_model.set_video_files(list(file_paths))
-        if self.view:
-            handle = self.view.get_video_frame_handle()
-            self.video_model.set_display_handle(handle)
         print(f"Video files selected: {file_paths}")
-        self.update_ui_regularly()
+        self.load_videos(list(file_paths))
 
     def on_play_pause_clicked(self):
         self.video_model.play_pause()
@@ -252,6 +388,14 @@ class MainViewModel:
         if new_time < 0: new_time = 0
         self.video_model.set_time(new_time)
 
+    def on_step_frame_clicked(self, direction: int):
+        """1フレーム進める (direction=1) または戻す (direction=-1)。"""
+        frame = self.video_model.step_frame(direction)
+        if frame is not None:
+            # リングバッファに残っていたフレームは、デコードせずにそのまま表示する
+            self.view.show_video_frame(frame)
+        self.update_ui_regularly()
+
     def on_set_speed_clicked(self, rate: float):
         self.video_model.set_rate(rate)
         for speed, button in self.view.speed_buttons.items():
@@ -264,54 +408,227 @@ class MainViewModel:
         self.selected_stamp = selected_name
         if selected_name:
             self.view.set_selected_stamp_text(selected_name)
-            if not self.is_recording:
-                self.view.start_button.config(state=tk.NORMAL)
+            # 記録中でない手順なら、他の手順の記録中でも開始できる
+            is_open = self.analysis_model.is_procedure_open(selected_name)
+            self.view.start_button.config(state=(tk.DISABLED if is_open else tk.NORMAL))
         else:
             self.view.set_selected_stamp_text("---")
             self.view.start_button.config(state=tk.DISABLED)
 
     def on_start_clicked(self):
-        if not self.selected_stamp or self.is_recording: return
-        self.is_recording = True
+        if not self.selected_stamp or self.analysis_model.is_procedure_open(self.selected_stamp): return
         start_time = self.video_model.get_time() / 1000.0
-        self.analysis_model.start_procedure(self.selected_stamp, start_time)
+        self.analysis_model.start_procedure(self.selected_stamp, start_time, snapshot=self._capture_snapshot("start"))
         self.view.start_button.config(state=tk.DISABLED)
-        self.view.end_button.config(state=tk.NORMAL)
-        self.view.stamp_tree.config(selectmode="none")
+        self._update_recording_state()
         print(f"Recording started for: {self.selected_stamp}")
 
     def on_end_clicked(self):
         if not self.is_recording: return
+        # 選択中の手順が記録中ならその手順を、そうでなければ最後に開始した手順を終了する
+        open_procedures = self.analysis_model.get_open_procedures()
+        procedure_name = self.selected_stamp if self.selected_stamp in open_procedures else next(reversed(open_procedures))
         memo_text = ""
         if self.settings_model.get("memo_enabled"):
             self.view.unbind_shortcuts()
-            memo_text = simpledialog.askstring("Memo", f"Enter a memo for '{self.selected_stamp}':", parent=self.view) or ""
+            memo_text = simpledialog.askstring("Memo", f"Enter a memo for '{procedure_name}':", parent=self.view) or ""
             self.view.bind_shortcuts()
         end_time = self.video_model.get_time() / 1000.0
-        self.analysis_model.end_procedure(end_time, memo=memo_text)
-        self.is_recording = False
-        self.view.end_button.config(state=tk.DISABLED)
-        self.view.stamp_tree.config(selectmode="browse")
-        
+        self.analysis_model.end_procedure(end_time, memo=memo_text, procedure_name=procedure_name,
+                                          snapshot=self._capture_snapshot("end"))
+        self._add_last_record_to_timeline()
+        self._update_recording_state()
+
+        # 過去のセッションから予測した次の手順を強調し、最も可能性の高いものを選択する
         stamps = self.preset_model.get_stamps(self.current_preset_name)
-        current_index = -1
-        if self.selected_stamp and self.selected_stamp in stamps:
-            current_index = stamps.index(self.selected_stamp)
-        if 0 <= current_index < len(stamps) - 1:
-            next_index = current_index + 1
-            self.view.update_stamp_list_and_select(stamps, next_index)
-            self.on_stamp_select()
-        else:
-            self.view.stamp_tree.selection_remove(self.view.stamp_tree.selection())
-            self.on_stamp_select()
+        self._show_stamp_predictions(procedure_name, stamps)
+        self.view.select_stamp(self.predicted_stamps[0] if self.predicted_stamps else None)
+        self.on_stamp_select()
         self._update_summary()
         self._update_undo_button_state()
         print("Recording ended.")
 
+    @profiler.timed("ui.snapshot")
+    def _capture_snapshot(self, kind: str) -> str | None:
+        """
+        表示中のフレームの保存をバックグラウンドに依頼し、画像の結果のフォルダからの相対パスを返す。
+        ソフトウェア出力では表示中のフレームを間引いてコピーし、それ以外ではプレイヤーのスナップショットを使う。
+        スナップショットが無効な場合や、保存待ちのフレームが多すぎる場合は None を返す。
+        """
+        if not self.settings_model.get("snapshot_enabled") or not self.video_model.media_loaded: return None
+        if self.snapshot_writer is None:
+            self.snapshot_writer = SnapshotWriter(self.settings_model.get("snapshot_width", 320),
+                                                  self.settings_model.get("snapshot_pending_mb", 64) * 1024 * 1024)
+        if self._snapshot_dir is None:
+            self._snapshot_dir = os.path.join(
+                "Snapshots", f"{self._get_session_base_name()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+            os.makedirs(os.path.join(self._get_results_dir(), self._snapshot_dir), exist_ok=True)
+        self._snapshot_count += 1
+        relative_path = os.path.join(self._snapshot_dir, f"{self._snapshot_count:04d}_{kind}.jpg")
+        path = os.path.join(self._get_results_dir(), relative_path)
+        frame = self.video_model.get_displayed_frame()
+        if frame is not None:
+            submitted = self.snapshot_writer.submit_frame(frame, path)
+        else:
+            submitted = self.snapshot_writer.submit_call(self.video_model.take_snapshot, path, self.snapshot_writer.width)
+        # CSVをどのOSで開いても参照できるように、区切りは "/" にする
+        return relative_path.replace(os.sep, "/") if submitted else None
+
+    def on_predicted_stamp_key(self, rank: int):
+        """数字キー: 予測した次の手順のうち、rank 番目 (1から) の手順を選択する。"""
+        if not self.view or not 1 <= rank <= len(self.predicted_stamps): return
+        self.view.select_stamp(self.predicted_stamps[rank - 1])
+        self.on_stamp_select()
+
+    def _show_stamp_predictions(self, previous: str | None, stamps: list[str]):
+        """
+        直前の手順 (None の場合はセッションの最初) の次の手順を予測して、一覧に表示する。
+        過去の記録がない場合は、プリセットの次の手順を候補にする。
+        """
+        predicted = []
+        if self.stamp_predictor:
+            predicted = self.stamp_predictor.predict(previous, set(stamps), limit=self.view.PREDICTION_KEY_COUNT)
+        if previous is None:
+            fallback = stamps[0] if stamps else None
+        else:
+            index = stamps.index(previous) if previous in stamps else -1
+            fallback = stamps[index + 1] if 0 <= index < len(stamps) - 1 else None
+        if fallback and fallback not in predicted and len(predicted) < self.view.PREDICTION_KEY_COUNT:
+            predicted.append(fallback)
+        self.predicted_stamps = predicted
+        self.view.show_stamp_predictions(predicted)
+
+    def _learn_stamp_history(self):
+        """まだ学習していない過去の結果のCSVを、バックグラウンドで読み込んで遷移表に加える。"""
+        known_sources = self.stamp_predictor.get_sources()
+
+        def on_done(sessions):
+            learned = self.stamp_predictor.add_sessions(sessions)
+            if learned:
+                self.stamp_predictor.save()
+                print(f"Learned stamp transitions from {learned} past sessions.")
+
+        self.scheduler.submit(_scan_stamp_history, self._get_results_dir(), known_sources,
+                              name="stamp_history", priority=PRIORITY_LOW, on_done=on_done)
+
+    def _get_results_dir(self) -> str:
+        """結果のCSVを保存するフォルダのパスを返します。"""
+        return os.path.join(os.path.dirname(self.settings_model.settings_file_path), 'AnalysisResults')
+
+    def _get_session_base_name(self) -> str:
+        """結果のファイル名に使う、最初の動画の名前を返します。"""
+        video_files = self.video_model.video_files
+        return os.path.splitext(os.path.basename(video_files[0]))[0] if video_files else "analysis_result"
+
+    # --- セッションの保存と再開 ---
+
+    def _get_sessions_dir(self) -> str:
+        """途中のセッションを保存するフォルダのパスを返します。"""
+        return os.path.join(os.path.dirname(self.settings_model.settings_file_path), 'Sessions')
+
+    def _get_video_infos(self) -> list[dict]:
+        """読み込んだ各動画の パス, 内容の指紋, 長さ(ms) を返します。"""
+        return [
+            {"path": path, "fingerprint": fingerprint, "duration_ms": duration}
+            for path, fingerprint, duration in zip(self.video_model.video_files, self._video_fingerprints,
+                                                   self.video_model.get_media_durations())
+        ]
+
+    def _build_session(self) -> dict:
+        """現在のセッションを、write_session() に渡す形式で返します。"""
+        open_snapshots = self.analysis_model.get_open_snapshots()
+        return {
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "videos": self._get_video_infos(),
+            "playhead_ms": self.video_model.get_time(),
+            "preset": self.current_preset_name,
+            "stamps": list(self.preset_model.get_stamps(self.current_preset_name)),
+            "open_procedures": [[name, start_time, open_snapshots.get(name)]
+                                for name, start_time in self.analysis_model.get_open_procedures().items()],
+            "records": self.analysis_model.get_records(),
+        }
+
+    def _has_unsaved_records(self) -> bool:
+        """結果のCSVに保存していない記録 (記録中の手順を含む) があるかどうかを返します。"""
+        return not self._results_saved and (self.analysis_model.has_data() or self.analysis_model.is_recording())
+
+    def on_save_session_clicked(self):
+        """途中のセッションをファイルに保存する。「Open Session...」で開くと、保存した位置から続けられる。"""
+        if not self.video_model.media_loaded: return
+        sessions_dir = self._get_sessions_dir()
+        os.makedirs(sessions_dir, exist_ok=True)
+        path = filedialog.asksaveasfilename(
+            title="Save Session", parent=self.view, initialdir=sessions_dir,
+            initialfile=f"{self._get_session_base_name()}{SESSION_SUFFIX}", defaultextension=SESSION_SUFFIX,
+            filetypes=(("Session Files", f"*{SESSION_SUFFIX}"), ("All files", "*.*"))
+        )
+        if not path: return
+        try:
+            write_session(path, self._build_session())
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Save Session", f"Failed to save the session.\nError: {e}", parent=self.view)
+            return
+        print(f"Session saved to {path}")
+
+    def on_open_session_clicked(self):
+        """
+        保存したセッション、または保存した結果のCSVを選び、開き直す。
+        今のセッションの保存していない記録は、閉じるときに自動保存される。
+        """
+        path = filedialog.askopenfilename(
+            title="Open Session", parent=self.view, initialdir=self._get_sessions_dir(),
+            filetypes=(("Sessions and Results", f"*{SESSION_SUFFIX} *.csv"), ("All files", "*.*"))
+        )
+        if not path: return
+        self.view.requested_session_path = path
+        self.view.is_next_session_requested = True
+        self.on_window_closing()
+
+    def _autosave_session(self):
+        """保存していない記録を、動画の名前の自動保存用のセッションに書き出す。"""
+        sessions_dir = self._get_sessions_dir()
+        path = os.path.join(sessions_dir, f"{self._get_session_base_name()}_autosave{SESSION_SUFFIX}")
+        try:
+            os.makedirs(sessions_dir, exist_ok=True)
+            write_session(path, self._build_session())
+            print(f"Unsaved records were saved to {path}")
+        except (OSError, ValueError) as e:
+            print(f"Failed to autosave the session: {e}")
+
+    def restore_session(self, session: dict):
+        """
+        開き直したセッションの記録と記録中の手順を戻し、保存したときの再生位置へ移動する。
+        動画は、保存しておいた長さを使って load_videos() で読み込み済みであること。
+        """
+        if session["records"]:
+            self.analysis_model.add_records(session["records"])
+        self.analysis_model.restore_open_procedures(session["open_procedures"])
+        self._resumed_preset = (session.get("preset"), session.get("stamps"))
+        # 読み込みで計算した指紋と比べ、保存してから内容が変わった (差し替えられた) 動画を知らせる
+        self._changed_session_videos = [
+            video["path"] for video, fingerprint in zip(session["videos"], self._video_fingerprints)
+            if video.get("fingerprint") and fingerprint and video["fingerprint"] != fingerprint
+        ]
+        if self.view:
+            # トラック数を先に設定し、記録ごとに全体を描画し直さないようにする
+            self.view.record_timeline.set_track_count(self.analysis_model.get_track_count())
+            for key in range(self.analysis_model.get_record_count()):
+                self._add_record_to_timeline(key)
+            self._update_summary()
+            self._update_undo_button_state()
+            self._update_recording_state()
+        self.video_model.set_time(min(int(session["playhead_ms"]), self.video_model.get_length()))
+        print(f"Session restored: {self.analysis_model.get_record_count()} records, "
+              f"playhead at {format_time(session['playhead_ms'] / 1000.0)}")
+
     def on_undo_clicked(self):
         undone_record = self.analysis_model.undo_last_record()
         if undone_record:
             print(f"Undone: {undone_record.get('手順名')}")
+            if self.view:
+                # 削除された記録は末尾のもの (キーは記録のインデックス)
+                self.view.record_timeline.remove_span(self.analysis_model.get_record_count())
+                self.view.record_timeline.set_track_count(self.analysis_model.get_track_count())
             self._update_summary()
         self._update_undo_button_state()
 
@@ -319,35 +636,90 @@ class MainViewModel:
         if not self.analysis_model.has_data():
             messagebox.showinfo("No Data", "No data has been recorded to save.", parent=self.view)
             return
-        output_dir = os.path.join(os.path.dirname(self.settings_model.settings_file_path),'AnalysisResults')
+        self._save_results()
+
+    def _save_results(self):
+        """
+        記録をCSV (とグラフ) に書き出し、書き出しが終わったらウィンドウを閉じる。
+        表の作成はTkのスレッドで行い、ファイルの書き出しはバックグラウンドのタスクで行う。
+        """
+        output_dir = self._get_results_dir()
         os.makedirs(output_dir, exist_ok=True)
-        video_files = self.video_model.video_files
-        base_name = os.path.splitext(os.path.basename(video_files[0]))[0] if video_files else "analysis_result"
+        base_name = self._get_session_base_name()
         date_prefix = datetime.now().strftime('%Y%m%d_%H%M%S')
         output_csv_path = os.path.join(output_dir, f"{base_name}_{date_prefix}.csv")
         df = self.analysis_model.export_to_dataframe()
-        df['移行時間(秒)'] = df['開始時間(秒)'] - df['終了時間(秒)'].shift(1)
-        df = df[["手順名", "開始時間(秒)", "終了時間(秒)", "所要時間(秒)", "移行時間(秒)", "メモ"]]
-        total_duration = df['所要時間(秒)'].sum()
-        total_transition = df['移行時間(秒)'].sum()
-        sum_row = pd.DataFrame([{'手順名': '合計', '所要時間(秒)': total_duration, '移行時間(秒)': total_transition}])
+        transitions = df['開始時間(秒)'] - _previous_end_times(df)
+        # 前の手順の途中で始まった手順 (重なっている手順) には、移行時間はない (空欄にする)
+        df['移行時間(秒)'] = transitions.where(transitions >= 0)
+        columns = ["手順名", "開始時間(秒)", "終了時間(秒)", "所要時間(秒)", "移行時間(秒)"]
+        sum_values = {'手順名': TOTAL_ROW_NAME}
+        if self._annotate_transition_activity(df):
+            columns += ["移行中アクティブ(秒)", "移行中アイドル(秒)"]
+        # スナップショットを保存した記録があれば、画像の参照の列も書き出す
+        snapshot_columns = [column for column in ("開始画像", "終了画像") if column in df.columns]
+        df = df[columns + ["メモ"] + snapshot_columns].fillna({column: "" for column in snapshot_columns})
+        for column in columns[3:]:
+            sum_values[column] = df[column].sum()
+        sum_row = pd.DataFrame([sum_values])
         df_with_total = pd.concat([df, sum_row], ignore_index=True)
-        try:
-            df_with_total.to_csv(output_csv_path, index=False, encoding='utf-8-sig', float_format='%.2f')
-            print(f"CSV saved to {output_csv_path}")
-            graph_path = None
-            if self.settings_model.get("graph_enabled"):
-                font_prop = helpers.get_japanese_font()
-                graph_path = helpers.create_and_save_graph(df, output_csv_path, font_prop)
-            messagebox.showinfo("Save Successful", f"Results saved successfully!\n\nCSV: {output_csv_path}" + (f"\nGraph: {graph_path}" if graph_path else ""))
-        except Exception as e:
-            messagebox.showerror("Save Error", f"Failed to save results.\nError: {e}")
-
-        # 正常に保存されたら、ウィンドウを閉じる
-        if self.view:
-            # 次のセッションは要求しないのでフラグはFalseのまま
+        graph_enabled = self.settings_model.get("graph_enabled")
+        report_cache_dir = self.settings_model.get_cache_dir('reports') if self.settings_model.get("html_report_enabled") else None
+        procedure_sequence = df['手順名'].tolist()
+        session = self._build_session()
+        session_info = {key: session[key] for key in ("saved_at", "preset", "videos")}
+
+        def restore_buttons():
+            self.view.finish_button.config(state=tk.NORMAL)
+            self.view.finish_and_next_button.config(state=tk.NORMAL)
+
+        def on_saved(paths):
+            graph_path, report_path = paths
+            self._results_saved = True
+            restore_buttons()
+            if self.stamp_predictor:
+                # 保存したセッションの手順の並びを、次の予測に使えるよう遷移表に加える
+                self.stamp_predictor.add_session(os.path.basename(output_csv_path), procedure_sequence)
+                self.stamp_predictor.save()
+            if self.worklist_model:
+                self.worklist_model.finish_current(output_csv_path)
+            messagebox.showinfo("Save Successful", f"Results saved successfully!\n\nCSV: {output_csv_path}"
+                                + (f"\nGraph: {graph_path}" if graph_path else "")
+                                + (f"\nReport: {report_path}" if report_path else ""))
             self.on_window_closing()
 
+        def on_failed(error):
+            restore_buttons()
+            messagebox.showerror("Save Error", f"Failed to save results.\nError: {error}")
+            self.on_window_closing()
+
+        # 書き出し中に二重に保存されないようにする
+        self.view.finish_button.config(state=tk.DISABLED)
+        self.view.finish_and_next_button.config(state=tk.DISABLED)
+        self.scheduler.submit(_write_results, df, df_with_total, output_csv_path, graph_enabled, session_info,
+                              report_cache_dir, self.snapshot_writer, session, name="export", priority=PRIORITY_HIGH,
+                              on_done=on_saved, on_error=on_failed)
+
+    def _annotate_transition_activity(self, df: pd.DataFrame) -> bool:
+        """
+        動き解析が完了していれば、各移行時間をアクティブ/アイドルの秒数に分けた列を追加する。
+        列を追加した場合は True を返す。
+        """
+        if not self.motion_model or not self.motion_model.is_complete():
+            return False
+        active_seconds, idle_seconds = [], []
+        for start, previous_end in zip(df['開始時間(秒)'], _previous_end_times(df)):
+            if pd.isna(previous_end) or start < previous_end:
+                active_seconds.append(None)
+                idle_seconds.append(None)
+                continue
+            active, idle = self.motion_model.get_activity_seconds(previous_end, start)
+            active_seconds.append(active)
+            idle_seconds.append(idle)
+        df['移行中アクティブ(秒)'] = active_seconds
+        df['移行中アイドル(秒)'] = idle_seconds
+        return True
+
     def on_options_changed(self):
         if not self.view: return
         self.settings_model.set("memo_enabled", self.view.memo_enabled_var.get())
@@ -357,26 +729,139 @@ class MainViewModel:
 
     def update_ui_regularly(self):
         if self._update_timer: self.view.after_cancel(self._update_timer)
+        # 動画が変わった可能性があるので、総再生時間の文字列を作り直し、前回値をリセットする
+        self._total_time_text = format_time(self.video_model.get_length() / 1000.0)
+        self._last_displayed_second = None
+        self._last_is_playing = None
+        self._last_timeline_position = None
         self._ui_update_loop()
 
+    @profiler.timed("ui.tick")
     def _ui_update_loop(self):
         if not self.view or not self.video_model.media_loaded: return
+        # Tkの変数やウィジェットへの書き込みは再描画を伴うため、値が変わったときだけ行う
         is_playing = self.video_model.is_playing()
-        self.view.play_pause_button.config(text=("Pause" if is_playing else "Play (P)"))
-        current_time_sec = self.video_model.get_time() / 1000.0
-        total_time_sec = self.video_model.get_length() / 1000.0
-        self.view.time_display_var.set(f"{format_time(current_time_sec)} / {format_time(total_time_sec)}")
-        if total_time_sec > 0:
-            if not self.view.is_slider_dragging:
-                self.view.timeline_var.set((current_time_sec / total_time_sec) * 1000)
+        if is_playing != self._last_is_playing:
+            self._last_is_playing = is_playing
+            self.view.play_pause_button.config(text=("Pause" if is_playing else "Play (P)"))
+        current_time_ms = self.video_model.get_time()
+        current_second = current_time_ms // 1000
+        if current_second != self._last_displayed_second:
+            self._last_displayed_second = current_second
+            self.view.time_display_var.set(f"{format_time(current_second)} / {self._total_time_text}")
+        # ドラッグ中はタイムラインがマウスの位置を表示する (描画は再生位置の線が1px以上動いたときだけ行われる)
+        if self.view.timeline.is_dragging:
+            self._last_timeline_position = None
+        elif current_time_ms != self._last_timeline_position:
+            self._last_timeline_position = current_time_ms
+            self.view.timeline.set_position(current_time_ms)
         self._update_timer = self.view.after(50, self._ui_update_loop)
 
+    # --- ソフトウェア映像出力 ---
+
+    def _start_video_frame_loop(self):
+        """プレイヤーがソフトウェア出力の場合、デコードされたフレームの描画ループを開始する。"""
+        if not self.view or self.video_model.get_frame_buffer() is None: return
+        if self._video_frame_timer:
+            self.view.after_cancel(self._video_frame_timer)
+        self._video_frame_loop()
+
+    def _video_frame_loop(self):
+        # 新しいフレームがあるときだけ描画する。描画が追いつかない間のフレームは FrameBuffer が捨てる
+        # (コマ戻し用の記録は、捨てられるフレームも含めてプレイヤーの表示のコールバックで行う。
+        #  コマ戻しで過去のフレームを表示している間は、その表示を優先する)
+        frame = self.video_model.get_frame_buffer().take_latest()
+        if frame is not None and not self.video_model.is_showing_history_frame():
+            with profiler.measure("ui.video_frame"):
+                self.view.show_video_frame(frame)
+        self._video_frame_timer = self.view.after(15, self._video_frame_loop)
+
+    # --- パフォーマンス計測 ---
+
+    def on_toggle_performance_overlay(self):
+        """「Performance Overlay」メニュー: 計測結果のオーバーレイ表示を切り替える。"""
+        if not self.view: return
+        if self.view.perf_overlay_var.get():
+            profiler.enabled = True
+            self._refresh_performance_overlay()
+        else:
+            if self._perf_overlay_timer:
+                self.view.after_cancel(self._perf_overlay_timer)
+                self._perf_overlay_timer = None
+            self.view.hide_performance_overlay()
+
+    def _refresh_performance_overlay(self):
+        self._perf_overlay_timer = None
+        if not self.view: return
+        self.view.show_performance_overlay(profiler.format_summary())
+        self._perf_overlay_timer = self.view.after(500, self._refresh_performance_overlay)
+
+    def _dump_profile(self):
+        """計測結果があれば、後で比較できるようにJSONファイルへ保存する。"""
+        if not profiler.has_data(): return
+        profile_dir = os.path.join(os.path.dirname(self.settings_model.settings_file_path), 'Profiles')
+        os.makedirs(profile_dir, exist_ok=True)
+        date_prefix = datetime.now().strftime('%Y%m%d_%H%M%S')
+        profiler.dump_json(os.path.join(profile_dir, f"profile_{date_prefix}.json"))
+        profiler.reset()
+
+    # --- 操作の記録 ---
+
+    def get_input_trace_context(self) -> dict:
+        """操作を記録するときに一緒に保存する、操作直前の状態を返します。"""
+        return {
+            "position_ms": self.video_model.get_time(),
+            "playing": self.video_model.is_playing(),
+            "rate": self.video_model.get_rate(),
+            "stamp": self.selected_stamp,
+        }
+
+    def _dump_input_trace(self):
+        """記録した操作があれば、再生に必要な情報と一緒にJSON Linesファイルへ保存する。"""
+        if not input_trace.has_data(): return
+        trace_dir = os.path.join(os.path.dirname(self.settings_model.settings_file_path), 'Traces')
+        os.makedirs(trace_dir, exist_ok=True)
+        date_prefix = datetime.now().strftime('%Y%m%d_%H%M%S')
+        header = {
+            "created_at": datetime.now().isoformat(timespec='seconds'),
+            "media_durations": self.video_model.get_media_durations(),
+            "preset": self.current_preset_name,
+            "stamps": self.preset_model.get_stamps(self.current_preset_name),
+            "candidates": self.scene_model.get_candidates() if self.scene_model else [],
+        }
+        input_trace.save(os.path.join(trace_dir, f"trace_{date_prefix}.jsonl"), header)
+        input_trace.reset()
+
     def _update_summary(self):
         if not self.view: return
         count, total_duration = self.analysis_model.get_summary()
         self.view.summary_count_var.set(f"Logged Procedures: {count}")
         self.view.summary_duration_var.set(f"Total Duration: {total_duration:.2f}s")
 
+    def _add_last_record_to_timeline(self):
+        """最後に追加された記録をタイムラインに描画します。"""
+        if not self.view or not self.analysis_model.has_data(): return
+        self._add_record_to_timeline(self.analysis_model.get_record_count() - 1)
+
+    def _add_record_to_timeline(self, key: int):
+        """記録 (キーは記録のインデックス) をタイムラインに描画します。"""
+        record = self.analysis_model.get_record(key)
+        self.view.record_timeline.add_span(
+            key, record["手順名"], record["開始時間(秒)"] * 1000.0, record["終了時間(秒)"] * 1000.0,
+            track=self.analysis_model.get_record_track(key)
+        )
+
+    def _update_recording_state(self):
+        """記録中の手順の表示と、End ボタンの状態を更新します。"""
+        if not self.view: return
+        open_procedures = self.analysis_model.get_open_procedures()
+        self.view.end_button.config(state=(tk.NORMAL if open_procedures else tk.DISABLED))
+        self.view.recording_var.set(f"Recording: {', '.join(open_procedures) if open_procedures else '---'}")
+
+    def on_record_span_clicked(self, start_time_ms: float):
+        """タイムライン上の記録がクリックされたら、その開始位置へシークする。"""
+        self.video_model.set_time(int(start_time_ms))
+
     def _update_undo_button_state(self):
         if not self.view: return
         self.view.undo_button.config(state=(tk.NORMAL if self.analysis_model.has_data() else tk.DISABLED))
@@ -385,41 +870,274 @@ class MainViewModel:
         """
         「Finish & Next Video」ボタンがクリックされたときの処理。
         """
-        # データを保存する (データがない場合は何もしない)
-        if self.analysis_model.has_data():
-            self.on_finish_and_save_clicked()
-        
         # Viewに次のセッションを要求するフラグを立てさせる
         if self.view:
             self.view.is_next_session_requested = True
-        
-        # 現在のウィンドウを閉じる
-        self.on_window_closing()
 
-    def load_videos(self, file_paths: list[str]):
+        # データを保存してから閉じる (データがない場合はそのまま閉じる)
+        if self.analysis_model.has_data():
+            self._save_results()
+        else:
+            if self.worklist_model:
+                self.worklist_model.finish_current()
+            self.on_window_closing()
+
+    def on_open_worklist_clicked(self):
+        """
+        症例のフォルダを選び、ワークリストモードで開き直す。
+        記録がある場合は「Save & Next」と同様に保存してから閉じる。
+        """
+        folder = filedialog.askdirectory(title="Select Worklist Folder", parent=self.view)
+        if not folder: return
+        self.view.requested_worklist_path = folder
+        self.on_finish_and_next_clicked()
+
+    def _poll_worklist(self):
+        """ワークリストの準備の結果を取り込み、進み具合の表示を更新する。"""
+        self._worklist_poll_timer = None
+        if not self.view or not self.worklist_model: return
+        self.worklist_model.poll()
+        self.view.worklist_var.set(self.worklist_model.get_progress_text())
+        if self.worklist_model.is_running():
+            self._worklist_poll_timer = self.view.after(1000, self._poll_worklist)
+
+    def _warn_worklist_case_errors(self):
+        """開いた症例の準備で問題が見つかっていれば知らせる。"""
+        case = self.worklist_model.get_current_case()
+        if case and case["errors"]:
+            messagebox.showwarning("Worklist", f"Problems were found while preparing '{case['name']}':\n\n"
+                                   + "\n".join(case["errors"]), parent=self.view)
+
+    def load_videos(self, file_paths: list[str], media_durations: list[int] | None = None, on_loaded=None):
         """
         指定された動画ファイルを読み込んで表示する。
+        media_durations (ワークリストの準備で調べた各動画の長さ) がある場合は、長さの取得を省略する。
+        プレイヤーが長さを取得している間はTkのスレッドを止めずに待ち、読み込みが終わってから表示と
+        on_loaded (引数なしの関数。再生位置の復元など) を行う。
         """
         if not file_paths: return
-            
-        self.video_model.set_video_files(file_paths)
-        
+        if self._video_load_timer and self.view:
+            # 前の読み込みの完了を待っている場合は、その続きを行わない
+            self.view.after_cancel(self._video_load_timer)
+            self._video_load_timer = None
+
+        self.video_model.set_video_files(file_paths, media_durations)
+        if self.video_model.is_loading() and self.view:
+            self._video_load_timer = self.view.after(100, self._poll_video_loading, on_loaded)
+            return
+        self.video_model.poll_durations()
+        self._finish_loading_videos(on_loaded)
+
+    def _poll_video_loading(self, on_loaded):
+        """プレイヤーが動画の長さを取得し終えていれば、読み込みの残りを行う。"""
+        self._video_load_timer = None
+        if not self.video_model.poll_durations():
+            self._video_load_timer = self.view.after(100, self._poll_video_loading, on_loaded)
+            return
+        self._finish_loading_videos(on_loaded)
+
+    def _finish_loading_videos(self, on_loaded):
+        """長さを取得し終えた動画を表示し、解析を開始する。"""
+        if not self.video_model.media_loaded: return
+        file_paths = self.video_model.video_files
+        if self.view and self.video_model.get_length() <= 0:
+            messagebox.showwarning("Video", "The length of the videos could not be read.\n\n"
+                                   + "\n".join(file_paths), parent=self.view)
+
         if self.view:
             handle = self.view.get_video_frame_handle()
             self.video_model.set_display_handle(handle)
+            self._show_playlist_on_timelines()
+            self.video_model.enable_frame_history(self.settings_model.get("frame_history_mb", 256) * 1024 * 1024,
+                                                  self.settings_model.get("frame_history_downscale", 2))
+            self._start_video_frame_loop()
 
-        print(f"Initial video files loaded: {file_paths}")
+        print(f"Video files loaded: {file_paths}")
+        self._start_video_analysis()
         self.update_ui_regularly()
+        if on_loaded:
+            on_loaded()
 
-    def on_timeline_changed(self, scale_value: float):
+    def on_timeline_seek(self, time_ms: int):
         """
-        タイムラインスライダーの値に基づいて動画をシークする。
+        タイムラインでクリック・ドラッグされた位置(ms)へシークする。
+        ドラッグ中は最も近いキーフレームへ補正して速くシークし、ドラッグの終了時に正確な位置へ移動する。
         """
-        total_duration_ms = self.video_model.get_length()
-        if total_duration_ms <= 0: return
+        if self.video_model.get_length() <= 0: return
+        fast = self.view.timeline.is_dragging and self.settings_model.get("fast_seek_enabled", True)
+        self._drag_seek_target = time_ms if fast else None
+        self.video_model.set_time(time_ms, precise=not fast)
+
+    def on_timeline_drag_changed(self, dragging: bool):
+        """タイムラインのドラッグの開始・終了。ドラッグ中はプロキシでシークさせる。"""
+        self.video_model.set_scrubbing(dragging)
+        if not dragging and self._drag_seek_target is not None:
+            self.video_model.set_time(self._drag_seek_target)
+            self._drag_seek_target = None
+
+    def _show_playlist_on_timelines(self):
+        """読み込んだプレイリストの長さと動画の境界をタイムラインに反映する。"""
+        total_ms = self.video_model.get_length()
+        self.view.timeline.set_duration(total_ms)
+        self.view.timeline.set_clip_boundaries(self.video_model.get_cumulative_durations()[1:-1])
+        self.view.record_timeline.set_duration(total_ms)
+        self.view.waveform.set_duration(total_ms)
+
+    # --- 動画のオフライン解析 (シーン切り替わり候補・動き・スクラブ用プロキシ・キーフレーム・音声波形) ---
 
-        target_time_ms = int((float(scale_value) / 1000.0) * total_duration_ms)
-        self.video_model.set_time(target_time_ms)
+    def _get_analysis_models(self) -> list:
+        return [model for model in (self.scene_model, self.motion_model, self.proxy_model, self.keyframe_model,
+                                    self.audio_model)
+                if model]
+
+    def _is_analysis_enabled(self, model) -> bool:
+        """設定で無効にされている解析 (動画全体のデコードが必要なもの) でなければ True を返す。"""
+        if model is self.scene_model:
+            return self.settings_model.get("scene_detection_enabled", True)
+        if model is self.motion_model:
+            return self.settings_model.get("motion_analysis_enabled", True)
+        return True
+
+    def _start_video_analysis(self):
+        """読み込んだプレイリストのオフライン解析を開始する。"""
+        if not self.video_model.media_loaded: return
+        video_files = self.video_model.video_files
+        durations = self.video_model.get_media_durations()
+        # 各モデルのキャッシュキーにも使うので、先にまとめて並列に計算しておく
+        self._video_fingerprints = get_video_fingerprints(video_files)
+        for model in self._get_analysis_models():
+            if not self._is_analysis_enabled(model):
+                continue
+            model.start_analysis(video_files, durations)
+        if self.proxy_model:
+            self.video_model.set_proxy_paths(self.proxy_model.get_proxy_paths())
+        if self.keyframe_model:
+            self.video_model.set_keyframe_times(self.keyframe_model.get_clip_keyframes())
+        if self.view:
+            if self.scene_model:
+                self.view.record_timeline.set_markers(self.scene_model.get_candidates())
+            if self.audio_model:
+                self.view.waveform.redraw()
+            if self._analysis_poll_timer:
+                self.view.after_cancel(self._analysis_poll_timer)
+            self._poll_video_analysis()
+
+    def _poll_video_analysis(self):
+        """解析結果を定期的に取り込み、タイムラインのマーカーを更新する。"""
+        self._analysis_poll_timer = None
+        if not self.view: return
+        if self.scene_model and self.scene_model.poll():
+            self.view.record_timeline.set_markers(self.scene_model.get_candidates())
+        if self.motion_model:
+            self.motion_model.poll()
+        if self.proxy_model and self.proxy_model.poll():
+            self.video_model.set_proxy_paths(self.proxy_model.get_proxy_paths())
+        if self.keyframe_model and self.keyframe_model.poll():
+            self.video_model.set_keyframe_times(self.keyframe_model.get_clip_keyframes())
+        if self.audio_model and self.audio_model.poll():
+            self.view.waveform.redraw()
+        if any(model.is_running() for model in self._get_analysis_models()):
+            self._analysis_poll_timer = self.view.after(1000, self._poll_video_analysis)
+
+    def on_jump_candidate_clicked(self, direction: int):
+        """現在位置から次 (direction=1) または前 (direction=-1) の境界候補へジャンプする。"""
+        if not self.scene_model: return
+        current_time = self.video_model.get_time()
+        if direction > 0:
+            target_time = self.scene_model.get_next_candidate(current_time)
+        else:
+            target_time = self.scene_model.get_previous_candidate(current_time)
+        if target_time is not None:
+            self.video_model.set_time(target_time)
+
+    def on_compare_annotations_clicked(self):
+        """
+        複数の評価者の結果のフォルダを含むフォルダを選び、評価者間の一致度のレポートをバックグラウンドで作成する。
+        """
+        folder = filedialog.askdirectory(title="Select Folder with Each Rater's Results", parent=self.view)
+        if not folder: return
+        output_dir = os.path.join(os.path.dirname(self.settings_model.settings_file_path), 'AnalysisResults',
+                                  f"Agreement_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+        def on_done(result):
+            if result["cases"] == 0:
+                messagebox.showinfo("Compare Annotations", "No case was annotated by two or more raters.",
+                                    parent=self.view)
+                return
+            messagebox.showinfo("Compare Annotations",
+                                f"Compared {result['cases']} case(s) ({result['skipped']} with a single rater skipped).\n\n"
+                                f"Report: {output_dir}", parent=self.view)
+
+        def on_failed(error):
+            messagebox.showerror("Compare Annotations", f"Failed to compare annotations.\nError: {error}", parent=self.view)
+
+        self.scheduler.submit(_compare_annotations, [folder], output_dir, name="agreement",
+                              on_done=on_done, on_error=on_failed)
+
+    def on_export_clips_clicked(self):
+        """
+        記録した各手順を元の動画から切り出し、選んだフォルダにクリップとしてバックグラウンドで書き出す。
+        以前に途中まで書き出したフォルダを選ぶと、残りのクリップだけを書き出す。
+        """
+        if self._clip_export_task and not self._clip_export_task.is_finished():
+            messagebox.showinfo("Export Clips", "Clips are already being exported.", parent=self.view)
+            return
+        if not self.analysis_model.has_data() or not self.video_model.video_files:
+            messagebox.showinfo("Export Clips", "No procedure has been recorded to export.", parent=self.view)
+            return
+        output_dir = filedialog.askdirectory(title="Select Folder for Procedure Clips",
+                                             initialdir=self._get_results_dir(), parent=self.view)
+        if not output_dir: return
+        df = self.analysis_model.export_to_dataframe()
+        records = list(zip(df['手順名'], df['開始時間(秒)'], df['終了時間(秒)']))
+        jobs = plan_clip_jobs(records, self.video_model.video_files, self.video_model.get_media_durations())
+        workers = self.settings_model.get("clip_export_workers") or os.cpu_count() or 1
+
+        def on_progress(fraction, message):
+            self.view.clip_export_var.set(f"Exporting clips: {message} ({fraction:.0%})")
+
+        def on_done(result):
+            self._clip_export_task = None
+            self.view.clip_export_var.set("")
+            text = (f"Wrote {result['written']} clip(s) ({result['remuxed']} without re-encoding), "
+                    f"{result['skipped']} already exported.\n\nFolder: {output_dir}")
+            if result["failed"]:
+                messagebox.showwarning("Export Clips", text + "\n\nFailed:\n" + "\n".join(
+                    f"{name}: {error}" for name, error in result["failed"]), parent=self.view)
+            else:
+                messagebox.showinfo("Export Clips", text, parent=self.view)
+
+        def on_failed(error):
+            self._clip_export_task = None
+            self.view.clip_export_var.set("")
+            messagebox.showerror("Export Clips", f"Failed to export clips.\nError: {error}", parent=self.view)
+
+        self._clip_export_task = self.scheduler.submit(
+            _export_clips, jobs, output_dir, workers, name="clip_export", priority=PRIORITY_LOW,
+            on_done=on_done, on_error=on_failed, on_progress=on_progress)
+
+    def on_build_reports_clicked(self):
+        """
+        結果のフォルダを選び、その中のすべてのセッションのHTMLのレポートをバックグラウンドで作成する。
+        CSVより新しいレポートがあるセッションは作り直さない。
+        """
+        folder = filedialog.askdirectory(title="Select Folder with Results", initialdir=self._get_results_dir(),
+                                         parent=self.view)
+        if not folder: return
+
+        def on_done(result):
+            text = f"Wrote {result['written']} report(s), {result['skipped']} already up to date."
+            if result["failed"]:
+                messagebox.showwarning("Build HTML Reports", text + "\n\nFailed:\n" + "\n".join(
+                    f"{os.path.basename(path)}: {error}" for path, error in result["failed"]), parent=self.view)
+            else:
+                messagebox.showinfo("Build HTML Reports", text, parent=self.view)
+
+        def on_failed(error):
+            messagebox.showerror("Build HTML Reports", f"Failed to build reports.\nError: {error}", parent=self.view)
+
+        self.scheduler.submit(_build_reports, folder, self.settings_model.get_cache_dir('reports'), name="reports",
+                              priority=PRIORITY_LOW, on_done=on_done, on_error=on_failed)
 
     def on_view_shortcuts(self):
         """「View Shortcuts」メニューがクリックされたときの処理。"""
@@ -431,6 +1149,11 @@ class MainViewModel:
         U : Undo Last Record
         Left Arrow : Skip Backward 10s
         Right Arrow : Skip Forward 10s
+        , (Comma) : Previous Frame
+        . (Period) : Next Frame
+        N : Jump to Next Candidate
+        B : Jump to Previous Candidate
+        1-9 : Select Predicted Next Procedure
         """
         messagebox.showinfo(
         "Keyboard Shortcuts",
@@ -450,3 +1173,80 @@ class MainViewModel:
         about_text,
         parent=self.view
         )
+
+def _previous_end_times(df: pd.DataFrame) -> pd.Series:
+    """
+    開始時間の順に並んだ記録の、それより前の記録の終了時間の最大値 (最初の記録は NaN) を返す。
+    手順が重なっている場合も、直前の行ではなく、それまでに終わった手順との間を移行時間とするために使う。
+    """
+    return df['終了時間(秒)'].cummax().shift(1)
+
+def _write_results(context, df: pd.DataFrame, df_with_total: pd.DataFrame, output_csv_path: str,
+                   graph_enabled: bool, session_info: dict, report_cache_dir: str | None = None,
+                   snapshot_writer: SnapshotWriter | None = None, session: dict | None = None) -> tuple[str | None, str | None]:
+    """
+    集計結果をCSVとグラフに書き出すタスク (ワーカースレッドで実行される)。
+    CSVと同じ名前のJSONには、動画のパスと内容の指紋などのセッションの情報を書き出します。
+    session が指定された場合は、丸めていない記録を同じ名前のセッションのファイルにも保存します
+    (CSVを開き直すと、こちらから元の値のまま読み込む)。
+    report_cache_dir が指定された場合は、同じ名前のHTMLのレポートも作成します (ページの枠はそこにキャッシュする)。
+
+    Returns:
+        (グラフのパス, レポートのパス) のタプル。作成しなかったものは None。
+    """
+    with profiler.measure("export.csv"):
+        df_with_total.to_csv(output_csv_path, index=False, encoding='utf-8-sig', float_format='%.2f')
+    print(f"CSV saved to {output_csv_path}")
+    with open(os.path.splitext(output_csv_path)[0] + ".json", 'w', encoding='utf-8') as f:
+        json.dump(session_info, f, indent=4, ensure_ascii=False)
+    if session is not None:
+        write_session(os.path.splitext(output_csv_path)[0] + SESSION_SUFFIX, session)
+    graph_path = report_path = None
+    if graph_enabled:
+        context.report_progress(0.4, "CSV saved")
+        font_prop = helpers.get_japanese_font()
+        with profiler.measure("export.graph"):
+            graph_path = helpers.create_and_save_graph(df, output_csv_path, font_prop)
+    if report_cache_dir is not None:
+        context.report_progress(0.7, "Writing report")
+        # スナップショットを埋め込めるよう、保存待ちのものを書き終えてから作る
+        if snapshot_writer is not None and not snapshot_writer.flush():
+            print("Some snapshots were still being saved when the report was written.")
+        try:
+            with profiler.measure("export.report"):
+                report_path = write_session_report(output_csv_path, asset_cache_dir=report_cache_dir)
+        except (OSError, ValueError, KeyError) as e:
+            # CSVは保存できているので、レポートの失敗では保存を失敗にしない
+            print(f"Failed to write the HTML report: {e}")
+    return graph_path, report_path
+
+def _compare_annotations(context, paths: list[str], output_dir: str) -> dict:
+    """
+    評価者間の一致度のレポートを作成するタスク。症例ごとの比較は専用のプロセスプールで並列に行う
+    (解析用の共有のプールを使うと、その間は動画の解析が止まるため)。
+    """
+    result = run_agreement(paths, output_dir, progress=context.report_progress,
+                           workers=max(1, (os.cpu_count() or 2) - 1), cancelled=lambda: context.token.is_cancelled)
+    context.token.raise_if_cancelled()
+    return result
+
+def _build_reports(context, folder: str, asset_cache_dir: str) -> dict:
+    """
+    フォルダ内の結果のHTMLのレポートをまとめて作成するタスク。作成は専用のプロセスプールで並列に行う
+    (解析用の共有のプールを使うと、その間は動画の解析が止まるため)。
+    """
+    result = run_reports([folder], asset_cache_dir=asset_cache_dir, progress=context.report_progress,
+                         workers=max(1, (os.cpu_count() or 2) - 1), cancelled=lambda: context.token.is_cancelled)
+    context.token.raise_if_cancelled()
+    return result
+
+def _scan_stamp_history(context, results_dir: str, known_sources: set[str]) -> list[tuple[str, list[str]]]:
+    """まだ学習していない過去の結果のCSVから、手順名の並びを読み込むタスク。"""
+    return scan_result_sequences(results_dir, known_sources)
+
+def _export_clips(context, jobs: list[dict], output_dir: str, workers: int) -> dict:
+    """手順のクリップを書き出すタスク。切り出しは専用のプロセスプールで並列に行う。"""
+    result = run_clip_export(jobs, output_dir, workers, cancelled=lambda: context.token.is_cancelled,
+                             progress=context.report_progress)
+    context.token.raise_if_cancelled()
+    return result
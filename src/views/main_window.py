@@ -2,6 +2,12 @@ import tkinter as tk
 from tkinter import ttk
 import sys
 from ..utils import helpers
+from .timeline_canvas import TimelineCanvas
+from .seek_timeline import SeekTimeline
+from .video_surface import VideoSurface
+from .waveform_canvas import WaveformCanvas
+from ..utils.profiler import profiler
+from ..utils.input_trace import input_trace
 
 class MainWindow(tk.Tk):
     """
@@ -25,6 +31,18 @@ class MainWindow(tk.Tk):
         self.config(menu=self.menu_bar)
 
         # ヘルプメニューを作成
+        view_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="View", menu=view_menu)
+        self.perf_overlay_var = tk.BooleanVar(value=False)
+        view_menu.add_checkbutton(label="Performance Overlay", accelerator="F9", variable=self.perf_overlay_var,
+                                  command=self.viewmodel.on_toggle_performance_overlay)
+
+        tools_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Tools", menu=tools_menu)
+        tools_menu.add_command(label="Compare Annotations...", command=self.viewmodel.on_compare_annotations_clicked)
+        tools_menu.add_command(label="Export Procedure Clips...", command=self.viewmodel.on_export_clips_clicked)
+        tools_menu.add_command(label="Build HTML Reports...", command=self.viewmodel.on_build_reports_clicked)
+
         help_menu = tk.Menu(self.menu_bar, tearoff=0)
         self.menu_bar.add_cascade(label="Help", menu=help_menu)
 
@@ -40,8 +58,13 @@ class MainWindow(tk.Tk):
 
         self.bind_shortcuts()
         self.is_next_session_requested = False
+        # 「Open Worklist...」で選ばれた、次のセッションで開くワークリストのパス
+        self.requested_worklist_path = None
+        # 「Open Session...」で選ばれた、次のセッションで開くセッションのファイル (または結果のCSV) のパス
+        self.requested_session_path = None
 
-        self.is_slider_dragging = False # タイムラインをドラッグ中かどうかのフラグ
+        self.perf_overlay_label = None
+        self.video_surface = None
 
     def set_video_model(self, video_model):
         """VideoPlayerModelへの参照を設定します。"""
@@ -107,42 +130,20 @@ class MainWindow(tk.Tk):
         self.video_frame = ttk.Frame(video_panel, style="Black.TFrame")
         self.video_frame.pack(fill=tk.BOTH, expand=True)
 
-        self.timeline_var = tk.DoubleVar()
-        self.timeline = ttk.Scale(video_panel, from_=0, to=1000, orient=tk.HORIZONTAL,
-                                variable=self.timeline_var)
-
-        def update_timeline_on_event(event):
-            """イベントの位置情報から Scale の値を更新し、シークをトリガーする"""
-            # スライダーの全長(ピクセル)に対する、クリック位置の割合を計算
-            percentage = event.x / event.widget.winfo_width()
-            # 割合を scale の値 (0-1000) に変換
-            scale_value = percentage * 1000
-            # 値が範囲内に収まるように調整
-            scale_value = max(0, min(1000, scale_value))
-            
-            # variable を手動で更新
-            self.timeline_var.set(scale_value)
-            # ViewModel にシークを依頼
-            self.viewmodel.on_timeline_changed(scale_value)
-
-        def on_slider_press(event):
-            self.is_slider_dragging = True
-            update_timeline_on_event(event)
-
-        def on_slider_drag(event):
-            if self.is_slider_dragging:
-                update_timeline_on_event(event)
-
-        def on_slider_release(event):
-            self.is_slider_dragging = False
-            
-        # command は使わず、bind のみで全ての操作を管理
-        self.timeline.bind("<ButtonPress-1>", on_slider_press)
-        self.timeline.bind("<B1-Motion>", on_slider_drag) # ドラッグ中もシーク
-        self.timeline.bind("<ButtonRelease-1>", on_slider_release)
-
+        # 再生位置のタイムライン (ホイールでズーム、Shift+ホイールでパン、ダブルクリックで全体表示)
+        self.timeline = SeekTimeline(video_panel, on_seek=self.viewmodel.on_timeline_seek,
+                                     on_view_changed=self._on_timeline_view_changed,
+                                     on_drag_changed=self.viewmodel.on_timeline_drag_changed)
         self.timeline.pack(fill=tk.X, pady=(8, 4))
 
+        # 音声の波形 (再生位置のタイムラインと同じ範囲を表示する)
+        self.waveform = WaveformCanvas(video_panel)
+        self.waveform.pack(fill=tk.X, pady=(0, 4))
+
+        # 記録済みの手順を表示するタイムライン (クリックでその手順の開始位置へシーク)
+        self.record_timeline = TimelineCanvas(video_panel, on_span_clicked=self.viewmodel.on_record_span_clicked)
+        self.record_timeline.pack(fill=tk.X, pady=(0, 4))
+
         self.time_display_var = tk.StringVar(value="--:--:-- / --:--:--")
         ttk.Label(video_panel, textvariable=self.time_display_var, anchor=tk.CENTER, font=font_caption).pack(fill=tk.X)
 
@@ -171,6 +172,18 @@ class MainWindow(tk.Tk):
         file_frame.pack(side=tk.TOP, fill=tk.X)
         self.open_video_button = ttk.Button(file_frame, text="Open Video File(s)", command=self.viewmodel.on_open_video_clicked)
         self.open_video_button.pack(expand=True, fill=tk.X, ipady=4)
+        ttk.Button(file_frame, text="Open Worklist...", command=self.viewmodel.on_open_worklist_clicked).pack(expand=True, fill=tk.X, pady=(4, 0))
+        # 途中のセッションの保存と、保存したセッション (または結果のCSV) からの再開
+        session_frame = ttk.Frame(file_frame)
+        session_frame.pack(fill=tk.X, pady=(4, 0))
+        ttk.Button(session_frame, text="Open Session...", command=self.viewmodel.on_open_session_clicked).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0, 2))
+        ttk.Button(session_frame, text="Save Session...", command=self.viewmodel.on_save_session_clicked).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(2, 0))
+        # ワークリストモードの進み具合 (症例の番号、次の症例の準備状況)
+        self.worklist_var = tk.StringVar(value="")
+        ttk.Label(file_frame, textvariable=self.worklist_var, font=font_caption, wraplength=320).pack(anchor=tk.W, pady=(4, 0))
+        # 手順のクリップの書き出しの進み具合
+        self.clip_export_var = tk.StringVar(value="")
+        ttk.Label(file_frame, textvariable=self.clip_export_var, font=font_caption, wraplength=320).pack(anchor=tk.W)
 
         main_controls_frame = ttk.Frame(scrollable_frame)
         main_controls_frame.pack(side=tk.TOP, fill=tk.X, pady=(24, 0))
@@ -184,6 +197,16 @@ class MainWindow(tk.Tk):
         skip_forward_btn = ttk.Button(playback_frame, text="10s >>", command=lambda: self.viewmodel.on_skip_time_clicked(10000))
         skip_forward_btn.pack(side=tk.LEFT, expand=True, fill=tk.X)
 
+        frame_step_frame = ttk.Frame(main_controls_frame)
+        frame_step_frame.pack(fill=tk.X, pady=(8, 0))
+        ttk.Button(frame_step_frame, text="◀ Frame (,)", command=lambda: self.viewmodel.on_step_frame_clicked(-1)).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0, 4))
+        ttk.Button(frame_step_frame, text="Frame (.) ▶", command=lambda: self.viewmodel.on_step_frame_clicked(1)).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(4, 0))
+
+        candidate_frame = ttk.Frame(main_controls_frame)
+        candidate_frame.pack(fill=tk.X, pady=(8, 0))
+        ttk.Button(candidate_frame, text="◀ Prev Candidate (B)", command=lambda: self.viewmodel.on_jump_candidate_clicked(-1)).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0, 4))
+        ttk.Button(candidate_frame, text="Next Candidate (N) ▶", command=lambda: self.viewmodel.on_jump_candidate_clicked(1)).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(4, 0))
+
         speed_frame = ttk.LabelFrame(main_controls_frame, text="Playback Speed")
         speed_frame.pack(fill=tk.X, pady=(12, 0))
         self.speed_buttons = {}
@@ -200,6 +223,8 @@ class MainWindow(tk.Tk):
         ttk.Label(status_frame, textvariable=self.summary_duration_var, font=font_caption).pack(anchor=tk.W, pady=(0, 8))
         self.selected_var = tk.StringVar(value="Selected: ---")
         ttk.Label(status_frame, textvariable=self.selected_var).pack(anchor=tk.W, pady=(8, 0))
+        self.recording_var = tk.StringVar(value="Recording: ---")
+        ttk.Label(status_frame, textvariable=self.recording_var, font=font_caption).pack(anchor=tk.W, pady=(2, 0))
         button_frame = ttk.Frame(status_frame)
         button_frame.pack(fill=tk.X, pady=8)
         self.start_button = ttk.Button(button_frame, text="Start (S)", state=tk.DISABLED, command=self.viewmodel.on_start_clicked)
@@ -211,9 +236,17 @@ class MainWindow(tk.Tk):
         
         stamp_frame = ttk.LabelFrame(scrollable_frame, text="Procedure Stamps")
         stamp_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True, pady=(24, 0))
-        self.stamp_tree = ttk.Treeview(stamp_frame, columns=("procedure"), show="headings", selectmode="browse")
+        self.stamp_tree = ttk.Treeview(stamp_frame, columns=("key", "procedure"), show="headings", selectmode="browse")
+        self.stamp_tree.heading("key", text="#")
+        self.stamp_tree.column("key", width=28, stretch=False, anchor=tk.CENTER)
         self.stamp_tree.heading("procedure", text="Procedure")
         self.stamp_tree.column("procedure", width=250)
+        # 次の手順として予測した項目の強調表示
+        self.stamp_tree.tag_configure("predicted", background="#E5F1FF")
+        # 手順名 -> Treeviewの項目ID と、予測として表示している手順名・項目
+        self._stamp_items = {}
+        self._predicted_stamps = []
+        self._predicted_items = []
         v_scroll = ttk.Scrollbar(stamp_frame, orient=tk.VERTICAL, command=self.stamp_tree.yview)
         self.stamp_tree.configure(yscrollcommand=v_scroll.set)
         self.stamp_tree.bind("<<TreeviewSelect>>", self.viewmodel.on_stamp_select)        
@@ -292,24 +325,102 @@ class MainWindow(tk.Tk):
         # 最初のアプローチに戻り、Canvasエリア全体にバインドを設定
         _on_treeview_scroll_leave(None) # 初期状態でバインドを有効化
 
+    # 記録・再生の対象になるショートカット (操作名 -> keysym)
+    SHORTCUT_KEYS = {
+        "play_pause": "p",
+        "start": "s",
+        "end": "e",
+        "undo": "u",
+        "skip_backward": "Left",
+        "skip_forward": "Right",
+        "next_candidate": "n",
+        "previous_candidate": "b",
+        "step_backward": "comma",
+        "step_forward": "period",
+    }
+    # 予測した次の手順を選ぶ数字キーの数 (1〜9)
+    PREDICTION_KEY_COUNT = 9
+
     def bind_shortcuts(self):
         """キーボードショートカットを有効化します。"""
-        self.bind_all("<p>", lambda event: self.viewmodel.on_play_pause_clicked())
-        self.bind_all("<s>", lambda event: self.viewmodel.on_start_clicked())
-        self.bind_all("<e>", lambda event: self.viewmodel.on_end_clicked())
-        self.bind_all("<u>", lambda event: self.viewmodel.on_undo_clicked())
-        self.bind_all("<Left>", lambda e: self.viewmodel.on_skip_time_clicked(-10000))
-        self.bind_all("<Right>", lambda e: self.viewmodel.on_skip_time_clicked(10000))
+        handlers = {
+            "play_pause": self.viewmodel.on_play_pause_clicked,
+            "start": self.viewmodel.on_start_clicked,
+            "end": self.viewmodel.on_end_clicked,
+            "undo": self.viewmodel.on_undo_clicked,
+            "skip_backward": lambda: self.viewmodel.on_skip_time_clicked(-10000),
+            "skip_forward": lambda: self.viewmodel.on_skip_time_clicked(10000),
+            "next_candidate": lambda: self.viewmodel.on_jump_candidate_clicked(1),
+            "previous_candidate": lambda: self.viewmodel.on_jump_candidate_clicked(-1),
+            "step_backward": lambda: self.viewmodel.on_step_frame_clicked(-1),
+            "step_forward": lambda: self.viewmodel.on_step_frame_clicked(1),
+        }
+        for action, keysym in self.SHORTCUT_KEYS.items():
+            self.bind_all(f"<{keysym}>", self._make_shortcut_handler(action, handlers[action]))
+        for rank in range(1, self.PREDICTION_KEY_COUNT + 1):
+            self.bind_all(f"<Key-{rank}>", self._make_shortcut_handler(
+                f"predicted_{rank}", lambda r=rank: self.viewmodel.on_predicted_stamp_key(r)))
+        self.bind_all("<F9>", lambda e: self._toggle_performance_overlay_var())
         print("Shortcuts enabled.")
 
+    def _make_shortcut_handler(self, action: str, handler):
+        """操作の記録が有効なときは、ハンドラの実行をUIへの反映まで含めて記録する。"""
+        def on_key(event):
+            if not input_trace.enabled:
+                handler()
+                return
+            input_trace.record(action, handler, flush=self.update_idletasks, **self.viewmodel.get_input_trace_context())
+        return on_key
+
     def unbind_shortcuts(self):
         """キーボードショートカットを無効化します。"""
         self.unbind_all("<p>")
         self.unbind_all("<s>")
         self.unbind_all("<e>")
         self.unbind_all("<u>")
+        self.unbind_all("<n>")
+        self.unbind_all("<b>")
+        self.unbind_all("<comma>")
+        self.unbind_all("<period>")
+        for rank in range(1, self.PREDICTION_KEY_COUNT + 1):
+            self.unbind_all(f"<Key-{rank}>")
         print("Shortcuts disabled.")
 
+    def _toggle_performance_overlay_var(self):
+        """F9キー: メニューのチェック状態を反転してから、ViewModelに切り替えを依頼する"""
+        self.perf_overlay_var.set(not self.perf_overlay_var.get())
+        self.viewmodel.on_toggle_performance_overlay()
+
+    def show_performance_overlay(self, text: str):
+        """動画エリアの左上に、計測結果のオーバーレイを表示・更新します。"""
+        if self.perf_overlay_label is None:
+            self.perf_overlay_label = tk.Label(self.video_frame.master, justify=tk.LEFT, anchor=tk.NW,
+                                               font=("Consolas", 9), background="#1D1D1F", foreground="#34C759")
+            self.perf_overlay_label.place(in_=self.video_frame, x=8, y=8)
+            self.perf_overlay_label.lift()
+        self.perf_overlay_label.config(text=text)
+
+    def hide_performance_overlay(self):
+        if self.perf_overlay_label is not None:
+            self.perf_overlay_label.destroy()
+            self.perf_overlay_label = None
+
+    def show_video_frame(self, frame):
+        """ソフトウェア出力のフレームを動画エリアに描画します。"""
+        if self.video_surface is None:
+            self.video_surface = VideoSurface(self.video_frame)
+            self.video_surface.place(x=0, y=0, relwidth=1, relheight=1)
+            if self.perf_overlay_label is not None:
+                self.perf_overlay_label.lift()
+        self.video_surface.show_frame(frame)
+
+    def _on_timeline_view_changed(self, start_ms: float, end_ms: float):
+        """再生位置のタイムラインをズーム・パンしたら、波形と記録のタイムラインも同じ範囲を表示する。"""
+        if hasattr(self, "waveform"):
+            self.waveform.set_visible_range(start_ms, end_ms)
+        if hasattr(self, "record_timeline"):
+            self.record_timeline.set_visible_range(start_ms, end_ms)
+
     def get_video_frame_handle(self) -> int:
         return self.video_frame.winfo_id()
     
@@ -320,12 +431,18 @@ class MainWindow(tk.Tk):
     def start_main_loop(self):
         self.mainloop()
 
+    @profiler.timed("ui.stamp_list")
     def update_stamp_list_and_select(self, stamps: list[str], select_index: int = -1):
         self.stamp_tree.selection_remove(self.stamp_tree.selection())
         for i in self.stamp_tree.get_children():
             self.stamp_tree.delete(i)
+        self._stamp_items = {}
+        self._predicted_items = []
         for stamp in stamps:
-            self.stamp_tree.insert("", tk.END, values=(stamp,))
+            item = self.stamp_tree.insert("", tk.END, values=("", stamp))
+            self._stamp_items.setdefault(stamp, item)
+        # 手順の追加や並べ替えで一覧を作り直しても、予測の表示は残す
+        self.show_stamp_predictions(self._predicted_stamps)
         if 0 <= select_index < len(stamps):
             children = self.stamp_tree.get_children()
             item_to_select = children[select_index]
@@ -337,7 +454,32 @@ class MainWindow(tk.Tk):
         selected_items = self.stamp_tree.selection()
         if not selected_items:
             return None
-        return self.stamp_tree.item(selected_items[0], "values")[0]
+        return self.stamp_tree.item(selected_items[0], "values")[1]
+
+    def select_stamp(self, stamp: str | None):
+        """手順を選択します (一覧を作り直さない)。None の場合は選択を解除します。"""
+        item = self._stamp_items.get(stamp)
+        if item is None:
+            self.stamp_tree.selection_remove(self.stamp_tree.selection())
+            return
+        self.stamp_tree.selection_set(item)
+        self.stamp_tree.focus(item)
+        self.stamp_tree.see(item)
+
+    def show_stamp_predictions(self, stamps: list[str]):
+        """予測した次の手順を強調し、選択に使う数字キーを表示します。前回の表示は消します。"""
+        for item in self._predicted_items:
+            self.stamp_tree.set(item, "key", "")
+            self.stamp_tree.item(item, tags=())
+        self._predicted_items = []
+        self._predicted_stamps = list(stamps)
+        for rank, stamp in enumerate(stamps[:self.PREDICTION_KEY_COUNT], start=1):
+            item = self._stamp_items.get(stamp)
+            if item is None:
+                continue
+            self.stamp_tree.set(item, "key", str(rank))
+            self.stamp_tree.item(item, tags=("predicted",))
+            self._predicted_items.append(item)
 
     def set_selected_stamp_text(self, text: str):
         self.selected_var.set(f"Selected: {text}")
\ No newline at end of file
@@ -0,0 +1,240 @@
+import bisect
+import tkinter as tk
+from ..utils.helpers import format_time, get_ui_font
+
+class SeekTimeline(tk.Canvas):
+    """
+    再生位置の表示とシークを行う、ズーム・パンが可能なタイムライン (View)。
+
+    表示範囲 (ms) をピクセルへ対応付けて描画するため、ズームすればミリ秒単位で位置を指定できます。
+    描画するのは表示範囲内の目盛り・動画の境界・再生位置だけで、描画コストは総再生時間に依存しません。
+
+    操作:
+        クリック・ドラッグ: その位置へシーク
+        マウスホイール: カーソル位置を中心にズーム
+        Shift + マウスホイール: 左右にパン
+        ダブルクリック: 全体表示に戻す
+    """
+    COLOR_BG = "#F5F5F7"
+    COLOR_TRACK = "#D1D1D6"
+    COLOR_TICK = "#8E8E93"
+    COLOR_TEXT = "#6E6E73"
+    COLOR_BOUNDARY = "#FF9500"
+    COLOR_PLAYHEAD = "#007AFF"
+    COLOR_OVERVIEW = "#007AFF"
+
+    # 表示範囲の最小値 (1000pxの幅で1px = 1ms)
+    MIN_VIEW_MS = 1000
+    # ホイール1段階あたりのズーム倍率
+    ZOOM_STEP = 1.25
+    # 目盛りの間隔の候補(ms)。ピクセル間隔が TICK_MIN_PX 以上になる最小のものを使う
+    TICK_STEPS_MS = [
+        10, 20, 50, 100, 200, 500,
+        1000, 2000, 5000, 10_000, 15_000, 30_000,
+        60_000, 120_000, 300_000, 600_000, 900_000, 1_800_000, 3_600_000,
+    ]
+    TICK_MIN_PX = 70
+    OVERVIEW_HEIGHT = 3
+
+    def __init__(self, parent, on_seek, on_view_changed=None, on_drag_changed=None, height: int = 34, **kwargs):
+        """
+        Args:
+            parent: 親ウィジェット。
+            on_seek: クリック・ドラッグされた位置(ms)を引数に呼ばれるコールバック。
+            on_view_changed: 表示範囲が変わったときに (開始ms, 終了ms) を引数に呼ばれるコールバック。
+            on_drag_changed: ドラッグの開始・終了時に、ドラッグ中かどうかを引数に呼ばれるコールバック。
+            height: キャンバスの高さ(px)。
+        """
+        super().__init__(parent, height=height, highlightthickness=0, background=self.COLOR_BG, **kwargs)
+        self._on_seek = on_seek
+        self._on_view_changed = on_view_changed
+        self._on_drag_changed = on_drag_changed
+        # 目盛りの時刻は、OSのUIフォントを小さくして表示する
+        self._tick_font = (get_ui_font()[0], 8)
+        self._total_ms = 0
+        self._view_start_ms = 0.0
+        self._view_ms = 0.0
+        self._position_ms = 0
+        self._playhead_x = None
+        # 各動画の境界 (プレイリスト全体での開始位置, ms)
+        self._boundaries = []
+        self.is_dragging = False
+
+        self.bind("<Configure>", lambda event: self.redraw())
+        self.bind("<ButtonPress-1>", self._on_press)
+        self.bind("<B1-Motion>", self._on_drag)
+        self.bind("<ButtonRelease-1>", self._on_release)
+        self.bind("<Double-Button-1>", lambda event: self.reset_zoom())
+        self.bind("<MouseWheel>", self._on_mousewheel)
+        # Linux (X11) ではホイールがボタン4/5として届く
+        self.bind("<Button-4>", lambda event: self._on_wheel_step(event, 1))
+        self.bind("<Button-5>", lambda event: self._on_wheel_step(event, -1))
+
+    # --- 公開API ---
+
+    def set_duration(self, total_ms: int):
+        """プレイリスト全体の長さ(ms)を設定し、全体表示に戻します。"""
+        self._total_ms = max(0, total_ms)
+        self._position_ms = 0
+        self.reset_zoom()
+
+    def set_clip_boundaries(self, boundaries_ms: list[int]):
+        """動画の切り替わり位置(ms)を設定します。"""
+        self._boundaries = sorted(boundaries_ms)
+        self.redraw()
+
+    def set_position(self, time_ms: int):
+        """
+        再生位置を更新します。再生位置の線が1px以上動くときだけ描画を更新します。
+        再生中に再生位置が表示範囲の外へ出た場合は、表示範囲を送ります。
+        """
+        previous_ms = self._position_ms
+        self._position_ms = time_ms
+        if (self._view_ms < self._total_ms and self._is_visible(previous_ms)
+                and not self._is_visible(time_ms)):
+            self._set_view(time_ms - self._view_ms * 0.1, self._view_ms)
+            return
+        self._draw_playhead()
+
+    def get_visible_range(self) -> tuple[float, float]:
+        return self._view_start_ms, self._view_start_ms + self._view_ms
+
+    def zoom(self, factor: float, anchor_ms: float | None = None):
+        """
+        表示範囲を factor 倍に拡大します (1より大きいとズームイン)。
+        anchor_ms の位置が画面上で動かないようにズームします。省略時は再生位置を基準にする。
+        """
+        if self._total_ms <= 0:
+            return
+        if anchor_ms is None:
+            anchor_ms = self._position_ms
+        new_view_ms = min(max(self._view_ms / factor, min(self.MIN_VIEW_MS, self._total_ms)), self._total_ms)
+        ratio = (anchor_ms - self._view_start_ms) / self._view_ms if self._view_ms else 0.0
+        self._set_view(anchor_ms - ratio * new_view_ms, new_view_ms)
+
+    def pan(self, fraction: float):
+        """表示範囲の fraction 倍だけ左右に移動します。"""
+        self._set_view(self._view_start_ms + self._view_ms * fraction, self._view_ms)
+
+    def reset_zoom(self):
+        self._set_view(0.0, float(self._total_ms))
+
+    def redraw(self):
+        """表示範囲の目盛り・境界・再生位置を描画し直します。"""
+        self.delete("all")
+        self._playhead_x = None
+        width = self.winfo_width()
+        height = self.winfo_height()
+        if width <= 1 or self._total_ms <= 0 or self._view_ms <= 0:
+            return
+        track_y = height - self.OVERVIEW_HEIGHT - 8
+        self.create_rectangle(0, track_y - 2, width, track_y + 2, fill=self.COLOR_TRACK, width=0)
+        self._draw_ticks(width, track_y)
+        self._draw_boundaries(height)
+        self._draw_overview(width, height)
+        self._draw_playhead()
+
+    # --- 座標変換 ---
+
+    def time_to_x(self, time_ms: float) -> float:
+        return (time_ms - self._view_start_ms) * self.winfo_width() / self._view_ms
+
+    def x_to_time(self, x: float) -> int:
+        width = max(self.winfo_width(), 1)
+        time_ms = self._view_start_ms + min(max(x, 0), width) * self._view_ms / width
+        return int(round(min(max(time_ms, 0), self._total_ms)))
+
+    # --- 内部処理 ---
+
+    def _is_visible(self, time_ms: float) -> bool:
+        return self._view_start_ms <= time_ms <= self._view_start_ms + self._view_ms
+
+    def _set_view(self, start_ms: float, view_ms: float):
+        view_ms = min(view_ms, float(self._total_ms))
+        start_ms = min(max(start_ms, 0.0), self._total_ms - view_ms)
+        self._view_start_ms = start_ms
+        self._view_ms = view_ms
+        self.redraw()
+        if self._on_view_changed:
+            self._on_view_changed(start_ms, start_ms + view_ms)
+
+    def _draw_ticks(self, width: int, track_y: int):
+        ms_per_px = self._view_ms / width
+        step = next((s for s in self.TICK_STEPS_MS if s / ms_per_px >= self.TICK_MIN_PX), self.TICK_STEPS_MS[-1])
+        show_ms = step < 1000
+        first = int(self._view_start_ms // step + 1) * step
+        end_ms = self._view_start_ms + self._view_ms
+        for time_ms in range(first, int(end_ms) + 1, step):
+            x = self.time_to_x(time_ms)
+            self.create_line(x, track_y - 6, x, track_y + 2, fill=self.COLOR_TICK)
+            label = format_time(time_ms // 1000)
+            if show_ms:
+                label += f".{time_ms % 1000:03d}"
+            self.create_text(x, 1, text=label, anchor=tk.N, fill=self.COLOR_TEXT, font=self._tick_font)
+
+    def _draw_boundaries(self, height: int):
+        # 表示範囲内の境界だけを二分探索で取り出す
+        lo = bisect.bisect_left(self._boundaries, self._view_start_ms)
+        hi = bisect.bisect_right(self._boundaries, self._view_start_ms + self._view_ms)
+        for time_ms in self._boundaries[lo:hi]:
+            x = self.time_to_x(time_ms)
+            self.create_line(x, 12, x, height - self.OVERVIEW_HEIGHT, fill=self.COLOR_BOUNDARY, width=2)
+
+    def _draw_overview(self, width: int, height: int):
+        """全体のうち、どこを表示しているかを下端の細いバーで示す。"""
+        if self._view_ms >= self._total_ms:
+            return
+        x0 = self._view_start_ms / self._total_ms * width
+        x1 = max(x0 + 2, (self._view_start_ms + self._view_ms) / self._total_ms * width)
+        self.create_rectangle(x0, height - self.OVERVIEW_HEIGHT, x1, height, fill=self.COLOR_OVERVIEW, width=0)
+
+    def _draw_playhead(self):
+        if self._view_ms <= 0 or self.winfo_width() <= 1:
+            return
+        x = int(self.time_to_x(self._position_ms))
+        if x == self._playhead_x:
+            return
+        self._playhead_x = x
+        height = self.winfo_height()
+        if self.find_withtag("playhead"):
+            self.coords("playhead_line", x, 12, x, height - self.OVERVIEW_HEIGHT)
+            self.coords("playhead_knob", x - 5, 12, x + 5, 12, x, 18)
+        else:
+            self.create_line(x, 12, x, height - self.OVERVIEW_HEIGHT, fill=self.COLOR_PLAYHEAD, width=2,
+                             tags=("playhead", "playhead_line"))
+            self.create_polygon(x - 5, 12, x + 5, 12, x, 18, fill=self.COLOR_PLAYHEAD, width=0,
+                                tags=("playhead", "playhead_knob"))
+
+    def _seek_to_x(self, x: float):
+        if self._total_ms <= 0:
+            return
+        self._position_ms = self.x_to_time(x)
+        self._draw_playhead()
+        self._on_seek(self._position_ms)
+
+    def _on_press(self, event):
+        self.is_dragging = True
+        # ドラッグ中のシークに備えられるよう、最初のシークより先に通知する
+        if self._on_drag_changed:
+            self._on_drag_changed(True)
+        self._seek_to_x(event.x)
+
+    def _on_drag(self, event):
+        if self.is_dragging:
+            self._seek_to_x(event.x)
+
+    def _on_release(self, event):
+        if not self.is_dragging:
+            return
+        self.is_dragging = False
+        if self._on_drag_changed:
+            self._on_drag_changed(False)
+
+    def _on_mousewheel(self, event):
+        self._on_wheel_step(event, 1 if event.delta > 0 else -1)
+
+    def _on_wheel_step(self, event, direction: int):
+        if event.state & 0x0001:  # Shift
+            self.pan(-0.1 * direction)
+        else:
+            self.zoom(self.ZOOM_STEP ** direction, anchor_ms=self._view_start_ms + event.x * self._view_ms / max(self.winfo_width(), 1))
@@ -0,0 +1,233 @@
+import bisect
+import tkinter as tk
+import zlib
+
+class TimelineCanvas(tk.Canvas):
+    """
+    記録済みの手順をカラースパンとして描画するタイムライン (View)。
+    表示範囲 (既定ではプレイリスト全体) に対する各記録の位置を表示し、クリックでその開始位置へシークします。
+    描画するのは表示範囲に重なるスパンだけなので、ズーム時の描画コストは表示範囲内の記録数に比例します。
+    同時に記録された (重なり合う) 手順は、トラックごとに高さを分けて描画します。
+    """
+    # 手順名ごとに安定した色を割り当てるためのパレット (Apple System Colors)
+    PALETTE = [
+        "#007AFF", "#34C759", "#FF9500", "#AF52DE",
+        "#FF2D55", "#5AC8FA", "#FFCC00", "#5856D6",
+    ]
+    COLOR_BG = "#F5F5F7"
+    COLOR_MERGED = "#6E6E73"
+    COLOR_MARKER = "#1D1D1F"
+
+    def __init__(self, parent, on_span_clicked, height: int = 24, **kwargs):
+        """
+        TimelineCanvasの初期化。
+
+        Args:
+            parent: 親ウィジェット。
+            on_span_clicked: スパンがクリックされたときに開始時間(ms)を引数に呼ばれるコールバック。
+            height: キャンバスの高さ(px)。
+        """
+        super().__init__(parent, height=height, highlightthickness=0, background=self.COLOR_BG, **kwargs)
+        self._on_span_clicked = on_span_clicked
+        self._total_ms = 0
+        # 表示範囲 (ms)
+        self._view_start_ms = 0.0
+        self._view_end_ms = 0.0
+
+        # key -> (name, start_ms, end_ms, track)
+        self._spans = {}
+        # トラックの数 (キャンバスの高さをこの数で分ける)
+        self._track_count = 1
+        # 表示範囲のスパンを二分探索で取り出すための、開始時間順の (start_ms, key) のリスト
+        self._span_starts = []
+        # 最も長いスパンの長さ(ms)。表示範囲より前に始まって範囲内まで続くスパンの探索に使う
+        self._max_span_ms = 0.0
+        # 1px以上の幅を持つスパン: key -> canvas item id
+        self._span_items = {}
+        # 1px未満のスパンは、ピクセル列ごとに1つの矩形へまとめる (Level of Detail)
+        # (column, track) -> [item id, 列に合流したスパンのキーの集合, 列内で最も早い開始時間(ms)]
+        self._lod_columns = {}
+        # 1px未満のスパン: key -> (column, track)
+        self._span_columns = {}
+        # canvas item id -> シーク先の開始時間(ms)
+        self._item_seek_times = {}
+        # 境界候補などのマーカー位置(ms)
+        self._markers = []
+
+        self.bind("<Configure>", lambda event: self.redraw())
+        self.bind("<ButtonPress-1>", self._on_click)
+
+    # --- 公開API ---
+
+    def set_duration(self, total_ms: int):
+        """プレイリスト全体の長さ(ms)を設定し、全体表示で再描画します。"""
+        self._total_ms = total_ms
+        self._view_start_ms = 0.0
+        self._view_end_ms = float(total_ms)
+        self.redraw()
+
+    def set_visible_range(self, start_ms: float, end_ms: float):
+        """表示範囲(ms)を設定し、その範囲だけを描画し直します。"""
+        if (start_ms, end_ms) == (self._view_start_ms, self._view_end_ms):
+            return
+        self._view_start_ms = start_ms
+        self._view_end_ms = end_ms
+        self.redraw()
+
+    def add_span(self, key, name: str, start_ms: float, end_ms: float, track: int = 0):
+        """スパンを1つ追加し、そのスパンだけを描画します。トラックが増えた場合は全体を描画し直します。"""
+        if key in self._spans:
+            self.remove_span(key)
+        self._spans[key] = (name, start_ms, end_ms, track)
+        if track >= self._track_count:
+            self._track_count = track + 1
+            bisect.insort(self._span_starts, (start_ms, key), key=_span_start)
+            self._max_span_ms = max(self._max_span_ms, end_ms - start_ms)
+            self.redraw()
+            return
+        bisect.insort(self._span_starts, (start_ms, key), key=_span_start)
+        self._max_span_ms = max(self._max_span_ms, end_ms - start_ms)
+        if end_ms >= self._view_start_ms and start_ms <= self._view_end_ms:
+            self._draw_span(key)
+
+    def remove_span(self, key):
+        """スパンを1つ削除し、そのスパンの描画だけを取り除きます。"""
+        span = self._spans.pop(key, None)
+        if span is None:
+            return
+        index = bisect.bisect_left(self._span_starts, span[1], key=_span_start)
+        while index < len(self._span_starts) and self._span_starts[index][0] == span[1]:
+            if self._span_starts[index][1] == key:
+                del self._span_starts[index]
+                break
+            index += 1
+        if span[2] - span[1] >= self._max_span_ms:
+            # 最も長いスパンが削除された場合は、残りのスパンから求め直す
+            self._max_span_ms = max((end - start for _, start, end, _ in self._spans.values()), default=0.0)
+        item = self._span_items.pop(key, None)
+        if item is not None:
+            self.delete(item)
+            self._item_seek_times.pop(item, None)
+            return
+        column = self._span_columns.pop(key, None)
+        if column is None:
+            return
+        entry = self._lod_columns[column]
+        entry[1].discard(key)
+        if not entry[1]:
+            self.delete(entry[0])
+            self._item_seek_times.pop(entry[0], None)
+            del self._lod_columns[column]
+            return
+        if span[1] <= entry[2]:
+            # 列で最も早いスパンが削除された場合は、シーク先を残りのスパンの最も早い開始時間にする
+            entry[2] = min(self._spans[k][1] for k in entry[1])
+            self._item_seek_times[entry[0]] = entry[2]
+        if len(entry[1]) == 1:
+            # 残り1件になった列は、その記録の色に戻す
+            remaining_key = next(iter(entry[1]))
+            self.itemconfigure(entry[0], fill=self._color_for(self._spans[remaining_key][0]))
+
+    def set_markers(self, times_ms: list[int]):
+        """境界候補などのマーカーを設定し、マーカーだけを描画し直します。"""
+        self._markers = sorted(times_ms)
+        self._draw_markers()
+
+    def set_track_count(self, track_count: int):
+        """トラックの数を設定し、描画し直します (記録を取り消してトラックが減ったときなど)。"""
+        track_count = max(1, track_count)
+        if track_count != self._track_count:
+            self._track_count = track_count
+            self.redraw()
+
+    def clear(self):
+        """すべてのスパンを削除します。"""
+        self._spans.clear()
+        self._span_starts.clear()
+        self._max_span_ms = 0.0
+        self._track_count = 1
+        self.redraw()
+
+    def redraw(self):
+        """表示範囲のスパンを描画し直します。サイズや表示範囲が変わったときに使用します。"""
+        self.delete("all")
+        self._span_items.clear()
+        self._lod_columns.clear()
+        self._span_columns.clear()
+        self._item_seek_times.clear()
+        lo = bisect.bisect_left(self._span_starts, self._view_start_ms - self._max_span_ms, key=_span_start)
+        hi = bisect.bisect_right(self._span_starts, self._view_end_ms, key=_span_start)
+        for start_ms, key in self._span_starts[lo:hi]:
+            if self._spans[key][2] >= self._view_start_ms:
+                self._draw_span(key)
+        self._draw_markers()
+
+    # --- 内部処理 ---
+
+    def _draw_span(self, key):
+        if self._total_ms <= 0:
+            return
+        width = self.winfo_width()
+        height = self.winfo_height()
+        if width <= 1:
+            return  # まだレイアウトが確定していない (<Configure>で再描画される)
+
+        name, start_ms, end_ms, track = self._spans[key]
+        scale = self._get_scale(width)
+        x0 = max((start_ms - self._view_start_ms) * scale, -1.0)
+        x1 = min((end_ms - self._view_start_ms) * scale, width + 1.0)
+        track_height = (height - 4) / self._track_count
+        y0 = 2 + track * track_height
+        y1 = y0 + track_height - (1 if self._track_count > 1 else 0)
+
+        if x1 - x0 >= 1.0:
+            item = self.create_rectangle(x0, y0, x1, y1, fill=self._color_for(name), width=0)
+            self._span_items[key] = item
+            self._item_seek_times[item] = start_ms
+            return
+
+        # 1px未満のスパンは、同じピクセル列の既存矩形に合流させて描画アイテム数を抑える
+        column = (int(x0), track)
+        self._span_columns[key] = column
+        entry = self._lod_columns.get(column)
+        if entry is None:
+            item = self.create_rectangle(column[0], y0, column[0] + 1, y1, fill=self._color_for(name), width=0)
+            self._lod_columns[column] = [item, {key}, start_ms]
+            self._item_seek_times[item] = start_ms
+            return
+        entry[1].add(key)
+        self.itemconfigure(entry[0], fill=self.COLOR_MERGED)
+        if start_ms < entry[2]:
+            entry[2] = start_ms
+            self._item_seek_times[entry[0]] = start_ms
+
+    def _draw_markers(self):
+        self.delete("marker")
+        width = self.winfo_width()
+        if self._total_ms <= 0 or width <= 1:
+            return
+        scale = self._get_scale(width)
+        lo = bisect.bisect_left(self._markers, self._view_start_ms)
+        hi = bisect.bisect_right(self._markers, self._view_end_ms)
+        # 同じピクセル列に重なるマーカーは1本だけ描く
+        for x in sorted({int((time_ms - self._view_start_ms) * scale) for time_ms in self._markers[lo:hi]}):
+            self.create_polygon(x - 3, 0, x + 3, 0, x, 5, fill=self.COLOR_MARKER, width=0, tags="marker")
+
+    def _get_scale(self, width: int) -> float:
+        """1msあたりのピクセル数を返します。"""
+        view_ms = self._view_end_ms - self._view_start_ms
+        return width / view_ms if view_ms > 0 else width / self._total_ms
+
+    def _on_click(self, event):
+        # 細いスパンもクリックしやすいように、前後2pxの範囲で検索する
+        items = self.find_overlapping(event.x - 2, 0, event.x + 2, self.winfo_height())
+        seek_times = [self._item_seek_times[item] for item in items if item in self._item_seek_times]
+        if seek_times:
+            self._on_span_clicked(min(seek_times))
+
+    def _color_for(self, name: str) -> str:
+        # hash()は実行ごとに値が変わるため、crc32で手順名ごとに安定した色を選ぶ
+        return self.PALETTE[zlib.crc32(name.encode("utf-8")) % len(self.PALETTE)]
+
+def _span_start(entry: tuple) -> float:
+    return entry[0]
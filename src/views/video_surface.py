@@ -0,0 +1,35 @@
+import tkinter as tk
+import numpy as np
+from PIL import Image, ImageTk
+
+class VideoSurface(tk.Label):
+    """
+    ソフトウェア出力のフレーム (BGRA の NumPy 配列) を描画するウィジェット (View)。
+    VLCがウィンドウへ直接描画できない環境で、動画エリアに重ねて表示します。
+    フレームはアスペクト比を保ったまま、ウィジェットの大きさに合わせて縮小・拡大します。
+    """
+
+    def __init__(self, parent, **kwargs):
+        super().__init__(parent, background="black", borderwidth=0, highlightthickness=0, **kwargs)
+        self._photo = None
+
+    def show_frame(self, frame: np.ndarray):
+        """フレームを描画します。"""
+        widget_width = self.winfo_width()
+        widget_height = self.winfo_height()
+        if widget_width < 2 or widget_height < 2:
+            return  # まだ配置されていない
+
+        frame_height, frame_width = frame.shape[:2]
+        # BGRA のバッファから、チャンネルを並べ替えながら RGB の画像を作る
+        image = Image.frombuffer("RGB", (frame_width, frame_height), frame, "raw", "BGRX", 0, 1)
+        scale = min(widget_width / frame_width, widget_height / frame_height)
+        size = (max(1, int(frame_width * scale)), max(1, int(frame_height * scale)))
+        if size != image.size:
+            image = image.resize(size, Image.BILINEAR)
+
+        if self._photo is None or (self._photo.width(), self._photo.height()) != size:
+            self._photo = ImageTk.PhotoImage(image)
+            self.config(image=self._photo)
+        else:
+            self._photo.paste(image)
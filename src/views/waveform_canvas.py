@@ -0,0 +1,76 @@
+import tkinter as tk
+import numpy as np
+
+class WaveformCanvas(tk.Canvas):
+    """
+    音声の波形を、表示範囲のピクセル列ごとの (min, max) として描画するキャンバス (View)。
+    ピークは描画のたびに表示範囲と幅を指定して取得するため、ズームしても表示範囲の分しか読みません。
+    波形は連続した列ごとに1つの多角形で描くので、キャンバスのアイテム数は幅によらず少ないままです。
+    """
+    COLOR_BG = "#F5F5F7"
+    COLOR_WAVE = "#8E8E93"
+    COLOR_CENTER = "#D1D1D6"
+
+    def __init__(self, parent, height: int = 28, **kwargs):
+        """
+        Args:
+            parent: 親ウィジェット。
+            height: キャンバスの高さ(px)。
+        """
+        super().__init__(parent, height=height, highlightthickness=0, background=self.COLOR_BG, **kwargs)
+        # (開始ms, 終了ms, 列数) -> ((列数, 2) int16 のピーク, 列に波形があるか) または None を返す関数
+        self._peak_provider = None
+        self._view_start_ms = 0.0
+        self._view_end_ms = 0.0
+
+        self.bind("<Configure>", lambda event: self.redraw())
+
+    # --- 公開API ---
+
+    def set_peak_provider(self, provider):
+        """波形のピークを返す関数を設定し、再描画します。"""
+        self._peak_provider = provider
+        self.redraw()
+
+    def set_duration(self, total_ms: int):
+        """プレイリスト全体の長さ(ms)を設定し、全体表示で再描画します。"""
+        self._view_start_ms = 0.0
+        self._view_end_ms = float(total_ms)
+        self.redraw()
+
+    def set_visible_range(self, start_ms: float, end_ms: float):
+        """表示範囲(ms)を設定し、その範囲の波形を描画し直します。"""
+        if (start_ms, end_ms) == (self._view_start_ms, self._view_end_ms):
+            return
+        self._view_start_ms = start_ms
+        self._view_end_ms = end_ms
+        self.redraw()
+
+    def redraw(self):
+        """表示範囲の波形を描画し直します。解析結果が増えたときにも使用します。"""
+        self.delete("all")
+        width, height = self.winfo_width(), self.winfo_height()
+        center = height / 2.0
+        self.create_line(0, center, width, center, fill=self.COLOR_CENTER)
+        if not self._peak_provider or width <= 1 or self._view_end_ms <= self._view_start_ms:
+            return
+        result = self._peak_provider(self._view_start_ms, self._view_end_ms, width)
+        if result is None:
+            return
+        peaks, valid = result
+        scale = (center - 1) / 32768.0
+        tops = center - peaks[:, 1].astype(np.float64) * scale
+        # 無音でも1pxの線が見えるように、上下を最低1px離す
+        bottoms = np.maximum(center - peaks[:, 0].astype(np.float64) * scale, tops + 1)
+        # 波形がある連続した列ごとに、上側を左から右へ、下側を右から左へたどる多角形を描く
+        changes = np.flatnonzero(np.diff(np.concatenate([[False], valid, [False]]).astype(np.int8)))
+        for first, last in zip(changes[::2], changes[1::2]):
+            xs = np.arange(first, last, dtype=np.float64)
+            if last - first == 1:
+                self.create_line(first, tops[first], first, bottoms[first], fill=self.COLOR_WAVE)
+                continue
+            coords = np.concatenate([
+                np.column_stack([xs, tops[first:last]]).ravel(),
+                np.column_stack([xs[::-1], bottoms[first:last][::-1]]).ravel(),
+            ])
+            self.create_polygon(*coords.tolist(), fill=self.COLOR_WAVE, outline="")
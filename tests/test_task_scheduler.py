@@ -0,0 +1,237 @@
+"""
+TaskScheduler のテスト。
+
+Tkを使わずに動かせるよう、after() / after_cancel() を記録するだけの FakeRoot を使い、
+テストのスレッドを「Tkのスレッド」としてポンプを手で回します。
+
+実行方法:
+    python -m unittest discover -s tests -t .
+"""
+import threading
+import time
+import unittest
+from src.utils.task_scheduler import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, Task, TaskScheduler
+
+
+class FakeRoot:
+    """after() / after_cancel() だけを持つ、Tkのウィジェットの代わり。作成したスレッド以外から呼ばれたら記録する。"""
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.violations = []
+        self._timers = {}
+        self._next_id = 0
+
+    def _check_thread(self, operation: str):
+        if threading.current_thread() is not self.thread:
+            self.violations.append((operation, threading.current_thread().name))
+
+    def after(self, ms: int, func, *args):
+        self._check_thread("after")
+        self._next_id += 1
+        timer_id = f"after#{self._next_id}"
+        self._timers[timer_id] = (func, args)
+        return timer_id
+
+    def after_cancel(self, timer_id):
+        self._check_thread("after_cancel")
+        self._timers.pop(timer_id, None)
+
+    def run_pending(self):
+        """登録されているタイマーを、待ち時間を無視してすべて実行する (Tkのメインループの1回分)。"""
+        timers, self._timers = self._timers, {}
+        for func, args in timers.values():
+            func(*args)
+
+
+class TaskSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = FakeRoot()
+        self.scheduler = TaskScheduler(self.root, max_workers=2)
+        self.tk_thread = threading.current_thread()
+        # 止めたタスクを最後に必ず終わらせるためのイベント
+        self.events = []
+
+    def tearDown(self):
+        for event in self.events:
+            event.set()
+        self.scheduler.shutdown(wait=True)
+        self.assertEqual(self.root.violations, [])
+
+    def pump_until(self, condition, timeout: float = 5.0):
+        """condition() が True になるまでポンプを回す。"""
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("timed out while pumping the scheduler")
+            self.root.run_pending()
+            time.sleep(0.005)
+
+    def blocking_task(self):
+        """set() されるまで終わらないタスクの関数と、開始したことを知らせるイベントを返す。"""
+        started, release = threading.Event(), threading.Event()
+        self.events.append(release)
+
+        def run(context):
+            started.set()
+            release.wait(5.0)
+            return "released"
+        return run, started, release
+
+    def test_callbacks_run_on_tk_thread(self):
+        threads = {}
+
+        def work(context, value):
+            threads["work"] = threading.current_thread()
+            context.report_progress(0.5, "half")
+            return value * 2
+
+        results = []
+        task = self.scheduler.submit(
+            work, 21, name="work",
+            on_done=lambda result: (threads.__setitem__("done", threading.current_thread()), results.append(result)),
+            on_progress=lambda fraction, message: threads.__setitem__("progress", threading.current_thread()))
+        self.pump_until(task.is_finished)
+
+        self.assertEqual(task.state, Task.DONE)
+        self.assertEqual(results, [42])
+        self.assertIsNot(threads["work"], self.tk_thread)
+        self.assertIs(threads["done"], self.tk_thread)
+        self.assertIs(threads["progress"], self.tk_thread)
+
+    def test_error_callback_runs_on_tk_thread(self):
+        def fail(context):
+            raise ValueError("broken")
+
+        errors = []
+        task = self.scheduler.submit(fail, on_error=lambda error: errors.append((error, threading.current_thread())))
+        self.pump_until(task.is_finished)
+
+        self.assertEqual(task.state, Task.FAILED)
+        self.assertIsInstance(errors[0][0], ValueError)
+        self.assertIs(errors[0][1], self.tk_thread)
+
+    def test_call_soon_from_worker_runs_on_tk_thread(self):
+        called = []
+
+        def work(context):
+            self.scheduler.call_soon(lambda: called.append(threading.current_thread()))
+
+        task = self.scheduler.submit(work)
+        self.pump_until(lambda: task.is_finished() and called)
+        self.assertIs(called[0], self.tk_thread)
+
+    def test_submit_from_other_thread_is_rejected(self):
+        errors = []
+
+        def submit():
+            try:
+                self.scheduler.submit(lambda context: None)
+            except RuntimeError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=submit)
+        thread.start()
+        thread.join()
+        self.assertEqual(len(errors), 1)
+
+    def test_high_priority_task_runs_while_workers_are_busy(self):
+        blockers = []
+        for _ in range(2):
+            run, started, _ = self.blocking_task()
+            blockers.append(self.scheduler.submit(run, priority=PRIORITY_LOW))
+            self.assertTrue(started.wait(5.0))
+        waiting = self.scheduler.submit(lambda context: "normal", priority=PRIORITY_NORMAL)
+        high = self.scheduler.submit(lambda context: "saved", priority=PRIORITY_HIGH)
+
+        self.pump_until(high.is_finished)
+        self.assertEqual(high.state, Task.DONE)
+        # 空けておいたワーカーは、PRIORITY_HIGH 以外のタスクには使わない
+        self.assertEqual(waiting.state, Task.PENDING)
+        self.assertTrue(all(task.state == Task.RUNNING for task in blockers))
+
+        for event in self.events:
+            event.set()
+        self.pump_until(waiting.is_finished)
+        self.assertEqual(waiting.state, Task.DONE)
+
+    def test_cancelled_pending_task_is_not_run(self):
+        for _ in range(2):
+            run, started, _ = self.blocking_task()
+            self.scheduler.submit(run, priority=PRIORITY_LOW)
+            self.assertTrue(started.wait(5.0))
+        ran, done = [], []
+        task = self.scheduler.submit(lambda context: ran.append(True), on_done=done.append)
+        task.cancel()
+
+        for event in self.events:
+            event.set()
+        self.pump_until(lambda: not self.scheduler.has_active_tasks())
+        self.assertEqual(task.state, Task.CANCELLED)
+        self.assertEqual(ran, [])
+        self.assertEqual(done, [])
+
+    def test_running_task_observes_cancellation(self):
+        started = threading.Event()
+
+        def work(context):
+            started.set()
+            while True:
+                context.token.raise_if_cancelled()
+                time.sleep(0.005)
+
+        done = []
+        task = self.scheduler.submit(work, on_done=done.append)
+        self.assertTrue(started.wait(5.0))
+        task.cancel()
+        self.pump_until(task.is_finished)
+        self.assertEqual(task.state, Task.CANCELLED)
+        self.assertEqual(done, [])
+
+    def test_begin_shutdown_keeps_only_high_priority_tasks(self):
+        low_started = threading.Semaphore(0)
+
+        def low_work(context):
+            low_started.release()
+            while True:
+                context.token.raise_if_cancelled()
+                time.sleep(0.005)
+
+        # PRIORITY_HIGH 以外に使えるワーカーを埋めておく
+        lows = [self.scheduler.submit(low_work, priority=PRIORITY_LOW) for _ in range(2)]
+        for _ in lows:
+            self.assertTrue(low_started.acquire(timeout=5.0))
+        run, started, release = self.blocking_task()
+        saved = []
+        high = self.scheduler.submit(run, priority=PRIORITY_HIGH, on_done=saved.append)
+        self.assertTrue(started.wait(5.0))
+        pending = self.scheduler.submit(lambda context: None, priority=PRIORITY_NORMAL)
+
+        self.scheduler.begin_shutdown()
+        self.assertEqual(pending.state, Task.CANCELLED)
+        with self.assertRaises(RuntimeError):
+            self.scheduler.submit(lambda context: None, priority=PRIORITY_HIGH)
+
+        self.pump_until(lambda: all(low.is_finished() for low in lows))
+        self.assertTrue(all(low.state == Task.CANCELLED for low in lows))
+        self.assertTrue(self.scheduler.has_active_tasks())
+        release.set()
+        self.pump_until(lambda: not self.scheduler.has_active_tasks())
+        self.assertEqual(high.state, Task.DONE)
+        self.assertEqual(saved, ["released"])
+
+    def test_shutdown_waits_for_running_tasks(self):
+        finished = threading.Event()
+
+        def work(context):
+            time.sleep(0.05)
+            finished.set()
+
+        self.scheduler.submit(work)
+        self.scheduler.shutdown(wait=True)
+        self.assertTrue(finished.is_set())
+
+
+if __name__ == "__main__":
+    unittest.main()